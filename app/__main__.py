@@ -0,0 +1,40 @@
+"""
+Command line entry point: ``python -m app <command>``.
+
+Commands:
+    serve   Run the pre-forking production server (see `app.server`).
+"""
+
+import argparse
+import sys
+
+from app import server
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="Run the production server")
+    serve.add_argument("--host", default=server.SERVER_HOST)
+    serve.add_argument("--port", type=int, default=server.SERVER_PORT)
+    serve.add_argument("--workers", type=int, default=server.SERVER_WORKERS)
+    serve.add_argument("--backlog", type=int, default=server.SERVER_BACKLOG)
+    serve.add_argument("--max-requests", type=int, default=server.SERVER_MAX_REQUESTS,
+                       help="Recycle a worker after this many requests (0 disables)")
+    serve.add_argument("--max-requests-jitter", type=int, default=server.SERVER_MAX_REQUESTS_JITTER)
+    serve.add_argument("--max-memory-mb", type=int, default=server.SERVER_MAX_MEMORY_MB,
+                       help="Recycle a worker whose RSS exceeds this many MiB (0 disables)")
+    serve.add_argument("--graceful-timeout", type=int, default=server.SERVER_GRACEFUL_TIMEOUT,
+                       help="Seconds a stopping worker may spend draining")
+    serve.add_argument("--max-startup-failures", type=int, default=server.SERVER_MAX_STARTUP_FAILURES,
+                       help="Exit after this many consecutive worker startup failures")
+
+    args = parser.parse_args(argv)
+    options = vars(args)
+    options.pop("command")
+    return server.serve(**options)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
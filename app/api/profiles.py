@@ -0,0 +1,53 @@
+"""
+Debug endpoints for the request profiles captured by `ProfilingMiddleware`.
+
+Only users holding `ADMIN_ROLE` may read them. Profiles live in the memory of
+the worker that captured them, so with several workers a profile id may have
+to be requested more than once before it reaches the right one.
+"""
+
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from app.core.security.permissions import bearer_has_role
+from app.graphql.permissions import ADMIN_ROLE
+from app.infrastructure.profiling.sampler import profile_store
+
+router = APIRouter(prefix="/debug/profiles", tags=["debug"])
+
+
+async def _require_admin(authorization: Optional[str]) -> None:
+    if not await bearer_has_role(authorization, ADMIN_ROLE):
+        raise HTTPException(status_code=403, detail=f"Requires role: {ADMIN_ROLE}.")
+
+
+@router.get("")
+async def list_profiles(operation: Optional[str] = Query(None), authorization: Optional[str] = Header(None)):
+    """
+    Lists this worker's recent profiles, newest first, optionally for one GraphQL operation.
+    """
+    await _require_admin(authorization)
+    return [profile.summary() for profile in profile_store.recent(operation)]
+
+
+@router.get("/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    format: Literal["collapsed", "speedscope"] = Query("collapsed"),
+    authorization: Optional[str] = Header(None),
+):
+    """
+    Returns one profile as collapsed stacks (text) or speedscope JSON.
+    """
+    await _require_admin(authorization)
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    if format == "speedscope":
+        return JSONResponse(
+            profile.speedscope(),
+            headers={"content-disposition": f'attachment; filename="{profile.id}.speedscope.json"'},
+        )
+    return PlainTextResponse(profile.collapsed())
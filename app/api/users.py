@@ -0,0 +1,67 @@
+"""
+Versioned REST endpoints for high-rate user lookups.
+
+These bypass GraphQL parsing, validation and execution for the lookups
+internal services make most: by id, by email, and batches of ids. They share
+the identity cache and projected queries of `UserService`, and responses are
+serialized from the cached records by a `TypeAdapter` built once at import,
+without constructing a model per user.
+
+Like the equivalent GraphQL fields, they do not require authentication.
+"""
+
+import os
+
+from fastapi import APIRouter, HTTPException, Query, Response
+from pydantic import TypeAdapter
+
+from app.core.services.user_service import UserService
+from app.schemas.api import UserSummary
+
+REST_MAX_BATCH_IDS = int(os.environ.get("REST_MAX_BATCH_IDS", "100"))
+
+router = APIRouter(prefix="/v1/users", tags=["users"])
+
+_user_json = TypeAdapter(UserSummary)
+_users_json = TypeAdapter(list[UserSummary])
+
+
+def _json(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
+
+@router.get("", response_model=list[UserSummary])
+async def get_users(ids: str = Query(..., description="Comma-separated user ids")):
+    """
+    Returns the existing users among `ids`, in request order; unknown ids are omitted.
+    """
+    try:
+        user_ids = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="ids must be comma-separated integers.")
+    if not user_ids or len(user_ids) > REST_MAX_BATCH_IDS:
+        raise HTTPException(status_code=422, detail=f"ids must list 1 to {REST_MAX_BATCH_IDS} user ids.")
+    records = await UserService.get_users_by_ids(user_ids)
+    return _json(_users_json.dump_json([record._asdict() for record in records]))
+
+
+@router.get("/by-email", response_model=UserSummary)
+async def get_user_by_email(email: str = Query(...)):
+    """
+    Returns the user with this email address (case-insensitive).
+    """
+    record = await UserService.get_user_by_email(email)
+    if record is None:
+        raise HTTPException(status_code=404, detail="User not found.")
+    return _json(_user_json.dump_json(record._asdict()))
+
+
+@router.get("/{user_id}", response_model=UserSummary)
+async def get_user(user_id: int):
+    """
+    Returns a single user by id.
+    """
+    record = await UserService.get_user_by_id(user_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="User not found.")
+    return _json(_user_json.dump_json(record._asdict()))
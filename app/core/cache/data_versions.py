@@ -0,0 +1,115 @@
+"""
+Per-table data versions for conditional GraphQL reads.
+
+A statement-level trigger on each tracked table increments a counter in
+`data_versions` whenever the table is written. The counter is spread over a
+few slots per table (chosen by backend pid) so concurrent writers rarely wait
+on the same row, and because it is updated inside the writing transaction a
+version only becomes visible together with the data it counts.
+
+Each worker polls the summed counters every `DATA_VERSION_REFRESH_INTERVAL`
+seconds; with sharded storage the shards' counters are added up. When this
+worker emits a user change event its versions are marked unknown until the
+next poll, which is triggered immediately, so a client never gets a stale
+"not modified" for its own write. Changes made by other workers are seen
+within one interval.
+"""
+
+import os
+import time
+from typing import Iterable, Optional
+
+from sqlalchemy import text
+
+from app.events.user_events import event_bus
+from app.infrastructure.background import PeriodicTask
+from app.infrastructure.sharding.shard_router import shard_router
+
+DATA_VERSION_REFRESH_INTERVAL = float(os.environ.get("DATA_VERSION_REFRESH_INTERVAL", "2"))
+
+# Tables that have the bump trigger (migration 5d8e2a7c9f41)
+TRACKED_TABLES = ("users", "user_roles", "user_profiles")
+
+VERSIONS_QUERY = text(
+    "SELECT table_name, sum(version) FROM chrome_users.data_versions GROUP BY table_name"
+)
+
+
+class DataVersions:
+    """
+    Latest known version of each tracked table in this worker.
+
+    Versions are None until loaded, while a local change is pending, and when
+    the last successful refresh is older than `stale_after` seconds, so callers
+    fall back to uncached behaviour whenever they cannot be trusted.
+    """
+
+    def __init__(self, stale_after: float = 3 * DATA_VERSION_REFRESH_INTERVAL):
+        self.stale_after = stale_after
+        self._versions: dict[str, int] = {}
+        self._loaded_at: Optional[float] = None
+        self._generation = 0
+        self._dirty = False
+
+    def get(self, tables: Iterable[str]) -> Optional[tuple[int, ...]]:
+        """
+        Returns the versions of `tables`, in order, or None if they are not currently known.
+        """
+        if self._dirty or self._loaded_at is None or time.monotonic() - self._loaded_at > self.stale_after:
+            return None
+        return tuple(self._versions.get(table, 0) for table in tables)
+
+    def mark_changed(self) -> None:
+        """Forgets the versions until the next refresh; call after a local write."""
+        self._generation += 1
+        self._dirty = True
+
+    async def refresh(self) -> None:
+        """Reloads the summed counters from every shard."""
+        generation = self._generation
+
+        async def read(session):
+            return (await session.execute(VERSIONS_QUERY)).all()
+
+        versions: dict[str, int] = {}
+        for rows in await shard_router.scatter(read):
+            for table, version in rows:
+                versions[table] = versions.get(table, 0) + int(version)
+        self._versions = versions
+        self._loaded_at = time.monotonic()
+        if generation == self._generation:
+            self._dirty = False
+
+
+class DataVersionRefresher(PeriodicTask):
+    """Keeps `DataVersions` current by polling the database."""
+
+    name = "DataVersionRefresher"
+
+    def __init__(self, versions: DataVersions, interval: float = DATA_VERSION_REFRESH_INTERVAL):
+        super().__init__(interval)
+        self.versions = versions
+
+    async def run_once(self) -> None:
+        await self.versions.refresh()
+
+
+# Per-worker version state
+data_versions = DataVersions()
+data_version_refresher = DataVersionRefresher(data_versions)
+
+
+def register_data_version_handlers():
+    """
+    Registers listeners that invalidate the known versions on local user changes.
+    To be called once during application startup.
+    """
+
+    @event_bus.on("user_registered")
+    @event_bus.on("user_updated")
+    @event_bus.on("user_verified")
+    @event_bus.on("user_roles_changed")
+    @event_bus.on("user_profile_updated")
+    def on_user_change(*args):
+        data_versions.mark_changed()
+        data_version_refresher.wake()
@@ -0,0 +1,212 @@
+"""
+In-process prefix index over usernames and emails for autocomplete.
+
+Lowercased usernames and emails are kept in one sorted array with a parallel
+array of user ids, so a prefix lookup is a binary search followed by a short
+forward scan. The index is optional (`USER_PREFIX_INDEX=1`); it is filled in
+the background from the `users` table, picks up registrations in this worker
+from `user_registered` events, and polls for users created elsewhere by id.
+Ids are allocated before their transactions commit, so they can become
+visible out of order; each poll re-reads the last
+`USER_PREFIX_INDEX_RESCAN_IDS` ids below the highest one seen to pick up
+users whose registration committed late.
+
+Entries are never removed: callers re-read the matched ids through the live
+user filter and re-check the prefix against the current row, so deleted or
+renamed users simply drop out of the results. When users are sharded, the
+index is filled from the user directory, which lists every user in one table.
+"""
+
+import asyncio
+import os
+from array import array
+from bisect import bisect_left
+from typing import Optional
+
+from app.database import asyncpg_connection
+from app.events.user_events import event_bus
+from app.infrastructure.background import PeriodicTask
+from app.infrastructure.sharding.shard_router import shard_router
+
+USER_PREFIX_INDEX = os.environ.get("USER_PREFIX_INDEX", "0") == "1"
+USER_PREFIX_INDEX_REFRESH_INTERVAL = float(os.environ.get("USER_PREFIX_INDEX_REFRESH_INTERVAL", "30"))
+USER_PREFIX_INDEX_LOAD_BATCH = int(os.environ.get("USER_PREFIX_INDEX_LOAD_BATCH", "50000"))
+USER_PREFIX_INDEX_RESCAN_IDS = int(os.environ.get("USER_PREFIX_INDEX_RESCAN_IDS", "1000"))
+
+
+class PrefixIndex:
+    """
+    Sorted array of ``(key, user_id)`` pairs supporting prefix search.
+
+    `last_user_id` is the highest id loaded from the table; users added from
+    events do not advance it, so the poller does not skip users registered by
+    other workers.
+
+    Single inserts use binary insertion; large batches are merged by
+    re-sorting a copy of the arrays on a helper thread. The key and id arrays
+    are swapped in as one tuple so readers never see them mismatched, and
+    entries added while a merge runs are replayed onto its result.
+    """
+
+    def __init__(self):
+        self._arrays: tuple[list[str], array] = ([], array("q"))
+        self._added_during_merge: Optional[list[tuple[int, tuple[str, ...]]]] = None
+        self.last_user_id = 0
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._arrays[0])
+
+    def add(self, user_id: int, *keys: str) -> None:
+        """Indexes `user_id` under each of `keys` (case-insensitive)."""
+        if self._added_during_merge is not None:
+            self._added_during_merge.append((user_id, keys))
+        index_keys, ids = self._arrays
+        for key in keys:
+            key = key.lower()
+            position = bisect_left(index_keys, key)
+            # Skip exact duplicates, e.g. a registration event racing the poller
+            scan = position
+            while scan < len(index_keys) and index_keys[scan] == key:
+                if ids[scan] == user_id:
+                    break
+                scan += 1
+            else:
+                index_keys.insert(position, key)
+                ids.insert(position, user_id)
+
+    async def merge(self, rows: list[tuple[int, str, str]]) -> None:
+        """
+        Indexes a large batch of ``(user_id, username, email)`` rows by
+        re-sorting on a helper thread.
+
+        The arrays are copied on the event loop before the thread starts, so
+        concurrent `add()` calls never mutate the lists being sorted; those
+        entries are re-added to the merged arrays once they are swapped in.
+        """
+        index_keys, ids = self._arrays
+        snapshot = (list(index_keys), array("q", ids))
+        self._added_during_merge = []
+        try:
+            arrays = await asyncio.to_thread(_merged, snapshot, rows)
+        finally:
+            added, self._added_during_merge = self._added_during_merge, None
+        self._arrays = arrays
+        for user_id, keys in added:
+            self.add(user_id, *keys)
+
+    def search(self, prefix: str, limit: int) -> list[int]:
+        """
+        Returns up to `limit` distinct user ids with a username or email
+        starting with `prefix`, in key order.
+        """
+        prefix = prefix.lower()
+        index_keys, ids = self._arrays
+        matches: dict[int, None] = {}
+        position = bisect_left(index_keys, prefix)
+        while position < len(index_keys) and len(matches) < limit and index_keys[position].startswith(prefix):
+            matches[ids[position]] = None
+            position += 1
+        return list(matches)
+
+
+def _merged(arrays: tuple[list[str], array], rows: list[tuple[int, str, str]]) -> tuple[list[str], array]:
+    """Returns new sorted key and id arrays holding `arrays` plus the entries for `rows`."""
+    pairs = set(zip(*arrays))
+    for user_id, username, email in rows:
+        pairs.add((username.lower(), user_id))
+        pairs.add((email.lower(), user_id))
+    pairs = sorted(pairs)
+    return [key for key, _ in pairs], array("q", (user_id for _, user_id in pairs))
+
+
+class PrefixIndexLoader(PeriodicTask):
+    """
+    Fills the prefix index with users whose id is above `last_user_id`, less
+    a trailing window of `rescan_ids` ids.
+
+    The first run loads the whole table in id-ordered batches and sorts it
+    once on a helper thread; later runs pick up users registered since, plus
+    those in the window that committed after a higher id was already read.
+    Re-read users are skipped by the duplicate check in `PrefixIndex.add()`.
+    """
+
+    name = "PrefixIndexLoader"
+    schema = "chrome_users"
+
+    # Batches smaller than this are inserted in place instead of re-sorted
+    merge_threshold = 256
+
+    def __init__(
+        self,
+        index: PrefixIndex,
+        interval: float = USER_PREFIX_INDEX_REFRESH_INTERVAL,
+        batch_size: int = USER_PREFIX_INDEX_LOAD_BATCH,
+        rescan_ids: int = USER_PREFIX_INDEX_RESCAN_IDS,
+    ):
+        super().__init__(interval)
+        self.index = index
+        self.batch_size = batch_size
+        self.rescan_ids = rescan_ids
+
+    async def run_once(self) -> None:
+        if shard_router.sharded:
+            # The directory has no deletion flag; deleted users are filtered out at search time
+            statement = (
+                f"SELECT user_id AS id, username, email_lower AS email FROM {self.schema}.user_directory "
+                f"WHERE user_id > $1 ORDER BY user_id LIMIT $2"
+            )
+        else:
+            statement = (
+                f"SELECT id, username, email FROM {self.schema}.users "
+                f"WHERE id > $1 AND is_deleted = false ORDER BY id LIMIT $2"
+            )
+        rows: list[tuple[int, str, str]] = []
+        last_user_id = self.index.last_user_id
+        after = max(0, last_user_id - self.rescan_ids)
+        async with asyncpg_connection(shard_router.engines[0]) as conn:
+            while True:
+                batch = await conn.fetch(statement, after, self.batch_size)
+                rows.extend((row["id"], row["username"], row["email"]) for row in batch)
+                if len(batch) < self.batch_size:
+                    break
+                after = batch[-1]["id"]
+
+        # Only a large batch of new users is worth re-sorting; the re-read window is mostly already indexed
+        if sum(row[0] > last_user_id for row in rows) >= self.merge_threshold:
+            await self.index.merge(rows)
+        else:
+            for user_id, username, email in rows:
+                self.index.add(user_id, username, email)
+        if rows:
+            self.index.last_user_id = max(self.index.last_user_id, rows[-1][0])
+
+        if not self.index.loaded:
+            self.index.loaded = True
+            print(f"[PrefixIndexLoader] Loaded {len(self.index)} keys")
+
+
+user_prefix_index = PrefixIndex()
+user_prefix_index_loader = PrefixIndexLoader(user_prefix_index)
+
+
+def start_prefix_index():
+    """
+    Registers the registration listener and starts loading the index, if enabled.
+    To be called once during application startup.
+    """
+    if not USER_PREFIX_INDEX:
+        return
+
+    @event_bus.on("user_registered")
+    def index_registered_user(user):
+        """
+        Adds a newly registered user to the prefix index.
+
+        Args:
+            user: The new user instance.
+        """
+        user_prefix_index.add(user.id, user.username, user.email)
+
+    user_prefix_index_loader.start()
+    user_prefix_index_loader.wake()
@@ -0,0 +1,125 @@
+"""
+In-process identity cache for user lookups.
+
+Each worker keeps a size-bounded LRU of compact, immutable user records so that
+repeated lookups by id, email or username are served from memory instead of the
+database. All three keys resolve to the same cache entry, and entries are dropped
+whenever a user update event is emitted.
+"""
+
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from app.events.user_events import event_bus
+
+
+class UserRecord(NamedTuple):
+    """
+    Immutable, tuple-backed snapshot of the public user fields.
+
+    Records are shared between concurrent requests, so they must never be mutated.
+    """
+    id: int
+    username: str
+    email: str
+    is_active: bool
+    email_verified: bool
+
+
+class UserIdentityCache:
+    """
+    Size-bounded LRU cache of `UserRecord` entries keyed by user id.
+
+    Email and username are secondary keys that point at the id, so a single entry
+    serves all three lookups and a single invalidation removes it everywhere.
+    Entries also expire after `ttl_seconds` to bound staleness across workers,
+    since invalidation events are only seen by the worker that emitted them.
+    """
+
+    def __init__(self, max_entries: int = 10_000, ttl_seconds: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, tuple[UserRecord, float]]" = OrderedDict()
+        self._by_email: dict[str, int] = {}
+        self._by_username: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_by_id(self, user_id: int) -> Optional[UserRecord]:
+        """Return the cached record for `user_id`, or None on a miss."""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        record, expires_at = entry
+        if expires_at < time.monotonic():
+            self.invalidate(user_id)
+            return None
+        self._entries.move_to_end(user_id)
+        return record
+
+    def get_by_email(self, email: str) -> Optional[UserRecord]:
+        """Return the cached record for `email` (case-insensitive), or None on a miss."""
+        user_id = self._by_email.get(email.lower())
+        return None if user_id is None else self.get_by_id(user_id)
+
+    def get_by_username(self, username: str) -> Optional[UserRecord]:
+        """Return the cached record for `username`, or None on a miss."""
+        user_id = self._by_username.get(username)
+        return None if user_id is None else self.get_by_id(user_id)
+
+    def put(self, record: UserRecord) -> None:
+        """
+        Insert or replace the entry for `record.id`, evicting the least recently
+        used entries once the cache is full.
+        """
+        if record.id in self._entries:
+            self.invalidate(record.id)
+
+        self._entries[record.id] = (record, time.monotonic() + self.ttl_seconds)
+        self._by_email[record.email.lower()] = record.id
+        self._by_username[record.username] = record.id
+
+        while len(self._entries) > self.max_entries:
+            evicted_id, _ = next(iter(self._entries.items()))
+            self.invalidate(evicted_id)
+
+    def invalidate(self, user_id: int) -> None:
+        """Drop the entry for `user_id` and both of its secondary keys."""
+        entry = self._entries.pop(user_id, None)
+        if entry is None:
+            return
+        record, _ = entry
+        if self._by_email.get(record.email.lower()) == user_id:
+            del self._by_email[record.email.lower()]
+        if self._by_username.get(record.username) == user_id:
+            del self._by_username[record.username]
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        self._entries.clear()
+        self._by_email.clear()
+        self._by_username.clear()
+
+
+# Per-worker cache instance shared by the GraphQL resolvers
+user_cache = UserIdentityCache()
+
+
+def register_cache_handlers():
+    """
+    Registers listeners that keep the identity cache coherent with user updates.
+    To be called once during application startup.
+    """
+
+    @event_bus.on("user_updated")
+    @event_bus.on("user_verified")
+    def invalidate_user(user):
+        """
+        Drops the cached record of a user whose row has just changed.
+
+        Args:
+            user: The updated user instance (anything with an `id` attribute).
+        """
+        user_cache.invalidate(user.id)
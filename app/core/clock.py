@@ -0,0 +1,14 @@
+"""
+Time helpers for converting between database timestamps and epoch seconds.
+
+Timestamps in the `chrome_users` schema are naive and in UTC.
+"""
+
+from datetime import datetime
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch(value: datetime) -> float:
+    """Converts a naive UTC timestamp to epoch seconds."""
+    return (value - _EPOCH).total_seconds()
@@ -0,0 +1,87 @@
+"""
+Per-request deadlines carried in a context variable.
+
+`DeadlineMiddleware` (see `app.middleware.deadline`) opens a deadline for each
+HTTP request, and tasks created while handling it (gathered resolvers, shard
+scatter reads) inherit it. Every database transaction started under a
+deadline runs with ``SET LOCAL statement_timeout`` set to the time left, so
+PostgreSQL gives up on a query nobody will wait for, and a transaction that
+would start after the deadline fails with `DeadlineExceeded` instead.
+
+Event handlers are detached from the request that emitted the event and run
+without its deadline (see `app.events.user_events`).
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# Absolute deadline as a time.monotonic() value, or None for no deadline
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when work is started after the current request's deadline."""
+
+
+def remaining() -> Optional[float]:
+    """Returns the seconds left until the current deadline, or None if there is none."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check() -> None:
+    """
+    Raises:
+        DeadlineExceeded: If the current deadline has passed.
+    """
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded.")
+
+
+def statement_timeout_ms() -> Optional[int]:
+    """
+    Returns the ``statement_timeout`` for a transaction starting now, or None without a deadline.
+
+    Raises:
+        DeadlineExceeded: If the current deadline has passed.
+    """
+    left = remaining()
+    if left is None:
+        return None
+    check()
+    # 0 would disable the timeout
+    return max(1, int(left * 1000))
+
+
+@contextmanager
+def deadline_after(seconds: float):
+    """
+    Runs the enclosed code with a deadline `seconds` from now, or the current one if that is earlier.
+
+    Yields:
+        float: The effective deadline, a time.monotonic() value.
+    """
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def no_deadline():
+    """Runs the enclosed code, and tasks it creates, without the current deadline."""
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
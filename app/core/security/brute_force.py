@@ -0,0 +1,327 @@
+"""
+In-memory brute-force detection fed by login attempts.
+
+Recent failures are counted per IP address and per user in sliding windows made
+of small time-bucketed ring arrays, so deciding whether to block someone is a
+constant-time memory lookup rather than a `COUNT(*)` over `login_attempt_logs`.
+Attempts are still written to `login_attempt_logs`, but asynchronously in
+batches, and the windows are rebuilt from that table at startup.
+"""
+
+import os
+import time
+from array import array
+from datetime import datetime, timedelta
+from typing import Hashable, Optional
+
+from app.core.clock import to_epoch
+from app.database import asyncpg_connection
+from app.infrastructure.background import PeriodicTask
+from app.infrastructure.copy_writer import BufferedCopyWriter
+from app.infrastructure.sharding.shard_router import shard_router
+
+BRUTE_FORCE_WINDOW_SECONDS = int(os.environ.get("BRUTE_FORCE_WINDOW_SECONDS", "900"))
+BRUTE_FORCE_BUCKET_SECONDS = int(os.environ.get("BRUTE_FORCE_BUCKET_SECONDS", "60"))
+BRUTE_FORCE_MAX_IP_FAILURES = int(os.environ.get("BRUTE_FORCE_MAX_IP_FAILURES", "50"))
+BRUTE_FORCE_MAX_USER_FAILURES = int(os.environ.get("BRUTE_FORCE_MAX_USER_FAILURES", "10"))
+BRUTE_FORCE_BLOCK_SECONDS = int(os.environ.get("BRUTE_FORCE_BLOCK_SECONDS", "900"))
+BRUTE_FORCE_MAX_KEYS = int(os.environ.get("BRUTE_FORCE_MAX_KEYS", "200000"))
+
+LOGIN_ATTEMPT_COLUMNS = ("ip_address", "user_id", "attempted_at", "was_successful", "reason")
+
+
+class _Window:
+    """Ring of per-bucket counts for one key, plus their running total."""
+
+    __slots__ = ("counts", "total", "head")
+
+    def __init__(self, buckets: int, head: int):
+        self.counts = array("I", bytes(4 * buckets))
+        self.total = 0
+        self.head = head
+
+
+class SlidingWindowCounter:
+    """
+    Counts events per key over the last `window_seconds`.
+
+    The window is split into `window_seconds / bucket_seconds` buckets stored in
+    a fixed-size ring per key. Advancing a window clears at most that many
+    buckets, so every operation is O(1) in the number of recorded events.
+    At most `max_keys` keys are tracked; the oldest are dropped first.
+    """
+
+    def __init__(self, window_seconds: int, bucket_seconds: int, max_keys: int = BRUTE_FORCE_MAX_KEYS):
+        self.bucket_seconds = bucket_seconds
+        self.buckets = max(1, window_seconds // bucket_seconds)
+        self.max_keys = max_keys
+        self._windows: dict[Hashable, _Window] = {}
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def add(self, key: Hashable, timestamp: Optional[float] = None, amount: int = 1) -> int:
+        """
+        Records `amount` events for `key` and returns the key's count in the window.
+
+        Events older than the window are ignored.
+        """
+        bucket = self._bucket(timestamp)
+        window = self._windows.get(key)
+        if window is None:
+            if len(self._windows) >= self.max_keys:
+                self._evict()
+            window = self._windows[key] = _Window(self.buckets, bucket)
+        elif bucket > window.head:
+            self._advance(window, bucket)
+        elif bucket <= window.head - self.buckets:
+            return window.total
+
+        window.counts[bucket % self.buckets] += amount
+        window.total += amount
+        return window.total
+
+    def count(self, key: Hashable, timestamp: Optional[float] = None) -> int:
+        """Returns the number of events recorded for `key` in the window."""
+        window = self._windows.get(key)
+        if window is None:
+            return 0
+        bucket = self._bucket(timestamp)
+        if bucket > window.head:
+            self._advance(window, bucket)
+        return window.total
+
+    def reset(self, key: Hashable) -> None:
+        """Forgets every event recorded for `key`."""
+        self._windows.pop(key, None)
+
+    def prune(self, timestamp: Optional[float] = None) -> None:
+        """Drops keys with no events left in the window."""
+        bucket = self._bucket(timestamp)
+        expired = [key for key, window in self._windows.items() if bucket - window.head >= self.buckets]
+        for key in expired:
+            del self._windows[key]
+
+    def _bucket(self, timestamp: Optional[float]) -> int:
+        return int((time.time() if timestamp is None else timestamp) // self.bucket_seconds)
+
+    def _advance(self, window: _Window, bucket: int) -> None:
+        steps = bucket - window.head
+        if steps >= self.buckets:
+            window.counts = array("I", bytes(4 * self.buckets))
+            window.total = 0
+        else:
+            for index in range(window.head + 1, bucket + 1):
+                slot = index % self.buckets
+                window.total -= window.counts[slot]
+                window.counts[slot] = 0
+        window.head = bucket
+
+    def _evict(self) -> None:
+        self.prune()
+        while len(self._windows) >= self.max_keys:
+            del self._windows[next(iter(self._windows))]
+
+
+class LoginAttemptWriter(BufferedCopyWriter):
+    """
+    Writes login attempts to `login_attempt_logs` with `COPY`, and persists
+    user blocks to `users.blocked_until` in the same flush, both on the shard
+    that owns the user.
+    """
+
+    name = "LoginAttemptWriter"
+    table = "login_attempt_logs"
+    columns = LOGIN_ATTEMPT_COLUMNS
+    user_column = 1
+
+    def __init__(self, capacity: int = 100_000, batch_size: int = 5000, flush_interval: float = 1.0, block_timeout: float = 1.0):
+        super().__init__(capacity, batch_size, flush_interval, block_timeout)
+        self._pending_blocks: dict[int, datetime] = {}
+
+    def block_user(self, user_id: int, until: datetime) -> None:
+        """Schedules `users.blocked_until` to be set for `user_id` on the next flush."""
+        self._pending_blocks[user_id] = until
+        self.wake()
+
+    async def flush(self) -> None:
+        await super().flush()
+        if not self._pending_blocks:
+            return
+        blocks, self._pending_blocks = self._pending_blocks, {}
+        errors = []
+        for shard, user_ids in shard_router.group_by_shard(blocks).items():
+            try:
+                async with asyncpg_connection(shard_router.engines[shard]) as conn:
+                    await conn.executemany(
+                        """
+                        UPDATE chrome_users.users
+                        SET blocked_until = $2
+                        WHERE id = $1 AND (blocked_until IS NULL OR blocked_until < $2)
+                        """,
+                        [(user_id, blocks[user_id]) for user_id in user_ids],
+                    )
+            except Exception as error:
+                # Keep newer blocks that arrived during the failed write
+                for user_id in user_ids:
+                    self._pending_blocks.setdefault(user_id, blocks[user_id])
+                errors.append(error)
+        if errors:
+            raise errors[0]
+
+
+class BruteForceDetector:
+    """
+    Tracks failed login attempts per IP and per user and decides when to block.
+
+    A key is blocked for `block_seconds` once its failures within the window
+    reach the configured limit. User blocks are also persisted to
+    `users.blocked_until` so they survive restarts and apply on every worker.
+    """
+
+    def __init__(
+        self,
+        window_seconds: int = BRUTE_FORCE_WINDOW_SECONDS,
+        bucket_seconds: int = BRUTE_FORCE_BUCKET_SECONDS,
+        max_ip_failures: int = BRUTE_FORCE_MAX_IP_FAILURES,
+        max_user_failures: int = BRUTE_FORCE_MAX_USER_FAILURES,
+        block_seconds: int = BRUTE_FORCE_BLOCK_SECONDS,
+        writer: Optional[LoginAttemptWriter] = None,
+    ):
+        self.window_seconds = window_seconds
+        self.max_ip_failures = max_ip_failures
+        self.max_user_failures = max_user_failures
+        self.block_seconds = block_seconds
+        self.ip_failures = SlidingWindowCounter(window_seconds, bucket_seconds)
+        self.user_failures = SlidingWindowCounter(window_seconds, bucket_seconds)
+        self.writer = writer if writer is not None else LoginAttemptWriter()
+        self._blocked_ips: dict[str, float] = {}
+        self._blocked_users: dict[int, float] = {}
+        self._pruner = _DetectorPruner(self, interval=window_seconds)
+
+    async def start(self) -> None:
+        """Reloads the windows from the database and starts the background tasks."""
+        await self.load()
+        self.writer.start()
+        self._pruner.start()
+
+    async def stop(self) -> None:
+        """Stops the background tasks and flushes queued attempts and blocks."""
+        await self._pruner.stop()
+        await self.writer.stop()
+
+    def blocked_until(self, ip_address: Optional[str] = None, user_id: Optional[int] = None) -> Optional[datetime]:
+        """
+        Returns when the block on this IP or user ends, or None if neither is blocked.
+        """
+        now = time.time()
+        until = max(
+            self._active_block(self._blocked_ips, ip_address, now),
+            self._active_block(self._blocked_users, user_id, now),
+        )
+        return datetime.utcfromtimestamp(until) if until else None
+
+    async def record_attempt(
+        self,
+        ip_address: Optional[str],
+        user_id: Optional[int],
+        was_successful: bool,
+        reason: Optional[str] = None,
+    ) -> Optional[datetime]:
+        """
+        Records a login attempt and updates the block state.
+
+        The attempt is queued for `login_attempt_logs`; nothing is written on the
+        calling path. A successful attempt clears the user's failure window.
+
+        Returns:
+            Optional[datetime]: When the resulting block ends, if the attempt triggered or extended one.
+        """
+        now = time.time()
+        await self.writer.enqueue((ip_address, user_id, datetime.utcfromtimestamp(now), was_successful, reason))
+
+        if was_successful:
+            if user_id is not None:
+                self.user_failures.reset(user_id)
+            return None
+
+        until = None
+        if ip_address and self.ip_failures.add(ip_address, now) >= self.max_ip_failures:
+            until = self._blocked_ips[ip_address] = now + self.block_seconds
+        if user_id is not None and self.user_failures.add(user_id, now) >= self.max_user_failures:
+            until = self._blocked_users[user_id] = now + self.block_seconds
+            self.writer.block_user(user_id, datetime.utcfromtimestamp(until))
+        return datetime.utcfromtimestamp(until) if until else None
+
+    async def load(self) -> None:
+        """
+        Rebuilds the failure windows and active user blocks from the database.
+
+        Only the current window of `login_attempt_logs` is read, which partition
+        pruning keeps to the most recent partition or two. Every shard is read,
+        since an IP's failures are spread over the shards of the users it tried.
+        """
+        since = datetime.utcnow() - timedelta(seconds=self.window_seconds)
+        failures, blocked = [], []
+        for shard_engine in shard_router.engines:
+            async with asyncpg_connection(shard_engine) as conn:
+                failures += await conn.fetch(
+                    """
+                    SELECT ip_address, user_id, attempted_at
+                    FROM chrome_users.login_attempt_logs
+                    WHERE attempted_at >= $1 AND was_successful = false
+                    ORDER BY attempted_at
+                    """,
+                    since,
+                )
+                blocked += await conn.fetch(
+                    "SELECT id, blocked_until FROM chrome_users.users WHERE blocked_until > $1",
+                    datetime.utcnow(),
+                )
+
+        for row in failures:
+            timestamp = to_epoch(row["attempted_at"])
+            if row["ip_address"]:
+                self.ip_failures.add(row["ip_address"], timestamp)
+            if row["user_id"] is not None:
+                self.user_failures.add(row["user_id"], timestamp)
+        for row in blocked:
+            self._blocked_users[row["id"]] = to_epoch(row["blocked_until"])
+
+    def prune(self) -> None:
+        """Drops expired windows and blocks to keep memory bounded."""
+        now = time.time()
+        self.ip_failures.prune(now)
+        self.user_failures.prune(now)
+        for blocks in (self._blocked_ips, self._blocked_users):
+            for key in [key for key, until in blocks.items() if until <= now]:
+                del blocks[key]
+
+    @staticmethod
+    def _active_block(blocks: dict, key, now: float) -> float:
+        if key is None:
+            return 0.0
+        until = blocks.get(key)
+        if until is None:
+            return 0.0
+        if until <= now:
+            del blocks[key]
+            return 0.0
+        return until
+
+
+class _DetectorPruner(PeriodicTask):
+    """Periodically drops expired windows and blocks from a detector."""
+
+    name = "BruteForcePruner"
+
+    def __init__(self, detector: BruteForceDetector, interval: float):
+        super().__init__(interval)
+        self.detector = detector
+
+    async def run_once(self) -> None:
+        self.detector.prune()
+
+
+# Per-worker detector used by the authentication flows
+brute_force_detector = BruteForceDetector()
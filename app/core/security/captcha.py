@@ -0,0 +1,184 @@
+"""
+Stateless HMAC-signed captcha challenges.
+
+Issuing a challenge creates no server-side state: the question's answer is
+bound into a signed token with an embedded expiry, and checking an answer is an
+HMAC comparison in-process. Each token may be answered once; replay protection
+comes from a small in-memory set of spent nonces that forgets each nonce once
+its token has expired anyway. Neither path touches the database, so bot floods
+against these endpoints cost CPU only.
+
+Token format: ``cc1.<nonce>.<expires>.<answer_mac>.<signature>``, where
+`answer_mac` is an HMAC of the nonce and the expected answer under a separate
+key, and `signature` covers everything before it. Every answer to a genuine,
+unexpired token spends its nonce, right or wrong, so answers cannot be guessed
+one after another against one token; forged or expired tokens are rejected
+before a nonce is spent. If the set fills up, the oldest nonces, whose tokens
+are the closest to expiry, are evicted rather than turning valid answers away.
+
+Spent nonces are tracked per worker process: with several workers behind a
+load balancer a solved token can be replayed at most once per worker within
+its lifetime. Set ``CAPTCHA_AUDIT=1`` to record verification attempts in
+`captcha_challenges`; rows are buffered and written with `COPY` off the request
+path, and dropped rather than waited for when the buffer is full.
+"""
+
+import os
+import secrets
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, NamedTuple, Optional
+
+from app.core.security.signing import derive_key, sign, verify
+from app.infrastructure.copy_writer import BufferedCopyWriter
+
+CAPTCHA_REQUIRED = os.environ.get("CAPTCHA_REQUIRED", "0") == "1"
+CAPTCHA_TTL_SECONDS = int(os.environ.get("CAPTCHA_TTL_SECONDS", "300"))
+CAPTCHA_MAX_NONCES = int(os.environ.get("CAPTCHA_MAX_NONCES", "200000"))
+CAPTCHA_AUDIT = os.environ.get("CAPTCHA_AUDIT", "0") == "1"
+
+_PREFIX = "cc1"
+_TOKEN_KEY = derive_key("captcha-token")
+_ANSWER_KEY = derive_key("captcha-answer")
+
+
+class CaptchaError(ValueError):
+    """Raised when a captcha token is invalid, expired, already used or answered wrongly."""
+
+
+class CaptchaChallenge(NamedTuple):
+    """An issued challenge: the question to show and the token to send back."""
+    token: str
+    question: str
+    expires_at: int
+
+
+def arithmetic_question() -> tuple[str, str]:
+    """Returns a random small arithmetic question and its answer."""
+    a, b = secrets.randbelow(20) + 1, secrets.randbelow(20) + 1
+    if secrets.randbelow(2):
+        return f"What is {a} + {b}?", str(a + b)
+    a, b = max(a, b), min(a, b)
+    return f"What is {a} - {b}?", str(a - b)
+
+
+def _normalize(answer: str) -> str:
+    return answer.strip().lower()
+
+
+class NonceSet:
+    """
+    Expiring set of spent challenge nonces.
+
+    Tokens share one lifetime, so nonces expire in roughly insertion order and
+    pruning only ever pops from the front of a queue. When the set is full the
+    oldest nonces are evicted early and counted in `evicted`; their tokens
+    could be replayed until they expire.
+    """
+
+    def __init__(self, max_size: int = CAPTCHA_MAX_NONCES):
+        self.max_size = max_size
+        self.evicted = 0
+        self._expiry: dict[str, float] = {}
+        self._order: deque[tuple[float, str]] = deque()
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def spend(self, nonce: str, expires_at: float) -> bool:
+        """
+        Marks `nonce` as spent until `expires_at`.
+
+        Returns:
+            bool: False if the nonce was already spent.
+        """
+        self._prune(time.time())
+        if nonce in self._expiry:
+            return False
+        while self._order and len(self._expiry) >= self.max_size:
+            _, oldest = self._order.popleft()
+            del self._expiry[oldest]
+            self.evicted += 1
+        self._expiry[nonce] = expires_at
+        self._order.append((expires_at, nonce))
+        return True
+
+    def _prune(self, now: float) -> None:
+        while self._order and self._order[0][0] < now:
+            _, nonce = self._order.popleft()
+            del self._expiry[nonce]
+
+
+class CaptchaAuditWriter(BufferedCopyWriter):
+    """
+    Optional buffered audit sink writing verification attempts to `captcha_challenges`.
+    """
+
+    name = "CaptchaAuditWriter"
+    table = "captcha_challenges"
+    columns = ("session_id", "challenge", "solved", "solved_at", "created_at")
+
+    def __init__(self):
+        # Never make a request wait for buffer space
+        super().__init__(capacity=50_000, batch_size=5_000, flush_interval=2.0, block_timeout=0)
+
+
+class CaptchaService:
+    """
+    Issues and verifies signed captcha challenges.
+
+    Args:
+        ttl_seconds (int): Lifetime of an issued challenge.
+        question (Callable): Returns a `(question, answer)` pair for each new challenge.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = CAPTCHA_TTL_SECONDS,
+        question: Callable[[], tuple[str, str]] = arithmetic_question,
+        nonces: Optional[NonceSet] = None,
+        audit_writer: Optional[CaptchaAuditWriter] = None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.question = question
+        self.nonces = nonces if nonces is not None else NonceSet()
+        self.audit_writer = audit_writer
+
+    def issue(self) -> CaptchaChallenge:
+        """Creates a new challenge without storing anything."""
+        question, answer = self.question()
+        nonce = secrets.token_urlsafe(12)
+        expires_at = int(time.time()) + self.ttl_seconds
+        answer_mac = sign(_ANSWER_KEY, f"{nonce}.{_normalize(answer)}")
+        body = f"{_PREFIX}.{nonce}.{expires_at}.{answer_mac}"
+        return CaptchaChallenge(f"{body}.{sign(_TOKEN_KEY, body)}", question, expires_at)
+
+    async def verify(self, token: str, answer: str) -> None:
+        """
+        Checks an answer to a challenge, spending the challenge either way.
+
+        Raises:
+            CaptchaError: If the token is invalid, expired or already used, or the answer is wrong.
+        """
+        body, _, signature = token.rpartition(".")
+        parts = body.split(".")
+        if len(parts) != 4 or parts[0] != _PREFIX or not parts[2].isdigit() or not verify(_TOKEN_KEY, body, signature):
+            raise CaptchaError("Invalid captcha.")
+        _, nonce, expires, answer_mac = parts
+        expires_at = int(expires)
+        if expires_at < time.time():
+            raise CaptchaError("Captcha has expired.")
+        if not self.nonces.spend(nonce, expires_at):
+            raise CaptchaError("Captcha has already been used.")
+
+        solved = verify(_ANSWER_KEY, f"{nonce}.{_normalize(answer)}", answer_mac)
+        if self.audit_writer is not None:
+            now = datetime.utcnow()
+            await self.audit_writer.enqueue((nonce, body, solved, now if solved else None, now))
+        if not solved:
+            raise CaptchaError("Incorrect captcha answer.")
+
+
+captcha_audit_writer = CaptchaAuditWriter() if CAPTCHA_AUDIT else None
+captcha_service = CaptchaService(audit_writer=captcha_audit_writer)
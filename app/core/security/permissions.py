@@ -0,0 +1,207 @@
+"""
+In-memory role registry and per-user role bitmasks.
+
+The `roles` table is tiny and rarely changes, so every worker loads it at
+startup and gives each live role a bit position. A user's live role
+assignments are then cached as a single integer mask, and checking whether a
+user holds a role is a bitwise AND instead of a `user_roles` / `roles` join.
+
+Masks are invalidated by `user_roles_changed` events in the emitting worker and
+expire after `ttl_seconds` elsewhere. The registry is reloaded periodically and
+on `roles_changed`; if bit positions change, every cached mask is dropped.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from app import crud
+from app.core.security.tokens import TokenError, verify_access_token
+from app.database import async_session
+from app.events.user_events import event_bus
+from app.infrastructure.background import PeriodicTask
+from app.infrastructure.sharding.shard_router import shard_router
+
+ROLE_REFRESH_INTERVAL = float(os.environ.get("ROLE_REFRESH_INTERVAL", "300"))
+PERMISSION_CACHE_SIZE = int(os.environ.get("PERMISSION_CACHE_SIZE", "50000"))
+PERMISSION_CACHE_TTL = float(os.environ.get("PERMISSION_CACHE_TTL", "60"))
+
+
+class RoleRegistry:
+    """
+    Maps live role names and ids to single-bit masks.
+
+    Bits are assigned in role id order, so every worker that loaded the same
+    roles agrees on the positions.
+    """
+
+    def __init__(self):
+        self._by_name: dict[str, int] = {}
+        self._by_id: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    async def load(self) -> bool:
+        """
+        Reloads the live roles from the database.
+
+        Returns:
+            bool: True if bit positions changed, in which case cached user masks are stale.
+        """
+        async with async_session() as db:
+            rows = await crud.get_live_roles(db)
+        by_id = {role_id: 1 << position for position, (role_id, _) in enumerate(rows)}
+        by_name = {name: by_id[role_id] for role_id, name in rows}
+        changed = by_id != self._by_id or by_name != self._by_name
+        self._by_id, self._by_name = by_id, by_name
+        return changed
+
+    def mask_of(self, names: Iterable[str]) -> int:
+        """Returns the combined mask of the named roles; unknown or deleted roles contribute nothing."""
+        mask = 0
+        for name in names:
+            mask |= self._by_name.get(name, 0)
+        return mask
+
+    def mask_of_ids(self, role_ids: Iterable[int]) -> int:
+        """Returns the combined mask of the given role ids; unknown or deleted roles contribute nothing."""
+        mask = 0
+        for role_id in role_ids:
+            mask |= self._by_id.get(role_id, 0)
+        return mask
+
+    def names(self, mask: int) -> list[str]:
+        """Returns the names of the roles set in `mask`."""
+        return [name for name, bit in self._by_name.items() if mask & bit]
+
+
+class PermissionCache:
+    """
+    Size-bounded LRU of per-user role masks, each valid for `ttl_seconds`.
+    """
+
+    def __init__(self, registry: RoleRegistry, max_entries: int = PERMISSION_CACHE_SIZE, ttl_seconds: float = PERMISSION_CACHE_TTL):
+        self.registry = registry
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, tuple[int, float]]" = OrderedDict()
+        # Bumped by every invalidation so a load that raced one is not cached
+        self._generation = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def mask(self, user_id: int) -> int:
+        """Returns the role mask of `user_id`, loading it on a miss."""
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[1] >= time.monotonic():
+            self._entries.move_to_end(user_id)
+            return entry[0]
+
+        generation = self._generation
+        async with shard_router.session_for(user_id) as db:
+            role_ids = await crud.get_live_role_ids(db, user_id)
+        mask = self.registry.mask_of_ids(role_ids)
+        if generation != self._generation:
+            return mask
+
+        self._entries[user_id] = (mask, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return mask
+
+    async def has_role(self, user_id: int, *roles: str) -> bool:
+        """Returns whether `user_id` holds at least one of `roles`."""
+        required = self.registry.mask_of(roles)
+        return bool(required and await self.mask(user_id) & required)
+
+    async def roles_of(self, user_id: int) -> list[str]:
+        """Returns the names of the live roles assigned to `user_id`."""
+        return self.registry.names(await self.mask(user_id))
+
+    def invalidate(self, user_id: int) -> None:
+        """Drops the cached mask of `user_id`."""
+        self._generation += 1
+        self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        """Drops every cached mask."""
+        self._generation += 1
+        self._entries.clear()
+
+
+class RoleRefresher(PeriodicTask):
+    """Periodically reloads the role registry so role edits made elsewhere are picked up."""
+
+    name = "RoleRefresher"
+
+    def __init__(self, cache: PermissionCache, interval: float = ROLE_REFRESH_INTERVAL):
+        super().__init__(interval)
+        self.cache = cache
+
+    async def run_once(self) -> None:
+        if await self.cache.registry.load():
+            self.cache.clear()
+
+
+role_registry = RoleRegistry()
+permission_cache = PermissionCache(role_registry)
+role_refresher = RoleRefresher(permission_cache)
+
+
+async def has_role(user_id: Optional[int], *roles: str) -> bool:
+    """
+    Returns whether a user holds at least one of `roles`.
+
+    Args:
+        user_id (Optional[int]): The user to check; None (anonymous) never has a role.
+        *roles (str): Acceptable role names.
+    """
+    if user_id is None:
+        return False
+    return await permission_cache.has_role(user_id, *roles)
+
+
+async def bearer_has_role(authorization: Optional[str], *roles: str) -> bool:
+    """
+    Returns whether the bearer access token in an Authorization header belongs to a user holding one of `roles`.
+
+    For checks outside GraphQL, e.g. in middleware and REST endpoints. A
+    missing, malformed or invalid token never has a role.
+
+    Args:
+        authorization (Optional[str]): The raw Authorization header value.
+        *roles (str): Acceptable role names.
+    """
+    if not authorization or authorization[:7].lower() != "bearer ":
+        return False
+    try:
+        claims = verify_access_token(authorization[7:].strip())
+    except TokenError:
+        return False
+    return await has_role(claims.user_id, *roles)
+
+
+def register_permission_handlers():
+    """
+    Registers listeners that keep role masks coherent with role changes.
+    To be called once during application startup.
+    """
+
+    @event_bus.on("user_roles_changed")
+    def invalidate_user_roles(user_id: int):
+        """
+        Drops the cached role mask of a user whose role assignments changed.
+
+        Args:
+            user_id (int): The affected user.
+        """
+        permission_cache.invalidate(user_id)
+
+    @event_bus.on("roles_changed")
+    def reload_roles():
+        """Reloads the role registry after roles were created or deleted."""
+        role_refresher.wake()
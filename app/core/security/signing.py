@@ -0,0 +1,45 @@
+"""
+HMAC-SHA256 signing helpers shared by the stateless token formats.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+
+TOKEN_SIGNING_SECRET = os.environ.get("TOKEN_SIGNING_SECRET")
+
+if TOKEN_SIGNING_SECRET:
+    _SECRET = TOKEN_SIGNING_SECRET.encode()
+else:
+    # Tokens signed with a per-process key only verify in the process that issued them
+    _SECRET = secrets.token_bytes(32)
+    print("[Signing] TOKEN_SIGNING_SECRET is not set; using a random per-process key.")
+
+
+def derive_key(purpose: str) -> bytes:
+    """
+    Derives a purpose-specific key from the signing secret, so a signature
+    produced for one token type is never valid for another.
+
+    Args:
+        purpose (str): Short label such as 'access-token'.
+    """
+    return hmac.new(_SECRET, purpose.encode(), hashlib.sha256).digest()
+
+
+def sign(key: bytes, message: str) -> str:
+    """Returns the unpadded base64url HMAC-SHA256 signature of `message`."""
+    digest = hmac.new(key, message.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def verify(key: bytes, message: str, signature: str) -> bool:
+    """Checks `signature` against `message` in constant time."""
+    return hmac.compare_digest(sign(key, message), signature)
+
+
+def hash_token(token: str) -> str:
+    """Returns the SHA-256 hex digest used to store opaque tokens at rest."""
+    return hashlib.sha256(token.encode()).hexdigest()
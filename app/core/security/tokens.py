@@ -0,0 +1,216 @@
+"""
+Short-lived signed access tokens and their in-memory revocation set.
+
+Access tokens are verified entirely in-process: checking one costs an HMAC and
+a set lookup, with no database round trip. They are bound to a `user_sessions`
+row, and revoking that session (or the refresh token the access token was
+minted from) is picked up by the revocation set within one refresh interval.
+
+Token format: ``at1.<user_id>.<session_id>.<refresh_token_id>.<expires>.<signature>``
+
+Session and refresh token ids are only unique within a shard, so both token
+kinds carry the user id, which routes them to the shard that owns the session.
+"""
+
+import os
+import secrets
+import time
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from app.core.clock import to_epoch
+from app.database import asyncpg_connection
+from app.infrastructure.background import PeriodicTask
+from app.infrastructure.sharding.shard_router import shard_router
+from app.core.security.signing import derive_key, sign, verify
+
+ACCESS_TOKEN_TTL_SECONDS = int(os.environ.get("ACCESS_TOKEN_TTL_SECONDS", "900"))
+REFRESH_TOKEN_TTL_DAYS = int(os.environ.get("REFRESH_TOKEN_TTL_DAYS", "30"))
+REVOCATION_REFRESH_INTERVAL = float(os.environ.get("REVOCATION_REFRESH_INTERVAL", "5"))
+
+_ACCESS_PREFIX = "at1"
+_REFRESH_PREFIX = "rt2"
+# Issued before refresh tokens carried the user id; their sessions are on shard 0
+_LEGACY_REFRESH_PREFIX = "rt1"
+_ACCESS_KEY = derive_key("access-token")
+
+# Re-read this much before the watermark so revocations committed out of order are not missed
+_REVOCATION_OVERLAP = timedelta(seconds=60)
+
+
+class TokenError(ValueError):
+    """Raised when a token is malformed, forged, expired or revoked."""
+
+
+class AccessClaims(NamedTuple):
+    """Verified contents of an access token."""
+    user_id: int
+    session_id: int
+    refresh_token_id: int
+    expires_at: int
+
+
+def issue_access_token(user_id: int, session_id: int, refresh_token_id: int) -> tuple[str, int]:
+    """
+    Issues a signed access token.
+
+    Returns:
+        tuple[str, int]: The token and its lifetime in seconds.
+    """
+    expires_at = int(time.time()) + ACCESS_TOKEN_TTL_SECONDS
+    body = f"{_ACCESS_PREFIX}.{user_id}.{session_id}.{refresh_token_id}.{expires_at}"
+    return f"{body}.{sign(_ACCESS_KEY, body)}", ACCESS_TOKEN_TTL_SECONDS
+
+
+def verify_access_token(token: str) -> AccessClaims:
+    """
+    Verifies an access token's signature, expiry and revocation status.
+
+    Raises:
+        TokenError: If the token is not valid.
+
+    Returns:
+        AccessClaims: The token's claims.
+    """
+    body, _, signature = token.rpartition(".")
+    parts = body.split(".")
+    if len(parts) != 5 or parts[0] != _ACCESS_PREFIX or not verify(_ACCESS_KEY, body, signature):
+        raise TokenError("Invalid access token.")
+
+    try:
+        claims = AccessClaims(*(int(part) for part in parts[1:]))
+    except ValueError:
+        raise TokenError("Invalid access token.")
+
+    if claims.expires_at < time.time():
+        raise TokenError("Access token has expired.")
+    if revocation_set.is_revoked(claims):
+        raise TokenError("Access token has been revoked.")
+    return claims
+
+
+def new_refresh_token(user_id: int, session_id: int) -> str:
+    """
+    Generates an opaque refresh token for a session.
+
+    The user and session ids are embedded so refreshes can find their session
+    (and its shard) after rotation; the random part is what makes the token
+    unguessable.
+    """
+    return f"{_REFRESH_PREFIX}.{user_id}.{session_id}.{secrets.token_urlsafe(32)}"
+
+
+def refresh_token_session(token: str) -> tuple[Optional[int], int]:
+    """
+    Extracts the user and session ids from a refresh token.
+
+    Raises:
+        TokenError: If the token is malformed.
+
+    Returns:
+        tuple[Optional[int], int]: The user id (None for legacy tokens) and the session id.
+    """
+    parts = token.split(".")
+    if len(parts) == 4 and parts[0] == _REFRESH_PREFIX and parts[1].isdigit() and parts[2].isdigit():
+        return int(parts[1]), int(parts[2])
+    if len(parts) == 3 and parts[0] == _LEGACY_REFRESH_PREFIX and parts[1].isdigit():
+        return None, int(parts[1])
+    raise TokenError("Invalid refresh token.")
+
+
+def refresh_token_expiry() -> datetime:
+    """Returns the expiry timestamp for a refresh token issued now."""
+    return datetime.utcnow() + timedelta(days=REFRESH_TOKEN_TTL_DAYS)
+
+
+class RevocationSet:
+    """
+    Compact in-memory set of revoked session and refresh token ids.
+
+    An id only needs to stay in the set until every access token minted before
+    its revocation has expired, so entries are pruned after one access token
+    lifetime. The set is refreshed incrementally from `revoked_at` columns on
+    every shard. Ids are only unique within a shard, so entries are keyed by
+    ``(user_id, id)``.
+    """
+
+    def __init__(self, ttl_seconds: int = ACCESS_TOKEN_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._sessions: dict[tuple[int, int], float] = {}
+        self._refresh_tokens: dict[tuple[int, int], float] = {}
+        self._watermark: Optional[datetime] = None
+
+    def __len__(self) -> int:
+        return len(self._sessions) + len(self._refresh_tokens)
+
+    def is_revoked(self, claims: AccessClaims) -> bool:
+        """True if the session or refresh token behind `claims` has been revoked."""
+        return (
+            (claims.user_id, claims.session_id) in self._sessions
+            or (claims.user_id, claims.refresh_token_id) in self._refresh_tokens
+        )
+
+    def revoke_session(self, user_id: int, session_id: int) -> None:
+        """Marks a session revoked in this worker immediately."""
+        self._sessions[(user_id, session_id)] = time.time() + self.ttl_seconds
+
+    def revoke_refresh_token(self, user_id: int, refresh_token_id: int) -> None:
+        """Marks a refresh token revoked in this worker immediately."""
+        self._refresh_tokens[(user_id, refresh_token_id)] = time.time() + self.ttl_seconds
+
+    async def refresh(self) -> None:
+        """
+        Pulls revocations recorded since the last refresh and prunes stale entries.
+
+        The first call loads every revocation still within one access token lifetime.
+        """
+        now = datetime.utcnow()
+        since = self._watermark or now - timedelta(seconds=self.ttl_seconds)
+        sessions, refresh_tokens = [], []
+        for shard_engine in shard_router.engines:
+            async with asyncpg_connection(shard_engine) as conn:
+                sessions += await conn.fetch(
+                    "SELECT user_id, id, revoked_at FROM chrome_users.user_sessions WHERE revoked_at >= $1",
+                    since - _REVOCATION_OVERLAP,
+                )
+                # Tokens revoked by normal rotation are excluded: their access tokens simply expire
+                refresh_tokens += await conn.fetch(
+                    """
+                    SELECT user_id, id, revoked_at FROM chrome_users.refresh_tokens
+                    WHERE revoked_at >= $1 AND is_rotated IS NOT TRUE
+                    """,
+                    since - _REVOCATION_OVERLAP,
+                )
+
+        for rows, target in ((sessions, self._sessions), (refresh_tokens, self._refresh_tokens)):
+            for row in rows:
+                target[(row["user_id"], row["id"])] = to_epoch(row["revoked_at"]) + self.ttl_seconds
+                if row["revoked_at"] > since:
+                    since = row["revoked_at"]
+        self._watermark = since
+        self.prune()
+
+    def prune(self) -> None:
+        """Drops ids whose access tokens have all expired."""
+        now = time.time()
+        for target in (self._sessions, self._refresh_tokens):
+            for key in [key for key, drop_after in target.items() if drop_after <= now]:
+                del target[key]
+
+
+class RevocationRefresher(PeriodicTask):
+    """Keeps a `RevocationSet` current by polling the database."""
+
+    name = "RevocationRefresher"
+
+    def __init__(self, revocations: RevocationSet, interval: float = REVOCATION_REFRESH_INTERVAL):
+        super().__init__(interval)
+        self.revocations = revocations
+
+    async def run_once(self) -> None:
+        await self.revocations.refresh()
+
+
+# Per-worker revocation state
+revocation_set = RevocationSet()
+revocation_refresher = RevocationRefresher(revocation_set)
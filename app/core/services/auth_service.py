@@ -0,0 +1,261 @@
+"""
+Service layer for password login, token refresh and logout.
+
+Logins create a `user_sessions` row and a DB-backed refresh token; requests are
+then authenticated with short-lived signed access tokens that are verified
+in-process (see `app.core.security.tokens`). Sessions and refresh tokens live
+on the shard that owns their user.
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Optional
+
+from graphql import GraphQLError
+from passlib.hash import bcrypt
+from sqlalchemy import or_, update
+from sqlalchemy.future import select
+
+from app.models import User, UserSession, RefreshToken
+from app.schemas.auth import LoginInput, AuthPayload
+from app.schemas.user import UserType
+from app.database import async_session
+from app import crud
+from app.events.user_events import event_bus
+from app.infrastructure.audit.audit_writer import audit
+from app.infrastructure.sharding.shard_router import shard_router
+from app.core.security.brute_force import brute_force_detector
+from app.core.security.signing import hash_token
+from app.core.security.tokens import (
+    AccessClaims,
+    TokenError,
+    issue_access_token,
+    new_refresh_token,
+    refresh_token_expiry,
+    refresh_token_session,
+    revocation_set,
+)
+
+_BLOCKED_MESSAGE = "Too many failed attempts. Please try again later."
+
+# Checked against when the account does not exist or has no password, so a
+# failed login costs one bcrypt verification either way and its timing does
+# not reveal whether the account exists. Same cost factor as stored hashes.
+_DUMMY_PASSWORD_HASH = "$2b$12$qqnM/7luED4SBsf211EzGel.nJ2mgTBF82otB0HcmwSYpMrcJdLm."
+
+
+class AuthService:
+    """
+    Contains business logic for authentication workflows.
+    """
+
+    @staticmethod
+    async def login(input: LoginInput, ip_address: Optional[str], user_agent: Optional[str]) -> AuthPayload:
+        """
+        Authenticate with email/username and password and start a new session.
+
+        Args:
+            input (LoginInput): Credentials and optional device label.
+            ip_address (Optional[str]): Client IP address.
+            user_agent (Optional[str]): Client user agent.
+
+        Raises:
+            GraphQLError: If the credentials are wrong, the caller is blocked, or the account is inactive.
+
+        Returns:
+            AuthPayload: A fresh access/refresh token pair.
+        """
+        if brute_force_detector.blocked_until(ip_address=ip_address):
+            raise GraphQLError(_BLOCKED_MESSAGE)
+
+        if shard_router.sharded:
+            user_id = await shard_router.locate(email=input.identifier, username=input.identifier)
+            # Unknown identifiers still go through the dummy password check below
+            db = shard_router.session_on(0) if user_id is None else shard_router.session_for(user_id)
+        else:
+            db = async_session()
+
+        async with db:
+            result = await db.execute(
+                select(User).where(
+                    or_(crud.email_matches(input.identifier), User.username == input.identifier),
+                    crud.live_users(),
+                )
+            )
+            user = result.scalars().first()
+
+            if user is not None and (
+                brute_force_detector.blocked_until(user_id=user.id)
+                or (user.blocked_until and user.blocked_until > datetime.utcnow())
+            ):
+                raise GraphQLError(_BLOCKED_MESSAGE)
+
+            # bcrypt is deliberately slow; keep it off the event loop
+            has_password = user is not None and user.password_hash is not None
+            matches = await asyncio.to_thread(
+                bcrypt.verify, input.password, user.password_hash if has_password else _DUMMY_PASSWORD_HASH
+            )
+            valid = has_password and matches
+            if not valid:
+                await brute_force_detector.record_attempt(
+                    ip_address, user.id if user else None, False, reason="invalid_credentials"
+                )
+                raise GraphQLError("Invalid credentials.")
+
+            if not user.is_active:
+                raise GraphQLError("Account is not active. Please verify your email first.")
+
+            await brute_force_detector.record_attempt(ip_address, user.id, True, reason="password")
+
+            session = UserSession(
+                user_id=user.id,
+                device=input.device,
+                user_agent=user_agent,
+                expires_at=refresh_token_expiry(),
+            )
+            db.add(session)
+            await db.flush()
+
+            payload = await AuthService._issue_tokens(db, user, session, ip_address, user_agent)
+            await db.commit()
+
+        await event_bus.emit_async("user_logged_in", user, ip_address, session.id)
+        await audit("auth", "login", user_id=user.id, ip_address=ip_address, user_agent=user_agent)
+        return payload
+
+    @staticmethod
+    async def refresh(refresh_token: str, ip_address: Optional[str], user_agent: Optional[str]) -> AuthPayload:
+        """
+        Exchange a refresh token for a new token pair, rotating the refresh token.
+
+        Presenting a refresh token that was already rotated is treated as token
+        theft: the whole session is revoked.
+
+        Args:
+            refresh_token (str): The refresh token from a previous login or refresh.
+            ip_address (Optional[str]): Client IP address.
+            user_agent (Optional[str]): Client user agent.
+
+        Raises:
+            GraphQLError: If the refresh token is invalid, expired or revoked.
+
+        Returns:
+            AuthPayload: A fresh access/refresh token pair.
+        """
+        try:
+            user_id, session_id = refresh_token_session(refresh_token)
+        except TokenError as error:
+            raise GraphQLError(str(error))
+
+        now = datetime.utcnow()
+        # Legacy tokens predate sharding, so their sessions are on shard 0
+        async with shard_router.session_on(0) if user_id is None else shard_router.session_for(user_id) as db:
+            result = await db.execute(
+                select(RefreshToken)
+                .where(RefreshToken.token == hash_token(refresh_token))
+                .with_for_update()
+            )
+            stored = result.scalars().first()
+            session = await db.get(UserSession, session_id)
+
+            if (
+                stored is None
+                or session is None
+                or stored.user_id != session.user_id
+                or (user_id is not None and session.user_id != user_id)
+            ):
+                raise GraphQLError("Invalid refresh token.")
+
+            if stored.revoked_at is not None:
+                if session.revoked_at is None:
+                    session.revoked_at = now
+                    await db.commit()
+                    revocation_set.revoke_session(session.user_id, session.id)
+                raise GraphQLError("Refresh token has been revoked.")
+
+            # The janitor deletes sessions past expires_at, so honour it here
+            # rather than depending on whether it has run yet
+            if (
+                session.revoked_at is not None
+                or stored.expires_at < now
+                or (session.expires_at is not None and session.expires_at <= now)
+            ):
+                raise GraphQLError("Refresh token has expired.")
+
+            user = await db.get(User, session.user_id)
+            if user is None or user.is_deleted or not user.is_active:
+                raise GraphQLError("Invalid refresh token.")
+
+            stored.revoked_at = now
+            stored.is_rotated = True
+            payload = await AuthService._issue_tokens(db, user, session, ip_address, user_agent)
+            stored.replaced_by_token = hash_token(payload.refresh_token)
+            await db.commit()
+
+        return payload
+
+    @staticmethod
+    async def logout(claims: AccessClaims) -> bool:
+        """
+        Revoke the session behind an access token.
+
+        The revocation takes effect in this worker immediately and in the
+        others on their next revocation refresh.
+
+        Args:
+            claims (AccessClaims): Claims of the caller's access token.
+
+        Returns:
+            bool: True once the session is revoked.
+        """
+        async with shard_router.session_for(claims.user_id) as db:
+            await db.execute(
+                update(UserSession)
+                .where(
+                    UserSession.id == claims.session_id,
+                    UserSession.user_id == claims.user_id,
+                    UserSession.revoked_at.is_(None),
+                )
+                .values(revoked_at=datetime.utcnow())
+            )
+            await db.commit()
+
+        revocation_set.revoke_session(claims.user_id, claims.session_id)
+        await audit("auth", "logout", user_id=claims.user_id)
+        return True
+
+    @staticmethod
+    async def _issue_tokens(db, user: User, session: UserSession, ip_address, user_agent) -> AuthPayload:
+        """
+        Stores a new refresh token for `session` and mints the matching access token.
+
+        The session is extended to the new token's expiry, so an active
+        session lives as long as its newest refresh token.
+        """
+        refresh_token = new_refresh_token(user.id, session.id)
+        token_hash = hash_token(refresh_token)
+        stored = RefreshToken(
+            user_id=user.id,
+            token=token_hash,
+            expires_at=refresh_token_expiry(),
+            created_by_ip=ip_address,
+            user_agent=user_agent,
+        )
+        db.add(stored)
+        session.token_hash = token_hash
+        session.expires_at = stored.expires_at
+        await db.flush()
+
+        access_token, expires_in = issue_access_token(user.id, session.id, stored.id)
+        return AuthPayload(
+            access_token=access_token,
+            refresh_token=refresh_token,
+            expires_in=expires_in,
+            user=UserType(
+                id=user.id,
+                username=user.username,
+                email=user.email,
+                is_active=user.is_active,
+                email_verified=user.email_verified
+            ),
+        )
@@ -0,0 +1,210 @@
+"""
+Service layer for user profiles and their version history.
+
+Every profile update writes one `user_profile_history` row in the same
+statement as the update itself (an ``UPDATE ... RETURNING`` CTE feeding an
+``INSERT ... SELECT``). History rows are JSONB deltas of the changed fields
+only, with a full checkpoint every `PROFILE_CHECKPOINT_INTERVAL` versions, so
+the profile as of any point in time is rebuilt from one checkpoint and at most
+`PROFILE_CHECKPOINT_INTERVAL - 1` deltas.
+"""
+
+import os
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+import strawberry
+from sqlalchemy import func, insert, literal, update
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
+from sqlalchemy.future import select
+
+from app.models import UserProfile, UserProfileHistory
+from app.schemas.profile import ProfileType, ProfileUpdateInput
+from app.events.user_events import event_bus
+from app.infrastructure.sharding.shard_router import shard_router
+from app.infrastructure.audit.audit_writer import audit
+
+PROFILE_CHECKPOINT_INTERVAL = int(os.environ.get("PROFILE_CHECKPOINT_INTERVAL", "16"))
+
+PROFILE_FIELDS = (
+    "first_name",
+    "last_name",
+    "date_of_birth",
+    "gender",
+    "address",
+    "country",
+    "timezone",
+    "bio",
+    "website",
+    "social_links",
+)
+
+# Fields that are not JSON-native and are stored as ISO 8601 strings
+_DATETIME_FIELDS = frozenset({"date_of_birth"})
+
+
+def _normalize(field: str, value: Any) -> Any:
+    # TIMESTAMP columns are naive UTC
+    if field in _DATETIME_FIELDS and value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _encode(changes: dict[str, Any]) -> dict[str, Any]:
+    return {
+        field: value.isoformat() if field in _DATETIME_FIELDS and value is not None else value
+        for field, value in changes.items()
+    }
+
+
+def _decode(changes: dict[str, Any]) -> dict[str, Any]:
+    return {
+        field: datetime.fromisoformat(value) if field in _DATETIME_FIELDS and value is not None else value
+        for field, value in changes.items()
+    }
+
+
+def is_checkpoint_version(version: int) -> bool:
+    """Returns whether profile `version` is stored as a full checkpoint (versions 1, 1 + N, 1 + 2N, ...)."""
+    return (version - 1) % PROFILE_CHECKPOINT_INTERVAL == 0
+
+
+class ProfileService:
+    """
+    Contains business logic for reading and updating user profiles.
+    """
+
+    @staticmethod
+    async def update_profile(user_id: int, input: ProfileUpdateInput) -> ProfileType:
+        """
+        Apply the fields set in `input` to the user's profile and record the change.
+
+        The profile row is created on first update. Updates that change nothing
+        do not bump the version or write history.
+
+        Args:
+            user_id (int): The user whose profile is updated.
+            input (ProfileUpdateInput): Fields to change; omitted fields are kept.
+
+        Returns:
+            ProfileType: The profile after the update.
+        """
+        async with shard_router.session_for(user_id) as db:
+            current = await ProfileService._lock_profile(db, user_id)
+            if current is None:
+                await db.execute(
+                    pg_insert(UserProfile)
+                    .values(user_id=user_id, version=0)
+                    .on_conflict_do_nothing(index_elements=[UserProfile.user_id])
+                )
+                current = await ProfileService._lock_profile(db, user_id)
+
+            state = {field: getattr(current, field) for field in PROFILE_FIELDS}
+            changes = {
+                field: value
+                for field in PROFILE_FIELDS
+                if (value := getattr(input, field)) is not strawberry.UNSET
+                and (value := _normalize(field, value)) != state[field]
+            }
+            if not changes:
+                await db.rollback()
+                return ProfileType(user_id=user_id, version=current.version, **state)
+
+            version = current.version + 1
+            state.update(changes)
+            checkpoint = is_checkpoint_version(version)
+
+            updated = (
+                update(UserProfile)
+                .where(UserProfile.user_id == user_id)
+                .values(**changes, version=version)
+                .returning(UserProfile.user_id, UserProfile.version)
+                .cte("updated")
+            )
+            # clock_timestamp(), not now(): now() is the transaction start, which can
+            # be older than a concurrently committed version and break as-of lookups.
+            await db.execute(
+                insert(UserProfileHistory).from_select(
+                    ["user_id", "version", "is_checkpoint", "changes", "updated_at"],
+                    select(
+                        updated.c.user_id,
+                        updated.c.version,
+                        literal(checkpoint),
+                        literal(_encode(state if checkpoint else changes), JSONB),
+                        func.clock_timestamp(),
+                    ),
+                )
+            )
+            await db.commit()
+
+        await event_bus.emit_async("user_profile_updated", user_id)
+        await audit("user", "profile_updated", user_id=user_id, meta_info={"fields": sorted(changes), "version": version})
+        return ProfileType(user_id=user_id, version=version, **state)
+
+    @staticmethod
+    async def get_profile(user_id: int) -> Optional[ProfileType]:
+        """
+        Fetch the current profile of a user.
+
+        Args:
+            user_id (int): The user whose profile is fetched.
+
+        Returns:
+            Optional[ProfileType]: The profile, or None if the user never set one.
+        """
+        async with shard_router.session_for(user_id) as db:
+            result = await db.execute(
+                select(UserProfile.version, *(getattr(UserProfile, field) for field in PROFILE_FIELDS))
+                .where(UserProfile.user_id == user_id)
+            )
+            row = result.first()
+        if row is None:
+            return None
+        return ProfileType(user_id=user_id, **row._asdict())
+
+    @staticmethod
+    async def get_profile_as_of(user_id: int, at: datetime) -> Optional[ProfileType]:
+        """
+        Reconstruct a user's profile as it was at time `at`.
+
+        Reads the latest checkpoint at or before `at` and the deltas written
+        after it up to `at`, in a single index-backed query, then replays the
+        deltas onto the checkpoint.
+
+        Args:
+            user_id (int): The user whose profile is reconstructed.
+            at (datetime): Point in time, naive UTC.
+
+        Returns:
+            Optional[ProfileType]: The profile at `at`, or None if it did not exist yet.
+        """
+        history = UserProfileHistory
+        checkpoint_version = (
+            select(func.max(history.version))
+            .where(history.user_id == user_id, history.is_checkpoint, history.updated_at <= at)
+            .scalar_subquery()
+        )
+        async with shard_router.session_for(user_id) as db:
+            result = await db.execute(
+                select(history.version, history.changes)
+                .where(history.user_id == user_id, history.version >= checkpoint_version, history.updated_at <= at)
+                .order_by(history.version)
+            )
+            rows = result.all()
+
+        if not rows:
+            return None
+        state = dict.fromkeys(PROFILE_FIELDS)
+        for row in rows:
+            state.update(_decode(row.changes))
+        return ProfileType(user_id=user_id, version=rows[-1].version, **state)
+
+    @staticmethod
+    async def _lock_profile(db, user_id: int):
+        """Selects the user's profile row FOR UPDATE so concurrent updates get consecutive versions."""
+        result = await db.execute(
+            select(UserProfile.version, *(getattr(UserProfile, field) for field in PROFILE_FIELDS))
+            .where(UserProfile.user_id == user_id)
+            .with_for_update()
+        )
+        return result.first()
@@ -0,0 +1,96 @@
+"""
+Service layer for assigning roles to users.
+
+Every assignment change emits `user_roles_changed` so cached role masks
+(see `app.core.security.permissions`) are dropped immediately.
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from graphql import GraphQLError
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.future import select
+
+from app.models import Role, UserRole
+from app.infrastructure.sharding.shard_router import shard_router
+from app.events.user_events import event_bus
+from app.infrastructure.audit.audit_writer import audit
+
+
+class RoleService:
+    """
+    Contains business logic for role assignments.
+    """
+
+    @staticmethod
+    async def assign_role(user_id: int, role_name: str, actor_id: Optional[int] = None) -> bool:
+        """
+        Assign a role to a user, reviving a previously revoked assignment.
+
+        Args:
+            user_id (int): The user receiving the role.
+            role_name (str): Name of an existing role.
+            actor_id (Optional[int]): The user performing the change.
+
+        Raises:
+            GraphQLError: If the role does not exist.
+
+        Returns:
+            bool: True once the role is assigned.
+        """
+        async with shard_router.session_for(user_id) as db:
+            role_id = await RoleService._role_id(db, role_name)
+            await db.execute(
+                pg_insert(UserRole)
+                .values(user_id=user_id, role_id=role_id, is_deleted=False)
+                .on_conflict_do_update(
+                    index_elements=[UserRole.user_id, UserRole.role_id],
+                    set_={"is_deleted": False, "assigned_at": datetime.utcnow()},
+                )
+            )
+            await db.commit()
+
+        await event_bus.emit_async("user_roles_changed", user_id)
+        await audit("role", "role_assigned", user_id=user_id, actor_id=actor_id, target=role_name)
+        return True
+
+    @staticmethod
+    async def revoke_role(user_id: int, role_name: str, actor_id: Optional[int] = None) -> bool:
+        """
+        Revoke a role from a user.
+
+        Args:
+            user_id (int): The user losing the role.
+            role_name (str): Name of an existing role.
+            actor_id (Optional[int]): The user performing the change.
+
+        Raises:
+            GraphQLError: If the role does not exist.
+
+        Returns:
+            bool: True if the user held the role.
+        """
+        async with shard_router.session_for(user_id) as db:
+            role_id = await RoleService._role_id(db, role_name)
+            result = await db.execute(
+                update(UserRole)
+                .where(UserRole.user_id == user_id, UserRole.role_id == role_id, UserRole.is_deleted == False)  # noqa: E712
+                .values(is_deleted=True)
+            )
+            await db.commit()
+
+        if not result.rowcount:
+            return False
+        await event_bus.emit_async("user_roles_changed", user_id)
+        await audit("role", "role_revoked", user_id=user_id, actor_id=actor_id, target=role_name)
+        return True
+
+    @staticmethod
+    async def _role_id(db, role_name: str) -> int:
+        result = await db.execute(select(Role.id).where(Role.name == role_name, Role.is_deleted == False))  # noqa: E712
+        role_id = result.scalar_one_or_none()
+        if role_id is None:
+            raise GraphQLError(f"Unknown role: {role_name}.")
+        return role_id
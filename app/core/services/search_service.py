@@ -0,0 +1,81 @@
+"""
+Service layer for finding users by partial username or email.
+
+Pure prefix lookups are answered from the in-process prefix index when it is
+enabled and loaded; everything else (substrings, typos, short result sets)
+goes to PostgreSQL, where the `pg_trgm` GIN indexes on `lower(username)` and
+`lower(email)` serve both `LIKE '%...%'` and similarity matches. When users are
+sharded, every shard is searched and the results are merged by score.
+"""
+
+import os
+
+from app import crud
+from app.database import async_session
+from app.core.cache.user_cache import UserRecord
+from app.core.cache.prefix_index import user_prefix_index
+from app.infrastructure.sharding.shard_router import shard_router
+
+USER_SEARCH_MAX_RESULTS = int(os.environ.get("USER_SEARCH_MAX_RESULTS", "100"))
+
+
+def _matches_prefix(row, query: str) -> bool:
+    """Whether the current username or email of `row` still starts with `query`; index entries can be stale."""
+    prefix = query.lower()
+    return row.username.lower().startswith(prefix) or row.email.lower().startswith(prefix)
+
+
+class UserSearchService:
+    """
+    Contains business logic for user search.
+    """
+
+    @staticmethod
+    async def search_users(query: str, first: int = 20) -> list[UserRecord]:
+        """
+        Find live users whose username or email matches `query`.
+
+        Args:
+            query (str): Prefix, substring or approximate spelling of a username or email.
+            first (int): Maximum number of results, capped at `USER_SEARCH_MAX_RESULTS`.
+
+        Returns:
+            list[UserRecord]: Matching users, best matches first.
+        """
+        query = query.strip()
+        first = max(1, min(first, USER_SEARCH_MAX_RESULTS))
+        if not query:
+            return []
+
+        if user_prefix_index.loaded:
+            user_ids = user_prefix_index.search(query, first)
+            if len(user_ids) == first:
+                rows = await UserSearchService._load_records(user_ids)
+                records = [
+                    UserRecord(*rows[user_id])
+                    for user_id in user_ids
+                    if user_id in rows and _matches_prefix(rows[user_id], query)
+                ]
+                # Fall through to SQL if deleted or renamed users thinned out the prefix hits
+                if len(records) == first:
+                    return records
+
+        if shard_router.sharded:
+            rows = await shard_router.scatter_gather(
+                crud.select_user_search(query, first, crud.user_search_score(query).label("score")),
+                key=lambda row: (-row.score, row.id),
+                limit=first,
+            )
+            return [UserRecord(*row[:-1]) for row in rows]
+
+        async with async_session() as db:
+            return [UserRecord(*row) for row in await crud.search_user_records(db, query, first)]
+
+    @staticmethod
+    async def _load_records(user_ids: list[int]) -> dict:
+        """Reads the live users among `user_ids` from the shards that own them, by id."""
+        rows = {}
+        for shard, ids in shard_router.group_by_shard(user_ids).items():
+            async with shard_router.session_on(shard) as db:
+                rows.update((row.id, row) for row in await crud.get_user_records(db, ids))
+        return rows
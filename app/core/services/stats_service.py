@@ -0,0 +1,98 @@
+"""
+Service layer for registration and verification statistics.
+
+Statistics are read from the hourly `registration_rollups` counters only
+(see `app.infrastructure.rollups`), never from the users table, so their cost
+depends on the number of buckets in the range rather than the number of users.
+The rollups are global counters kept on the application database even when
+users are sharded; the backfill tool counts users on every shard.
+"""
+
+import os
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import TIMESTAMP, String, func, literal, literal_column, select
+
+from app.database import async_session
+from app.models import RegistrationRollup
+
+REGISTRATION_STATS_MAX_ROWS = int(os.environ.get("REGISTRATION_STATS_MAX_ROWS", "10000"))
+
+# Periods buckets can be rolled up into, as PostgreSQL date_trunc units
+PERIODS = ("hour", "day", "week", "month")
+
+
+class RegistrationStatsService:
+    """
+    Contains business logic for registration statistics.
+    """
+
+    @staticmethod
+    async def registration_stats(
+        start: datetime,
+        end: datetime,
+        period: Optional[str] = "day",
+        by_registered_via: bool = False,
+        by_referrer: bool = False,
+    ) -> list:
+        """
+        Sums the rollup buckets of [start, end) into groups.
+
+        Buckets are whole hours, so a bucket counts when its hour starts in
+        the range. Verifications are attributed to the hour the user
+        registered in.
+
+        Args:
+            start (datetime): Inclusive lower bound, naive UTC.
+            end (datetime): Exclusive upper bound, naive UTC.
+            period (Optional[str]): One of `PERIODS` to group by time, or None for totals over the range.
+            by_registered_via (bool): Also group by signup channel.
+            by_referrer (bool): Also group by referrer.
+
+        Returns:
+            list[Row]: Rows with `period`, `registered_via`, `referrer`,
+                `registrations` and `verifications`, ordered by group; ungrouped
+                dimensions are None.
+
+        Raises:
+            ValueError: If the arguments are invalid or the result exceeds `REGISTRATION_STATS_MAX_ROWS` rows.
+        """
+        if end <= start:
+            raise ValueError("The end of the range must be after its start.")
+        if period is not None and period not in PERIODS:
+            raise ValueError(f"Unknown period '{period}'.")
+
+        if period is None:
+            period_column = literal(None, TIMESTAMP)
+        elif period == "hour":
+            period_column = RegistrationRollup.bucket
+        else:
+            # A literal unit, so the select list and GROUP BY are the same expression to PostgreSQL
+            period_column = func.date_trunc(literal_column(f"'{period}'"), RegistrationRollup.bucket)
+        via_column = RegistrationRollup.registered_via if by_registered_via else literal(None, String)
+        referrer_column = RegistrationRollup.referrer if by_referrer else literal(None, String)
+        groups = [column for column, used in (
+            (period_column, period is not None),
+            (via_column, by_registered_via),
+            (referrer_column, by_referrer),
+        ) if used]
+
+        stmt = (
+            select(
+                period_column.label("period"),
+                via_column.label("registered_via"),
+                referrer_column.label("referrer"),
+                func.sum(RegistrationRollup.registrations).label("registrations"),
+                func.sum(RegistrationRollup.verifications).label("verifications"),
+            )
+            .where(RegistrationRollup.bucket >= start, RegistrationRollup.bucket < end)
+            .group_by(*groups)
+            .order_by(*groups)
+            .limit(REGISTRATION_STATS_MAX_ROWS + 1)
+        )
+        async with async_session() as db:
+            rows = (await db.execute(stmt)).all()
+        if len(rows) > REGISTRATION_STATS_MAX_ROWS:
+            raise ValueError("Too many groups; narrow the range or group by a coarser period.")
+        return rows
@@ -2,6 +2,7 @@
 Service layer for core user operations like registration and verification.
 """
 
+import asyncio
 from app.models import User
 from app.schemas.user import UserRegisterInput, UserType, UserVerifyInput
 from sqlalchemy.future import select
@@ -13,7 +14,15 @@ import secrets
 import re
 from sqlalchemy.exc import IntegrityError
 from graphql import GraphQLError
+from typing import Optional
 from app.events.user_events import event_bus
+from app.core.deadline import no_deadline
+from app.core.cache.user_cache import UserRecord, user_cache
+from app.database import async_session
+from app import crud
+from app.infrastructure.audit.audit_writer import audit
+from app.core.security.brute_force import brute_force_detector
+from app.infrastructure.sharding.shard_router import DirectoryConflict, shard_router
 
 class UserService:
     """
@@ -41,37 +50,50 @@ class UserService:
         Returns:
             UserType: A sanitized public-facing user type for API response.
         """
-        db: AsyncSession = await get_db().__anext__()
-
         errors = {}
 
         # Validate email format
         if not re.match(r"[^@]+@[^@]+\.[^@]+", input.email):
             errors["email"] = "Invalid email format."
 
-        # Check username uniqueness
-        result = await db.execute(select(User).where(User.username == input.username))
-        if result.scalars().first():
-            errors["username"] = "Username is already taken."
+        user_id = None
+        if shard_router.sharded:
+            # The directory allocates the id and enforces uniqueness across shards;
+            # the user row then goes to the shard that owns that id
+            if not errors:
+                try:
+                    user_id = await shard_router.reserve(input.username, input.email, input.phone_number)
+                except DirectoryConflict as conflict:
+                    errors.update(conflict.fields)
+            db: AsyncSession = shard_router.session_for(user_id) if user_id is not None else async_session()
+        else:
+            db: AsyncSession = await get_db().__anext__()
 
-        # Check email uniqueness
-        result = await db.execute(select(User).where(User.email == input.email))
-        if result.scalars().first():
-            errors["email"] = "Email is already registered."
+            # Check username uniqueness
+            result = await db.execute(select(User.id).where(User.username == input.username))
+            if result.scalars().first():
+                errors["username"] = "Username is already taken."
 
-        # Check phone number uniqueness (if provided)
-        if input.phone_number:
-            result = await db.execute(select(User).where(User.phone_number == input.phone_number))
+            # Check email uniqueness
+            result = await db.execute(select(User.id).where(crud.email_matches(input.email)))
             if result.scalars().first():
-                errors["phone_number"] = "Phone number is already in use."
+                errors["email"] = "Email is already registered."
+
+            # Check phone number uniqueness (if provided)
+            if input.phone_number:
+                result = await db.execute(select(User.id).where(User.phone_number == input.phone_number))
+                if result.scalars().first():
+                    errors["phone_number"] = "Phone number is already in use."
 
         if errors:
+            if user_id is not None:
+                await shard_router.release(user_id)
             # Aggregate all field errors and raise as GraphQLError
             formatted = "\n".join(f"{field}: {msg}" for field, msg in errors.items())
             raise GraphQLError(f"Registration failed:\n{formatted}")
 
-        # Hash the password using bcrypt
-        hashed_password = bcrypt.hash(input.password)
+        # Hash the password using bcrypt; it is deliberately slow, so keep it off the event loop
+        hashed_password = await asyncio.to_thread(bcrypt.hash, input.password)
 
         # Generate verification code
         verification_code = secrets.token_hex(3)
@@ -79,6 +101,7 @@ class UserService:
 
         # Create new user
         new_user = User(
+            id=user_id,
             username=input.username,
             email=input.email,
             phone_number=input.phone_number,
@@ -98,11 +121,18 @@ class UserService:
             await db.commit()
         except IntegrityError:
             await db.rollback()
+            if user_id is not None:
+                await shard_router.release(user_id)
             raise GraphQLError("Unexpected database error while saving user.")
 
-        await db.refresh(new_user)
-
-        await event_bus.emit_async("user_registered", new_user)
+        await asyncio.shield(UserService._announce(
+            db,
+            new_user,
+            "user_registered",
+            ip_address=input.registration_ip,
+            user_agent=input.user_agent,
+            meta_info={"registered_via": input.registered_via},
+        ))
 
         return UserType(
             id=new_user.id,
@@ -113,41 +143,67 @@ class UserService:
         )
 
     @staticmethod
-    async def verify_user_code(input: UserVerifyInput, db: AsyncSession) -> UserType:
+    async def verify_user_code(input: UserVerifyInput, db: AsyncSession, ip_address: Optional[str] = None) -> UserType:
         """
         Verify a user's email or phone using a verification code.
 
+        Failed attempts feed the brute-force detector, and requests from a
+        blocked IP or for a blocked user are rejected before the code is checked.
+
         Args:
-            input (UserVerifyInput): Contains email_or_phone and verification_code.
-            db (AsyncSession): Database session.
+            input (UserVerifyInput): Contains the email (or phone number) and verification_code.
+            db (AsyncSession): Database session; unused when users are sharded,
+                as the user is read on the shard that owns it.
+            ip_address (Optional[str]): IP address of the client making the attempt.
 
         Raises:
-            ValueError: If no user is found, or code is invalid/expired.
+            ValueError: If no user is found, the caller is blocked, or code is invalid/expired.
 
         Returns:
             UserType: Verified user info.
         """
+        if brute_force_detector.blocked_until(ip_address=ip_address):
+            raise ValueError("Too many failed attempts. Please try again later.")
+
+        if shard_router.sharded:
+            user_id = await shard_router.locate(email=input.email, phone_number=input.email)
+            # Unknown users are looked up on shard 0, where they are not found either
+            db = shard_router.session_on(0) if user_id is None else shard_router.session_for(user_id)
+
         query = select(User).where(
-            (User.email == input.email_or_phone) | (User.phone_number == input.email_or_phone)
+            crud.email_matches(input.email) | (User.phone_number == input.email)
         )
         result = await db.execute(query)
         user = result.scalars().first()
 
         if not user:
+            await brute_force_detector.record_attempt(ip_address, None, False, reason="user_not_found")
             raise ValueError("User not found.")
 
+        if (
+            brute_force_detector.blocked_until(user_id=user.id)
+            or (user.blocked_until and user.blocked_until > datetime.utcnow())
+        ):
+            raise ValueError("Too many failed attempts. Please try again later.")
+
         if user.verification_code != input.verification_code:
+            await brute_force_detector.record_attempt(ip_address, user.id, False, reason="invalid_verification_code")
             raise ValueError("Invalid verification code.")
 
         if not user.verification_code_expires_at or user.verification_code_expires_at < datetime.utcnow():
             raise ValueError("Verification code has expired.")
 
-        user.email_verified = True
-        user.email_verified_at = datetime.utcnow()
-        user.is_active = True  # optional depending on your flow
+        await brute_force_detector.record_attempt(ip_address, user.id, True, reason="verification_code")
+
+        # Repeating a successful verification is harmless but must not be counted
+        # (or reactivate the user) a second time
+        if not user.email_verified:
+            user.email_verified = True
+            user.email_verified_at = datetime.utcnow()
+            user.is_active = True  # optional depending on your flow
 
-        await db.commit()
-        await db.refresh(user)
+            await db.commit()
+            await asyncio.shield(UserService._announce(db, user, "user_verified"))
 
         return UserType(
             id=user.id,
@@ -157,3 +213,120 @@ class UserService:
             email_verified=user.email_verified
         )
 
+    @staticmethod
+    async def _announce(db: AsyncSession, user: User, event: str, **audit_fields) -> None:
+        """
+        Reloads a just-committed user, emits `event` for it and records the audit row.
+
+        The change is already committed, so callers shield this from
+        cancellation (e.g. by the request deadline): otherwise the listeners
+        that count the user and invalidate caches could miss it. It runs
+        without the request's deadline for the same reason, since a refresh
+        starting after the deadline would be refused.
+        """
+        with no_deadline():
+            await db.refresh(user)
+            await event_bus.emit_async(event, user)
+            await audit("user", event, user_id=user.id, **audit_fields)
+
+    @staticmethod
+    async def get_user_by_id(user_id: int) -> Optional[UserRecord]:
+        """
+        Look up a user by id, serving warm lookups from the identity cache.
+
+        Args:
+            user_id (int): The user's primary key.
+
+        Returns:
+            Optional[UserRecord]: The user record, or None if no such user exists.
+        """
+        record = user_cache.get_by_id(user_id)
+        if record is None:
+            record = await UserService._load_record(crud.get_user_record, user_id, user_id=user_id)
+        return record
+
+    @staticmethod
+    async def get_user_by_email(email: str) -> Optional[UserRecord]:
+        """
+        Look up a user by email, serving warm lookups from the identity cache.
+
+        Args:
+            email (str): The user's email address.
+
+        Returns:
+            Optional[UserRecord]: The user record, or None if no such user exists.
+        """
+        record = user_cache.get_by_email(email)
+        if record is None:
+            record = await UserService._load_record(crud.get_user_record_by_email, email, email=email)
+        return record
+
+    @staticmethod
+    async def get_user_by_username(username: str) -> Optional[UserRecord]:
+        """
+        Look up a user by username, serving warm lookups from the identity cache.
+
+        Args:
+            username (str): The user's username.
+
+        Returns:
+            Optional[UserRecord]: The user record, or None if no such user exists.
+        """
+        record = user_cache.get_by_username(username)
+        if record is None:
+            record = await UserService._load_record(crud.get_user_record_by_username, username, username=username)
+        return record
+
+    @staticmethod
+    async def get_users_by_ids(user_ids: list[int]) -> list[UserRecord]:
+        """
+        Look up several users by id, serving warm lookups from the identity cache.
+
+        Cache misses are loaded with one projected query per shard.
+
+        Args:
+            user_ids (list[int]): Primary keys; duplicates are looked up once.
+
+        Returns:
+            list[UserRecord]: The existing users, in the order of `user_ids`.
+        """
+        records: dict[int, UserRecord] = {}
+        missing_by_shard: dict[int, list[int]] = {}
+        for user_id in dict.fromkeys(user_ids):
+            record = user_cache.get_by_id(user_id)
+            if record is None:
+                missing_by_shard.setdefault(shard_router.shard_for(user_id), []).append(user_id)
+            else:
+                records[user_id] = record
+
+        for shard, missing in missing_by_shard.items():
+            async with shard_router.session_on(shard) as session:
+                rows = await crud.get_user_records(session, missing)
+            for row in rows:
+                record = UserRecord(*row)
+                user_cache.put(record)
+                records[record.id] = record
+        return [records[user_id] for user_id in dict.fromkeys(user_ids) if user_id in records]
+
+    @staticmethod
+    async def _load_record(loader, value, **lookup) -> Optional[UserRecord]:
+        """
+        Fetch a projected user row with `loader` and populate the cache with it.
+
+        When users are sharded, the row is read from the shard that owns the
+        user, found from `lookup` (`user_id=`, or `email=` / `username=` via the directory).
+        """
+        if shard_router.sharded:
+            user_id = lookup.get("user_id") or await shard_router.locate(**lookup)
+            if user_id is None:
+                return None
+            session = shard_router.session_for(user_id)
+        else:
+            session = async_session()
+        async with session:
+            row = await loader(session, value)
+        if row is None:
+            return None
+        record = UserRecord(*row)
+        user_cache.put(record)
+        return record
@@ -1,7 +1,9 @@
+from datetime import datetime
+from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.models import User, Role
-from app.schemas import UserCreate, UserResponse
+from app.models import User, Role, UserRole, UserSession, UserJobQueue
+from app.schemas.api import UserCreate, UserResponse
 
 async def create_user(db: AsyncSession, user_create: UserCreate):
     db_user = User(username=user_create.username, email=user_create.email, password_hash=user_create.password)
@@ -11,9 +13,105 @@ async def create_user(db: AsyncSession, user_create: UserCreate):
     return db_user
 
 async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100):
-    result = await db.execute(select(User).offset(skip).limit(limit))
+    result = await db.execute(select_live_users(User).offset(skip).limit(limit))
     return result.scalars().all()
 
 async def get_user(db: AsyncSession, user_id: int):
     result = await db.execute(select(User).filter(User.id == user_id))
     return result.scalar_one_or_none()
+
+# Columns backing the compact `UserRecord` used by the identity cache
+USER_RECORD_COLUMNS = (User.id, User.username, User.email, User.is_active, User.email_verified)
+
+async def get_user_record(db: AsyncSession, user_id: int):
+    result = await db.execute(select(*USER_RECORD_COLUMNS).where(User.id == user_id, live_users()))
+    return result.first()
+
+async def get_user_record_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(*USER_RECORD_COLUMNS).where(email_matches(email), live_users()))
+    return result.first()
+
+async def get_user_record_by_username(db: AsyncSession, username: str):
+    result = await db.execute(select(*USER_RECORD_COLUMNS).where(User.username == username, live_users()))
+    return result.first()
+
+async def search_user_records(db: AsyncSession, query: str, limit: int):
+    result = await db.execute(select_user_search(query, limit))
+    return result.all()
+
+async def get_user_records(db: AsyncSession, user_ids: list[int]):
+    result = await db.execute(select(*USER_RECORD_COLUMNS).where(User.id.in_(user_ids), live_users()))
+    return result.all()
+
+async def get_live_role_ids(db: AsyncSession, user_id: int):
+    result = await db.execute(select_live_user_roles(user_id, UserRole.role_id))
+    return result.scalars().all()
+
+async def get_live_roles(db: AsyncSession):
+    result = await db.execute(select(Role.id, Role.name).where(Role.is_deleted == False).order_by(Role.id))  # noqa: E712
+    return result.all()
+
+# Hot-path predicates. Each one matches a partial or expression index exactly
+# (see the models and tests/test_hot_query_plans.py); keep them in sync.
+
+def email_matches(email: str):
+    """Case-insensitive email match served by the unique `lower(email)` index."""
+    return func.lower(User.email) == email.lower()
+
+def live_users():
+    """Non-deleted users, served by the partial `(id) WHERE is_deleted = false` index."""
+    return User.is_deleted == False  # noqa: E712 - must render as `= false` to match the index predicate
+
+def select_live_users(*columns):
+    return select(*columns).where(live_users()).order_by(User.id)
+
+def select_active_sessions(user_id: int):
+    return select(UserSession).where(UserSession.user_id == user_id, UserSession.revoked_at.is_(None))
+
+def select_live_user_roles(user_id: int, *columns):
+    return select(*(columns or (UserRole,))).where(UserRole.user_id == user_id, UserRole.is_deleted == False)  # noqa: E712
+
+def select_expired_unverified_users(now: datetime):
+    return (
+        select(User)
+        .where(User.email_verified == False, live_users())  # noqa: E712
+        .where(User.verification_code_expires_at < now)
+        .order_by(User.verification_code_expires_at)
+    )
+
+def select_pending_jobs(now: datetime, limit: int):
+    return (
+        select(UserJobQueue)
+        .where(UserJobQueue.status == 'pending', UserJobQueue.scheduled_for <= now)
+        .order_by(UserJobQueue.scheduled_for)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+
+def user_search_score(query: str):
+    """Relevance of a user to a search, best first when ordered descending."""
+    query = query.lower()
+    return func.greatest(func.similarity(func.lower(User.username), query), func.similarity(func.lower(User.email), query))
+
+def select_user_search(query: str, limit: int, *columns):
+    """
+    Substring or trigram-similar match on username/email, served by the `gin_trgm_ops` indexes.
+
+    `columns` are selected after the user record columns, e.g. the score to merge results from several shards.
+    """
+    query = query.lower()
+    pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    username, email = func.lower(User.username), func.lower(User.email)
+    score = user_search_score(query)
+    return (
+        select(*USER_RECORD_COLUMNS, *columns)
+        .where(
+            username.like(pattern)
+            | email.like(pattern)
+            | username.op("%")(query)
+            | email.op("%")(query),
+            live_users(),
+        )
+        .order_by(score.desc(), User.id)
+        .limit(limit)
+    )
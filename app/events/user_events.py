@@ -2,7 +2,63 @@
 Event dispatcher using pyee to decouple event emission from handling.
 """
 
+import asyncio
+import time
+
 from pyee.asyncio import AsyncIOEventEmitter
 
+from app.core.deadline import no_deadline
+
+
+class AppEventEmitter(AsyncIOEventEmitter):
+    """
+    AsyncIO event emitter with an awaitable emit for use inside coroutines.
+    """
+
+    async def emit_async(self, event: str, *args, **kwargs) -> bool:
+        """
+        Emit an event from async code.
+
+        Coroutine handlers are scheduled on the running loop exactly as with
+        `emit()`; this does not wait for them to finish.
+
+        Returns:
+            bool: True if the event had any listeners.
+        """
+        return self.emit(event, *args, **kwargs)
+
+    def _emit_run(self, f, args, kwargs) -> None:
+        # Handlers outlive the request that emitted the event, so they must not inherit its deadline
+        with no_deadline():
+            super()._emit_run(f, args, kwargs)
+
+    @property
+    def pending(self) -> int:
+        """Number of coroutine handlers that are still running."""
+        return len(self._waiting)
+
+    async def drain(self, timeout: float) -> int:
+        """
+        Wait for running coroutine handlers to finish, including handlers they
+        trigger in turn, and cancel whatever is still running after `timeout`.
+
+        Args:
+            timeout (float): Seconds to wait before cancelling.
+
+        Returns:
+            int: Number of handlers that had to be cancelled.
+        """
+        deadline = time.monotonic() + timeout
+        while self._waiting:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.wait(set(self._waiting), timeout=remaining)
+
+        cancelled = len(self._waiting)
+        self.cancel()
+        return cancelled
+
+
 # Global event emitter for the app
-event_bus = AsyncIOEventEmitter()
+event_bus = AppEventEmitter()
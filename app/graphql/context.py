@@ -0,0 +1,77 @@
+"""
+Helpers for reading request details from the Strawberry GraphQL context.
+"""
+
+from typing import Optional
+from fastapi import Request
+from graphql import GraphQLError
+from strawberry.types import Info
+from app.core.security.tokens import AccessClaims, TokenError, verify_access_token
+from app.infrastructure.activity.activity_tracker import activity_tracker
+
+
+async def get_context(request: Request) -> dict:
+    """
+    Builds the per-request GraphQL context.
+
+    A bearer access token, if present, is verified in-process (signature,
+    expiry and revocation set) and exposed as `auth`. Invalid tokens leave
+    `auth` empty and record the reason in `auth_error`. Authenticated requests
+    touch their session in the activity tracker (an in-memory write).
+    """
+    auth, auth_error = None, None
+    header = request.headers.get("authorization")
+    if header and header[:7].lower() == "bearer ":
+        try:
+            auth = verify_access_token(header[7:].strip())
+            activity_tracker.touch_session(auth.user_id, auth.session_id)
+        except TokenError as error:
+            auth_error = str(error)
+    return {"auth": auth, "auth_error": auth_error}
+
+
+def current_claims(info: Info) -> Optional[AccessClaims]:
+    """Returns the verified access token claims of the caller, if authenticated."""
+    return info.context.get("auth")
+
+
+def require_claims(info: Info) -> AccessClaims:
+    """
+    Returns the caller's access token claims.
+
+    Raises:
+        GraphQLError: If the request is not authenticated.
+    """
+    claims = current_claims(info)
+    if claims is None:
+        raise GraphQLError(info.context.get("auth_error") or "Authentication required.")
+    return claims
+
+
+def client_ip(info: Info) -> Optional[str]:
+    """
+    Returns the IP address of the client that sent the current request.
+
+    Args:
+        info (Info): Strawberry GraphQL context.
+
+    Returns:
+        Optional[str]: The client IP, or None if the transport does not provide one.
+    """
+    request = info.context.get("request")
+    if request is None or request.client is None:
+        return None
+    return request.client.host
+
+
+def client_user_agent(info: Info) -> Optional[str]:
+    """
+    Returns the User-Agent header of the current request, if any.
+
+    Args:
+        info (Info): Strawberry GraphQL context.
+    """
+    request = info.context.get("request")
+    if request is None:
+        return None
+    return request.headers.get("user-agent")
@@ -0,0 +1,20 @@
+"""
+Schema extension that tells the event loop watchdog which operation each task is executing.
+"""
+
+from strawberry.extensions import SchemaExtension
+
+from app.infrastructure.profiling.loop_watchdog import loop_watchdog
+
+
+class InFlightOperations(SchemaExtension):
+    """
+    Registers the current GraphQL operation with `loop_watchdog` for the duration of the request.
+    """
+
+    def on_operation(self):
+        loop_watchdog.operation_started(self.execution_context.operation_name or "anonymous")
+        try:
+            yield
+        finally:
+            loop_watchdog.operation_finished()
@@ -0,0 +1,37 @@
+"""
+GraphQL mutations for logging in, refreshing tokens and logging out.
+"""
+
+import strawberry
+from strawberry.types import Info
+from app.schemas.auth import LoginInput, AuthPayload
+from app.core.services.auth_service import AuthService
+from app.graphql.context import client_ip, client_user_agent, require_claims
+
+
+@strawberry.type
+class AuthMutation:
+    """
+    Contains the mutations that manage authenticated sessions.
+    """
+
+    @strawberry.mutation
+    async def login(self, input: LoginInput, info: Info) -> AuthPayload:
+        """
+        Log in with email/username and password.
+        """
+        return await AuthService.login(input, client_ip(info), client_user_agent(info))
+
+    @strawberry.mutation
+    async def refresh_token(self, refresh_token: str, info: Info) -> AuthPayload:
+        """
+        Exchange a refresh token for a new access/refresh token pair.
+        """
+        return await AuthService.refresh(refresh_token, client_ip(info), client_user_agent(info))
+
+    @strawberry.mutation
+    async def logout(self, info: Info) -> bool:
+        """
+        Revoke the caller's current session.
+        """
+        return await AuthService.logout(require_claims(info))
@@ -0,0 +1,29 @@
+"""
+GraphQL mutation for requesting a captcha challenge.
+"""
+
+import strawberry
+from app.schemas.captcha import CaptchaChallengeType
+from app.core.security.captcha import captcha_service
+
+
+@strawberry.type
+class CaptchaMutation:
+    """
+    Contains the mutation that issues signed captcha challenges.
+
+    Issuing is a mutation rather than a query so that concurrent requests are
+    never coalesced into one shared challenge.
+    """
+
+    @strawberry.mutation
+    def request_captcha(self) -> CaptchaChallengeType:
+        """
+        Issue a new captcha challenge. Nothing is stored server-side.
+        """
+        challenge = captcha_service.issue()
+        return CaptchaChallengeType(
+            token=challenge.token,
+            question=challenge.question,
+            expires_at=challenge.expires_at,
+        )
@@ -0,0 +1,24 @@
+"""
+GraphQL mutation for updating the caller's profile.
+"""
+
+import strawberry
+from strawberry.types import Info
+from app.schemas.profile import ProfileType, ProfileUpdateInput
+from app.core.services.profile_service import ProfileService
+from app.graphql.context import require_claims
+
+
+@strawberry.type
+class ProfileMutation:
+    """
+    Contains the mutation that edits the authenticated user's profile.
+    """
+
+    @strawberry.mutation
+    async def update_profile(self, input: ProfileUpdateInput, info: Info) -> ProfileType:
+        """
+        Update the caller's profile; omitted fields are left unchanged.
+        """
+        claims = require_claims(info)
+        return await ProfileService.update_profile(claims.user_id, input)
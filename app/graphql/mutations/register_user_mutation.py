@@ -3,9 +3,11 @@ Strawberry GraphQL mutation class for user registration.
 """
 
 import strawberry
+from graphql import GraphQLError
 from strawberry.types import Info
 from app.schemas.user import UserRegisterInput, UserType
 from app.core.services.user_service import UserService
+from app.core.security.captcha import CAPTCHA_REQUIRED, CaptchaError, captcha_service
 
 @strawberry.type
 class RegisterUserMutation:
@@ -28,5 +30,14 @@ class RegisterUserMutation:
 
         Returns:
             UserType: Basic user profile excluding sensitive data.
+
+        Raises:
+            GraphQLError: If a captcha is required or supplied and not solved.
         """
+        if CAPTCHA_REQUIRED or input.captcha_token:
+            # Checked in-process before any database work
+            try:
+                await captcha_service.verify(input.captcha_token or "", input.captcha_answer or "")
+            except CaptchaError as error:
+                raise GraphQLError(str(error))
         return await UserService.register_user(input)
@@ -0,0 +1,30 @@
+"""
+GraphQL mutations for assigning and revoking user roles.
+"""
+
+import strawberry
+from strawberry.types import Info
+from app.core.services.role_service import RoleService
+from app.graphql.context import current_claims
+from app.graphql.permissions import ADMIN_ROLE, require_role
+
+
+@strawberry.type
+class RoleMutation:
+    """
+    Contains the mutations that manage role assignments. Restricted to admins.
+    """
+
+    @strawberry.mutation(permission_classes=[require_role(ADMIN_ROLE)])
+    async def assign_role(self, user_id: int, role: str, info: Info) -> bool:
+        """
+        Assign a role to a user.
+        """
+        return await RoleService.assign_role(user_id, role, actor_id=current_claims(info).user_id)
+
+    @strawberry.mutation(permission_classes=[require_role(ADMIN_ROLE)])
+    async def revoke_role(self, user_id: int, role: str, info: Info) -> bool:
+        """
+        Revoke a role from a user.
+        """
+        return await RoleService.revoke_role(user_id, role, actor_id=current_claims(info).user_id)
@@ -5,9 +5,13 @@ GraphQL aggregator for all user-related mutations.
 import strawberry
 from app.graphql.mutations.register_user_mutation import RegisterUserMutation
 from app.graphql.mutations.verify_user_mutation import VerifyUserMutation
+from app.graphql.mutations.auth_mutation import AuthMutation
+from app.graphql.mutations.profile_mutation import ProfileMutation
+from app.graphql.mutations.role_mutation import RoleMutation
+from app.graphql.mutations.captcha_mutation import CaptchaMutation
 
 @strawberry.type
-class UserMutation(RegisterUserMutation, VerifyUserMutation):
+class UserMutation(RegisterUserMutation, VerifyUserMutation, AuthMutation, ProfileMutation, RoleMutation, CaptchaMutation):
     """
     Combines all user-related mutations into one class.
 
@@ -6,6 +6,7 @@ import strawberry
 from app.schemas.user import UserType, UserVerifyInput
 from app.core.services.user_service import UserService
 from app.database import get_db
+from app.graphql.context import client_ip
 from strawberry.types import Info
 
 @strawberry.type
@@ -20,4 +21,4 @@ class VerifyUserMutation:
         Verify a user based on email/phone and code.
         """
         db = await get_db().__anext__()
-        return await UserService.verify_user_code(input=input, db=db)
+        return await UserService.verify_user_code(input=input, db=db, ip_address=client_ip(info))
@@ -0,0 +1,49 @@
+"""
+Strawberry permission classes backed by the in-memory role masks.
+"""
+
+import os
+from typing import Any
+
+from strawberry.permission import BasePermission
+from strawberry.types import Info
+
+from app.core.security.permissions import has_role
+from app.graphql.context import current_claims
+
+# Role required for user administration (role changes, user search)
+ADMIN_ROLE = os.environ.get("ADMIN_ROLE", "admin")
+
+
+class HasRole(BasePermission):
+    """
+    Grants access if the authenticated caller holds at least one of `roles`.
+
+    Use `require_role(...)` to build a subclass for a specific set of roles.
+    """
+
+    roles: tuple[str, ...] = ()
+    message = "Not authorized."
+
+    async def has_permission(self, source: Any, info: Info, **kwargs: Any) -> bool:
+        claims = current_claims(info)
+        return await has_role(claims.user_id if claims else None, *self.roles)
+
+
+def require_role(*roles: str) -> type[HasRole]:
+    """
+    Builds a permission class that requires any of `roles`.
+
+    Example:
+        @strawberry.mutation(permission_classes=[require_role("admin")])
+
+    Args:
+        *roles (str): Acceptable role names.
+
+    Returns:
+        type[HasRole]: A permission class for `permission_classes`.
+    """
+    return type("RequireRole", (HasRole,), {
+        "roles": roles,
+        "message": f"Requires role: {' or '.join(roles)}.",
+    })
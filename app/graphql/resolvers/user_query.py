@@ -1,10 +1,44 @@
 """Contains GraphQL resolvers related to the User entity."""
 
 import strawberry
+from datetime import datetime, timezone
+from typing import Annotated, Optional
+from strawberry.types import Info
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas.user import UserType
+from app.schemas.profile import ProfileType
+from app.schemas.stats import PERIOD_GROUPS, RegistrationStatsGroupBy, RegistrationStatsType
 from app.models import User
-from app.database import async_session
+from app.infrastructure.sharding.shard_router import shard_router
+from app import crud
+from app.core.cache.user_cache import UserRecord
+from app.core.services.user_service import UserService
+from app.core.services.profile_service import ProfileService
+from app.core.services.search_service import UserSearchService
+from app.core.services.stats_service import RegistrationStatsService
+from app.graphql.context import require_claims
+from app.graphql.permissions import ADMIN_ROLE, require_role
+
+
+def to_naive_utc(value: datetime) -> datetime:
+    """Converts an aware datetime to naive UTC; naive values are taken as UTC already."""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def to_user_type(record: Optional[UserRecord]) -> Optional[UserType]:
+    """Converts a cached user record into its GraphQL output type."""
+    if record is None:
+        return None
+    return UserType(
+        id=record.id,
+        username=record.username,
+        email=record.email,
+        is_active=record.is_active,
+        email_verified=record.email_verified
+    )
+
 
 @strawberry.type
 class UserQuery:
@@ -12,17 +46,83 @@ class UserQuery:
 
     @strawberry.field
     async def all_users(self) -> list[UserType]:
-        """Returns all users in the system."""
-        async with async_session() as session:
-            result = await session.execute(
-                User.__table__.select()
-            )
-            users = result.fetchall()
-            return [
-                UserType(
-                    id=row.id,
-                    username=row.username,
-                    email=row.email,
-                    is_active=row.is_active
-                ) for row in users
-            ]
+        """Returns all non-deleted users in the system."""
+        users = await shard_router.scatter_gather(
+            crud.select_live_users(*crud.USER_RECORD_COLUMNS),
+            key=lambda row: row.id,
+        )
+        return [
+            UserType(
+                id=row.id,
+                username=row.username,
+                email=row.email,
+                is_active=row.is_active,
+                email_verified=row.email_verified
+            ) for row in users
+        ]
+
+    @strawberry.field
+    async def user(self, id: int) -> Optional[UserType]:
+        """Returns a single user by id, or null if it does not exist."""
+        return to_user_type(await UserService.get_user_by_id(id))
+
+    @strawberry.field
+    async def user_by_email(self, email: str) -> Optional[UserType]:
+        """Returns a single user by email address, or null if it does not exist."""
+        return to_user_type(await UserService.get_user_by_email(email))
+
+    @strawberry.field
+    async def user_by_username(self, username: str) -> Optional[UserType]:
+        """Returns a single user by username, or null if it does not exist."""
+        return to_user_type(await UserService.get_user_by_username(username))
+
+    @strawberry.field(permission_classes=[require_role(ADMIN_ROLE)])
+    async def search_users(self, query: str, first: int = 20) -> list[UserType]:
+        """Returns users whose username or email matches `query` by prefix, substring or similarity."""
+        return [to_user_type(record) for record in await UserSearchService.search_users(query, first)]
+
+    @strawberry.field
+    async def profile(self, info: Info, as_of: Optional[datetime] = None) -> Optional[ProfileType]:
+        """
+        Returns the caller's profile, or its state at `as_of` (UTC) if given.
+        """
+        claims = require_claims(info)
+        if as_of is None:
+            return await ProfileService.get_profile(claims.user_id)
+        return await ProfileService.get_profile_as_of(claims.user_id, to_naive_utc(as_of))
+
+    @strawberry.field(permission_classes=[require_role(ADMIN_ROLE)])
+    async def registration_stats(
+        self,
+        from_: Annotated[datetime, strawberry.argument(name="from")],
+        to: datetime,
+        group_by: Optional[list[RegistrationStatsGroupBy]] = None,
+    ) -> list[RegistrationStatsType]:
+        """
+        Returns registrations and verifications in [from, to) per group, read from the hourly rollups.
+
+        `groupBy` defaults to [DAY]; pass an empty list for totals over the range.
+        """
+        group_by = [RegistrationStatsGroupBy.DAY] if group_by is None else group_by
+        periods = [group.value for group in group_by if group in PERIOD_GROUPS]
+        if len(set(periods)) > 1:
+            raise ValueError("groupBy may contain only one of HOUR, DAY, WEEK and MONTH.")
+        rows = await RegistrationStatsService.registration_stats(
+            to_naive_utc(from_),
+            to_naive_utc(to),
+            period=periods[0] if periods else None,
+            by_registered_via=RegistrationStatsGroupBy.REGISTERED_VIA in group_by,
+            by_referrer=RegistrationStatsGroupBy.REFERRER in group_by,
+        )
+        stats = []
+        for row in rows:
+            registrations, verifications = int(row.registrations or 0), int(row.verifications or 0)
+            stats.append(RegistrationStatsType(
+                period=row.period.replace(tzinfo=timezone.utc) if row.period is not None else None,
+                registered_via=row.registered_via,
+                referrer=row.referrer,
+                registrations=registrations,
+                verifications=verifications,
+                verification_rate=verifications / registrations if registrations else None,
+            ))
+        return stats
@@ -9,11 +9,16 @@ GraphQL operations exposed through the API.
 import strawberry
 from app.graphql.resolvers.user_query import UserQuery
 from app.graphql.mutations.user_mutation import UserMutation
+from app.graphql.single_flight import SingleFlight
+from app.graphql.in_flight import InFlightOperations
 
 # Create a Strawberry schema instance
 # - Query: defines read-only operations (e.g., fetch users)
 # - Mutation: defines write operations (e.g., register user)
+# - SingleFlight: identical concurrent queries share one execution
+# - InFlightOperations: names the running operation in event loop watchdog reports
 schema = strawberry.Schema(
     query=UserQuery,
-    mutation=UserMutation
+    mutation=UserMutation,
+    extensions=[InFlightOperations, SingleFlight],
 )
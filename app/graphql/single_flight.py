@@ -0,0 +1,149 @@
+"""
+Single-flight coalescing of identical concurrent GraphQL queries.
+
+When many clients send the same query at the same moment (a dashboard
+refreshing `allUsers`, for instance), only the first execution runs; the
+others wait for it and receive its result. Requests are identical when their
+normalized query document, operation name, variables and auth scope (caller
+id and token error) match. Mutations and subscriptions are never coalesced,
+and a result is only shared with requests that arrived while it was being
+computed, so coalescing never serves stale data.
+
+At most `SINGLE_FLIGHT_MAX_WAITERS` requests wait on one execution; further
+duplicates execute on their own. A waiter gives up after
+`SINGLE_FLIGHT_TIMEOUT` seconds with an error. If the shared execution is
+cancelled (its client went away), one of its waiters starts a new one.
+"""
+
+import asyncio
+import json
+import os
+from functools import lru_cache
+from typing import Optional
+
+from graphql import ExecutionResult, GraphQLError, parse, print_ast
+from strawberry.extensions import SchemaExtension
+from strawberry.types.graphql import OperationType
+
+from app.core import metrics
+
+SINGLE_FLIGHT_ENABLED = os.environ.get("SINGLE_FLIGHT_ENABLED", "1") == "1"
+SINGLE_FLIGHT_MAX_WAITERS = int(os.environ.get("SINGLE_FLIGHT_MAX_WAITERS", "1000"))
+SINGLE_FLIGHT_TIMEOUT = float(os.environ.get("SINGLE_FLIGHT_TIMEOUT", "10"))
+
+executions_total = metrics.counter(
+    "graphql_single_flight_executions_total", "Query executions that ran as the leader of a flight.", ("operation",)
+)
+collapsed_total = metrics.counter(
+    "graphql_single_flight_collapsed_total", "Query executions served from another in-flight execution.", ("operation",)
+)
+overflow_total = metrics.counter(
+    "graphql_single_flight_overflow_total", "Duplicate queries executed alone because the waiter cap was reached.", ("operation",)
+)
+timeouts_total = metrics.counter(
+    "graphql_single_flight_timeouts_total", "Waiters that gave up before the shared execution finished.", ("operation",)
+)
+
+
+class _Flight:
+    __slots__ = ("future", "waiters")
+
+    def __init__(self):
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.waiters = 0
+
+
+# In-flight executions of this process, keyed by `_flight_key`
+_flights: dict[tuple, _Flight] = {}
+
+
+@lru_cache(maxsize=1024)
+def normalize_query(query: str) -> str:
+    """Returns `query` re-printed from its AST, so formatting differences do not matter."""
+    return print_ast(parse(query))
+
+
+def _flight_key(execution_context) -> Optional[tuple]:
+    if not execution_context.query:
+        return None
+    context = execution_context.context
+    auth = context.get("auth") if isinstance(context, dict) else None
+    auth_error = context.get("auth_error") if isinstance(context, dict) else None
+    try:
+        variables = json.dumps(execution_context.variables or {}, sort_keys=True, default=str)
+    except (TypeError, ValueError):
+        return None
+    return (
+        normalize_query(execution_context.query),
+        execution_context.operation_name,
+        variables,
+        auth.user_id if auth is not None else None,
+        auth_error,
+    )
+
+
+class SingleFlight(SchemaExtension):
+    """
+    Schema extension that lets identical concurrent queries share one execution.
+    """
+
+    def __init__(self, *, max_waiters: int = SINGLE_FLIGHT_MAX_WAITERS, timeout: float = SINGLE_FLIGHT_TIMEOUT, **kwargs):
+        super().__init__(**kwargs)
+        self.max_waiters = max_waiters
+        self.timeout = timeout
+
+    async def on_execute(self):
+        execution_context = self.execution_context
+        if not SINGLE_FLIGHT_ENABLED or execution_context.operation_type != OperationType.QUERY:
+            yield
+            return
+        key = _flight_key(execution_context)
+        if key is None:
+            yield
+            return
+        operation = execution_context.operation_name or "anonymous"
+
+        while (flight := _flights.get(key)) is not None:
+            if flight.waiters >= self.max_waiters:
+                overflow_total.inc(operation=operation)
+                yield
+                return
+            result = await self._wait(flight, operation)
+            if result is not None:
+                execution_context.result = result
+                yield
+                return
+            # The shared execution failed; the first waiter to get here leads a new one
+
+        flight = _flights[key] = _Flight()
+        executions_total.inc(operation=operation)
+        try:
+            yield
+        finally:
+            if _flights.get(key) is flight:
+                del _flights[key]
+            # Waiters of a failed or cancelled execution run the query themselves
+            if execution_context.result is not None:
+                flight.future.set_result(execution_context.result)
+            else:
+                flight.future.cancel()
+
+    async def _wait(self, flight: _Flight, operation: str) -> Optional[ExecutionResult]:
+        # Returns the shared result, or None if the shared execution failed or was cancelled
+        flight.waiters += 1
+        try:
+            # asyncio.wait neither cancels the shared future on timeout nor
+            # swallows a cancellation of this waiter, so a CancelledError here
+            # always means this request was cancelled
+            done, _ = await asyncio.wait({flight.future}, timeout=self.timeout)
+        finally:
+            flight.waiters -= 1
+        if not done:
+            timeouts_total.inc(operation=operation)
+            return ExecutionResult(
+                data=None, errors=[GraphQLError("Timed out waiting for an identical query to complete.")]
+            )
+        if flight.future.cancelled():
+            return None
+        collapsed_total.inc(operation=operation)
+        return flight.future.result()
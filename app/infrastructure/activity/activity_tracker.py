@@ -0,0 +1,222 @@
+"""
+Write-coalescing buffer for login and session activity.
+
+Recording `users.last_login_ip`, a `user_logins` row and `user_sessions.last_seen_at`
+directly would put several writes per request on the hottest rows in the
+database. Instead the request path only updates in-memory maps, keeping the
+latest value per user and per session, and appends login rows to a bounded
+queue. A background task flushes every `ACTIVITY_FLUSH_INTERVAL` seconds with
+one ``UPDATE ... FROM (VALUES ...)`` per table and batch, and one `COPY` of the
+queued login rows; the final flush runs at shutdown. Each shard's rows are
+written to that shard.
+"""
+
+import os
+from datetime import datetime
+from typing import Optional
+
+from app.database import asyncpg_connection
+from app.events.user_events import event_bus
+from app.infrastructure.background import PeriodicFlusher
+from app.infrastructure.copy_writer import ROW_ERRORS, BufferedCopyWriter
+from app.infrastructure.sharding.shard_router import shard_router
+
+ACTIVITY_FLUSH_INTERVAL = float(os.environ.get("ACTIVITY_FLUSH_INTERVAL", "5.0"))
+ACTIVITY_BATCH_SIZE = int(os.environ.get("ACTIVITY_BATCH_SIZE", "1000"))
+ACTIVITY_MAX_PENDING_LOGINS = int(os.environ.get("ACTIVITY_MAX_PENDING_LOGINS", "100000"))
+
+# Column order of the login rows handed to COPY
+LOGIN_COLUMNS = ("user_id", "login_provider", "login_ip", "login_time")
+
+
+def _values(rows: list[tuple], casts: tuple[str, ...]) -> tuple[str, list]:
+    """
+    Builds a ``VALUES`` list with positional parameters for `rows`.
+
+    The first row carries explicit casts so PostgreSQL knows the column types.
+    """
+    width = len(casts)
+    groups = []
+    for index in range(len(rows)):
+        base = index * width
+        if index == 0:
+            params = (f"${base + i + 1}::{cast}" for i, cast in enumerate(casts))
+        else:
+            params = (f"${base + i + 1}" for i in range(width))
+        groups.append(f"({', '.join(params)})")
+    return ", ".join(groups), [value for row in rows for value in row]
+
+
+def _by_shard(pending: dict) -> dict[int, list]:
+    """Splits the keys of `pending` (user ids, or (user id, session id) pairs) by owning shard, in order."""
+    groups: dict[int, list] = {}
+    for key in sorted(pending):
+        user_id = key[0] if isinstance(key, tuple) else key
+        groups.setdefault(shard_router.shard_for(user_id), []).append(key)
+    return groups
+
+
+class LoginWriter(BufferedCopyWriter):
+    """
+    The tracker's queue of `user_logins` rows.
+
+    Flushed by the tracker rather than started on its own, so a login row
+    rejected by COPY is isolated and dropped like any other buffered row.
+    """
+
+    name = "ActivityLoginWriter"
+    table = "user_logins"
+    columns = LOGIN_COLUMNS
+    user_column = 0
+
+
+class ActivityTracker(PeriodicFlusher):
+    """
+    Buffers activity updates and writes them out in a few statements per flush.
+
+    Each user and session keeps only its latest value, so a user logging in
+    many times between flushes costs one row update. At most `batch_size`
+    rows go into one statement, rows are updated in id order so concurrent
+    flushes from several workers do not deadlock, and a failed flush puts its
+    unwritten work back in the buffer (newer values recorded meanwhile win).
+
+    The login IPs, session touches and login rows are written independently
+    and per shard: a failure in one is raised only after the others have
+    been flushed, and
+    a row the database rejects is logged, counted in `rejected` and dropped
+    instead of being retried forever.
+    """
+
+    name = "ActivityTracker"
+    schema = "chrome_users"
+
+    def __init__(
+        self,
+        flush_interval: float = ACTIVITY_FLUSH_INTERVAL,
+        batch_size: int = ACTIVITY_BATCH_SIZE,
+        max_pending_logins: int = ACTIVITY_MAX_PENDING_LOGINS,
+    ):
+        super().__init__(flush_interval)
+        self.batch_size = batch_size
+        self.rejected = 0
+        self.logins = LoginWriter(
+            capacity=max_pending_logins,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+            block_timeout=0,
+        )
+        self._last_login_ip: dict[int, str] = {}
+        # Keyed by (user id, session id): session ids are only unique within a shard
+        self._last_seen: dict[tuple[int, int], datetime] = {}
+
+    def __len__(self) -> int:
+        return len(self._last_login_ip) + len(self._last_seen) + len(self.logins)
+
+    @property
+    def dropped(self) -> int:
+        """Login rows dropped because `max_pending_logins` were already queued."""
+        return self.logins.dropped
+
+    def record_login(self, user_id: int, ip_address: Optional[str], provider: str = "password") -> None:
+        """Queues a `user_logins` row and the user's new `last_login_ip`."""
+        if ip_address is not None:
+            self._last_login_ip[user_id] = ip_address
+        self.logins.offer((user_id, provider, ip_address, datetime.utcnow()))
+        if len(self.logins) >= self.batch_size:
+            self.wake()
+
+    def touch_session(self, user_id: int, session_id: int) -> None:
+        """Records that a session of `user_id` was just used."""
+        self._last_seen[user_id, session_id] = datetime.utcnow()
+
+    async def flush(self) -> None:
+        """Writes every buffered update, raising the first failure once all steps have run."""
+        async with self.flush_lock:
+            last_login_ip, self._last_login_ip = self._last_login_ip, {}
+            last_seen, self._last_seen = self._last_seen, {}
+            errors = []
+            for pending, buffer, update in (
+                (last_login_ip, self._last_login_ip, self._update_last_login_ip),
+                (last_seen, self._last_seen, self._update_last_seen),
+            ):
+                for shard, keys in _by_shard(pending).items():
+                    rows = [(key, pending[key]) for key in keys]
+                    try:
+                        await self._write(shard, rows, update)
+                    except Exception as error:
+                        errors.append(error)
+                    finally:
+                        # Put back whatever was not written; values recorded during the flush are newer
+                        for key, value in rows:
+                            buffer.setdefault(key, value)
+            try:
+                await self.logins.flush()
+            except Exception as error:
+                errors.append(error)
+            if errors:
+                raise errors[0]
+
+    async def _write(self, shard: int, rows: list[tuple], update) -> None:
+        # Removes rows from `rows` as they are written or rejected, so the
+        # caller can put back exactly what is left
+        async with asyncpg_connection(shard_router.engines[shard]) as conn:
+            while rows:
+                await self._update_isolating(conn, rows[:self.batch_size], update)
+                del rows[:self.batch_size]
+
+    async def _update_isolating(self, conn, batch: list[tuple], update) -> None:
+        # Updates are idempotent, so a batch failing on its contents is
+        # retried in halves until the offending rows are isolated
+        parts = [batch]
+        while parts:
+            part = parts.pop()
+            try:
+                await update(conn, part)
+            except ROW_ERRORS as error:
+                if len(part) > 1:
+                    middle = len(part) // 2
+                    parts += [part[middle:], part[:middle]]
+                    continue
+                self.rejected += 1
+                print(f"[{self.name}] Dropped an update rejected by the database: {error}: {part[0]!r}")
+
+    async def _update_last_login_ip(self, conn, rows: list[tuple[int, str]]) -> None:
+        values, params = _values(rows, ("int", "varchar"))
+        await conn.execute(
+            f"UPDATE {self.schema}.users AS u SET last_login_ip = v.ip "
+            f"FROM (VALUES {values}) AS v(id, ip) "
+            "WHERE u.id = v.id AND u.last_login_ip IS DISTINCT FROM v.ip",
+            *params,
+        )
+
+    async def _update_last_seen(self, conn, rows: list[tuple[tuple[int, int], datetime]]) -> None:
+        values, params = _values([(session_id, seen_at) for (_, session_id), seen_at in rows], ("int", "timestamp"))
+        await conn.execute(
+            f"UPDATE {self.schema}.user_sessions AS s SET last_seen_at = v.seen_at "
+            f"FROM (VALUES {values}) AS v(id, seen_at) "
+            "WHERE s.id = v.id AND (s.last_seen_at IS NULL OR s.last_seen_at < v.seen_at)",
+            *params,
+        )
+
+# Per-worker tracker, started and stopped with the application
+activity_tracker = ActivityTracker()
+
+
+def register_activity_handlers():
+    """
+    Registers the listener that records logins in the activity tracker.
+    To be called once during application startup.
+    """
+
+    @event_bus.on("user_logged_in")
+    def record_login(user, ip_address, session_id):
+        """
+        Buffers the login row, the user's last login IP and the session's first touch.
+
+        Args:
+            user: The user that logged in (anything with an `id` attribute).
+            ip_address (Optional[str]): Client IP address.
+            session_id (int): The session created by the login.
+        """
+        activity_tracker.record_login(user.id, ip_address)
+        activity_tracker.touch_session(user.id, session_id)
@@ -0,0 +1,104 @@
+"""
+Buffered writer for `chrome_users.audit_logs`.
+
+Audit events are appended to an in-memory buffer on the request path and written
+to the database in batches by a background task using asyncpg's `COPY`, which is
+far cheaper per row than individual INSERT statements.
+"""
+
+import json
+import os
+from datetime import datetime
+from typing import Any, Optional, Union
+
+from app.infrastructure.copy_writer import BufferedCopyWriter
+
+AUDIT_BUFFER_CAPACITY = int(os.environ.get("AUDIT_BUFFER_CAPACITY", "100000"))
+AUDIT_BATCH_SIZE = int(os.environ.get("AUDIT_BATCH_SIZE", "5000"))
+AUDIT_FLUSH_INTERVAL = float(os.environ.get("AUDIT_FLUSH_INTERVAL", "1.0"))
+AUDIT_BLOCK_TIMEOUT = float(os.environ.get("AUDIT_BLOCK_TIMEOUT", "2.0"))
+
+# Column order of the records handed to COPY
+AUDIT_COLUMNS = (
+    "user_id",
+    "actor_id",
+    "event_type",
+    "action",
+    "target",
+    "meta_info",
+    "ip_address",
+    "user_agent",
+    "created_at",
+)
+
+
+class AuditWriter(BufferedCopyWriter):
+    """
+    Bounded buffer of audit rows drained to `audit_logs` with `COPY`.
+
+    See `BufferedCopyWriter` for the flush and backpressure behaviour.
+    """
+
+    name = "AuditWriter"
+    table = "audit_logs"
+    columns = AUDIT_COLUMNS
+    user_column = 0
+
+    def __init__(
+        self,
+        capacity: int = AUDIT_BUFFER_CAPACITY,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        flush_interval: float = AUDIT_FLUSH_INTERVAL,
+        block_timeout: float = AUDIT_BLOCK_TIMEOUT,
+    ):
+        super().__init__(capacity, batch_size, flush_interval, block_timeout)
+
+
+# Per-worker audit writer, started and stopped with the application
+audit_writer = AuditWriter()
+
+
+async def audit(
+    event_type: str,
+    action: str,
+    *,
+    user_id: Optional[int] = None,
+    actor_id: Optional[int] = None,
+    target: Optional[str] = None,
+    meta_info: Union[str, dict[str, Any], None] = None,
+    ip_address: Optional[str] = None,
+    user_agent: Optional[str] = None,
+) -> bool:
+    """
+    Records an audit event.
+
+    On the request path this is a single append to an in-memory buffer; the row
+    reaches `audit_logs` on the next background flush.
+
+    Args:
+        event_type (str): Broad category of the event, e.g. 'user'.
+        action (str): What happened, e.g. 'user_registered'.
+        user_id (Optional[int]): The user the event is about.
+        actor_id (Optional[int]): The user who performed the action, if different.
+        target (Optional[str]): Free-form identifier of the affected object.
+        meta_info (Union[str, dict, None]): Extra details; dicts are stored as JSON.
+        ip_address (Optional[str]): Client IP address.
+        user_agent (Optional[str]): Client user agent.
+
+    Returns:
+        bool: False if the event was dropped because the buffer stayed full.
+    """
+    if isinstance(meta_info, dict):
+        meta_info = json.dumps(meta_info, separators=(",", ":"), default=str)
+
+    return await audit_writer.enqueue((
+        user_id,
+        actor_id,
+        event_type,
+        action,
+        target,
+        meta_info,
+        ip_address,
+        user_agent,
+        datetime.utcnow(),
+    ))
@@ -0,0 +1,114 @@
+"""
+Base classes for work that runs periodically on a background task.
+"""
+
+import asyncio
+from typing import Optional
+
+
+class PeriodicTask:
+    """
+    Runs `run_once()` every `interval` seconds, or sooner when woken.
+
+    Errors raised by `run_once()` are reported and the loop keeps going, so a
+    transient database failure does not stop the task for good.
+
+    Tasks are usually module-level singletons built at import time, before the
+    server's event loop exists, so asyncio primitives are created in `start()`
+    or on first use rather than in `__init__` (on Python 3.9 they bind to the
+    loop current at construction).
+    """
+
+    name = "PeriodicTask"
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._wakeup: Optional[asyncio.Event] = None
+        self._wake_requested = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        """True while the background loop is active."""
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Starts the background loop on the running event loop."""
+        if not self.running:
+            self._wakeup = asyncio.Event()
+            if self._wake_requested:
+                self._wakeup.set()
+            self._task = asyncio.get_running_loop().create_task(self._run(), name=self.name)
+
+    def wake(self) -> None:
+        """Requests a run without waiting for the next interval; before `start()`, the first run happens immediately."""
+        self._wake_requested = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def stop(self) -> None:
+        """Stops the background loop, waiting for it to exit."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_once(self) -> None:
+        """Performs one unit of periodic work. Implemented by subclasses."""
+        raise NotImplementedError
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            self._wake_requested = False
+            try:
+                await self.run_once()
+            except Exception as error:
+                print(f"[{self.name}] Run failed: {error}")
+
+
+class PeriodicFlusher(PeriodicTask):
+    """
+    Periodic task that drains an in-memory buffer.
+
+    Subclasses buffer work on the request path and implement `flush()` to write
+    it out in batches. `stop()` performs one final flush so nothing buffered is
+    lost on shutdown.
+    """
+
+    name = "PeriodicFlusher"
+
+    def __init__(self, flush_interval: float):
+        super().__init__(flush_interval)
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def flush_interval(self) -> float:
+        """Seconds between scheduled flushes."""
+        return self.interval
+
+    @property
+    def flush_lock(self) -> asyncio.Lock:
+        """Lock serializing `flush()` calls, created on first use."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        return self._flush_lock
+
+    async def stop(self) -> None:
+        """Stops the background loop and flushes whatever is still buffered."""
+        await super().stop()
+        await self.flush()
+
+    async def run_once(self) -> None:
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Writes out buffered work. Implemented by subclasses."""
+        raise NotImplementedError
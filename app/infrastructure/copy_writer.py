@@ -0,0 +1,199 @@
+"""
+Bounded in-memory buffer of rows written to a table in batches with `COPY`.
+"""
+
+import asyncio
+import itertools
+import os
+import time
+from collections import deque
+from typing import Optional
+
+import asyncpg
+
+from app.database import asyncpg_connection
+from app.infrastructure.background import PeriodicFlusher
+from app.infrastructure.sharding.shard_router import shard_router
+
+COPY_MAX_ATTEMPTS = int(os.environ.get("COPY_MAX_ATTEMPTS", "3"))
+
+# Errors caused by the rows themselves rather than the connection or the server:
+# values PostgreSQL rejects, and values the driver cannot encode (which raises
+# a ValueError or TypeError subclass)
+ROW_ERRORS = (asyncpg.DataError, asyncpg.IntegrityConstraintViolationError, ValueError, TypeError)
+
+
+class BufferedCopyWriter(PeriodicFlusher):
+    """
+    Buffers rows for `schema.table` and drains them with asyncpg's `COPY`.
+
+    A flush is triggered every `flush_interval` seconds or as soon as
+    `batch_size` rows are waiting. When the buffer holds `capacity` rows,
+    producers wait for the flusher to make room; if no room appears within
+    `block_timeout` seconds the row is dropped and counted in `dropped`.
+
+    A batch that COPY rejects because of its contents is retried as a whole
+    `max_attempts` times; after that it is written in halves until the
+    offending rows are isolated, and those are logged and counted in
+    `rejected` so one bad row cannot hold up the rest of the buffer. Other
+    failures (connection loss, server down) are retried indefinitely.
+
+    Rows of user-scoped tables are written to the shard that owns the user
+    in their `user_column`, each shard's rows in their own queue, so a shard
+    that is down does not hold up the others; rows without a user go to
+    shard 0. Writers without a `user_column` use the application database.
+
+    Subclasses set `schema`, `table` and `columns`, and `user_column` for
+    user-scoped tables.
+    """
+
+    name = "BufferedCopyWriter"
+    schema = "chrome_users"
+    table: str = ""
+    columns: tuple[str, ...] = ()
+    # Index in `columns` of the user id rows are routed by
+    user_column: Optional[int] = None
+
+    def __init__(
+        self,
+        capacity: int,
+        batch_size: int,
+        flush_interval: float,
+        block_timeout: float,
+        max_attempts: int = COPY_MAX_ATTEMPTS,
+    ):
+        super().__init__(flush_interval)
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.block_timeout = block_timeout
+        self.max_attempts = max_attempts
+        self.written = 0
+        self.dropped = 0
+        self.rejected = 0
+        # Queues and consecutive row-error failures per shard; None is the application database
+        self._buffers: dict[Optional[int], deque] = {}
+        self._failed_attempts: dict[Optional[int], int] = {}
+        self._space: Optional[asyncio.Event] = None
+
+    def __len__(self) -> int:
+        return sum(len(buffer) for buffer in self._buffers.values())
+
+    def offer(self, record: tuple) -> bool:
+        """
+        Appends a row to the buffer without waiting, for callers outside async code.
+
+        Args:
+            record (tuple): Values in `columns` order.
+
+        Returns:
+            bool: False if the row was dropped because the buffer is full.
+        """
+        if len(self) >= self.capacity:
+            self.dropped += 1
+            return False
+        self._buffers.setdefault(self._shard_of(record), deque()).append(record)
+        if len(self) >= self.batch_size:
+            self.wake()
+        return True
+
+    async def enqueue(self, record: tuple) -> bool:
+        """
+        Appends a row to the buffer, waiting for space if it is full.
+
+        Args:
+            record (tuple): Values in `columns` order.
+
+        Returns:
+            bool: False if the row was dropped because the buffer stayed full.
+        """
+        if len(self) >= self.capacity:
+            if self._space is None:
+                self._space = asyncio.Event()
+            deadline = time.monotonic() + self.block_timeout
+            while len(self) >= self.capacity:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.dropped += 1
+                    return False
+                self._space.clear()
+                self.wake()
+                try:
+                    await asyncio.wait_for(self._space.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    pass
+
+        return self.offer(record)
+
+    async def flush(self) -> None:
+        """
+        Writes every buffered row to the table in `batch_size` chunks.
+
+        Each shard is flushed in turn; a failure is raised once the other
+        shards have been flushed.
+        """
+        async with self.flush_lock:
+            errors = []
+            for shard, buffer in list(self._buffers.items()):
+                try:
+                    await self._flush_shard(shard, buffer)
+                except Exception as error:
+                    errors.append(error)
+            if errors:
+                raise errors[0]
+
+    async def _flush_shard(self, shard: Optional[int], buffer: deque) -> None:
+        bind = None if shard is None else shard_router.engines[shard]
+        while buffer:
+            count = min(len(buffer), self.batch_size)
+            batch = list(itertools.islice(buffer, count))
+            async with asyncpg_connection(bind) as conn:
+                if self._failed_attempts.get(shard, 0) < self.max_attempts:
+                    try:
+                        await self._copy(conn, batch)
+                    except ROW_ERRORS:
+                        self._failed_attempts[shard] = self._failed_attempts.get(shard, 0) + 1
+                        raise
+                    self._discard(buffer, count)
+                else:
+                    await self._copy_isolating(conn, buffer, batch)
+            self._failed_attempts.pop(shard, None)
+
+    def _shard_of(self, record: tuple) -> Optional[int]:
+        if self.user_column is None:
+            return None
+        user_id = record[self.user_column]
+        return 0 if user_id is None else shard_router.shard_for(user_id)
+
+    async def _copy(self, conn, records: list[tuple]) -> None:
+        await conn.copy_records_to_table(
+            self.table,
+            schema_name=self.schema,
+            columns=self.columns,
+            records=records,
+        )
+        self.written += len(records)
+
+    async def _copy_isolating(self, conn, buffer: deque, batch: list[tuple]) -> None:
+        # Splits the batch until each part is written or is a single rejected
+        # row; parts are handled in order, so everything before a failure has
+        # been discarded from the buffer
+        parts = [batch]
+        while parts:
+            part = parts.pop()
+            try:
+                await self._copy(conn, part)
+            except ROW_ERRORS as error:
+                if len(part) > 1:
+                    middle = len(part) // 2
+                    parts += [part[middle:], part[:middle]]
+                    continue
+                self.rejected += 1
+                print(f"[{self.name}] Dropped a row rejected by {self.schema}.{self.table}: {error}: {part[0]!r}")
+            self._discard(buffer, len(part))
+
+    def _discard(self, buffer: deque, count: int) -> None:
+        # Only discard rows once COPY has succeeded (or rejected them for good)
+        for _ in range(count):
+            buffer.popleft()
+        if self._space is not None:
+            self._space.set()
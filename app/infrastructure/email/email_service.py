@@ -3,6 +3,7 @@ Email service to send verification emails via SMTP.
 This module also registers event listeners to handle email workflows.
 """
 
+import asyncio
 import os
 import smtplib
 import ssl
@@ -10,6 +11,11 @@ from email.message import EmailMessage
 from app.events.user_events import event_bus
 from app.models import User
 
+# SMTP relay; defaults to Gmail over implicit TLS. Point these at a local sink for tests and benchmarks.
+SMTP_HOST = os.environ.get("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", "465"))
+SMTP_USE_SSL = os.environ.get("SMTP_USE_SSL", "1") == "1"
+
 
 class EmailService:
     """
@@ -19,7 +25,7 @@ class EmailService:
     @staticmethod
     def send_verification_email(to_email: str, code: str):
         """
-        Sends a verification email to the specified user using Gmail SMTP.
+        Sends a verification email to the specified user through the configured SMTP relay.
 
         Args:
             to_email (str): The recipient's email address.
@@ -52,10 +58,13 @@ class EmailService:
         message["Subject"] = subject
         message.set_content(body)
 
-        # Connect to Gmail SMTP server
+        # Connect to the SMTP server (Gmail unless SMTP_HOST says otherwise)
         try:
-            context = ssl.create_default_context()
-            with smtplib.SMTP_SSL("smtp.gmail.com", 465, context=context) as server:
+            if SMTP_USE_SSL:
+                server = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, context=ssl.create_default_context())
+            else:
+                server = smtplib.SMTP(SMTP_HOST, SMTP_PORT)
+            with server:
                 server.login(email_from, email_password)
                 server.send_message(message)
                 print(f"[EmailService] Verification code sent to {to_email}")
@@ -78,7 +87,9 @@ def register_event_handlers():
             user (User): The newly registered user instance.
         """
         try:
-            EmailService.send_verification_email(
+            # smtplib blocks; send from a worker thread so the event loop keeps serving requests
+            await asyncio.to_thread(
+                EmailService.send_verification_email,
                 to_email=user.email,
                 code=user.verification_code
             )
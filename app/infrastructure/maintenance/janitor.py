@@ -0,0 +1,153 @@
+"""
+Background janitor that purges expired tokens, codes, challenges, sessions and
+idempotency keys.
+
+Rows are deleted in small batches selected through the `expires_at` /
+`created_at` / `revoked_at` indexes, so each DELETE holds its locks briefly and
+the tables and their unique token indexes stop growing without bound. Batch
+sizes adapt to a per-batch latency budget, and the janitor sleeps between
+batches so it never takes more than a fraction of the database's time. Every
+database is purged: the shards hold their users' tokens and sessions.
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from app.database import asyncpg_connection
+from app.infrastructure.background import PeriodicTask
+from app.infrastructure.sharding.shard_router import shard_router
+
+JANITOR_INTERVAL = float(os.environ.get("JANITOR_INTERVAL", "300"))
+JANITOR_BATCH_SIZE = int(os.environ.get("JANITOR_BATCH_SIZE", "1000"))
+JANITOR_MIN_BATCH_SIZE = int(os.environ.get("JANITOR_MIN_BATCH_SIZE", "50"))
+JANITOR_MAX_BATCH_SIZE = int(os.environ.get("JANITOR_MAX_BATCH_SIZE", "10000"))
+JANITOR_BATCH_BUDGET_MS = float(os.environ.get("JANITOR_BATCH_BUDGET_MS", "50"))
+JANITOR_DUTY_CYCLE = float(os.environ.get("JANITOR_DUTY_CYCLE", "0.25"))
+JANITOR_MAX_RUN_SECONDS = float(os.environ.get("JANITOR_MAX_RUN_SECONDS", "60"))
+
+# How long unsolved captcha challenges and revoked sessions are kept around
+CAPTCHA_CHALLENGE_TTL = timedelta(minutes=int(os.environ.get("CAPTCHA_CHALLENGE_TTL_MINUTES", "30")))
+REVOKED_SESSION_GRACE = timedelta(days=int(os.environ.get("REVOKED_SESSION_GRACE_DAYS", "1")))
+
+# pg_advisory_lock key so only one worker purges at a time
+JANITOR_LOCK_ID = 7_401_031
+
+
+class PurgeRule(NamedTuple):
+    """
+    A set of dead rows to purge: rows of `table` whose indexed `column` is older
+    than `now - age`.
+    """
+    table: str
+    column: str
+    age: timedelta = timedelta(0)
+
+
+PURGE_RULES = (
+    PurgeRule("password_reset_tokens", "expires_at"),
+    PurgeRule("authorization_codes", "expires_at"),
+    PurgeRule("captcha_challenges", "created_at", CAPTCHA_CHALLENGE_TTL),
+    PurgeRule("refresh_tokens", "expires_at"),
+    PurgeRule("user_sessions", "expires_at"),
+    PurgeRule("user_sessions", "revoked_at", REVOKED_SESSION_GRACE),
+    PurgeRule("idempotency_keys", "expires_at"),
+)
+
+
+class Janitor(PeriodicTask):
+    """
+    Periodically deletes expired rows according to `PURGE_RULES`.
+
+    Each batch is
+    ``DELETE ... WHERE ctid = ANY(ARRAY(SELECT ctid ... WHERE <column> < $1 LIMIT $2))``,
+    which resolves the victims through the column's index and deletes them by
+    physical address. After each batch the janitor halves the batch size if it
+    overran `batch_budget_ms` (doubling it when well under), then sleeps long
+    enough to keep its share of wall time at `duty_cycle`.
+    """
+
+    name = "Janitor"
+    schema = "chrome_users"
+
+    def __init__(
+        self,
+        rules: tuple[PurgeRule, ...] = PURGE_RULES,
+        interval: float = JANITOR_INTERVAL,
+        batch_size: int = JANITOR_BATCH_SIZE,
+        batch_budget_ms: float = JANITOR_BATCH_BUDGET_MS,
+        duty_cycle: float = JANITOR_DUTY_CYCLE,
+        max_run_seconds: float = JANITOR_MAX_RUN_SECONDS,
+    ):
+        super().__init__(interval)
+        self.rules = rules
+        self.batch_size = batch_size
+        self.batch_budget_ms = batch_budget_ms
+        self.duty_cycle = duty_cycle
+        self.max_run_seconds = max_run_seconds
+        self.last_report: dict[str, int] = {}
+
+    async def run_once(self) -> None:
+        report = await self.purge()
+        purged = {table: rows for table, rows in report.items() if rows}
+        if purged:
+            summary = ", ".join(f"{table}={rows}" for table, rows in purged.items())
+            print(f"[Janitor] Purged expired rows: {summary}")
+
+    async def purge(self) -> dict[str, int]:
+        """
+        Runs every purge rule once on every database, within the run's time limit.
+
+        Returns:
+            dict[str, int]: Rows deleted per table; empty if another worker holds the locks.
+        """
+        report: dict[str, int] = {}
+        deadline = time.monotonic() + self.max_run_seconds
+        for bind in shard_router.databases:
+            async with asyncpg_connection(bind) as conn:
+                if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", JANITOR_LOCK_ID):
+                    continue
+                try:
+                    for rule in self.rules:
+                        deleted = await self._purge_rule(conn, rule, deadline)
+                        report[rule.table] = report.get(rule.table, 0) + deleted
+                finally:
+                    await conn.execute("SELECT pg_advisory_unlock($1)", JANITOR_LOCK_ID)
+
+        self.last_report = report
+        return report
+
+    async def _purge_rule(self, conn, rule: PurgeRule, deadline: float) -> int:
+        table = f"{self.schema}.{rule.table}"
+        statement = (
+            f"DELETE FROM {table} WHERE ctid = ANY(ARRAY("
+            f"SELECT ctid FROM {table} WHERE {rule.column} < $1 LIMIT $2))"
+        )
+        cutoff = datetime.utcnow() - rule.age
+        deleted = 0
+
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            status = await conn.execute(statement, cutoff, self.batch_size)
+            elapsed = time.perf_counter() - started
+
+            rows = int(status.split()[-1])
+            deleted += rows
+            if rows < self.batch_size:
+                break
+
+            self._adapt_batch_size(elapsed * 1000)
+            await asyncio.sleep(elapsed * (1 / self.duty_cycle - 1))
+
+        return deleted
+
+    def _adapt_batch_size(self, elapsed_ms: float) -> None:
+        if elapsed_ms > self.batch_budget_ms:
+            self.batch_size = max(JANITOR_MIN_BATCH_SIZE, self.batch_size // 2)
+        elif elapsed_ms < self.batch_budget_ms / 2:
+            self.batch_size = min(JANITOR_MAX_BATCH_SIZE, self.batch_size * 2)
+
+
+janitor = Janitor()
@@ -0,0 +1,365 @@
+"""
+Maintenance of the monthly range-partitioned log tables.
+
+`audit_logs` and `login_attempt_logs` are partitioned by month on their
+timestamp column. This module creates partitions ahead of time so inserts
+never land in the default partition, and enforces retention by detaching and
+dropping whole partitions (optionally after archiving them to a gzip'd CSV)
+instead of running large DELETEs. Rows that still ended up in the default
+partition are deleted (and archived) by range once they fall out of retention. `PartitionMaintainer` maintains the
+tables on every database, since each shard logs its own users' events.
+"""
+
+import asyncio
+import gzip
+import os
+import re
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from typing import Optional
+
+from app.database import asyncpg_connection
+from app.infrastructure.background import PeriodicTask
+from app.infrastructure.sharding.shard_router import shard_router
+
+SCHEMA = "chrome_users"
+
+# Partitioned table -> partition key column
+PARTITIONED_TABLES = {
+    "audit_logs": "created_at",
+    "login_attempt_logs": "attempted_at",
+}
+
+PARTITION_MONTHS_AHEAD = int(os.environ.get("PARTITION_MONTHS_AHEAD", "3"))
+PARTITION_MAINTENANCE_INTERVAL = float(os.environ.get("PARTITION_MAINTENANCE_INTERVAL", "3600"))
+PARTITION_ARCHIVE_DIR = os.environ.get("PARTITION_ARCHIVE_DIR") or None
+
+# Months of data to keep per table; 0 keeps everything
+RETENTION_MONTHS = {
+    "audit_logs": int(os.environ.get("AUDIT_LOG_RETENTION_MONTHS", "0")),
+    "login_attempt_logs": int(os.environ.get("LOGIN_ATTEMPT_RETENTION_MONTHS", "0")),
+}
+
+# pg_advisory_lock key so only one worker runs partition DDL at a time
+PARTITION_MAINTENANCE_LOCK_ID = 7_401_028
+
+_PARTITION_SUFFIX = re.compile(r"_p(\d{4})_(\d{2})$")
+
+
+def month_start(value: date) -> date:
+    """Returns the first day of the month containing `value`."""
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    """Returns the first day of the month `months` after the one containing `value`."""
+    index = value.year * 12 + (value.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    """Returns the name of the partition of `table` holding `month`."""
+    return f"{table}_p{month:%Y_%m}"
+
+
+class PartitionManager:
+    """
+    Creates and retires monthly partitions of the partitioned log tables.
+    """
+
+    def __init__(self, tables: dict[str, str] = PARTITIONED_TABLES, schema: str = SCHEMA):
+        self.tables = tables
+        self.schema = schema
+
+    async def ensure_partitions(self, months_ahead: int = PARTITION_MONTHS_AHEAD, conn=None) -> list[str]:
+        """
+        Creates the current month's partition and the next `months_ahead` ones
+        for every managed table, plus a default partition as a safety net
+        (see `create_partition`).
+
+        Args:
+            months_ahead (int): How many future months to pre-create.
+            conn: Optional asyncpg connection to reuse.
+
+        Returns:
+            list[str]: Names of partitions that were created by this call.
+        """
+        if conn is None:
+            async with asyncpg_connection() as conn:
+                return await self.ensure_partitions(months_ahead, conn)
+
+        created = []
+        current = month_start(datetime.utcnow().date())
+        for table, key in self.tables.items():
+            existing = {name for name, _ in await self.list_partitions(table, conn)}
+            for offset in range(months_ahead + 1):
+                start = add_months(current, offset)
+                name = partition_name(table, start)
+                if name in existing:
+                    continue
+                await self.create_partition(table, key, start, conn)
+                created.append(name)
+            # Created last, so the first run does not check the months above against it
+            await conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.schema}.{table}_default "
+                f"PARTITION OF {self.schema}.{table} DEFAULT"
+            )
+        return created
+
+    async def create_partition(self, table: str, key: str, start: date, conn) -> None:
+        """
+        Creates the partition of `table` for the month starting at `start`.
+
+        Creating a partition makes PostgreSQL check that the default partition
+        holds no rows in its range, and fails if it does. The default
+        partition only receives rows for months without a partition, so it is
+        normally empty and the check is free; if it does hold rows for the
+        month, it is detached, those rows are moved into the new partition,
+        and it is attached again, all in one transaction.
+        """
+        end = add_months(start, 1)
+        name = partition_name(table, start)
+        default = f"{self.schema}.{table}_default"
+        create = (
+            f"CREATE TABLE IF NOT EXISTS {self.schema}.{name} "
+            f"PARTITION OF {self.schema}.{table} "
+            f"FOR VALUES FROM ('{start}') TO ('{end}')"
+        )
+        async with conn.transaction():
+            has_default = await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", default)
+            stray = has_default and await conn.fetchval(
+                f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {key} >= $1 AND {key} < $2)", start, end
+            )
+            if not stray:
+                await conn.execute(create)
+                return
+            await conn.execute(f"ALTER TABLE {self.schema}.{table} DETACH PARTITION {default}")
+            await conn.execute(create)
+            moved = await conn.execute(
+                f"WITH moved AS (DELETE FROM {default} WHERE {key} >= $1 AND {key} < $2 RETURNING *) "
+                f"INSERT INTO {self.schema}.{name} SELECT * FROM moved",
+                start, end,
+            )
+            await conn.execute(f"ALTER TABLE {self.schema}.{table} ATTACH PARTITION {default} DEFAULT")
+        print(f"[PartitionManager] Moved {moved.split()[-1]} rows from {default} into {name}")
+
+    async def list_partitions(self, table: str, conn) -> list[tuple[str, date]]:
+        """
+        Lists the monthly partitions currently attached to `table`.
+
+        Returns:
+            list[tuple[str, date]]: (partition name, first day of its month), oldest first.
+        """
+        rows = await conn.fetch(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            JOIN pg_namespace ns ON ns.oid = parent.relnamespace
+            WHERE ns.nspname = $1 AND parent.relname = $2
+            """,
+            self.schema,
+            table,
+        )
+        partitions = []
+        for row in rows:
+            match = _PARTITION_SUFFIX.search(row["relname"])
+            if match:
+                partitions.append((row["relname"], date(int(match[1]), int(match[2]), 1)))
+        return sorted(partitions, key=lambda item: item[1])
+
+    async def drop_partitions_before(
+        self,
+        table: str,
+        cutoff: date,
+        archive_dir: Optional[str] = PARTITION_ARCHIVE_DIR,
+        conn=None,
+    ) -> list[str]:
+        """
+        Drops every partition of `table` whose month ends on or before `cutoff`.
+
+        When `archive_dir` is set, each partition is first streamed to
+        `<archive_dir>/<schema>.<partition>.csv.gz` with `COPY`; the partition is only
+        detached and dropped once the archive has been written.
+
+        Returns:
+            list[str]: Names of the dropped partitions.
+        """
+        if conn is None:
+            async with asyncpg_connection() as conn:
+                return await self.drop_partitions_before(table, cutoff, archive_dir, conn)
+
+        dropped = []
+        for name, month in await self.list_partitions(table, conn):
+            if add_months(month, 1) > cutoff:
+                break
+            if archive_dir:
+                await self.archive_partition(name, archive_dir, conn)
+            async with conn.transaction():
+                await conn.execute(f"ALTER TABLE {self.schema}.{table} DETACH PARTITION {self.schema}.{name}")
+                await conn.execute(f"DROP TABLE {self.schema}.{name}")
+            dropped.append(name)
+        return dropped
+
+    async def archive_partition(self, name: str, archive_dir: str, conn) -> str:
+        """
+        Streams a partition to `<archive_dir>/<schema>.<partition>.csv.gz`.
+
+        Returns:
+            str: Path of the written archive.
+        """
+        return await self._archive(
+            name,
+            archive_dir,
+            lambda output: conn.copy_from_table(name, schema_name=self.schema, output=output, format="csv", header=True),
+        )
+
+    async def purge_default_before(
+        self,
+        table: str,
+        cutoff: date,
+        archive_dir: Optional[str] = PARTITION_ARCHIVE_DIR,
+        conn=None,
+    ) -> int:
+        """
+        Deletes the rows of `table`'s default partition dated before `cutoff`.
+
+        Monthly partitions are dropped whole, but rows that landed in the
+        default partition would otherwise outlive retention. When
+        `archive_dir` is set they are first streamed to
+        `<archive_dir>/<schema>.<table>_default_before_<YYYY_MM>.csv.gz`. The
+        default partition is locked against inserts meanwhile, so nothing is
+        deleted without being archived.
+
+        Returns:
+            int: Number of deleted rows.
+        """
+        if conn is None:
+            async with asyncpg_connection() as conn:
+                return await self.purge_default_before(table, cutoff, archive_dir, conn)
+
+        key = self.tables[table]
+        default = f"{self.schema}.{table}_default"
+        expired = f"FROM {default} WHERE {key} < $1"
+        if not await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", default):
+            return 0
+        if not await conn.fetchval(f"SELECT EXISTS (SELECT 1 {expired})", cutoff):
+            return 0
+        async with conn.transaction():
+            await conn.execute(f"LOCK TABLE {default} IN SHARE ROW EXCLUSIVE MODE")
+            if archive_dir:
+                await self._archive(
+                    f"{table}_default_before_{cutoff:%Y_%m}",
+                    archive_dir,
+                    lambda output: conn.copy_from_query(f"SELECT * {expired}", cutoff, output=output, format="csv", header=True),
+                )
+            deleted = int((await conn.execute(f"DELETE {expired}", cutoff)).split()[-1])
+        print(f"[PartitionManager] Deleted {deleted} rows before {cutoff} from {default}")
+        return deleted
+
+    async def _archive(self, name: str, archive_dir: str, copy) -> str:
+        # `copy(output)` streams CSV chunks to `output`; the file only appears once complete
+        os.makedirs(archive_dir, exist_ok=True)
+        path = os.path.join(archive_dir, f"{self.schema}.{name}.csv.gz")
+        partial_path = f"{path}.partial"
+
+        with gzip.open(partial_path, "wb") as archive:
+            async def write(chunk: bytes):
+                await asyncio.to_thread(archive.write, chunk)
+
+            await copy(write)
+
+        os.replace(partial_path, path)
+        return path
+
+    async def apply_retention(
+        self,
+        retention_months: dict[str, int] = RETENTION_MONTHS,
+        archive_dir: Optional[str] = PARTITION_ARCHIVE_DIR,
+        conn=None,
+    ) -> dict[str, list[str]]:
+        """
+        Drops partitions older than each table's retention window, and
+        deletes rows older than it from the default partitions.
+
+        Args:
+            retention_months (dict[str, int]): Months to keep per table; 0 keeps everything.
+            archive_dir (Optional[str]): Directory to archive partitions into before dropping.
+
+        Returns:
+            dict[str, list[str]]: Dropped partition names per table.
+        """
+        if conn is None:
+            async with asyncpg_connection() as conn:
+                return await self.apply_retention(retention_months, archive_dir, conn)
+
+        current = month_start(datetime.utcnow().date())
+        dropped = {}
+        for table in self.tables:
+            months = retention_months.get(table, 0)
+            if months > 0:
+                cutoff = add_months(current, -months)
+                dropped[table] = await self.drop_partitions_before(table, cutoff, archive_dir, conn)
+                await self.purge_default_before(table, cutoff, archive_dir, conn)
+        return dropped
+
+
+partition_manager = PartitionManager()
+
+
+class PartitionMaintainer(PeriodicTask):
+    """
+    Periodically pre-creates partitions and applies retention on every database.
+
+    Only one worker does the work on each database per run; the others skip
+    it when they cannot take that database's advisory lock.
+    """
+
+    name = "PartitionMaintainer"
+
+    def __init__(self, manager: PartitionManager = partition_manager, interval: float = PARTITION_MAINTENANCE_INTERVAL):
+        super().__init__(interval)
+        self.manager = manager
+
+    async def ensure(self) -> list[str]:
+        """
+        Pre-creates upcoming partitions without applying retention.
+
+        Called at startup so a fresh database has partitions before the first insert.
+        """
+        created = []
+        for bind in shard_router.databases:
+            async with self._locked(bind) as conn:
+                if conn is not None:
+                    created += await self.manager.ensure_partitions(conn=conn)
+        return created
+
+    async def run_once(self) -> None:
+        for bind in shard_router.databases:
+            async with self._locked(bind) as conn:
+                if conn is None:
+                    continue
+                created = await self.manager.ensure_partitions(conn=conn)
+                dropped = await self.manager.apply_retention(conn=conn)
+
+            if created:
+                print(f"[PartitionMaintainer] Created partitions: {', '.join(created)}")
+            for table, names in dropped.items():
+                if names:
+                    print(f"[PartitionMaintainer] Dropped {table} partitions: {', '.join(names)}")
+
+    @asynccontextmanager
+    async def _locked(self, bind=None):
+        """Yields a connection to `bind` holding the maintenance lock, or None if another worker has it."""
+        async with asyncpg_connection(bind) as conn:
+            if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", PARTITION_MAINTENANCE_LOCK_ID):
+                yield None
+                return
+            try:
+                yield conn
+            finally:
+                await conn.execute("SELECT pg_advisory_unlock($1)", PARTITION_MAINTENANCE_LOCK_ID)
+
+
+partition_maintainer = PartitionMaintainer()
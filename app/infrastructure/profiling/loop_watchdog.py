@@ -0,0 +1,209 @@
+"""
+Event loop lag monitoring and blocked-loop reports.
+
+`LoopWatchdog` wakes every `LOOP_LAG_INTERVAL` seconds on the event loop and
+records how late it woke up in the ``event_loop_lag_seconds`` histogram.
+Each wake-up is also a heartbeat for a helper thread: when the loop has not
+beaten for `LOOP_BLOCK_THRESHOLD_MS` past its due time, something is blocking
+it, and the thread captures the loop thread's stack while it is still
+blocked. The report names the running task and the GraphQL operations in
+flight (see `app.graphql.in_flight`), so the innermost frame is the blocking
+call and the operation is the one that made it.
+
+For tests and benchmarks, `fail_on_slow_callbacks()` turns on asyncio debug
+mode and raises `SlowCallbackError` if any callback ran longer than a limit;
+setting `LOOP_SLOW_CALLBACK_MS` enables the same detection, reporting only,
+for the whole application.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from app.core import metrics
+from app.infrastructure.background import PeriodicTask
+
+LOOP_LAG_INTERVAL = float(os.environ.get("LOOP_LAG_INTERVAL", "0.1"))
+LOOP_BLOCK_THRESHOLD_MS = float(os.environ.get("LOOP_BLOCK_THRESHOLD_MS", "200"))
+LOOP_SLOW_CALLBACK_MS = os.environ.get("LOOP_SLOW_CALLBACK_MS")
+
+# Innermost frames included in a blocked-loop report
+REPORT_STACK_DEPTH = 30
+
+lag_seconds = metrics.histogram(
+    "event_loop_lag_seconds",
+    "Delay between when the watchdog was due to run on the event loop and when it ran.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+blocked_total = metrics.counter(
+    "event_loop_blocked_total", "Times the event loop was blocked for longer than the report threshold."
+)
+slow_callbacks_total = metrics.counter(
+    "event_loop_slow_callbacks_total", "Callbacks that ran longer than LOOP_SLOW_CALLBACK_MS (debug mode only)."
+)
+
+
+class LoopWatchdog(PeriodicTask):
+    """
+    Measures event loop lag and reports what is running when the loop blocks.
+
+    Args:
+        interval (float): Seconds between lag measurements.
+        block_threshold (float): Seconds past the due heartbeat after which a block is reported.
+    """
+
+    name = "LoopWatchdog"
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, block_threshold: float = LOOP_BLOCK_THRESHOLD_MS / 1000):
+        super().__init__(interval)
+        self.block_threshold = block_threshold
+        self.operations: "weakref.WeakKeyDictionary[asyncio.Task, str]" = weakref.WeakKeyDictionary()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._due: Optional[float] = None
+        self._heartbeat = time.monotonic()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def start(self) -> None:
+        """Starts the lag measurements and the watchdog thread."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        if LOOP_SLOW_CALLBACK_MS:
+            watch_slow_callbacks(self._loop, float(LOOP_SLOW_CALLBACK_MS))
+        super().start()
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._watch, name=self.name, daemon=True)
+            self._thread.start()
+
+    async def stop(self) -> None:
+        """Stops the watchdog thread and the lag measurements."""
+        self._stopping.set()
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+        await super().stop()
+        self._due = None
+
+    def operation_started(self, name: str) -> None:
+        """Records that the current task is executing GraphQL operation `name`."""
+        self.operations[asyncio.current_task()] = name
+
+    def operation_finished(self) -> None:
+        self.operations.pop(asyncio.current_task(), None)
+
+    async def run_once(self) -> None:
+        now = self._loop.time()
+        if self._due is not None:
+            lag_seconds.observe(max(0.0, now - self._due))
+        self._due = now + self.interval
+        self._heartbeat = time.monotonic()
+
+    def _watch(self) -> None:
+        reported = None
+        check_every = max(0.01, self.block_threshold / 2)
+        while not self._stopping.wait(check_every):
+            heartbeat = self._heartbeat
+            blocked_for = time.monotonic() - heartbeat - self.interval
+            if blocked_for < self.block_threshold or reported == heartbeat:
+                continue
+            reported = heartbeat
+            blocked_total.inc()
+            print(self._report(blocked_for))
+
+    def _report(self, blocked_for: float) -> str:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)[-REPORT_STACK_DEPTH:]) if frame is not None else "  (no frame)\n"
+        del frame
+        # asyncio.current_task() only works on the loop's own thread; this is the dict it reads
+        task = asyncio.tasks._current_tasks.get(self._loop)
+        task_name = task.get_name() if task is not None else "(no task: loop callback)"
+        try:
+            running = self.operations.get(task) if task is not None else None
+            in_flight = sorted(set(self.operations.values()))
+        except RuntimeError:
+            running, in_flight = None, []
+        operation = f"operation {running}" if running else f"operations in flight: {', '.join(in_flight) or 'none'}"
+        return (
+            f"[LoopWatchdog] Event loop blocked for {blocked_for * 1000:.0f} ms+ in task {task_name} ({operation}); "
+            f"loop thread stack:\n{stack}"
+        )
+
+
+class SlowCallbackError(AssertionError):
+    """Raised by `fail_on_slow_callbacks()` when callbacks exceeded the limit."""
+
+
+class _SlowCallbackHandler(logging.Handler):
+    # asyncio debug mode logs "Executing <handle> took 0.250 seconds" for slow callbacks
+    def __init__(self, collect: bool):
+        super().__init__(logging.WARNING)
+        self.collect = collect
+        self.slow: list[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if isinstance(record.msg, str) and record.msg.startswith("Executing "):
+            slow_callbacks_total.inc()
+            if self.collect:
+                self.slow.append(record.getMessage())
+
+
+def watch_slow_callbacks(loop: asyncio.AbstractEventLoop, limit_ms: float, collect: bool = False) -> _SlowCallbackHandler:
+    """
+    Enables asyncio debug mode on `loop` and counts every callback that runs longer than `limit_ms`.
+
+    asyncio also logs each one, with the callback, as a warning.
+
+    Args:
+        collect (bool): Also keep the messages in the handler's `slow` list.
+
+    Returns:
+        The installed logging handler.
+    """
+    loop.set_debug(True)
+    loop.slow_callback_duration = limit_ms / 1000
+    handler = _SlowCallbackHandler(collect)
+    logging.getLogger("asyncio").addHandler(handler)
+    return handler
+
+
+@asynccontextmanager
+async def fail_on_slow_callbacks(limit_ms: float):
+    """
+    Fails the enclosed code if any event loop callback took longer than `limit_ms`.
+
+    Example:
+        async with fail_on_slow_callbacks(50):
+            await client.post("/graphql", json=...)
+
+    Raises:
+        SlowCallbackError: On exit, listing the slow callbacks.
+    """
+    loop = asyncio.get_running_loop()
+    debug, duration = loop.get_debug(), loop.slow_callback_duration
+    handler = watch_slow_callbacks(loop, limit_ms, collect=True)
+    try:
+        # The loop decides whether to time a callback before running it, so
+        # start the enclosed code in a fresh callback that debug mode covers
+        await asyncio.sleep(0)
+        yield handler
+        # Let the loop finish (and time) the callback that ran the enclosed code
+        await asyncio.sleep(0)
+    finally:
+        logging.getLogger("asyncio").removeHandler(handler)
+        loop.set_debug(debug)
+        loop.slow_callback_duration = duration
+    if handler.slow:
+        raise SlowCallbackError(f"{len(handler.slow)} callbacks took longer than {limit_ms} ms:\n" + "\n".join(handler.slow))
+
+
+loop_watchdog = LoopWatchdog()
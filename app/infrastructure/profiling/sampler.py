@@ -0,0 +1,268 @@
+"""
+Low-overhead stack sampling of individual requests.
+
+While at least one request is being profiled, a daemon thread wakes every
+`PROFILE_SAMPLE_INTERVAL` seconds and reads the event loop thread's current
+stack with `sys._current_frames()`. Nothing is installed in the profiled code
+itself, so requests that are not profiled pay nothing but a task factory
+dictionary lookup.
+
+A sample is attributed to a profile when the task running at that moment is
+the request's task or a task it created (tracked through a task factory).
+Samples taken while the request is suspended, waiting on the database or
+behind other requests, are recorded as a single ``(waiting)`` frame, so a
+profile covers the request's wall-clock time.
+
+Finished profiles are kept in a bounded in-memory `ProfileStore` and can be
+rendered as collapsed stacks (for flamegraph.pl and similar tools) or as
+speedscope JSON.
+"""
+
+import asyncio
+import itertools
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import Counter, OrderedDict
+from typing import Optional
+
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get("PROFILE_SAMPLE_INTERVAL", "0.005"))
+PROFILE_MAX_SAMPLES = int(os.environ.get("PROFILE_MAX_SAMPLES", "20000"))
+PROFILE_STORE_SIZE = int(os.environ.get("PROFILE_STORE_SIZE", "50"))
+
+# Stand-in stack for samples taken while the profiled request was not running
+WAITING = (("(waiting)", "", 0),)
+
+# Frames up to and including the event loop's handle dispatch are the same for every sample
+_LOOP_DISPATCH = ("_run", os.path.join("asyncio", "events.py"))
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# Frame = (function, file, first line); a stack is a tuple of frames, root first
+Frame = tuple[str, str, int]
+
+
+def _short_path(filename: str) -> str:
+    marker = filename.rfind("site-packages" + os.sep)
+    if marker != -1:
+        return filename[marker + len("site-packages") + 1:]
+    if filename.startswith(_PROJECT_ROOT + os.sep):
+        return filename[len(_PROJECT_ROOT) + 1:]
+    return filename
+
+
+class Profile:
+    """The samples collected for one request."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, operation: str, method: str, path: str):
+        self.id = f"{int(time.time())}-{next(self._ids)}"
+        self.operation = operation
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self.duration: Optional[float] = None
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self.seconds: Counter = Counter()
+        self._started = time.perf_counter()
+
+    def add(self, stack: tuple[Frame, ...], elapsed: float) -> None:
+        """Records one sample standing for the `elapsed` seconds since the previous one."""
+        if self.samples < PROFILE_MAX_SAMPLES:
+            self.stacks[stack] += 1
+            self.seconds[stack] += elapsed
+            self.samples += 1
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self._started
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "operation": self.operation,
+            "method": self.method,
+            "path": self.path,
+            "started_at": self.started_at,
+            "duration_ms": None if self.duration is None else round(self.duration * 1000, 3),
+            "samples": self.samples,
+            "waiting_samples": self.stacks.get(WAITING, 0),
+        }
+
+    def collapsed(self) -> str:
+        """Renders the samples as collapsed stacks: ``frame;frame;frame count`` per line."""
+        lines = []
+        for stack, count in self.stacks.most_common():
+            labels = (name if not file else f"{name} ({file}:{line})" for name, file, line in stack)
+            lines.append(f"{';'.join(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> dict:
+        """
+        Renders the samples as a speedscope "sampled" profile.
+
+        Each sample is weighted by the wall-clock milliseconds since the
+        previous one, which can exceed the interval while the loop thread
+        holds the GIL.
+        """
+        frames: dict[Frame, int] = {}
+        samples, weights = [], []
+        for stack, seconds in self.seconds.items():
+            samples.append([frames.setdefault(frame, len(frames)) for frame in stack])
+            weights.append(round(seconds * 1000, 3))
+        total = sum(weights)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "exporter": "chrome-tour-api",
+            "name": f"{self.operation} ({self.id})",
+            "shared": {
+                "frames": [
+                    {"name": name, "file": file, "line": line} if file else {"name": name}
+                    for name, file, line in frames
+                ],
+            },
+            "profiles": [{
+                "type": "sampled",
+                "name": self.operation,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": total,
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+
+class StackSampler:
+    """
+    Samples the event loop thread on behalf of the requests being profiled.
+
+    `start()` and `stop()` must be called from the profiled request's task.
+    """
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._active: set[Profile] = set()
+        self._task_profiles: "weakref.WeakKeyDictionary[asyncio.Task, Profile]" = weakref.WeakKeyDictionary()
+        self._labels: dict = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread_id: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def active(self) -> int:
+        """Number of requests currently being profiled."""
+        return len(self._active)
+
+    def start(self, profile: Profile) -> None:
+        """Starts sampling for the current task and the tasks it creates."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._thread_id = loop, threading.get_ident()
+            self._install_task_factory(loop)
+        self._task_profiles[asyncio.current_task()] = profile
+        with self._lock:
+            self._active.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="StackSampler", daemon=True)
+                self._thread.start()
+
+    def stop(self, profile: Profile) -> None:
+        """Stops sampling for `profile` and records its duration."""
+        with self._lock:
+            self._active.discard(profile)
+        self._task_profiles.pop(asyncio.current_task(), None)
+        profile.finish()
+
+    def _install_task_factory(self, loop: asyncio.AbstractEventLoop) -> None:
+        # Tasks created by a profiled task belong to the same profile
+        previous = loop.get_task_factory()
+        task_profiles = self._task_profiles
+
+        def factory(loop, coro, **kwargs):
+            task = previous(loop, coro, **kwargs) if previous else asyncio.Task(coro, loop=loop, **kwargs)
+            if task_profiles:
+                parent = asyncio.current_task(loop)
+                profile = task_profiles.get(parent) if parent is not None else None
+                if profile is not None:
+                    task_profiles[task] = profile
+            return task
+
+        loop.set_task_factory(factory)
+
+    def _run(self) -> None:
+        # asyncio.current_task() only works on the loop's own thread; this is the dict it reads
+        current_tasks = asyncio.tasks._current_tasks
+        last = time.perf_counter()
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                profiles = list(self._active)
+
+            owner = None
+            task = current_tasks.get(self._loop)
+            if task is not None:
+                try:
+                    owner = self._task_profiles.get(task)
+                except Exception:
+                    owner = None
+            stack = None
+            if owner is not None:
+                frame = sys._current_frames().get(self._thread_id)
+                stack = self._stack(frame) if frame is not None else None
+                del frame
+            now = time.perf_counter()
+            for profile in profiles:
+                profile.add(stack if profile is owner and stack else WAITING, now - last)
+            last = now
+            time.sleep(self.interval)
+
+    def _stack(self, frame) -> tuple[Frame, ...]:
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                label = self._labels[code] = (code.co_name, _short_path(code.co_filename), code.co_firstlineno)
+            frames.append(label)
+            frame = frame.f_back
+        frames.reverse()
+        for index in range(len(frames) - 1, -1, -1):
+            name, file, _ = frames[index]
+            if name == _LOOP_DISPATCH[0] and file.endswith(_LOOP_DISPATCH[1]):
+                del frames[:index + 1]
+                break
+        return tuple(frames)
+
+
+class ProfileStore:
+    """The most recent finished profiles of this worker, oldest evicted first."""
+
+    def __init__(self, max_entries: int = PROFILE_STORE_SIZE):
+        self.max_entries = max_entries
+        self._profiles: "OrderedDict[str, Profile]" = OrderedDict()
+
+    def add(self, profile: Profile) -> None:
+        self._profiles[profile.id] = profile
+        while len(self._profiles) > self.max_entries:
+            self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        return self._profiles.get(profile_id)
+
+    def recent(self, operation: Optional[str] = None) -> list[Profile]:
+        """Returns the stored profiles, newest first, optionally only those of one operation."""
+        return [
+            profile for profile in reversed(self._profiles.values())
+            if operation is None or profile.operation == operation
+        ]
+
+
+stack_sampler = StackSampler()
+profile_store = ProfileStore()
@@ -0,0 +1,133 @@
+"""
+Incrementally maintained registration and verification counters.
+
+`registration_rollups` holds one row per hour x `registered_via` x referrer
+with the number of registrations in that hour and how many of those users
+have verified their email since, so verification rates are per registration
+cohort. Dashboards read these rows instead of grouping the users table.
+
+The request path only bumps in-memory counters from the `user_registered`
+and `user_verified` events; a background task upserts them every
+`ROLLUP_FLUSH_INTERVAL` seconds, adding to the stored counts, and the final
+flush runs at shutdown. Counts buffered in a worker that dies are lost;
+`app.tools.backfill_registration_rollups` recomputes any range exactly.
+"""
+
+import os
+from datetime import datetime
+from typing import Optional
+
+from app.database import asyncpg_connection
+from app.events.user_events import event_bus
+from app.infrastructure.background import PeriodicFlusher
+
+ROLLUP_FLUSH_INTERVAL = float(os.environ.get("ROLLUP_FLUSH_INTERVAL", "10.0"))
+ROLLUP_BATCH_SIZE = int(os.environ.get("ROLLUP_BATCH_SIZE", "1000"))
+
+# Dimension values longer than the columns are truncated; missing ones are stored as ''
+REGISTERED_VIA_LENGTH = 50
+REFERRER_LENGTH = 255
+
+RollupKey = tuple[datetime, str, str]
+
+
+def rollup_key(created_at: Optional[datetime], registered_via: Optional[str], referrer: Optional[str]) -> RollupKey:
+    """Returns the (hour, registered_via, referrer) bucket of a user."""
+    bucket = (created_at or datetime.utcnow()).replace(minute=0, second=0, microsecond=0, tzinfo=None)
+    return bucket, (registered_via or "")[:REGISTERED_VIA_LENGTH], (referrer or "")[:REFERRER_LENGTH]
+
+
+# Adds a batch of deltas to the stored counters; arrays are parallel columns
+UPSERT_SQL = """
+INSERT INTO {schema}.registration_rollups AS r (bucket, registered_via, referrer, registrations, verifications)
+SELECT * FROM unnest($1::timestamp[], $2::varchar[], $3::varchar[], $4::bigint[], $5::bigint[])
+ON CONFLICT (bucket, registered_via, referrer) DO UPDATE
+SET registrations = r.registrations + EXCLUDED.registrations,
+    verifications = r.verifications + EXCLUDED.verifications
+"""
+
+
+class RegistrationRollups(PeriodicFlusher):
+    """
+    Buffers registration and verification counts per bucket and adds them to the table in batches.
+
+    Buckets are written in key order so concurrent flushes from several
+    workers do not deadlock, and a failed flush keeps its deltas for the next one.
+    """
+
+    name = "RegistrationRollups"
+    schema = "chrome_users"
+
+    def __init__(self, flush_interval: float = ROLLUP_FLUSH_INTERVAL, batch_size: int = ROLLUP_BATCH_SIZE):
+        super().__init__(flush_interval)
+        self.batch_size = batch_size
+        self._pending: dict[RollupKey, list[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def record_registration(self, key: RollupKey) -> None:
+        self._pending.setdefault(key, [0, 0])[0] += 1
+
+    def record_verification(self, key: RollupKey) -> None:
+        self._pending.setdefault(key, [0, 0])[1] += 1
+
+    async def flush(self) -> None:
+        """Adds every buffered delta to `registration_rollups`."""
+        async with self.flush_lock:
+            pending, self._pending = self._pending, {}
+            rows = sorted(pending.items())
+            try:
+                async with asyncpg_connection() as conn:
+                    while rows:
+                        batch = rows[:self.batch_size]
+                        await conn.execute(
+                            UPSERT_SQL.format(schema=self.schema),
+                            [key[0] for key, _ in batch],
+                            [key[1] for key, _ in batch],
+                            [key[2] for key, _ in batch],
+                            [counts[0] for _, counts in batch],
+                            [counts[1] for _, counts in batch],
+                        )
+                        del rows[:self.batch_size]
+            finally:
+                # Put back whatever was not written, on top of deltas recorded during the flush
+                for key, (registrations, verifications) in rows:
+                    counts = self._pending.setdefault(key, [0, 0])
+                    counts[0] += registrations
+                    counts[1] += verifications
+
+
+# Per-worker counters, started and stopped with the application
+registration_rollups = RegistrationRollups()
+
+
+def register_rollup_handlers():
+    """
+    Registers the listeners that count registrations and verifications.
+    To be called once during application startup.
+    """
+
+    @event_bus.on("user_registered")
+    def count_registration(user):
+        """
+        Counts a new user in its registration bucket.
+
+        Args:
+            user (User): The newly registered user instance.
+        """
+        registration_rollups.record_registration(
+            rollup_key(user.created_at, user.registered_via, user.registration_referrer)
+        )
+
+    @event_bus.on("user_verified")
+    def count_verification(user):
+        """
+        Counts a verification in the bucket the user registered in.
+
+        Args:
+            user (User): The verified user instance.
+        """
+        registration_rollups.record_verification(
+            rollup_key(user.created_at, user.registered_via, user.registration_referrer)
+        )
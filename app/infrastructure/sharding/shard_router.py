@@ -0,0 +1,279 @@
+"""
+Hash-sharded user storage across several PostgreSQL databases.
+
+Each user lives on exactly one shard, chosen by a jump consistent hash of the
+user id, and every row keyed by that user (`CO_LOCATED_TABLES`, plus sessions
+and refresh tokens) lives on the same shard, so all single-user work stays on
+one node. Jump hashing keeps placement stable: growing from N to N+1 shards
+moves only about 1/(N+1) of the users.
+
+Shard 0 also holds the directory (`user_directory`), which allocates globally
+unique user ids, enforces username/email/phone uniqueness across shards and
+maps an email, username or phone number to its user id for lookups. Its `shard` column records
+where each user currently lives; `app.tools.rebalance_shards` moves users
+whose hashed shard has changed after the shard count changes.
+
+Shards are configured with ``SHARD_DATABASE_URLS`` (comma-separated, shard 0
+first). When it is unset there is a single shard, the application database,
+and the router adds no directory lookups or extra queries.
+
+Reference tables such as `roles` must be identical on every shard. Registration, user
+lookups, `allUsers`, profiles and role assignments are routed here. The role
+registry reads `roles` from the application database, and registration
+statistics and their rollups live only there by design: they are global
+counters, not per-user rows.
+
+Sign-in, token refresh and logout, verification, search and the prefix index,
+the audit, login attempt and activity writers, and the janitor and partition
+maintenance all go through the router as well, so every user-scoped row is
+read and written on its user's shard.
+"""
+
+import asyncio
+import hashlib
+import heapq
+import itertools
+import os
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from sqlalchemy import delete, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import DATABASE_URL, async_session, engine
+from app.models import UserDirectory
+
+SHARD_DATABASE_URLS = [
+    url.strip() for url in os.environ.get("SHARD_DATABASE_URLS", "").split(",") if url.strip()
+] or [DATABASE_URL]
+
+# Tables holding per-user rows, parents first: (table, user id column, surrogate
+# primary key re-assigned on the destination when a user moves, or None)
+CO_LOCATED_TABLES = (
+    ("users", "id", None),
+    ("user_profiles", "user_id", "id"),
+    ("user_profile_history", "user_id", "id"),
+    ("user_roles", "user_id", None),
+    ("user_logins", "user_id", "id"),
+    ("password_reset_tokens", "user_id", "id"),
+    ("authorization_codes", "user_id", "id"),
+    ("user_job_queue", "user_id", "id"),
+    ("login_attempt_logs", "user_id", "id"),
+    ("audit_logs", "user_id", "id"),
+)
+
+# Per-user tables whose ids are embedded in issued tokens; moving a user drops
+# them, so the user has to sign in again. Children first.
+SESSION_TABLES = ("refresh_tokens", "user_sessions")
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """
+    Jump consistent hash (Lamping & Veach) of a 64-bit key into `buckets` buckets.
+    """
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return b
+
+
+def shard_of(user_id: int, shard_count: int) -> int:
+    """Returns the shard a user belongs on when there are `shard_count` shards."""
+    if shard_count == 1:
+        return 0
+    key = int.from_bytes(hashlib.blake2b(user_id.to_bytes(8, "big", signed=True), digest_size=8).digest(), "big")
+    return jump_hash(key, shard_count)
+
+
+class DirectoryConflict(ValueError):
+    """Raised when a username or email is already taken on another shard."""
+
+    def __init__(self, fields: dict[str, str]):
+        super().__init__(", ".join(fields))
+        self.fields = fields
+
+
+class ShardRouter:
+    """
+    Routes user-scoped database work to the shard that owns the user.
+
+    Args:
+        urls (list[str]): Database URLs, shard 0 first. The application
+            database's existing engine is reused for its URL.
+    """
+
+    def __init__(self, urls: list[str] = SHARD_DATABASE_URLS):
+        self.urls = list(urls)
+        self.engines: list[AsyncEngine] = []
+        self.sessionmakers: list[sessionmaker] = []
+        for url in self.urls:
+            if url == DATABASE_URL:
+                self.engines.append(engine)
+                self.sessionmakers.append(async_session)
+            else:
+                shard_engine = create_async_engine(url, echo=os.environ.get("SQL_ECHO", "1") == "1")
+                self.engines.append(shard_engine)
+                self.sessionmakers.append(sessionmaker(bind=shard_engine, class_=AsyncSession, expire_on_commit=False))
+
+    @property
+    def count(self) -> int:
+        return len(self.engines)
+
+    @property
+    def sharded(self) -> bool:
+        """True when users are spread over more than one database."""
+        return self.count > 1
+
+    @property
+    def databases(self) -> list[AsyncEngine]:
+        """Every database: the shards, plus the application database if it is not one of them."""
+        return self.engines if engine in self.engines else [engine, *self.engines]
+
+    def shard_for(self, user_id: int) -> int:
+        return shard_of(user_id, self.count)
+
+    def engine_for(self, user_id: Optional[int]) -> AsyncEngine:
+        """
+        Returns the engine of the shard that owns `user_id`.
+
+        Rows that belong to no user, such as failed logins for unknown
+        accounts, go to shard 0.
+        """
+        return self.engines[0 if user_id is None else self.shard_for(user_id)]
+
+    def group_by_shard(self, user_ids: Iterable[int]) -> dict[int, list[int]]:
+        """Splits `user_ids` by owning shard, keeping their order within each shard."""
+        groups: dict[int, list[int]] = {}
+        for user_id in user_ids:
+            groups.setdefault(self.shard_for(user_id), []).append(user_id)
+        return groups
+
+    def session_for(self, user_id: int) -> AsyncSession:
+        """Opens a session on the shard that owns `user_id`."""
+        return self.sessionmakers[self.shard_for(user_id)]()
+
+    def session_on(self, shard: int) -> AsyncSession:
+        """Opens a session on shard number `shard`."""
+        return self.sessionmakers[shard]()
+
+    def directory_session(self) -> AsyncSession:
+        """Opens a session on shard 0, which holds the directory."""
+        return self.sessionmakers[0]()
+
+    async def locate(
+        self,
+        *,
+        email: Optional[str] = None,
+        username: Optional[str] = None,
+        phone_number: Optional[str] = None,
+    ) -> Optional[int]:
+        """
+        Resolves an email, username or phone number to a user id through the directory.
+
+        When several are given, a user matching any of them is returned, as
+        when signing in with an identifier that may be either. Only meaningful
+        when `sharded`; unsharded callers query the users table directly.
+        """
+        conditions = []
+        if email is not None:
+            conditions.append(UserDirectory.email_lower == email.lower())
+        if username is not None:
+            conditions.append(UserDirectory.username == username)
+        if phone_number is not None:
+            conditions.append(UserDirectory.phone_number == phone_number)
+        async with self.directory_session() as session:
+            return (await session.execute(
+                select(UserDirectory.user_id).where(or_(*conditions)).order_by(UserDirectory.user_id).limit(1)
+            )).scalar()
+
+    async def reserve(self, username: str, email: str, phone_number: Optional[str] = None) -> int:
+        """
+        Allocates a user id and claims `username`, `email` and `phone_number` across all shards.
+
+        Raises:
+            DirectoryConflict: If any of them is already taken.
+
+        Returns:
+            int: The new user's id; the user row must be inserted with it on `shard_for(id)`.
+        """
+        async with self.directory_session() as session:
+            condition = (UserDirectory.username == username) | (UserDirectory.email_lower == email.lower())
+            if phone_number:
+                condition |= UserDirectory.phone_number == phone_number
+            taken = (await session.execute(
+                select(UserDirectory.username, UserDirectory.email_lower, UserDirectory.phone_number).where(condition)
+            )).all()
+            conflicts = {}
+            for row in taken:
+                if row.username == username:
+                    conflicts["username"] = "Username is already taken."
+                if row.email_lower == email.lower():
+                    conflicts["email"] = "Email is already registered."
+                if phone_number and row.phone_number == phone_number:
+                    conflicts["phone_number"] = "Phone number is already in use."
+            if conflicts:
+                raise DirectoryConflict(conflicts)
+
+            entry = UserDirectory(username=username, email_lower=email.lower(), phone_number=phone_number or None, shard=0)
+            session.add(entry)
+            try:
+                await session.flush()
+            except IntegrityError:
+                raise DirectoryConflict({"username": "Username, email or phone number is already taken."})
+            entry.shard = self.shard_for(entry.user_id)
+            await session.commit()
+            return entry.user_id
+
+    async def release(self, user_id: int) -> None:
+        """Frees a reservation whose user row could not be created."""
+        async with self.directory_session() as session:
+            await session.execute(delete(UserDirectory).where(UserDirectory.user_id == user_id))
+            await session.commit()
+
+    async def scatter(self, work: Callable[[AsyncSession], Awaitable[Any]]) -> list[Any]:
+        """
+        Runs `work(session)` on every shard concurrently.
+
+        Returns:
+            list: One result per shard, in shard order.
+        """
+        async def run(maker: sessionmaker):
+            async with maker() as session:
+                return await work(session)
+
+        return list(await asyncio.gather(*(run(maker) for maker in self.sessionmakers)))
+
+    async def scatter_gather(self, statement, *, key: Callable[[Any], Any], limit: Optional[int] = None) -> list:
+        """
+        Runs a SELECT on every shard and merges the rows.
+
+        Each shard's rows must already be ordered by `key` (add the matching
+        ORDER BY, and a LIMIT of at most `limit`, to `statement`); they are
+        merged without re-sorting.
+
+        Args:
+            statement: SQLAlchemy selectable executed unchanged on each shard.
+            key (Callable): Sort key of a row, matching the statement's ORDER BY.
+            limit (Optional[int]): Maximum number of merged rows.
+        """
+        async def fetch(session: AsyncSession):
+            return (await session.execute(statement)).all()
+
+        per_shard = await self.scatter(fetch)
+        if len(per_shard) == 1:
+            rows = per_shard[0]
+            return rows if limit is None else rows[:limit]
+        merged = heapq.merge(*per_shard, key=key)
+        return list(merged if limit is None else itertools.islice(merged, limit))
+
+    async def dispose(self) -> None:
+        """Closes the connection pools of every shard except the application database's."""
+        for shard_engine in self.engines:
+            if shard_engine is not engine:
+                await shard_engine.dispose()
+
+
+shard_router = ShardRouter()
@@ -6,13 +6,43 @@ creates the database tables on startup, and registers event handlers such as
 sending emails after user registration.
 """
 
+import hashlib
+import os
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from strawberry.fastapi import GraphQLRouter
 
 from app.models import Base
 from app.database import engine
+from app.events.user_events import event_bus
 from app.graphql.schema import schema
+from app.api.users import router as users_router
+from app.api.profiles import router as profiles_router
+from app.graphql.context import get_context
 from app.infrastructure.email.email_service import register_event_handlers
+from app.core.cache.user_cache import register_cache_handlers
+from app.core.cache.data_versions import data_version_refresher, data_versions, register_data_version_handlers
+from app.core.cache.prefix_index import start_prefix_index, user_prefix_index_loader
+from app.infrastructure.audit.audit_writer import audit_writer
+from app.infrastructure.activity.activity_tracker import activity_tracker, register_activity_handlers
+from app.infrastructure.rollups.registration_rollups import register_rollup_handlers, registration_rollups
+from app.infrastructure.partitions.partition_manager import partition_maintainer
+from app.core.security.brute_force import brute_force_detector
+from app.core.security.tokens import revocation_set, revocation_refresher
+from app.core.security.captcha import captcha_audit_writer
+from app.core.security.permissions import role_registry, role_refresher, register_permission_handlers
+from app.infrastructure.maintenance.janitor import janitor
+from app.infrastructure.profiling.loop_watchdog import loop_watchdog
+from app.infrastructure.sharding.shard_router import shard_router
+from app.middleware.idempotency import IdempotencyMiddleware
+from app.middleware.conditional_get import ConditionalGetMiddleware
+from app.middleware.profiling import ProfilingMiddleware
+from app.middleware.deadline import DeadlineMiddleware
+from app.core.metrics import registry as metrics_registry
+
+# Seconds shutdown waits for running event handlers (e.g. emails) before cancelling them
+EVENT_DRAIN_TIMEOUT = float(os.environ.get("EVENT_DRAIN_TIMEOUT", "10"))
 
 # Initialize the FastAPI app
 app = FastAPI(
@@ -22,21 +52,110 @@ app = FastAPI(
 )
 
 # Mount the Strawberry GraphQL endpoint
-graphql_app = GraphQLRouter(schema)
+graphql_app = GraphQLRouter(schema, context_getter=get_context)
 app.include_router(graphql_app, prefix="/graphql")
 
+# REST fast path for hot user lookups
+app.include_router(users_router)
+
+# Captured request profiles (admin only)
+app.include_router(profiles_router)
+
+# Replay stored responses for retried mutations carrying an Idempotency-Key
+app.add_middleware(IdempotencyMiddleware)
+
+# ETags, 304s and persisted query hashes for GraphQL queries sent with GET
+app.add_middleware(ConditionalGetMiddleware, salt=hashlib.sha256(str(schema).encode()).hexdigest())
+
+# Per-request deadlines; cancels requests past their deadline or whose client disconnected
+app.add_middleware(DeadlineMiddleware)
+
+# Stack-sampling profiles of requests sent with X-Profile by an admin, or sampled at PROFILE_SAMPLE_RATE
+app.add_middleware(ProfilingMiddleware)
+
 # Startup event: Create database tables and register event listeners
 @app.on_event("startup")
 async def on_startup():
     """
     Tasks to run when the application starts:
     - Create database tables if they don't exist.
+    - Create upcoming partitions of the partitioned log tables.
     - Register user-related event handlers (e.g., email sending).
+    - Register identity cache invalidation handlers.
+    - Load the data versions used for GraphQL ETags and keep them refreshed.
+    - Start loading the optional username/email prefix index.
+    - Start the background audit log writer and partition maintenance.
+    - Register the login activity handler and start the activity tracker.
+    - Register the registration rollup handlers and start their writer.
+    - Reload the brute-force detector's failure windows.
+    - Load the access token revocation set and keep it refreshed.
+    - Load the role registry and register role mask invalidation handlers.
+    - Start the janitor that purges expired tokens and sessions.
+    - Start the optional captcha audit writer.
+    - Start the event loop lag watchdog.
     """
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    await partition_maintainer.ensure()
 
     register_event_handlers()  # 👈 Register email event listeners
+    register_cache_handlers()
+    try:
+        await data_versions.refresh()
+    except Exception as error:
+        print(f"[Startup] Data versions unavailable, GraphQL GET responses are not cacheable: {error}")
+    register_data_version_handlers()
+    data_version_refresher.start()
+    start_prefix_index()
+    audit_writer.start()
+    partition_maintainer.start()
+    register_activity_handlers()
+    activity_tracker.start()
+    register_rollup_handlers()
+    registration_rollups.start()
+    await brute_force_detector.start()
+    await revocation_set.refresh()
+    revocation_refresher.start()
+    await role_registry.load()
+    register_permission_handlers()
+    role_refresher.start()
+    janitor.start()
+    if captcha_audit_writer is not None:
+        captcha_audit_writer.start()
+    loop_watchdog.start()
+
+# Shutdown event: Flush buffered background work
+@app.on_event("shutdown")
+async def on_shutdown():
+    """
+    Tasks to run when the application stops:
+    - Let running event handlers finish (cancelling them after a timeout).
+    - Flush any audit events (and captcha audit rows) still held in memory.
+    - Flush buffered login and session activity and registration rollups.
+    - Stop partition maintenance.
+    - Flush queued login attempts.
+    - Stop refreshing the revocation set, the role registry and the data versions.
+    - Stop the janitor, the prefix index loader and the loop watchdog.
+    - Close the database connection pool.
+    """
+    cancelled = await event_bus.drain(EVENT_DRAIN_TIMEOUT)
+    if cancelled:
+        print(f"[Shutdown] Cancelled {cancelled} event handlers that did not finish in time")
+    await janitor.stop()
+    await loop_watchdog.stop()
+    await user_prefix_index_loader.stop()
+    await role_refresher.stop()
+    await data_version_refresher.stop()
+    await revocation_refresher.stop()
+    await partition_maintainer.stop()
+    await brute_force_detector.stop()
+    await audit_writer.stop()
+    await activity_tracker.stop()
+    await registration_rollups.stop()
+    if captcha_audit_writer is not None:
+        await captcha_audit_writer.stop()
+    await shard_router.dispose()
+    await engine.dispose()
 
 # Optional HTTP root endpoint for testing
 @app.get("/")
@@ -45,3 +164,11 @@ async def read_root():
     Returns a welcome message with instructions.
     """
     return {"message": "Welcome to the Chrome Tour API! Visit /graphql to start querying."}
+
+# Prometheus scrape endpoint for this worker's metrics
+@app.get("/metrics", response_class=PlainTextResponse)
+async def read_metrics():
+    """
+    Returns the worker's metrics in the Prometheus text format.
+    """
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
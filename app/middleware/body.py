@@ -0,0 +1,37 @@
+"""
+Request body helpers shared by the ASGI middlewares.
+"""
+
+
+async def read_body(receive) -> tuple[bytes, bool]:
+    """
+    Reads the whole request body.
+
+    Returns:
+        tuple[bytes, bool]: The body, and True if a non-http message (a
+        disconnect) interrupted it.
+    """
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            return b"".join(chunks), True
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks), False
+
+
+def replay_body(body: bytes, disconnected: bool, receive):
+    """Returns a `receive` callable that yields an already read body first, then defers to `receive`."""
+    sent = False
+
+    async def replay():
+        nonlocal sent
+        if not sent:
+            sent = True
+            if disconnected:
+                return {"type": "http.disconnect"}
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return replay
@@ -0,0 +1,290 @@
+"""
+HTTP caching for read-only GraphQL queries sent with GET.
+
+A GET request to `/graphql` whose operation is a query over
+`CACHEABLE_FIELDS` gets an ``ETag`` derived from the request (query, operation
+name, variables, Authorization header) and the current versions of the tables
+those fields read (see `app.core.cache.data_versions`). A request whose
+``If-None-Match`` matches is answered with 304 without executing anything, so
+an unchanged read costs one hash and a few version lookups. Successful
+responses carry ``Cache-Control`` (`GRAPHQL_GET_CACHE_CONTROL`, or
+`GRAPHQL_GET_PRIVATE_CACHE_CONTROL` when the request is authenticated) and
+``Vary: Authorization``; responses with errors get ``no-store``.
+
+Queries can be sent by hash using the automatic persisted query protocol
+(``extensions={"persistedQuery": {"version": 1, "sha256Hash": ...}}``): an
+unknown hash is answered with ``PersistedQueryNotFound``, and the client
+retries once with the query text, which registers it. Registered queries are
+kept per worker; `PERSISTED_QUERIES_FILE` (a JSON object of hash to query)
+preloads them in every worker.
+
+Fields answered from per-worker caches (single-user lookups, search) are not
+listed in `CACHEABLE_FIELDS`: those caches may lag a write made on another
+worker, which would pin the stale result under a fresh ETag.
+"""
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode
+
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    InlineFragmentNode,
+    OperationDefinitionNode,
+    OperationType,
+    parse,
+)
+
+from app.core import metrics
+from app.core.cache.data_versions import DataVersions, data_versions
+
+GRAPHQL_GET_CACHE_CONTROL = os.environ.get("GRAPHQL_GET_CACHE_CONTROL", "public, max-age=0, must-revalidate")
+GRAPHQL_GET_PRIVATE_CACHE_CONTROL = os.environ.get("GRAPHQL_GET_PRIVATE_CACHE_CONTROL", "private, max-age=0, must-revalidate")
+PERSISTED_QUERY_CACHE_SIZE = int(os.environ.get("PERSISTED_QUERY_CACHE_SIZE", "1000"))
+PERSISTED_QUERIES_FILE = os.environ.get("PERSISTED_QUERIES_FILE")
+
+# Top-level query fields whose results depend only on these tables and the caller
+CACHEABLE_FIELDS = {
+    "allUsers": ("users",),
+    "profile": ("user_profiles",),
+    "__typename": (),
+}
+
+conditional_get_total = metrics.counter(
+    "graphql_conditional_get_total", "GraphQL GET requests by caching outcome.", ("result",)
+)
+
+
+class PersistedQueries:
+    """
+    Size-bounded map of SHA-256 hash to query text for automatic persisted queries.
+
+    Preloaded queries are never evicted; registered ones are kept in LRU order.
+    """
+
+    def __init__(self, max_entries: int = PERSISTED_QUERY_CACHE_SIZE, path: Optional[str] = PERSISTED_QUERIES_FILE):
+        self.max_entries = max_entries
+        self._preloaded: dict[str, str] = {}
+        self._registered: "OrderedDict[str, str]" = OrderedDict()
+        if path:
+            with open(path, encoding="utf-8") as handle:
+                self._preloaded = {key.lower(): query for key, query in json.load(handle).items()}
+
+    def get(self, sha256_hash: str) -> Optional[str]:
+        query = self._preloaded.get(sha256_hash)
+        if query is None:
+            query = self._registered.get(sha256_hash)
+            if query is not None:
+                self._registered.move_to_end(sha256_hash)
+        return query
+
+    def register(self, sha256_hash: str, query: str) -> bool:
+        """
+        Stores `query` under `sha256_hash`.
+
+        Returns:
+            bool: False if the hash does not match the query.
+        """
+        if hashlib.sha256(query.encode()).hexdigest() != sha256_hash:
+            return False
+        if sha256_hash not in self._preloaded:
+            self._registered[sha256_hash] = query
+            self._registered.move_to_end(sha256_hash)
+            while len(self._registered) > self.max_entries:
+                self._registered.popitem(last=False)
+        return True
+
+
+persisted_queries = PersistedQueries()
+
+
+@lru_cache(maxsize=1024)
+def cacheable_tables(query: str, operation_name: Optional[str]) -> Optional[tuple[str, ...]]:
+    """
+    Returns the tables a query operation depends on, or None if it is not cacheable.
+
+    An operation is cacheable when it is a query and every top-level field,
+    including those inside fragments, is listed in `CACHEABLE_FIELDS`.
+    """
+    try:
+        document = parse(query)
+    except GraphQLError:
+        return None
+
+    operations = [node for node in document.definitions if isinstance(node, OperationDefinitionNode)]
+    fragments = {node.name.value: node for node in document.definitions if isinstance(node, FragmentDefinitionNode)}
+    if operation_name is not None:
+        operations = [node for node in operations if node.name is not None and node.name.value == operation_name]
+    if len(operations) != 1 or operations[0].operation != OperationType.QUERY:
+        return None
+
+    tables: set[str] = set()
+    pending, seen = list(operations[0].selection_set.selections), set()
+    while pending:
+        selection = pending.pop()
+        if isinstance(selection, FieldNode):
+            if selection.name.value not in CACHEABLE_FIELDS:
+                return None
+            tables.update(CACHEABLE_FIELDS[selection.name.value])
+        elif isinstance(selection, InlineFragmentNode):
+            pending.extend(selection.selection_set.selections)
+        elif isinstance(selection, FragmentSpreadNode):
+            fragment = fragments.get(selection.name.value)
+            if fragment is None:
+                return None
+            if selection.name.value not in seen:
+                seen.add(selection.name.value)
+                pending.extend(fragment.selection_set.selections)
+    return tuple(sorted(tables))
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of `etag` against an If-None-Match header value."""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+class ConditionalGetMiddleware:
+    """
+    ASGI middleware adding persisted queries, ETags and 304 responses to GraphQL GET requests.
+
+    Only GET requests to `path` are affected; everything else passes straight through.
+
+    Args:
+        app: The wrapped ASGI application.
+        salt (str): Mixed into every ETag; pass something that changes with
+            the schema so a deploy does not revalidate old response shapes.
+    """
+
+    def __init__(
+        self,
+        app,
+        salt: str = "",
+        versions: DataVersions = data_versions,
+        queries: PersistedQueries = persisted_queries,
+        path: str = "/graphql",
+    ):
+        self.app = app
+        self.salt = salt
+        self.versions = versions
+        self.queries = queries
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or scope["path"].rstrip("/") != self.path:
+            return await self.app(scope, receive, send)
+
+        params = dict(parse_qsl(scope["query_string"].decode("latin-1")))
+        persisted = _persisted_query(params.get("extensions"))
+        if persisted is not None:
+            if "query" in params:
+                if not self.queries.register(persisted, params["query"]):
+                    return await _graphql_error(send, 400, "provided sha does not match query", "INVALID_PERSISTED_QUERY")
+            else:
+                query = self.queries.get(persisted)
+                if query is None:
+                    return await _graphql_error(send, 200, "PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND")
+                params["query"] = query
+                scope = dict(scope, query_string=urlencode(params).encode("latin-1"))
+
+        query = params.get("query")
+        tables = cacheable_tables(query, params.get("operationName")) if query else None
+        versions = self.versions.get(tables) if tables is not None else None
+        if versions is None:
+            conditional_get_total.inc(result="uncacheable")
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        authorization = headers.get(b"authorization", b"")
+        variables = params.get("variables") or "{}"
+        try:
+            variables = json.dumps(json.loads(variables), sort_keys=True, separators=(",", ":"))
+        except ValueError:
+            pass
+        digest = hashlib.sha256(json.dumps(
+            [self.salt, query, params.get("operationName"), variables, authorization.decode("latin-1"), tables, versions]
+        ).encode()).hexdigest()[:32]
+        etag = f'"{digest}"'
+        cache_headers = [
+            (b"etag", etag.encode()),
+            (b"cache-control", (GRAPHQL_GET_PRIVATE_CACHE_CONTROL if authorization else GRAPHQL_GET_CACHE_CONTROL).encode()),
+            (b"vary", b"Authorization"),
+        ]
+
+        if_none_match = headers.get(b"if-none-match")
+        if if_none_match is not None and etag_matches(if_none_match.decode("latin-1"), etag):
+            conditional_get_total.inc(result="not_modified")
+            await send({"type": "http.response.start", "status": 304, "headers": cache_headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        start, chunks = None, []
+
+        async def buffer(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                return await send(message)
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            response_headers = [
+                (name, value) for name, value in start.get("headers", [])
+                if name.lower() not in (b"etag", b"cache-control", b"vary")
+            ]
+            if start["status"] == 200 and _succeeded(body):
+                conditional_get_total.inc(result="modified")
+                response_headers += cache_headers
+            else:
+                response_headers.append((b"cache-control", b"no-store"))
+            await send({**start, "headers": response_headers})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, buffer)
+
+
+def _persisted_query(extensions: Optional[str]) -> Optional[str]:
+    # Returns the requested persisted query hash, if any
+    if not extensions:
+        return None
+    try:
+        persisted = json.loads(extensions).get("persistedQuery")
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(persisted, dict) or not isinstance(persisted.get("sha256Hash"), str):
+        return None
+    return persisted["sha256Hash"].lower()
+
+
+def _succeeded(body: bytes) -> bool:
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return False
+    return isinstance(payload, dict) and not payload.get("errors")
+
+
+async def _graphql_error(send, status: int, message: str, code: str) -> None:
+    body = json.dumps({"errors": [{"message": message, "extensions": {"code": code}}]}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"cache-control", b"no-store"),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,156 @@
+"""
+Request deadlines and cancellation of abandoned requests.
+
+Every HTTP request runs under a deadline (see `app.core.deadline`). The budget
+is taken, in order, from the `REQUEST_TIMEOUT_HEADER` header (``X-Request-Timeout-Ms``,
+milliseconds, capped at `MAX_REQUEST_TIMEOUT_MS`), from
+`REQUEST_OPERATION_TIMEOUTS_MS` for the GraphQL operation name (a JSON object
+of operation name to milliseconds), or from `DEFAULT_REQUEST_TIMEOUT_MS`.
+
+The request is handled in its own task, which is cancelled as soon as the
+deadline passes or the client disconnects. Cancellation propagates into the
+resolver tasks it gathers and into asyncpg, which cancels the running query
+on the server, and the session's connection goes back to the pool instead of
+finishing queries nobody will read. A request cancelled at its deadline
+before responding gets a 504; a disconnected client gets nothing.
+
+The request body is read up front so the client connection can be watched for
+a disconnect while the request runs.
+"""
+
+import asyncio
+import json
+import os
+from contextlib import suppress
+from typing import Optional
+from urllib.parse import parse_qsl
+
+from app.core import metrics
+from app.core.deadline import deadline_after
+from app.middleware.body import read_body
+from app.middleware.profiling import operation_name
+
+REQUEST_TIMEOUT_HEADER = os.environ.get("REQUEST_TIMEOUT_HEADER", "x-request-timeout-ms").lower().encode("latin-1")
+DEFAULT_REQUEST_TIMEOUT_MS = float(os.environ.get("DEFAULT_REQUEST_TIMEOUT_MS", "30000"))
+MAX_REQUEST_TIMEOUT_MS = float(os.environ.get("MAX_REQUEST_TIMEOUT_MS", "60000"))
+REQUEST_OPERATION_TIMEOUTS_MS: dict[str, float] = json.loads(os.environ.get("REQUEST_OPERATION_TIMEOUTS_MS") or "{}")
+
+cancelled_total = metrics.counter(
+    "http_requests_cancelled_total", "Requests cancelled before completing, by reason.", ("reason",)
+)
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware that runs each HTTP request under a deadline and cancels it when it is abandoned.
+
+    Args:
+        app: The wrapped ASGI application.
+        default_ms (float): Budget of requests without a header or operation default.
+        max_ms (float): Upper bound for budgets requested in the header.
+        operation_ms (dict[str, float]): Budgets by GraphQL operation name.
+    """
+
+    def __init__(
+        self,
+        app,
+        default_ms: float = DEFAULT_REQUEST_TIMEOUT_MS,
+        max_ms: float = MAX_REQUEST_TIMEOUT_MS,
+        operation_ms: Optional[dict[str, float]] = None,
+        graphql_path: str = "/graphql",
+    ):
+        self.app = app
+        self.default_ms = default_ms
+        self.max_ms = max_ms
+        self.operation_ms = REQUEST_OPERATION_TIMEOUTS_MS if operation_ms is None else operation_ms
+        self.graphql_path = graphql_path
+
+    def budget(self, scope, body: bytes) -> float:
+        """Returns the request's budget in seconds."""
+        header = dict(scope["headers"]).get(REQUEST_TIMEOUT_HEADER)
+        if header is not None:
+            try:
+                return max(0.0, min(float(header), self.max_ms)) / 1000
+            except ValueError:
+                pass
+        if self.operation_ms and scope["path"].rstrip("/") == self.graphql_path:
+            if scope["method"] == "POST":
+                try:
+                    payload = json.loads(body)
+                except ValueError:
+                    payload = None
+            else:
+                payload = dict(parse_qsl(scope["query_string"].decode("latin-1")))
+            operation = operation_name(payload) if isinstance(payload, dict) else None
+            if operation in self.operation_ms:
+                return self.operation_ms[operation] / 1000
+        return self.default_ms / 1000
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        body, disconnected = await read_body(receive)
+        if disconnected:
+            cancelled_total.inc(reason="disconnect")
+            return
+        budget = self.budget(scope, body)
+        gone = asyncio.Event()
+        body_sent, started = False, False
+
+        async def app_receive():
+            # The body once, then only the disconnect seen by `watch()`
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await gone.wait()
+            return {"type": "http.disconnect"}
+
+        async def app_send(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        async def watch():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            gone.set()
+
+        with deadline_after(budget):
+            task = asyncio.create_task(self.app(scope, app_receive, app_send))
+        watcher = asyncio.create_task(watch())
+        try:
+            done, _ = await asyncio.wait({task, watcher}, timeout=budget, return_when=asyncio.FIRST_COMPLETED)
+            if task in done:
+                return task.result()
+            reason = "disconnect" if watcher in done else "deadline"
+            task.cancel()
+            with suppress(asyncio.CancelledError, Exception):
+                await task
+            cancelled_total.inc(reason=reason)
+            if reason == "deadline" and not started:
+                await _deadline_exceeded(send, scope["path"].rstrip("/") == self.graphql_path)
+        finally:
+            watcher.cancel()
+            if not task.done():
+                task.cancel()
+
+
+async def _deadline_exceeded(send, graphql: bool) -> None:
+    if graphql:
+        payload = {"errors": [{"message": "Request deadline exceeded.", "extensions": {"code": "DEADLINE_EXCEEDED"}}]}
+    else:
+        payload = {"detail": "Request deadline exceeded."}
+    body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 504,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"cache-control", b"no-store"),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,383 @@
+"""
+Idempotency keys for GraphQL mutations.
+
+Clients on unreliable networks retry mutations such as `registerUser` and
+`verifyUser`. When a mutation request carries an ``Idempotency-Key`` header, the
+first request with that key executes normally and its response is stored;
+retries with the same key and the same request body replay the stored response
+without touching the resolvers, so they cost no bcrypt hashing, uniqueness
+queries or inserts. Duplicates that arrive while the first request is still
+running wait for it instead of executing in parallel.
+
+Keys are scoped to the caller's Authorization header. Reusing a key with a
+different request body is rejected with 422, and a duplicate that waits longer
+than `IDEMPOTENCY_WAIT_SECONDS` receives 409. Responses with a 5xx status, or
+requests that fail or are cancelled, are not stored, so the next retry runs
+again.
+
+Stored responses live in an in-memory TTL store by default. Set
+``IDEMPOTENCY_STORE=postgres`` to share them between workers and hosts through
+the `idempotency_keys` table, whose expired rows the janitor purges.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from graphql import GraphQLError, OperationDefinitionNode, OperationType, parse
+
+from app.database import asyncpg_connection
+from app.middleware.body import read_body, replay_body
+
+IDEMPOTENCY_STORE = os.environ.get("IDEMPOTENCY_STORE", "memory")
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get("IDEMPOTENCY_WAIT_SECONDS", "30"))
+IDEMPOTENCY_LOCK_SECONDS = int(os.environ.get("IDEMPOTENCY_LOCK_SECONDS", "60"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.environ.get("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+IDEMPOTENCY_MAX_BODY_BYTES = int(os.environ.get("IDEMPOTENCY_MAX_BODY_BYTES", str(1024 * 1024)))
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyKeyMismatch(ValueError):
+    """Raised when a key is reused with a different request."""
+
+
+class IdempotencyKeyInProgress(RuntimeError):
+    """Raised when the request holding a key does not finish within the wait timeout."""
+
+
+@dataclass
+class StoredResponse:
+    """A completed HTTP response kept for replay."""
+    status: int
+    headers: list[tuple[str, str]]
+    body: bytes
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "response", "expires_at", "done")
+
+    def __init__(self, fingerprint: str, expires_at: float):
+        self.fingerprint = fingerprint
+        self.response: Optional[StoredResponse] = None
+        self.expires_at = expires_at
+        self.done = asyncio.Event()
+
+
+class IdempotencyStore:
+    """
+    In-memory TTL store of idempotent responses.
+
+    `claim()` either returns a stored response to replay or makes the caller
+    the owner of the key, who must then call `complete()` or `release()`.
+    Concurrent claims of a key that is being executed wait on the owner.
+    """
+
+    def __init__(
+        self,
+        ttl: int = IDEMPOTENCY_TTL_SECONDS,
+        lock_seconds: int = IDEMPOTENCY_LOCK_SECONDS,
+        max_entries: int = IDEMPOTENCY_MAX_ENTRIES,
+    ):
+        self.ttl = ttl
+        self.lock_seconds = lock_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+
+    async def claim(self, key: str, fingerprint: str, timeout: float = IDEMPOTENCY_WAIT_SECONDS) -> Optional[StoredResponse]:
+        """
+        Claims `key` for execution, or returns the response stored for it.
+
+        Args:
+            key (str): Scoped idempotency key.
+            fingerprint (str): Hash of the request; must match the one stored with the key.
+            timeout (float): Seconds to wait for a concurrent request holding the key.
+
+        Returns:
+            Optional[StoredResponse]: The response to replay, or None if the caller now owns the key.
+
+        Raises:
+            IdempotencyKeyMismatch: If the key was used for a different request.
+            IdempotencyKeyInProgress: If the key is still held after `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        while (entry := self._live(key)) is not None:
+            if entry.fingerprint != fingerprint:
+                raise IdempotencyKeyMismatch("Idempotency-Key was already used for a different request.")
+            if entry.response is not None:
+                return entry.response
+            try:
+                await asyncio.wait_for(entry.done.wait(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                raise IdempotencyKeyInProgress("A request with this Idempotency-Key is still in progress.")
+            # Completed: replay on the next pass. Released: claim it ourselves.
+
+        entry = _Entry(fingerprint, time.monotonic() + self.lock_seconds)
+        self._insert(key, entry)
+        try:
+            response = await self._claim_shared(key, fingerprint, deadline)
+        except BaseException:
+            self._finish(key, entry, None)
+            raise
+        if response is not None:
+            self._finish(key, entry, response)
+        return response
+
+    async def complete(self, key: str, response: StoredResponse) -> None:
+        """Stores the owner's response for replay and wakes waiting duplicates."""
+        entry = self._entries.get(key)
+        try:
+            await self._complete_shared(key, response)
+        finally:
+            if entry is not None:
+                self._finish(key, entry, response)
+
+    async def release(self, key: str) -> None:
+        """Gives up ownership without storing a response, so the next request executes."""
+        entry = self._entries.get(key)
+        try:
+            await self._release_shared(key)
+        finally:
+            if entry is not None:
+                self._finish(key, entry, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def _claim_shared(self, key: str, fingerprint: str, deadline: float) -> Optional[StoredResponse]:
+        return None
+
+    async def _complete_shared(self, key: str, response: StoredResponse) -> None:
+        pass
+
+    async def _release_shared(self, key: str) -> None:
+        pass
+
+    def _live(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            # An owner that never finished must not block the key forever
+            del self._entries[key]
+            entry.done.set()
+            return None
+        return entry
+
+    def _insert(self, key: str, entry: _Entry) -> None:
+        self._entries[key] = entry
+        now = time.monotonic()
+        while self._entries:
+            oldest_key, oldest = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_entries and oldest.expires_at > now:
+                break
+            del self._entries[oldest_key]
+            oldest.done.set()
+
+    def _finish(self, key: str, entry: _Entry, response: Optional[StoredResponse]) -> None:
+        if response is None:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+        else:
+            entry.response = response
+            entry.expires_at = time.monotonic() + self.ttl
+            if self._entries.get(key) is entry:
+                self._entries.move_to_end(key)
+        entry.done.set()
+
+
+class PostgresIdempotencyStore(IdempotencyStore):
+    """
+    Idempotency store shared through the `idempotency_keys` table.
+
+    The in-memory layer still coalesces duplicates within this process; only
+    the first local claimant talks to the database. Claims insert the key with
+    ``ON CONFLICT DO UPDATE ... WHERE`` the existing row has expired or its
+    owner's lock has lapsed, so exactly one request across all workers owns a
+    key at a time. Other workers poll the row until a response is stored.
+    """
+
+    schema = "chrome_users"
+
+    async def _claim_shared(self, key: str, fingerprint: str, deadline: float) -> Optional[StoredResponse]:
+        table = f"{self.schema}.idempotency_keys"
+        claim = (
+            f"INSERT INTO {table} AS k (key, fingerprint, locked_until, created_at, expires_at) "
+            "VALUES ($1, $2, $4, $3, $5) "
+            "ON CONFLICT (key) DO UPDATE SET fingerprint = EXCLUDED.fingerprint, status_code = NULL, "
+            "headers = NULL, body = NULL, locked_until = EXCLUDED.locked_until, "
+            "created_at = EXCLUDED.created_at, expires_at = EXCLUDED.expires_at "
+            "WHERE k.expires_at < $3 OR (k.status_code IS NULL AND k.locked_until < $3) "
+            "RETURNING true"
+        )
+        delay = 0.05
+        while True:
+            now = datetime.utcnow()
+            async with asyncpg_connection() as conn:
+                claimed = await conn.fetchval(
+                    claim, key, fingerprint, now, now + timedelta(seconds=self.lock_seconds), now + timedelta(seconds=self.ttl)
+                )
+                if claimed:
+                    return None
+                row = await conn.fetchrow(
+                    f"SELECT fingerprint, status_code, headers, body FROM {table} WHERE key = $1", key
+                )
+            if row is None:
+                continue
+            if row["fingerprint"] != fingerprint:
+                raise IdempotencyKeyMismatch("Idempotency-Key was already used for a different request.")
+            if row["status_code"] is not None:
+                headers = [tuple(header) for header in json.loads(row["headers"])]
+                return StoredResponse(row["status_code"], headers, bytes(row["body"]))
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise IdempotencyKeyInProgress("A request with this Idempotency-Key is still in progress.")
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.5)
+
+    async def _complete_shared(self, key: str, response: StoredResponse) -> None:
+        async with asyncpg_connection() as conn:
+            await conn.execute(
+                f"UPDATE {self.schema}.idempotency_keys "
+                "SET status_code = $2, headers = $3::jsonb, body = $4, locked_until = NULL, expires_at = $5 "
+                "WHERE key = $1",
+                key,
+                response.status,
+                json.dumps(response.headers),
+                response.body,
+                datetime.utcnow() + timedelta(seconds=self.ttl),
+            )
+
+    async def _release_shared(self, key: str) -> None:
+        async with asyncpg_connection() as conn:
+            await conn.execute(
+                f"DELETE FROM {self.schema}.idempotency_keys WHERE key = $1 AND status_code IS NULL", key
+            )
+
+
+idempotency_store = PostgresIdempotencyStore() if IDEMPOTENCY_STORE == "postgres" else IdempotencyStore()
+
+
+def is_mutation(body: bytes) -> bool:
+    """
+    Returns True if a GraphQL request body selects a mutation operation.
+
+    Bodies that are not valid GraphQL requests return False and are left for
+    the GraphQL endpoint to reject.
+    """
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return False
+    if not isinstance(payload, dict) or not isinstance(payload.get("query"), str):
+        return False
+    try:
+        document = parse(payload["query"])
+    except GraphQLError:
+        return False
+
+    operation_name = payload.get("operationName")
+    for definition in document.definitions:
+        if not isinstance(definition, OperationDefinitionNode):
+            continue
+        if operation_name is None or (definition.name is not None and definition.name.value == operation_name):
+            return definition.operation == OperationType.MUTATION
+    return False
+
+
+class IdempotencyMiddleware:
+    """
+    ASGI middleware applying `Idempotency-Key` semantics to GraphQL mutations.
+
+    Only POST requests to `path` that carry the header and select a mutation
+    are affected; everything else passes straight through.
+    """
+
+    def __init__(
+        self,
+        app,
+        store: IdempotencyStore = idempotency_store,
+        path: str = "/graphql",
+        wait_seconds: float = IDEMPOTENCY_WAIT_SECONDS,
+        max_body_bytes: int = IDEMPOTENCY_MAX_BODY_BYTES,
+    ):
+        self.app = app
+        self.store = store
+        self.path = path
+        self.wait_seconds = wait_seconds
+        self.max_body_bytes = max_body_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"].rstrip("/") != self.path:
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        raw_key = headers.get(IDEMPOTENCY_HEADER)
+        if raw_key is None:
+            return await self.app(scope, receive, send)
+
+        client_key = raw_key.decode("latin-1").strip()
+        if not client_key or len(client_key) > MAX_KEY_LENGTH:
+            return await _error(send, 400, f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters.")
+
+        body, more = await read_body(receive)
+        if more or not is_mutation(body):
+            return await self.app(scope, replay_body(body, more, receive), send)
+
+        caller = hashlib.sha256(headers.get(b"authorization", b"")).hexdigest()[:16]
+        key = f"{caller}:{client_key}"
+        fingerprint = hashlib.sha256(body).hexdigest()
+        try:
+            stored = await self.store.claim(key, fingerprint, self.wait_seconds)
+        except IdempotencyKeyMismatch as error:
+            return await _error(send, 422, str(error))
+        except IdempotencyKeyInProgress as error:
+            return await _error(send, 409, str(error))
+        if stored is not None:
+            return await _send_stored(send, stored)
+
+        start, chunks = None, []
+
+        async def capture(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_body(body, False, receive), capture)
+        except BaseException:
+            await asyncio.shield(self.store.release(key))
+            raise
+
+        response_body = b"".join(chunks)
+        if start is None or start["status"] >= 500 or len(response_body) > self.max_body_bytes:
+            await self.store.release(key)
+            return
+        stored_headers = [(name.decode("latin-1"), value.decode("latin-1")) for name, value in start.get("headers", [])]
+        await self.store.complete(key, StoredResponse(start["status"], stored_headers, response_body))
+
+
+async def _send_stored(send, stored: StoredResponse) -> None:
+    headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in stored.headers]
+    headers.append((b"idempotent-replayed", b"true"))
+    await send({"type": "http.response.start", "status": stored.status, "headers": headers})
+    await send({"type": "http.response.body", "body": stored.body})
+
+
+async def _error(send, status: int, message: str) -> None:
+    body = json.dumps({"errors": [{"message": message}]}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
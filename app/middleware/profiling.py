@@ -0,0 +1,108 @@
+"""
+Opt-in per-request profiling.
+
+A request is profiled when it carries the `PROFILE_HEADER` header (``X-Profile``)
+and an access token of a user holding `ADMIN_ROLE`, or when it is picked at
+random with probability `PROFILE_SAMPLE_RATE` (0 by default). At most
+`PROFILE_MAX_CONCURRENT` requests are profiled at once; others run normally.
+
+Profiled responses carry ``X-Profile-Id``; the profile can then be fetched
+from ``/debug/profiles/{id}`` as collapsed stacks or speedscope JSON, and
+``/debug/profiles`` lists recent profiles by GraphQL operation name (see
+`app.api.profiles`). Profiles are kept per worker.
+"""
+
+import json
+import os
+import random
+from urllib.parse import parse_qsl
+
+from graphql import GraphQLError, OperationDefinitionNode, parse
+
+from app.core.security.permissions import bearer_has_role
+from app.graphql.permissions import ADMIN_ROLE
+from app.infrastructure.profiling.sampler import Profile, ProfileStore, StackSampler, profile_store, stack_sampler
+from app.middleware.body import read_body, replay_body
+
+PROFILE_HEADER = os.environ.get("PROFILE_HEADER", "x-profile").lower().encode("latin-1")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_MAX_CONCURRENT = int(os.environ.get("PROFILE_MAX_CONCURRENT", "4"))
+
+
+def operation_name(payload: dict) -> str:
+    """Returns the name of the GraphQL operation a request payload selects, or ``anonymous``."""
+    if isinstance(payload.get("operationName"), str) and payload["operationName"]:
+        return payload["operationName"]
+    query = payload.get("query")
+    if isinstance(query, str):
+        try:
+            document = parse(query)
+        except GraphQLError:
+            return "invalid"
+        for definition in document.definitions:
+            if isinstance(definition, OperationDefinitionNode) and definition.name is not None:
+                return definition.name.value
+    return "anonymous"
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that samples the stacks of selected HTTP requests.
+
+    GraphQL requests (to `graphql_path`) are labelled with their operation
+    name, other requests with their method and path.
+    """
+
+    def __init__(
+        self,
+        app,
+        sampler: StackSampler = stack_sampler,
+        store: ProfileStore = profile_store,
+        sample_rate: float = PROFILE_SAMPLE_RATE,
+        max_concurrent: int = PROFILE_MAX_CONCURRENT,
+        graphql_path: str = "/graphql",
+    ):
+        self.app = app
+        self.sampler = sampler
+        self.store = store
+        self.sample_rate = sample_rate
+        self.max_concurrent = max_concurrent
+        self.graphql_path = graphql_path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.sampler.active >= self.max_concurrent:
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        if PROFILE_HEADER in headers:
+            authorization = headers.get(b"authorization", b"").decode("latin-1")
+            if not await bearer_has_role(authorization, ADMIN_ROLE):
+                return await self.app(scope, receive, send)
+        elif not (self.sample_rate and random.random() < self.sample_rate):
+            return await self.app(scope, receive, send)
+
+        operation = f"{scope['method']} {scope['path']}"
+        if scope["path"].rstrip("/") == self.graphql_path:
+            if scope["method"] == "POST":
+                body, disconnected = await read_body(receive)
+                receive = replay_body(body, disconnected, receive)
+                try:
+                    payload = json.loads(body)
+                except ValueError:
+                    payload = None
+            else:
+                payload = dict(parse_qsl(scope["query_string"].decode("latin-1")))
+            operation = operation_name(payload) if isinstance(payload, dict) else "invalid"
+
+        profile = Profile(operation, scope["method"], scope["path"])
+
+        async def tag(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile.id.encode())]}
+            await send(message)
+
+        self.sampler.start(profile)
+        try:
+            await self.app(scope, receive, tag)
+        finally:
+            self.sampler.stop(profile)
+            self.store.add(profile)
@@ -1,10 +1,11 @@
 # models.py
 
-from sqlalchemy import Column, Integer, String, Boolean, Text, TIMESTAMP, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, Text, TIMESTAMP, ForeignKey, LargeBinary
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import UniqueConstraint, Index, DDL, event, text
 
 Base = declarative_base()
 
@@ -24,14 +25,14 @@ class User(Base):
     phone_number = Column(String(20))
     password_hash = Column(Text)
     is_active = Column(Boolean, default=True)
-    is_deleted = Column(Boolean, default=False)
+    is_deleted = Column(Boolean, nullable=False, default=False, server_default=text('false'))
     last_login_ip = Column(String(45))
     created_at = Column(TIMESTAMP, default=func.now())
     updated_at = Column(TIMESTAMP, default=func.now(), onupdate=func.now())
     provider = Column(String(50))
     provider_user_id = Column(String(100))
     profile_picture_url = Column(String(255))
-    email_verified = Column(Boolean, default=False)
+    email_verified = Column(Boolean, nullable=False, default=False, server_default=text('false'))
     verification_code = Column(String(10))
     verification_attempts = Column(Integer, default=0)
     verification_code_sent_at = Column(TIMESTAMP)
@@ -77,27 +78,28 @@ class UserProfile(Base):
     bio = Column(Text)
     website = Column(String(255))
     social_links = Column(Text)
+    version = Column(Integer, nullable=False, default=0, server_default='0')
 
     user = relationship('User', back_populates='profile')
 
 
+# Change log of UserProfile, one row per profile version. Most rows are deltas
+# whose `changes` hold only the fields that version modified; every
+# PROFILE_CHECKPOINT_INTERVAL-th version is a checkpoint with the full profile.
 class UserProfileHistory(Base):
     __tablename__ = 'user_profile_history'
-    __table_args__ = {'schema': 'chrome_users'}
+    __table_args__ = (
+        UniqueConstraint('user_id', 'version', name='uq_user_profile_history_user_version'),
+        Index('ix_user_profile_history_checkpoints', 'user_id', 'updated_at', postgresql_where=text('is_checkpoint')),
+        {'schema': 'chrome_users'}
+    )
 
-    id = Column(Integer, primary_key=True)
+    id = Column(BigInteger, primary_key=True)
     user_id = Column(Integer, ForeignKey('chrome_users.users.id'), nullable=False)
-    first_name = Column(String(50))
-    last_name = Column(String(50))
-    date_of_birth = Column(TIMESTAMP)
-    gender = Column(String(10))
-    address = Column(Text)
-    country = Column(String(50))
-    timezone = Column(String(50))
-    bio = Column(Text)
-    website = Column(String(255))
-    social_links = Column(Text)
-    updated_at = Column(TIMESTAMP, default=func.now())
+    version = Column(Integer, nullable=False)
+    is_checkpoint = Column(Boolean, nullable=False, default=False)
+    changes = Column(JSONB, nullable=False)
+    updated_at = Column(TIMESTAMP, nullable=False, default=func.now())
 
     user = relationship('User', back_populates='profile_history')
 
@@ -109,7 +111,7 @@ class Role(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(50), unique=True, nullable=False, index=True)
     description = Column(Text)
-    is_deleted = Column(Boolean, default=False)
+    is_deleted = Column(Boolean, nullable=False, default=False, server_default=text('false'))
     created_at = Column(TIMESTAMP, default=func.now())
 
     users = relationship('UserRole', back_populates='role')
@@ -122,7 +124,7 @@ class UserRole(Base):
     user_id = Column(Integer, ForeignKey('chrome_users.users.id'), primary_key=True, index=True)
     role_id = Column(Integer, ForeignKey('chrome_users.roles.id'), primary_key=True, index=True)
     assigned_at = Column(TIMESTAMP, default=func.now())
-    is_deleted = Column(Boolean, default=False)
+    is_deleted = Column(Boolean, nullable=False, default=False, server_default=text('false'))
 
     user = relationship('User', back_populates='roles')
     role = relationship('Role', back_populates='users')
@@ -148,7 +150,7 @@ class PasswordResetToken(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('chrome_users.users.id'), index=True)
     token = Column(String(255), unique=True, index=True)
-    expires_at = Column(TIMESTAMP)
+    expires_at = Column(TIMESTAMP, index=True)
     used_at = Column(TIMESTAMP)
     created_at = Column(TIMESTAMP, default=func.now())
 
@@ -164,8 +166,10 @@ class UserSession(Base):
     device = Column(Text)
     user_agent = Column(Text)
     login_at = Column(TIMESTAMP, default=func.now())
-    expires_at = Column(TIMESTAMP)
-    revoked_at = Column(TIMESTAMP)
+    expires_at = Column(TIMESTAMP, index=True)
+    revoked_at = Column(TIMESTAMP, index=True)
+    # Written in batches by app.infrastructure.activity
+    last_seen_at = Column(TIMESTAMP)
     token_hash = Column(String(255), unique=True)
 
     user = relationship('User', back_populates='sessions')
@@ -180,7 +184,7 @@ class CaptchaChallenge(Base):
     challenge = Column(Text, nullable=False)
     solved = Column(Boolean, default=False)
     solved_at = Column(TIMESTAMP)
-    created_at = Column(TIMESTAMP, default=func.now())
+    created_at = Column(TIMESTAMP, default=func.now(), index=True)
 
 
 class RefreshToken(Base):
@@ -191,7 +195,7 @@ class RefreshToken(Base):
     user_id = Column(Integer, ForeignKey('chrome_users.users.id'), nullable=False, index=True)
     token = Column(String(255), unique=True, nullable=False, index=True)
     issued_at = Column(TIMESTAMP, default=func.now())
-    expires_at = Column(TIMESTAMP, nullable=False)
+    expires_at = Column(TIMESTAMP, nullable=False, index=True)
     revoked_at = Column(TIMESTAMP)
     created_by_ip = Column(String(45))
     replaced_by_token = Column(String(255))
@@ -209,7 +213,7 @@ class AuthorizationCode(Base):
     user_id = Column(Integer, ForeignKey('chrome_users.users.id'), nullable=False, index=True)
     code = Column(String(255), unique=True, nullable=False, index=True)
     redirect_uri = Column(Text)
-    expires_at = Column(TIMESTAMP)
+    expires_at = Column(TIMESTAMP, index=True)
     created_at = Column(TIMESTAMP, default=func.now())
 
     user = relationship('User', back_populates='authorization_codes')
@@ -217,12 +221,13 @@ class AuthorizationCode(Base):
 
 class LoginAttemptLog(Base):
     __tablename__ = 'login_attempt_logs'
-    __table_args__ = {'schema': 'chrome_users'}
+    # Monthly range partitions on attempted_at, managed by app.infrastructure.partitions
+    __table_args__ = {'schema': 'chrome_users', 'postgresql_partition_by': 'RANGE (attempted_at)'}
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     ip_address = Column(String(45), index=True)
     user_id = Column(Integer, ForeignKey('chrome_users.users.id'), nullable=True)
-    attempted_at = Column(TIMESTAMP, default=func.now())
+    attempted_at = Column(TIMESTAMP, primary_key=True, nullable=False, default=func.now(), server_default=func.now())
     was_successful = Column(Boolean)
     reason = Column(Text)
 
@@ -231,9 +236,10 @@ class LoginAttemptLog(Base):
 
 class AuditLog(Base):
     __tablename__ = 'audit_logs'
-    __table_args__ = {'schema': 'chrome_users'}
+    # Monthly range partitions on created_at, managed by app.infrastructure.partitions
+    __table_args__ = {'schema': 'chrome_users', 'postgresql_partition_by': 'RANGE (created_at)'}
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     user_id = Column(Integer, ForeignKey('chrome_users.users.id'), nullable=True)
     actor_id = Column(Integer, ForeignKey('chrome_users.users.id'), nullable=True)
     event_type = Column(String(50), nullable=False)
@@ -242,7 +248,7 @@ class AuditLog(Base):
     meta_info = Column(Text)
     ip_address = Column(String(45))
     user_agent = Column(Text)
-    created_at = Column(TIMESTAMP, default=func.now())
+    created_at = Column(TIMESTAMP, primary_key=True, nullable=False, default=func.now(), server_default=func.now())
 
     user = relationship('User', foreign_keys=[user_id], back_populates='audit_logs')
     actor = relationship('User', foreign_keys=[actor_id])
@@ -262,3 +268,78 @@ class UserJobQueue(Base):
     status = Column(String(20), default='pending')
 
     user = relationship('User', back_populates='background_jobs')
+
+
+
+class IdempotencyKey(Base):
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = {'schema': 'chrome_users'}
+
+    # Caller scope and client-supplied Idempotency-Key, see app.middleware.idempotency
+    key = Column(String(300), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    # Null while the first request is still executing
+    status_code = Column(Integer)
+    headers = Column(JSONB)
+    body = Column(LargeBinary)
+    locked_until = Column(TIMESTAMP)
+    created_at = Column(TIMESTAMP, default=func.now())
+    expires_at = Column(TIMESTAMP, nullable=False, index=True)
+
+
+class UserDirectory(Base):
+    __tablename__ = 'user_directory'
+    __table_args__ = (
+        UniqueConstraint('phone_number', name='uq_user_directory_phone_number'),
+        {'schema': 'chrome_users'}
+    )
+
+    # Global user id allocation and username/email/phone -> shard map; only
+    # shard 0's copy is used (see app.infrastructure.sharding)
+    user_id = Column(Integer, primary_key=True)
+    shard = Column(Integer, nullable=False)
+    username = Column(String(50), unique=True, nullable=False)
+    email_lower = Column(String(100), unique=True, nullable=False)
+    phone_number = Column(String(20))
+
+
+# Registration and verification counts per hour, signup channel and referrer,
+# maintained by app.infrastructure.rollups; verifications are counted in the
+# hour the user registered. Missing dimensions are stored as ''.
+class RegistrationRollup(Base):
+    __tablename__ = 'registration_rollups'
+    __table_args__ = {'schema': 'chrome_users'}
+
+    bucket = Column(TIMESTAMP, primary_key=True)
+    registered_via = Column(String(50), primary_key=True, server_default='')
+    referrer = Column(String(255), primary_key=True, server_default='')
+    registrations = Column(BigInteger, nullable=False, default=0, server_default='0')
+    verifications = Column(BigInteger, nullable=False, default=0, server_default='0')
+
+# Partial and expression indexes for hot predicates. The queries that rely on
+# them live in app/crud.py and must use exactly these predicates.
+Index('uq_users_email_lower', func.lower(User.email), unique=True)
+Index('ix_users_live_id', User.id, postgresql_where=text('is_deleted = false'))
+Index(
+    'ix_users_unverified_code_expiry',
+    User.verification_code_expires_at,
+    postgresql_where=text('email_verified = false AND is_deleted = false'),
+)
+Index('ix_user_sessions_live_user_id', UserSession.user_id, postgresql_where=text('revoked_at IS NULL'))
+Index('ix_user_roles_live_user_id', UserRole.user_id, postgresql_where=text('is_deleted = false'))
+Index('ix_user_job_queue_pending', UserJobQueue.scheduled_for, postgresql_where=text("status = 'pending'"))
+
+# Trigram indexes for fuzzy user search (see crud.select_user_search)
+event.listen(Base.metadata, 'before_create', DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+Index(
+    'ix_users_username_trgm',
+    func.lower(User.username).label('username_lower'),
+    postgresql_using='gin',
+    postgresql_ops={'username_lower': 'gin_trgm_ops'},
+)
+Index(
+    'ix_users_email_trgm',
+    func.lower(User.email).label('email_lower'),
+    postgresql_using='gin',
+    postgresql_ops={'email_lower': 'gin_trgm_ops'},
+)
@@ -1,8 +1,9 @@
-# schemas.py
+# schemas/api.py
 
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
 from typing import Optional, List
+from typing_extensions import TypedDict
 
 # User schema
 class UserBase(BaseModel):
@@ -25,6 +26,15 @@ class UserResponse(UserBase):
     class Config:
         orm_mode = True
 
+# Lean user representation served by the /v1/users lookup endpoints; a TypedDict so
+# it can be serialized straight from cached records without model validation
+class UserSummary(TypedDict):
+    id: int
+    username: str
+    email: str
+    is_active: bool
+    email_verified: bool
+
 # User MFA-related schemas
 class MfaCreate(BaseModel):
     secret: str
@@ -0,0 +1,39 @@
+"""
+GraphQL Input and Output Types for authentication operations.
+"""
+
+import strawberry
+from typing import Optional
+from app.schemas.user import UserType
+
+
+@strawberry.input
+class LoginInput:
+    """
+    GraphQL input type used to log in with a password.
+
+    Attributes:
+        identifier (str): The user's email address or username.
+        password (str): The user's password.
+        device (Optional[str]): Optional label for the device starting the session.
+    """
+    identifier: str
+    password: str
+    device: Optional[str] = None
+
+
+@strawberry.type
+class AuthPayload:
+    """
+    GraphQL output type returned after a successful login or token refresh.
+
+    Attributes:
+        access_token (str): Short-lived signed token to send as `Authorization: Bearer <token>`.
+        refresh_token (str): Opaque long-lived token used to obtain new access tokens.
+        expires_in (int): Lifetime of the access token in seconds.
+        user (UserType): The authenticated user.
+    """
+    access_token: str
+    refresh_token: str
+    expires_in: int
+    user: UserType
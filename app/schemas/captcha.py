@@ -0,0 +1,20 @@
+"""
+GraphQL Output Types for captcha challenges.
+"""
+
+import strawberry
+
+
+@strawberry.type
+class CaptchaChallengeType:
+    """
+    GraphQL type for an issued captcha challenge.
+
+    Attributes:
+        token (str): Signed challenge token to send back with the answer.
+        question (str): The question to show the user.
+        expires_at (int): Expiry of the challenge as a Unix timestamp.
+    """
+    token: str
+    question: str
+    expires_at: int
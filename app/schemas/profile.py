@@ -0,0 +1,62 @@
+"""
+GraphQL Input and Output Types for user profile operations.
+"""
+
+import strawberry
+from datetime import datetime
+from typing import Optional
+
+
+@strawberry.input
+class ProfileUpdateInput:
+    """
+    GraphQL input type used to update the caller's profile.
+
+    Omitted fields are left unchanged; fields passed as null are cleared.
+
+    Attributes:
+        first_name (Optional[str]): Given name.
+        last_name (Optional[str]): Family name.
+        date_of_birth (Optional[datetime]): Date of birth.
+        gender (Optional[str]): Gender, free-form.
+        address (Optional[str]): Postal address.
+        country (Optional[str]): Country name or code.
+        timezone (Optional[str]): IANA timezone, e.g. 'Europe/Berlin'.
+        bio (Optional[str]): Short biography.
+        website (Optional[str]): Personal website URL.
+        social_links (Optional[str]): Social profile links, free-form.
+    """
+    first_name: Optional[str] = strawberry.UNSET
+    last_name: Optional[str] = strawberry.UNSET
+    date_of_birth: Optional[datetime] = strawberry.UNSET
+    gender: Optional[str] = strawberry.UNSET
+    address: Optional[str] = strawberry.UNSET
+    country: Optional[str] = strawberry.UNSET
+    timezone: Optional[str] = strawberry.UNSET
+    bio: Optional[str] = strawberry.UNSET
+    website: Optional[str] = strawberry.UNSET
+    social_links: Optional[str] = strawberry.UNSET
+
+
+@strawberry.type
+class ProfileType:
+    """
+    GraphQL output type representing a user's profile at a given version.
+
+    Attributes:
+        user_id (int): The user the profile belongs to.
+        version (int): Profile version; incremented by every update.
+        first_name ... social_links: The profile fields, see `ProfileUpdateInput`.
+    """
+    user_id: int
+    version: int
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    date_of_birth: Optional[datetime] = None
+    gender: Optional[str] = None
+    address: Optional[str] = None
+    country: Optional[str] = None
+    timezone: Optional[str] = None
+    bio: Optional[str] = None
+    website: Optional[str] = None
+    social_links: Optional[str] = None
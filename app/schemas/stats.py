@@ -0,0 +1,54 @@
+"""
+GraphQL Input and Output Types for registration statistics.
+"""
+
+import strawberry
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+
+@strawberry.enum
+class RegistrationStatsGroupBy(Enum):
+    """
+    Dimensions registration statistics can be grouped by.
+
+    At most one of HOUR, DAY, WEEK and MONTH may be used; without any of them
+    each group covers the whole requested range.
+    """
+    HOUR = "hour"
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+    REGISTERED_VIA = "registered_via"
+    REFERRER = "referrer"
+
+
+# Group-by values that select a time period
+PERIOD_GROUPS = (
+    RegistrationStatsGroupBy.HOUR,
+    RegistrationStatsGroupBy.DAY,
+    RegistrationStatsGroupBy.WEEK,
+    RegistrationStatsGroupBy.MONTH,
+)
+
+
+@strawberry.type
+class RegistrationStatsType:
+    """
+    GraphQL output type representing registrations and verifications of one group.
+
+    Attributes:
+        period (Optional[datetime]): Start of the period (UTC), or null when not grouped by time.
+        registered_via (Optional[str]): Signup channel, or null when not grouped by it; '' if unknown.
+        referrer (Optional[str]): Referrer, or null when not grouped by it; '' if unknown.
+        registrations (int): Users who registered in the group.
+        verifications (int): How many of those users have verified their email.
+        verification_rate (Optional[float]): verifications / registrations, or null without registrations.
+    """
+    period: Optional[datetime]
+    registered_via: Optional[str]
+    referrer: Optional[str]
+    registrations: int
+    verifications: int
+    verification_rate: Optional[float]
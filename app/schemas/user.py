@@ -23,6 +23,8 @@ class UserRegisterInput:
         user_agent (Optional[str]): Device or browser metadata collected at registration.
         registered_via (Optional[str]): Source of registration, e.g., 'web', 'mobile'.
         registration_referrer (Optional[str]): Referring page or campaign, if applicable.
+        captcha_token (Optional[str]): Token of a challenge from `requestCaptcha`.
+        captcha_answer (Optional[str]): The user's answer to that challenge.
     """
     username: str
     email: str
@@ -32,6 +34,8 @@ class UserRegisterInput:
     user_agent: Optional[str] = None
     registered_via: Optional[str] = None
     registration_referrer: Optional[str] = None
+    captcha_token: Optional[str] = None
+    captcha_answer: Optional[str] = None
 
 
 @strawberry.input
@@ -0,0 +1,274 @@
+"""
+Pre-forking production server for the FastAPI application.
+
+The master process imports the application (schema, models, resolvers) once,
+binds the listening socket and forks the workers, so imported modules are shared
+copy-on-write. Each worker runs uvicorn on uvloop with the httptools parser and
+accepts connections from the shared socket.
+
+Workers are recycled (drained and replaced) after `max_requests` requests, with
+jitter so they do not all restart together, or once their resident memory
+exceeds `max_memory_mb`.
+
+Signals sent to the master:
+- SIGTERM / SIGINT: stop accepting, let every worker drain in-flight requests
+  and event handlers and close its database pool, then exit. Workers still
+  running after `graceful_timeout` are killed.
+- SIGHUP: gracefully replace every worker, e.g. after a deploy.
+
+A worker whose application startup fails (database unreachable, invalid
+configuration) is replaced after an exponentially growing delay, up to
+`SERVER_MAX_RESPAWN_DELAY` seconds. After `SERVER_MAX_STARTUP_FAILURES`
+consecutive startup failures the master stops the remaining workers and exits
+with a non-zero status instead of retrying forever.
+"""
+
+import os
+import random
+import resource
+import signal
+import socket
+import threading
+import time
+from typing import Optional
+
+SERVER_HOST = os.environ.get("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.environ.get("SERVER_PORT", "8000"))
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", str(os.cpu_count() or 1)))
+SERVER_BACKLOG = int(os.environ.get("SERVER_BACKLOG", "2048"))
+SERVER_MAX_REQUESTS = int(os.environ.get("SERVER_MAX_REQUESTS", "50000"))
+SERVER_MAX_REQUESTS_JITTER = int(os.environ.get("SERVER_MAX_REQUESTS_JITTER", "5000"))
+SERVER_MAX_MEMORY_MB = int(os.environ.get("SERVER_MAX_MEMORY_MB", "0"))
+SERVER_GRACEFUL_TIMEOUT = int(os.environ.get("SERVER_GRACEFUL_TIMEOUT", "30"))
+SERVER_MAX_STARTUP_FAILURES = int(os.environ.get("SERVER_MAX_STARTUP_FAILURES", "5"))
+SERVER_MAX_RESPAWN_DELAY = float(os.environ.get("SERVER_MAX_RESPAWN_DELAY", "30"))
+
+# Exit status of a worker whose application never finished starting up
+STARTUP_FAILURE_STATUS = 3
+
+# Seconds between resident memory checks in each worker
+MEMORY_CHECK_INTERVAL = 5.0
+
+
+def resident_memory_mb() -> float:
+    """Returns the current resident set size of this process in MiB."""
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        # Not Linux: fall back to the peak RSS (KiB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if peak > 2**32 else peak / 2**10
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    """Creates the listening socket shared by all workers."""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Worker:
+    """
+    One forked server process.
+
+    Runs uvicorn on the inherited socket until it is told to stop, reaches its
+    request limit or exceeds its memory limit, then exits.
+    """
+
+    def __init__(self, sock: socket.socket, max_requests: int, max_memory_mb: int, graceful_timeout: int):
+        self.sock = sock
+        self.max_requests = max_requests
+        self.max_memory_mb = max_memory_mb
+        self.graceful_timeout = graceful_timeout
+        self.started = False
+
+    def run(self) -> None:
+        import uvicorn
+        from app.main import app
+
+        config = uvicorn.Config(
+            app,
+            loop="uvloop",
+            http="httptools",
+            lifespan="on",
+            limit_max_requests=self.max_requests or None,
+            timeout_graceful_shutdown=self.graceful_timeout,
+            log_level="info",
+        )
+        server = uvicorn.Server(config)
+        if self.max_memory_mb:
+            threading.Thread(target=self._watch_memory, args=(server,), name="MemoryWatch", daemon=True).start()
+        server.run(sockets=[self.sock])
+        # uvicorn returns normally when the lifespan startup fails
+        self.started = server.started
+
+    def _watch_memory(self, server) -> None:
+        # uvicorn polls `should_exit`, so setting it from this thread triggers a graceful stop
+        while not server.should_exit:
+            time.sleep(MEMORY_CHECK_INTERVAL)
+            rss = resident_memory_mb()
+            if rss > self.max_memory_mb:
+                print(f"[Server] Worker {os.getpid()} uses {rss:.0f} MiB > {self.max_memory_mb} MiB; recycling")
+                server.should_exit = True
+
+
+class Master:
+    """
+    Forks and supervises `workers` worker processes sharing one socket.
+    """
+
+    def __init__(
+        self,
+        host: str = SERVER_HOST,
+        port: int = SERVER_PORT,
+        workers: int = SERVER_WORKERS,
+        backlog: int = SERVER_BACKLOG,
+        max_requests: int = SERVER_MAX_REQUESTS,
+        max_requests_jitter: int = SERVER_MAX_REQUESTS_JITTER,
+        max_memory_mb: int = SERVER_MAX_MEMORY_MB,
+        graceful_timeout: int = SERVER_GRACEFUL_TIMEOUT,
+        max_startup_failures: int = SERVER_MAX_STARTUP_FAILURES,
+        max_respawn_delay: float = SERVER_MAX_RESPAWN_DELAY,
+    ):
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers)
+        self.backlog = backlog
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.max_memory_mb = max_memory_mb
+        self.graceful_timeout = graceful_timeout
+        self.max_startup_failures = max_startup_failures
+        self.max_respawn_delay = max_respawn_delay
+        self.children: dict[int, float] = {}
+        self.stopping = False
+        self.startup_failures = 0
+        self._pending_spawns = 0
+        self._respawn_at = 0.0
+        self.sock: Optional[socket.socket] = None
+
+    def serve(self) -> int:
+        """
+        Runs the server until it is told to stop.
+
+        Returns:
+            int: Process exit status; 1 if workers kept failing to start.
+        """
+        # Import the application before forking so workers share it copy-on-write
+        import app.main  # noqa: F401
+
+        self.sock = bind_socket(self.host, self.port, self.backlog)
+        print(f"[Server] Master {os.getpid()} listening on {self.host}:{self.port} with {self.workers} workers")
+
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_reload)
+
+        for _ in range(self.workers):
+            self._spawn()
+        self._supervise()
+
+        self.sock.close()
+        if self.startup_failures >= self.max_startup_failures:
+            print(f"[Server] Master exiting after {self.startup_failures} consecutive worker startup failures")
+            return 1
+        print("[Server] Master exiting")
+        return 0
+
+    def _spawn(self) -> None:
+        jitter = random.randint(0, self.max_requests_jitter) if self.max_requests and self.max_requests_jitter else 0
+        worker = Worker(self.sock, self.max_requests + jitter, self.max_memory_mb, self.graceful_timeout)
+
+        pid = os.fork()
+        if pid:
+            self.children[pid] = time.monotonic()
+            return
+
+        # Child: restore default signal handling; uvicorn installs its own
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, signal.SIG_DFL)
+        status = 0
+        try:
+            worker.run()
+        except BaseException as error:
+            print(f"[Server] Worker {os.getpid()} crashed: {error!r}")
+            status = 1
+        finally:
+            os._exit(status if worker.started else STARTUP_FAILURE_STATUS)
+
+    def _supervise(self) -> None:
+        kill_at: Optional[float] = None
+        while self.children or (self._pending_spawns and not self.stopping):
+            if self._pending_spawns and not self.stopping and time.monotonic() >= self._respawn_at:
+                for _ in range(self._pending_spawns):
+                    self._spawn()
+                self._pending_spawns = 0
+            if self.stopping and kill_at is None:
+                kill_at = time.monotonic() + self.graceful_timeout + 5
+            if kill_at is not None and time.monotonic() >= kill_at:
+                print(f"[Server] Killing {len(self.children)} workers that did not drain in time")
+                self._signal_children(signal.SIGKILL)
+                kill_at = float("inf")
+
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid = 0
+            if pid == 0:
+                time.sleep(0.1)
+                continue
+
+            self.children.pop(pid, None)
+            if not self.stopping:
+                self._replace(pid, os.waitstatus_to_exitcode(status))
+
+    def _replace(self, pid: int, exit_code: int) -> None:
+        """Schedules a replacement for an exited worker, backing off while workers fail to start."""
+        if exit_code != STARTUP_FAILURE_STATUS:
+            self.startup_failures = 0
+            print(f"[Server] Worker {pid} exited ({exit_code}); starting a replacement")
+            self._pending_spawns += 1
+            return
+
+        self.startup_failures += 1
+        if self.startup_failures >= self.max_startup_failures:
+            print(f"[Server] Worker {pid} failed to start {self.startup_failures} times in a row; stopping")
+            self.stopping = True
+            self._signal_children(signal.SIGTERM)
+            return
+        delay = min(self.max_respawn_delay, 2 ** (self.startup_failures - 1))
+        print(f"[Server] Worker {pid} failed to start; starting a replacement in {delay:g}s")
+        self._pending_spawns += 1
+        self._respawn_at = max(self._respawn_at, time.monotonic() + delay)
+
+    def _signal_children(self, signum: int) -> None:
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                self.children.pop(pid, None)
+
+    def _on_stop(self, signum, frame) -> None:
+        if self.stopping:
+            return
+        print(f"[Server] Received {signal.Signals(signum).name}; draining workers")
+        self.stopping = True
+        # Workers close their own copies as they stop accepting
+        self.sock.close()
+        self._signal_children(signal.SIGTERM)
+
+    def _on_reload(self, signum, frame) -> None:
+        # Each worker drains and exits; the supervisor loop replaces it
+        print("[Server] Received SIGHUP; recycling workers")
+        self._signal_children(signal.SIGTERM)
+
+
+def serve(**options) -> int:
+    """Starts the pre-forking server; keyword options override the `SERVER_*` settings."""
+    return Master(**options).serve()
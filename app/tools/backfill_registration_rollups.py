@@ -0,0 +1,152 @@
+"""
+Recomputes `registration_rollups` from the users table.
+
+The application only adds registrations and verifications it sees as events,
+so the rollups have to be built once for existing users, and again for ranges
+where events were missed: users loaded by `app.tools.import_users`, counts
+buffered in a worker that died, or a flush that kept failing.
+
+The range is processed one window at a time. For each window the users that
+registered in it are counted per hour, signup channel and referrer on every
+shard, and the window's rollup rows are replaced with the result in one
+transaction, so re-running is safe. Deleted users still count: the rollups
+record registrations as they happened.
+
+Run it on closed hours. Events for users in a window that arrive while the
+window is being replaced (a registration in a still-open hour, or a late
+verification) can be counted twice or not at all; re-run that window later
+if that matters.
+
+Usage:
+    python -m app.tools.backfill_registration_rollups [--from 2026-01-01] [--to 2026-10-01] [--window-hours 24]
+
+``--from`` defaults to the first registration and ``--to`` to the start of the
+current hour; both are UTC and rounded down to the hour.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import asyncpg
+
+from app.database import DATABASE_URL
+from app.infrastructure.rollups.registration_rollups import REFERRER_LENGTH, REGISTERED_VIA_LENGTH
+from app.infrastructure.sharding.shard_router import SHARD_DATABASE_URLS
+from app.tools.rebalance_shards import driver_url
+
+SCHEMA = "chrome_users"
+
+COUNT_SQL = f"""
+SELECT date_trunc('hour', created_at) AS bucket,
+       coalesce(left(registered_via, {REGISTERED_VIA_LENGTH}), '') AS registered_via,
+       coalesce(left(registration_referrer, {REFERRER_LENGTH}), '') AS referrer,
+       count(*) AS registrations,
+       count(*) FILTER (WHERE email_verified) AS verifications
+FROM {SCHEMA}.users
+WHERE created_at >= $1 AND created_at < $2
+GROUP BY 1, 2, 3
+"""
+
+
+def floor_hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+async def count_window(shards: list[asyncpg.Connection], start: datetime, end: datetime) -> dict[tuple, list[int]]:
+    """Counts the registrations and verifications of [start, end) on every shard, per bucket."""
+    counts: dict[tuple, list[int]] = {}
+    for conn in shards:
+        for row in await conn.fetch(COUNT_SQL, start, end):
+            bucket = counts.setdefault((row["bucket"], row["registered_via"], row["referrer"]), [0, 0])
+            bucket[0] += row["registrations"]
+            bucket[1] += row["verifications"]
+    return counts
+
+
+async def replace_window(rollups: asyncpg.Connection, start: datetime, end: datetime, counts: dict[tuple, list[int]]) -> None:
+    """Replaces the rollup rows of [start, end) with `counts` in one transaction."""
+    rows = sorted(counts.items())
+    async with rollups.transaction():
+        await rollups.execute(
+            f"DELETE FROM {SCHEMA}.registration_rollups WHERE bucket >= $1 AND bucket < $2", start, end
+        )
+        if rows:
+            await rollups.execute(
+                f"""
+                INSERT INTO {SCHEMA}.registration_rollups (bucket, registered_via, referrer, registrations, verifications)
+                SELECT * FROM unnest($1::timestamp[], $2::varchar[], $3::varchar[], $4::bigint[], $5::bigint[])
+                """,
+                [key[0] for key, _ in rows],
+                [key[1] for key, _ in rows],
+                [key[2] for key, _ in rows],
+                [value[0] for _, value in rows],
+                [value[1] for _, value in rows],
+            )
+
+
+async def first_registration(shards: list[asyncpg.Connection]) -> Optional[datetime]:
+    found = [await conn.fetchval(f"SELECT min(created_at) FROM {SCHEMA}.users") for conn in shards]
+    found = [value for value in found if value is not None]
+    return min(found) if found else None
+
+
+async def run(args: argparse.Namespace) -> int:
+    """Runs the backfill described by the parsed command line arguments and returns the number of users counted."""
+    shards = [await asyncpg.connect(driver_url(url)) for url in SHARD_DATABASE_URLS]
+    rollups = await asyncpg.connect(driver_url(DATABASE_URL))
+    try:
+        start = args.start or await first_registration(shards)
+        if start is None:
+            print("[BackfillRollups] No users found")
+            return 0
+        start = floor_hour(start)
+        end = floor_hour(args.end or datetime.utcnow())
+        window = timedelta(hours=args.window_hours)
+
+        total = 0
+        started = time.perf_counter()
+        while start < end:
+            window_end = min(start + window, end)
+            counts = await count_window(shards, start, window_end)
+            await replace_window(rollups, start, window_end, counts)
+            total += sum(value[0] for value in counts.values())
+            elapsed = time.perf_counter() - started
+            print(f"[BackfillRollups] Up to {window_end:%Y-%m-%d %H:00}: {total} registrations ({elapsed:.1f}s)")
+            start = window_end
+        return total
+    finally:
+        await rollups.close()
+        for conn in shards:
+            await conn.close()
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.tools.backfill_registration_rollups", description="Recompute the registration rollups."
+    )
+    parser.add_argument("--from", dest="start", type=datetime.fromisoformat, help="First hour to recompute (UTC)")
+    parser.add_argument("--to", dest="end", type=datetime.fromisoformat, help="End of the range, exclusive (UTC)")
+    parser.add_argument("--window-hours", type=int, default=24, help="Hours recomputed per transaction")
+    args = parser.parse_args(argv)
+    for name in ("start", "end"):
+        value = getattr(args, name)
+        if value is not None and value.tzinfo is not None:
+            setattr(args, name, value.astimezone(timezone.utc).replace(tzinfo=None))
+    if args.window_hours < 1:
+        parser.error("--window-hours must be at least 1")
+    return args
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = parse_args(argv)
+    total = asyncio.run(run(args))
+    print(f"[BackfillRollups] Done: {total} registrations counted")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,436 @@
+"""
+Bulk import of users from a legacy system.
+
+Streams a CSV or NDJSON file in chunks and validates every record. Plaintext
+passwords are bcrypt-hashed across a process pool, and existing bcrypt hashes
+are passed through. Each chunk is loaded with ``COPY`` into a temporary staging
+table and merged into ``chrome_users.users`` in one transaction. Records that
+collide with existing users, or with each other, are written to a conflict
+report instead.
+
+After every committed chunk the number of consumed input records is written to
+a checkpoint file, and a re-run resumes from there. If the process dies between
+a commit and its checkpoint, the re-run reports that chunk's records as
+conflicts rather than importing them twice.
+
+Users are inserted straight into the application database, without going
+through the user directory or shard placement, so the tool refuses to run when
+``SHARD_DATABASE_URLS`` configures more than one shard. Imported users emit no
+registration events either: run ``python -m app.tools.backfill_registration_rollups``
+over their ``created_at`` range afterwards to bring the rollups up to date.
+
+Usage:
+    python -m app.tools.import_users users.csv [--format csv|ndjson] [--chunk-size 5000]
+        [--workers N] [--verified] [--checkpoint PATH] [--report PATH] [--restart]
+
+Input fields: ``username``, ``email`` (required), ``password`` or
+``password_hash`` (one required), and optionally ``phone_number``,
+``email_verified`` and ``created_at`` (ISO 8601, UTC).
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Iterator, NamedTuple, Optional, Union
+
+from passlib.hash import bcrypt
+
+from app.database import asyncpg_connection
+from app.infrastructure.sharding.shard_router import shard_router
+
+EMAIL_PATTERN = re.compile(r"[^@]+@[^@]+\.[^@]+")
+TRUE_VALUES = {"1", "true", "t", "yes", "y"}
+
+STAGING_TABLE = "import_users_staging"
+STAGING_COLUMNS = (
+    "record_no",
+    "username",
+    "email",
+    "phone_number",
+    "password_hash",
+    "email_verified",
+    "created_at",
+)
+
+
+class ImportRecord(NamedTuple):
+    """A validated input record, before password hashing."""
+    record_no: int
+    username: str
+    email: str
+    phone_number: Optional[str]
+    password: Optional[str]
+    password_hash: Optional[str]
+    email_verified: bool
+    created_at: Optional[datetime]
+
+
+class Rejection(NamedTuple):
+    """An input record that was not imported, and why."""
+    record_no: int
+    username: str
+    email: str
+    reason: str
+
+
+class ImportStats:
+    """Running totals of an import, persisted in the checkpoint."""
+
+    def __init__(self, records: int = 0, imported: int = 0, conflicts: int = 0, invalid: int = 0):
+        self.records = records
+        self.imported = imported
+        self.conflicts = conflicts
+        self.invalid = invalid
+
+    def as_dict(self) -> dict:
+        return {"records": self.records, "imported": self.imported, "conflicts": self.conflicts, "invalid": self.invalid}
+
+
+def _hash_passwords(passwords: list[str], rounds: int) -> list[str]:
+    """Runs in a pool worker: bcrypt-hashes a batch of plaintext passwords."""
+    hasher = bcrypt.using(rounds=rounds)
+    return [hasher.hash(password) for password in passwords]
+
+
+def read_records(path: str, fmt: str) -> Iterator[object]:
+    """
+    Yields raw input records, normally dicts.
+
+    An NDJSON line that is not valid JSON yields None, so it is rejected as
+    one invalid record instead of aborting the import.
+    """
+    with open(path, newline="", encoding="utf-8") as handle:
+        if fmt == "csv":
+            yield from csv.DictReader(handle)
+        else:
+            for line in handle:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        yield None
+
+
+def _text(raw: dict, field: str) -> Optional[str]:
+    """Returns a string field of a raw record, or None if it is missing."""
+    value = raw.get(field)
+    if value is not None and not isinstance(value, str):
+        raise TypeError(f"{field} is not a string")
+    return value
+
+
+def validate(record_no: int, raw: object) -> Union[ImportRecord, Rejection]:
+    """
+    Validates one raw input record with the same rules as registration.
+
+    Records that are not JSON objects, or whose text fields hold other types,
+    are rejected as ``invalid_record``.
+
+    Returns:
+        Union[ImportRecord, Rejection]: The cleaned record, or the reason it was rejected.
+    """
+    if not isinstance(raw, dict):
+        return Rejection(record_no, "", "", "invalid_record")
+    try:
+        username = (_text(raw, "username") or "").strip()
+        email = (_text(raw, "email") or "").strip()
+        phone_number = (_text(raw, "phone_number") or "").strip() or None
+        password = _text(raw, "password") or None
+        password_hash = _text(raw, "password_hash") or None
+    except TypeError:
+        return Rejection(record_no, str(raw.get("username") or ""), str(raw.get("email") or ""), "invalid_record")
+
+    def reject(reason: str) -> Rejection:
+        return Rejection(record_no, username, email, reason)
+
+    if not username or len(username) > 50:
+        return reject("invalid_username")
+    if not EMAIL_PATTERN.match(email) or len(email) > 100:
+        return reject("invalid_email")
+    if phone_number is not None and len(phone_number) > 20:
+        return reject("invalid_phone_number")
+    if password_hash is not None:
+        if not bcrypt.identify(password_hash):
+            return reject("unsupported_password_hash")
+        password = None
+    elif password is None:
+        return reject("missing_password")
+
+    created_at = raw.get("created_at") or None
+    if created_at is not None:
+        try:
+            created_at = datetime.fromisoformat(str(created_at))
+        except ValueError:
+            return reject("invalid_created_at")
+        if created_at.tzinfo is not None:
+            created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+    return ImportRecord(
+        record_no,
+        username,
+        email,
+        phone_number,
+        password,
+        password_hash,
+        str(raw.get("email_verified", "")).strip().lower() in TRUE_VALUES,
+        created_at,
+    )
+
+
+class UserImporter:
+    """
+    Imports users chunk by chunk, pipelining password hashing of the next
+    chunk with the database merge of the current one.
+    """
+
+    schema = "chrome_users"
+
+    def __init__(self, pool: ProcessPoolExecutor, workers: int, rounds: int, all_verified: bool):
+        self.pool = pool
+        self.workers = workers
+        self.rounds = rounds
+        self.all_verified = all_verified
+
+    async def prepare(self, chunk: list[tuple[int, object]]) -> tuple[list[tuple], list[Rejection]]:
+        """
+        Validates a chunk, drops in-chunk duplicates and hashes its passwords.
+
+        Returns:
+            tuple[list[tuple], list[Rejection]]: Staging rows and rejected records.
+        """
+        records: list[ImportRecord] = []
+        rejected: list[Rejection] = []
+        seen: set[tuple[str, str]] = set()
+        for record_no, raw in chunk:
+            result = validate(record_no, raw)
+            if isinstance(result, Rejection):
+                rejected.append(result)
+                continue
+            keys = {("username", result.username), ("email", result.email.lower())}
+            if result.phone_number:
+                keys.add(("phone_number", result.phone_number))
+            if keys & seen:
+                rejected.append(Rejection(record_no, result.username, result.email, "duplicate_in_input"))
+                continue
+            seen |= keys
+            records.append(result)
+
+        plaintext = [record.password for record in records if record.password is not None]
+        hashes = iter(await self._hash(plaintext))
+        rows = [
+            (
+                record.record_no,
+                record.username,
+                record.email,
+                record.phone_number,
+                record.password_hash if record.password is None else next(hashes),
+                record.email_verified or self.all_verified,
+                record.created_at,
+            )
+            for record in records
+        ]
+        return rows, rejected
+
+    async def _hash(self, passwords: list[str]) -> list[str]:
+        if not passwords:
+            return []
+        loop = asyncio.get_running_loop()
+        size = -(-len(passwords) // self.workers)
+        batches = [passwords[start:start + size] for start in range(0, len(passwords), size)]
+        results = await asyncio.gather(
+            *(loop.run_in_executor(self.pool, _hash_passwords, batch, self.rounds) for batch in batches)
+        )
+        return [password_hash for batch in results for password_hash in batch]
+
+    async def create_staging(self, conn) -> None:
+        """Creates the session-local staging table, emptied on every commit."""
+        await conn.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+                record_no bigint PRIMARY KEY,
+                username varchar(50) NOT NULL,
+                email varchar(100) NOT NULL,
+                phone_number varchar(20),
+                password_hash text NOT NULL,
+                email_verified boolean NOT NULL,
+                created_at timestamp
+            ) ON COMMIT DELETE ROWS
+        """)
+
+    async def merge(self, conn, rows: list[tuple]) -> tuple[int, list[Rejection]]:
+        """
+        Loads staging rows with COPY and inserts the non-conflicting ones.
+
+        Returns:
+            tuple[int, list[Rejection]]: Number of users inserted, and the conflicting records.
+        """
+        if not rows:
+            return 0, []
+        users = f"{self.schema}.users"
+        async with conn.transaction():
+            await conn.copy_records_to_table(STAGING_TABLE, columns=STAGING_COLUMNS, records=rows)
+            conflicts = await conn.fetch(f"""
+                SELECT record_no, username, email, reason FROM (
+                    SELECT s.record_no, s.username, s.email,
+                        CASE
+                            WHEN EXISTS (SELECT 1 FROM {users} u WHERE u.username = s.username) THEN 'username_taken'
+                            WHEN EXISTS (SELECT 1 FROM {users} u WHERE lower(u.email) = lower(s.email)) THEN 'email_taken'
+                            WHEN s.phone_number IS NOT NULL
+                                AND EXISTS (SELECT 1 FROM {users} u WHERE u.phone_number = s.phone_number) THEN 'phone_number_taken'
+                        END AS reason
+                    FROM {STAGING_TABLE} s
+                ) c
+                WHERE reason IS NOT NULL
+            """)
+            if conflicts:
+                await conn.execute(
+                    f"DELETE FROM {STAGING_TABLE} WHERE record_no = ANY($1::bigint[])",
+                    [row["record_no"] for row in conflicts],
+                )
+            # ON CONFLICT guards against users registered between the check and the insert
+            inserted = await conn.fetch(f"""
+                INSERT INTO {users} (
+                    username, email, phone_number, password_hash, is_active, is_deleted,
+                    email_verified, email_verified_at, registered_via, created_at, updated_at
+                )
+                SELECT username, email, phone_number, password_hash, email_verified, false,
+                    email_verified, CASE WHEN email_verified THEN now() END, 'import',
+                    COALESCE(created_at, now()), now()
+                FROM {STAGING_TABLE}
+                ORDER BY record_no
+                ON CONFLICT DO NOTHING
+                RETURNING username
+            """)
+
+        rejected = [Rejection(row["record_no"], row["username"], row["email"], row["reason"]) for row in conflicts]
+        if len(inserted) + len(conflicts) < len(rows):
+            # Staged usernames are unique, so they identify which rows lost a race
+            conflicting = {row["record_no"] for row in conflicts}
+            inserted_usernames = {row["username"] for row in inserted}
+            rejected.extend(
+                Rejection(record_no, username, email, "conflict_during_import")
+                for record_no, username, email, *_ in rows
+                if record_no not in conflicting and username not in inserted_usernames
+            )
+        return len(inserted), rejected
+
+
+def load_checkpoint(path: str, input_path: str) -> ImportStats:
+    """Reads the checkpoint for `input_path`, or returns empty stats if there is none."""
+    if not os.path.exists(path):
+        return ImportStats()
+    with open(path, encoding="utf-8") as handle:
+        data = json.load(handle)
+    if data.get("input") != os.path.abspath(input_path):
+        raise RuntimeError(f"Checkpoint {path} belongs to {data.get('input')}; use --restart to discard it.")
+    return ImportStats(**{key: data[key] for key in ImportStats().as_dict()})
+
+
+def save_checkpoint(path: str, input_path: str, stats: ImportStats) -> None:
+    """Atomically replaces the checkpoint file."""
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as handle:
+        json.dump({"input": os.path.abspath(input_path), **stats.as_dict()}, handle)
+    os.replace(temporary, path)
+
+
+async def run(args: argparse.Namespace) -> ImportStats:
+    """Runs the import described by the parsed command line arguments."""
+    if shard_router.sharded:
+        raise RuntimeError(
+            "Importing into a sharded deployment is not supported: users would bypass "
+            "the user directory and shard placement."
+        )
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    stats = load_checkpoint(args.checkpoint, args.input)
+    resumed_at = stats.records
+    if resumed_at:
+        print(f"[ImportUsers] Resuming after record {resumed_at}")
+
+    records = enumerate(read_records(args.input, args.format), start=1)
+    records = islice(records, resumed_at, None)
+
+    def next_chunk() -> list[tuple[int, object]]:
+        return list(islice(records, args.chunk_size))
+
+    started = time.perf_counter()
+    report_mode = "a" if resumed_at else "w"
+    with ProcessPoolExecutor(max_workers=args.workers) as pool, \
+            open(args.report, report_mode, newline="", encoding="utf-8") as report_file:
+        report = csv.writer(report_file)
+        if report_mode == "w":
+            report.writerow(["record_no", "username", "email", "reason"])
+
+        importer = UserImporter(pool, args.workers, args.bcrypt_rounds, args.verified)
+        async with asyncpg_connection() as conn:
+            await importer.create_staging(conn)
+
+            chunk = next_chunk()
+            preparing = asyncio.ensure_future(importer.prepare(chunk)) if chunk else None
+            while preparing is not None:
+                rows, invalid = await preparing
+                consumed = len(chunk)
+                chunk = next_chunk()
+                preparing = asyncio.ensure_future(importer.prepare(chunk)) if chunk else None
+
+                inserted, conflicts = await importer.merge(conn, rows)
+                report.writerows(invalid + conflicts)
+                report_file.flush()
+
+                stats.records += consumed
+                stats.imported += inserted
+                stats.invalid += len(invalid)
+                stats.conflicts += len(conflicts)
+                save_checkpoint(args.checkpoint, args.input, stats)
+
+                elapsed = time.perf_counter() - started
+                rate = (stats.records - resumed_at) / elapsed if elapsed else 0.0
+                print(
+                    f"[ImportUsers] {stats.records} read, {stats.imported} imported, "
+                    f"{stats.conflicts} conflicts, {stats.invalid} invalid ({rate:,.0f} records/s)"
+                )
+
+    return stats
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m app.tools.import_users", description="Bulk import users from CSV or NDJSON.")
+    parser.add_argument("input", help="Path to the CSV or NDJSON file")
+    parser.add_argument("--format", choices=("csv", "ndjson"), help="Input format (default: from the file extension)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Records per COPY/merge transaction")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Password hashing processes")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12, help="bcrypt cost for plaintext passwords")
+    parser.add_argument("--verified", action="store_true", help="Mark every imported user as verified and active")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <input>.checkpoint.json)")
+    parser.add_argument("--report", help="Conflict/rejection report (default: <input>.conflicts.csv)")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint and start over")
+    args = parser.parse_args(argv)
+    args.format = args.format or ("ndjson" if args.input.endswith((".ndjson", ".jsonl")) else "csv")
+    args.checkpoint = args.checkpoint or f"{args.input}.checkpoint.json"
+    args.report = args.report or f"{args.input}.conflicts.csv"
+    return args
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        stats = asyncio.run(run(args))
+    except RuntimeError as error:
+        print(f"[ImportUsers] {error}")
+        return 1
+    print(f"[ImportUsers] Done: {json.dumps(stats.as_dict())}; rejected records are listed in {args.report}")
+    if stats.imported:
+        print("[ImportUsers] Run `python -m app.tools.backfill_registration_rollups` to count the imported users in the registration rollups")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+Moves users to the shard their id hashes to under the configured shard count.
+
+Run it with the new ``SHARD_DATABASE_URLS`` before the application is
+restarted with them: the application routes by hash alone, so a user is only
+reachable once their rows have been moved.
+
+For every directory entry whose recorded shard differs from its hashed shard,
+the user's rows in `CO_LOCATED_TABLES` are copied to the destination with
+``COPY`` (surrogate ids are re-assigned there), the directory entry is
+updated, and the rows are deleted from the source. Any partial copy left on
+the destination by an interrupted run is removed first, so re-running is safe.
+Sessions and refresh tokens are not copied: moved users have to sign in again.
+Audit entries on the source where a moved user was the actor keep the entry
+but lose the actor reference.
+
+Every run first adds users missing from the directory, e.g. those registered
+while the application ran with a single database (which does not use the
+directory), recording the shard they were found on. Entries that already
+exist keep their shard, which registrations and moves maintain.
+
+Usage:
+    python -m app.tools.rebalance_shards [--dry-run] [--batch-size 500]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from typing import Optional
+
+import asyncpg
+
+from app.infrastructure.sharding.shard_router import CO_LOCATED_TABLES, SESSION_TABLES, SHARD_DATABASE_URLS, shard_of
+
+SCHEMA = "chrome_users"
+
+
+def driver_url(url: str) -> str:
+    """Strips the SQLAlchemy driver suffix so asyncpg accepts the URL."""
+    return url.replace("+asyncpg", "", 1)
+
+
+async def rebuild_directory(shards: list[asyncpg.Connection], batch_size: int) -> int:
+    """
+    Upserts a directory entry for every user on every shard and advances the id sequence past them.
+
+    The names and phone number of existing entries are refreshed but their
+    shard is kept: a user found on two shards is one whose move was
+    interrupted, and the recorded shard is the copy that is complete.
+
+    Returns:
+        int: Number of users found.
+    """
+    directory = shards[0]
+    total = 0
+    for shard, conn in enumerate(shards):
+        last_id = 0
+        while True:
+            rows = await conn.fetch(
+                f"SELECT id, username, lower(email), phone_number FROM {SCHEMA}.users "
+                f"WHERE id > $1 ORDER BY id LIMIT $2",
+                last_id, batch_size,
+            )
+            if not rows:
+                break
+            await directory.executemany(
+                f"""
+                INSERT INTO {SCHEMA}.user_directory (user_id, shard, username, email_lower, phone_number)
+                VALUES ($1, $2, $3, $4, $5)
+                ON CONFLICT (user_id) DO UPDATE
+                SET username = EXCLUDED.username, email_lower = EXCLUDED.email_lower, phone_number = EXCLUDED.phone_number
+                """,
+                [(row[0], shard, row[1], row[2], row[3]) for row in rows],
+            )
+            last_id = rows[-1][0]
+            total += len(rows)
+        print(f"[RebalanceShards] Directory: {total} users after shard {shard}")
+
+    await directory.execute(
+        f"""
+        SELECT setval(
+            pg_get_serial_sequence('{SCHEMA}.user_directory', 'user_id'),
+            COALESCE((SELECT max(user_id) FROM {SCHEMA}.user_directory), 0) + 1,
+            false
+        )
+        """
+    )
+    return total
+
+
+async def _columns(conn: asyncpg.Connection, table: str, skip: Optional[str]) -> list[str]:
+    rows = await conn.fetch(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = $1 AND table_name = $2 ORDER BY ordinal_position",
+        SCHEMA, table,
+    )
+    return [row[0] for row in rows if row[0] != skip]
+
+
+async def move_user(user_id: int, source: asyncpg.Connection, destination: asyncpg.Connection,
+                    directory: asyncpg.Connection, target: int, columns: dict[str, list[str]]) -> int:
+    """
+    Moves one user's rows from `source` to `destination` and repoints the directory.
+
+    Returns:
+        int: Number of rows copied.
+    """
+    copied = 0
+    async with destination.transaction():
+        for table, user_column, _ in reversed(CO_LOCATED_TABLES):
+            await destination.execute(f"DELETE FROM {SCHEMA}.{table} WHERE {user_column} = $1", user_id)
+        for table, user_column, _ in CO_LOCATED_TABLES:
+            names = columns[table]
+            records = await source.fetch(
+                f"SELECT {', '.join(names)} FROM {SCHEMA}.{table} WHERE {user_column} = $1", user_id
+            )
+            if records:
+                await destination.copy_records_to_table(table, records=records, columns=names, schema_name=SCHEMA)
+                copied += len(records)
+
+    await directory.execute(f"UPDATE {SCHEMA}.user_directory SET shard = $2 WHERE user_id = $1", user_id, target)
+
+    async with source.transaction():
+        await source.execute(f"UPDATE {SCHEMA}.audit_logs SET actor_id = NULL WHERE actor_id = $1", user_id)
+        for table in SESSION_TABLES:
+            await source.execute(f"DELETE FROM {SCHEMA}.{table} WHERE user_id = $1", user_id)
+        for table, user_column, _ in reversed(CO_LOCATED_TABLES):
+            await source.execute(f"DELETE FROM {SCHEMA}.{table} WHERE {user_column} = $1", user_id)
+    return copied
+
+
+async def run(args: argparse.Namespace) -> int:
+    """Runs the rebalance described by the parsed command line arguments and returns the number of users moved."""
+    shards = [await asyncpg.connect(driver_url(url)) for url in SHARD_DATABASE_URLS]
+    try:
+        count = len(shards)
+        directory = shards[0]
+        if not args.dry_run:
+            await rebuild_directory(shards, args.batch_size)
+
+        columns = {table: await _columns(directory, table, surrogate) for table, _, surrogate in CO_LOCATED_TABLES}
+        moved, copied, last_id = 0, 0, 0
+        started = time.perf_counter()
+        while True:
+            entries = await directory.fetch(
+                f"SELECT user_id, shard FROM {SCHEMA}.user_directory WHERE user_id > $1 ORDER BY user_id LIMIT $2",
+                last_id, args.batch_size,
+            )
+            if not entries:
+                break
+            last_id = entries[-1][0]
+            for user_id, current in entries:
+                target = shard_of(user_id, count)
+                if target == current:
+                    continue
+                if current >= count:
+                    print(f"[RebalanceShards] User {user_id} is on shard {current}, which is no longer configured; skipped")
+                    continue
+                moved += 1
+                if not args.dry_run:
+                    copied += await move_user(user_id, shards[current], shards[target], directory, target, columns)
+            elapsed = time.perf_counter() - started
+            verb = "to move" if args.dry_run else "moved"
+            print(f"[RebalanceShards] Up to user {last_id}: {moved} users {verb}, {copied} rows copied ({elapsed:.1f}s)")
+        return moved
+    finally:
+        for conn in shards:
+            await conn.close()
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m app.tools.rebalance_shards", description="Move users to their hashed shard.")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the users that would move")
+    parser.add_argument("--batch-size", type=int, default=500, help="Directory entries read per batch")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = parse_args(argv)
+    print(f"[RebalanceShards] {len(SHARD_DATABASE_URLS)} shards configured")
+    moved = asyncio.run(run(args))
+    print(f"[RebalanceShards] Done: {moved} users {'would move' if args.dry_run else 'moved'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Command line entry point: ``python -m benchmarks``.
+
+Examples:
+    python -m benchmarks --mix register=1,verify=1,all_users=8 --rate 100 --duration 60 --out bench.json
+    python -m benchmarks --baseline bench.json --max-regression 0.1
+    python -m benchmarks --transport http --url http://127.0.0.1:8000 --mix all_users=1
+    python -m benchmarks --mix register=1,user_graphql=5,user_rest=5  # GraphQL vs REST lookups
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+
+from benchmarks.runner import BenchConfig, compare, load_report, parse_mix, run_benchmark
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("--transport", choices=("asgi", "http"), default="asgi",
+                        help="Run the app in-process (asgi) or load a running server (http)")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Server URL for --transport http")
+    parser.add_argument("--mix", default="register=1,verify=1,all_users=8",
+                        help="Comma-separated scenario=weight pairs")
+    parser.add_argument("--rate", type=float, default=50.0, help="Arrivals per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds before the measurement")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the scenario mix")
+    parser.add_argument("--max-in-flight", type=int, default=2000,
+                        help="Arrivals beyond this many outstanding requests are dropped and counted")
+    parser.add_argument("--drain-timeout", type=float, default=60.0,
+                        help="Seconds to wait for outstanding requests after the last arrival; the rest time out")
+    parser.add_argument("--out", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="Compare against a previously saved JSON report")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="Fail if any scenario's p95 grows by more than this fraction over the baseline")
+
+    args = parser.parse_args(argv)
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as error:
+        parser.error(str(error))
+
+    config = BenchConfig(
+        mix=mix,
+        rate=args.rate,
+        duration=args.duration,
+        warmup=args.warmup,
+        transport=args.transport,
+        url=args.url,
+        seed=args.seed,
+        max_in_flight=args.max_in_flight,
+        drain_timeout=args.drain_timeout,
+    )
+    report = asyncio.run(run_benchmark(config))
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+
+    if args.baseline:
+        lines, regressed = compare(report, load_report(args.baseline), args.max_regression)
+        for line in lines:
+            print(f"[Benchmark] {line}")
+        if regressed:
+            print(f"[Benchmark] p95 regressed by more than {args.max_regression:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
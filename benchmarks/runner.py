@@ -0,0 +1,278 @@
+"""
+Open-loop load generator and report builder.
+
+Requests are started on a fixed schedule (`rate` per second) whatever the
+state of earlier requests. Latency is measured from each request's scheduled
+start, so queueing delay inside the app counts against it instead of slowing
+the generator down (no coordinated omission). Requests still running
+`drain_timeout` seconds after the last arrival are cancelled and reported as
+timed out, and throughput is measured up to the later of the last scheduled
+arrival and the last completion, so the drain does not dilute it.
+
+In ``asgi`` mode the app runs in-process behind httpx's `ASGITransport`, and
+every SQL statement that goes through the SQLAlchemy engine is attributed to
+the scenario that issued it. Driver-level work (COPY writers, raw asyncpg
+connections) is not counted. In ``http`` mode the app runs elsewhere and
+query counts are not available.
+"""
+
+import asyncio
+import contextvars
+import json
+import math
+import os
+import random
+import secrets
+import subprocess
+import time
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from typing import Optional
+
+import httpx
+
+from benchmarks.scenarios import SCENARIOS, BenchContext, ScenarioSkipped
+from benchmarks.smtp_sink import SmtpSink
+
+# Per-operation SQL statement counter, set around each scenario call
+_query_counter: contextvars.ContextVar[Optional[list[int]]] = contextvars.ContextVar("bench_query_counter", default=None)
+
+
+@dataclass
+class BenchConfig:
+    """Parameters of one benchmark run."""
+    mix: dict[str, float]
+    rate: float = 50.0
+    duration: float = 30.0
+    warmup: float = 5.0
+    transport: str = "asgi"
+    url: str = "http://127.0.0.1:8000"
+    seed: int = 1
+    max_in_flight: int = 2000
+    drain_timeout: float = 60.0
+
+
+@dataclass
+class EndpointStats:
+    """Samples collected for one scenario."""
+    latencies: list[float] = field(default_factory=list)
+    queries: list[int] = field(default_factory=list)
+    errors: int = 0
+    skipped: int = 0
+    timed_out: int = 0
+    error_samples: list[str] = field(default_factory=list)
+
+
+def percentile(sorted_values: list[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    """Parses ``name=weight,name=weight`` into a scenario mix."""
+    mix = {}
+    for part in filter(None, (item.strip() for item in text.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _install_query_counter(engine) -> None:
+    from sqlalchemy import event
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        counter = _query_counter.get()
+        if counter is not None:
+            counter[0] += 1
+
+
+async def run_benchmark(config: BenchConfig) -> dict:
+    """
+    Runs one benchmark and returns its JSON-serialisable report.
+
+    Args:
+        config (BenchConfig): Mix, arrival rate, duration and transport.
+    """
+    run_id = secrets.token_hex(3)
+    sink = None
+    async with AsyncExitStack() as stack:
+        if config.transport == "asgi":
+            sink = SmtpSink().start()
+            stack.callback(sink.stop)
+            # Must be set before the app (and its email service) is imported
+            os.environ.update({
+                "SMTP_HOST": str(sink.host),
+                "SMTP_PORT": str(sink.port),
+                "SMTP_USE_SSL": "0",
+                "EMAIL_FROM": os.environ.get("EMAIL_FROM", "bench@bench.invalid"),
+                "EMAIL_FROM_PASSWORD": os.environ.get("EMAIL_FROM_PASSWORD", "bench"),
+            })
+            os.environ.setdefault("SQL_ECHO", "0")
+            from app.main import app
+            from app.database import engine
+
+            _install_query_counter(engine)
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            transport = httpx.ASGITransport(app=app)
+            client = httpx.AsyncClient(transport=transport, base_url="http://bench")
+        else:
+            client = httpx.AsyncClient(base_url=config.url, timeout=30.0)
+        await stack.enter_async_context(client)
+
+        context = BenchContext(sink, run_id)
+        stats = {name: EndpointStats() for name in config.mix}
+        names, weights = list(config.mix), list(config.mix.values())
+        chooser = random.Random(config.seed)
+        in_flight: set[asyncio.Task] = set()
+        dropped = 0
+        last_completed: Optional[float] = None
+
+        async def one(name: str, scheduled: float, record: bool) -> None:
+            nonlocal last_completed
+            counter = [0]
+            token = _query_counter.set(counter)
+            try:
+                await SCENARIOS[name](client, context)
+            except asyncio.CancelledError:
+                # Still running at the end of the drain
+                if record:
+                    stats[name].timed_out += 1
+                raise
+            except ScenarioSkipped:
+                if record:
+                    stats[name].skipped += 1
+                return
+            except Exception as error:
+                if record:
+                    stats[name].errors += 1
+                    if len(stats[name].error_samples) < 5:
+                        stats[name].error_samples.append(str(error)[:200])
+                    last_completed = time.perf_counter()
+                return
+            finally:
+                _query_counter.reset(token)
+            if record:
+                last_completed = time.perf_counter()
+                stats[name].latencies.append(last_completed - scheduled)
+                stats[name].queries.append(counter[0])
+
+        interval = 1.0 / config.rate
+        total = int((config.warmup + config.duration) * config.rate)
+        start = time.perf_counter()
+        measure_from = start + config.warmup
+        for index in range(total):
+            scheduled = start + index * interval
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(in_flight) >= config.max_in_flight:
+                dropped += 1
+                continue
+            task = asyncio.ensure_future(one(chooser.choices(names, weights)[0], scheduled, scheduled >= measure_from))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+        last_arrival = start + (total - 1) * interval
+        if in_flight:
+            _, stragglers = await asyncio.wait(set(in_flight), timeout=config.drain_timeout)
+            # Cancelled while the app is still up, so they unwind cleanly
+            for task in stragglers:
+                task.cancel()
+            await asyncio.gather(*stragglers, return_exceptions=True)
+        elapsed = max(last_arrival, last_completed or last_arrival) - measure_from
+
+    return build_report(config, stats, elapsed, dropped, query_counts=config.transport == "asgi")
+
+
+def build_report(config: BenchConfig, stats: dict[str, EndpointStats], elapsed: float, dropped: int, query_counts: bool) -> dict:
+    """Summarises the collected samples."""
+    endpoints = {}
+    completed = 0
+    for name, endpoint in stats.items():
+        latencies = sorted(endpoint.latencies)
+        completed += len(latencies)
+        endpoints[name] = {
+            "count": len(latencies),
+            "errors": endpoint.errors,
+            "skipped": endpoint.skipped,
+            "timed_out": endpoint.timed_out,
+            "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed > 0 else None,
+            "mean_ms": round(1000 * sum(latencies) / len(latencies), 3) if latencies else None,
+            "p50_ms": _ms(percentile(latencies, 0.50)),
+            "p95_ms": _ms(percentile(latencies, 0.95)),
+            "p99_ms": _ms(percentile(latencies, 0.99)),
+            "max_ms": _ms(latencies[-1] if latencies else None),
+            "db_queries_per_request": (
+                round(sum(endpoint.queries) / len(endpoint.queries), 2) if query_counts and endpoint.queries else None
+            ),
+            "error_samples": endpoint.error_samples,
+        }
+    return {
+        "revision": _git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {
+            "mix": config.mix,
+            "rate": config.rate,
+            "duration": config.duration,
+            "warmup": config.warmup,
+            "transport": config.transport,
+            "seed": config.seed,
+        },
+        "throughput_rps": round(completed / elapsed, 2) if elapsed > 0 else None,
+        "dropped": dropped,
+        "timed_out": sum(endpoint.timed_out for endpoint in stats.values()),
+        "endpoints": endpoints,
+    }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> tuple[list[str], bool]:
+    """
+    Compares a report against a saved baseline.
+
+    Args:
+        report (dict): The current run.
+        baseline (dict): A previously saved report.
+        max_regression (float): Allowed relative p95 increase, e.g. 0.1 for 10%.
+
+    Returns:
+        tuple[list[str], bool]: Human-readable comparison lines, and whether any endpoint regressed.
+    """
+    lines, regressed = [], False
+    for name, current in report["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if previous is None:
+            lines.append(f"{name}: no baseline")
+            continue
+        parts = []
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "db_queries_per_request"):
+            old, new = previous.get(metric), current.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            parts.append(f"{metric} {old} -> {new} ({change:+.1%})")
+            if metric == "p95_ms" and change > max_regression:
+                regressed = True
+        lines.append(f"{name}: " + ", ".join(parts))
+    return lines, regressed
+
+
+def load_report(path: str) -> dict:
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
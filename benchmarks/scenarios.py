@@ -0,0 +1,149 @@
+"""
+Benchmark scenarios: one GraphQL operation or REST call each, selected by weight in a mix.
+
+A scenario is an async callable ``(client, context) -> None`` that raises
+`ScenarioError` when the operation fails. Register new ones in `SCENARIOS`.
+
+The ``user_graphql`` / ``user_rest`` pair performs the same lookup through
+each API, for side-by-side comparison: ``--mix register=1,user_graphql=5,user_rest=5``.
+"""
+
+import asyncio
+import itertools
+import os
+import random
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+from benchmarks.smtp_sink import SmtpSink
+
+# Seconds the verification scenario waits for its email to reach the sink
+CODE_TIMEOUT = 5.0
+
+
+class ScenarioError(Exception):
+    """Raised when an operation returns an HTTP or GraphQL error."""
+
+
+class ScenarioSkipped(Exception):
+    """Raised when a scenario has nothing to work on, e.g. no unverified users yet."""
+
+
+class BenchContext:
+    """State shared by the scenarios of one benchmark run."""
+
+    def __init__(self, sink: Optional[SmtpSink], run_id: str):
+        self.sink = sink
+        self.run_id = run_id
+        self.unverified: deque[str] = deque()
+        self.user_ids: list[int] = []
+        self._sequence = itertools.count()
+
+    def unique(self) -> int:
+        return next(self._sequence)
+
+
+async def graphql(client: httpx.AsyncClient, query: str, variables: Optional[dict] = None) -> dict:
+    """Posts a GraphQL operation and returns its `data`, raising `ScenarioError` on errors."""
+    response = await client.post("/graphql", json={"query": query, "variables": variables or {}})
+    if response.status_code != 200:
+        raise ScenarioError(f"HTTP {response.status_code}")
+    payload = response.json()
+    if payload.get("errors"):
+        raise ScenarioError(payload["errors"][0].get("message", "GraphQL error"))
+    return payload["data"]
+
+
+REGISTER = """
+mutation Register($input: UserRegisterInput!) {
+  registerUser(input: $input) { id }
+}
+"""
+
+VERIFY = """
+mutation Verify($input: UserVerifyInput!) {
+  verifyUser(input: $input) { id emailVerified }
+}
+"""
+
+USER = """
+query User($id: Int!) {
+  user(id: $id) { id username email isActive emailVerified }
+}
+"""
+
+ALL_USERS = """
+query AllUsers {
+  allUsers { id username email }
+}
+"""
+
+
+async def register(client: httpx.AsyncClient, context: BenchContext) -> None:
+    number = context.unique()
+    email = f"bench-{context.run_id}-{os.getpid()}-{number}@bench.invalid"
+    data = await graphql(client, REGISTER, {
+        "input": {
+            "username": f"b{context.run_id}{os.getpid()}x{number}",
+            "email": email,
+            "password": "bench-password",
+            "registeredVia": "benchmark",
+        }
+    })
+    context.unverified.append(email)
+    context.user_ids.append(int(data["registerUser"]["id"]))
+
+
+async def verify(client: httpx.AsyncClient, context: BenchContext) -> None:
+    if context.sink is None or not context.unverified:
+        raise ScenarioSkipped()
+    email = context.unverified.popleft()
+    code = await asyncio.to_thread(context.sink.code_for, email, CODE_TIMEOUT)
+    if code is None:
+        raise ScenarioError(f"no verification email for {email}")
+    await graphql(client, VERIFY, {"input": {"email": email, "verificationCode": code}})
+
+
+async def all_users(client: httpx.AsyncClient, context: BenchContext) -> None:
+    await graphql(client, ALL_USERS)
+
+
+async def rest(client: httpx.AsyncClient, path: str, params: Optional[dict] = None):
+    """Gets a REST resource and returns its JSON body, raising `ScenarioError` on errors."""
+    response = await client.get(path, params=params)
+    if response.status_code != 200:
+        raise ScenarioError(f"HTTP {response.status_code}")
+    return response.json()
+
+
+def known_user_id(context: BenchContext) -> int:
+    if not context.user_ids:
+        raise ScenarioSkipped()
+    return random.choice(context.user_ids)
+
+
+async def user_graphql(client: httpx.AsyncClient, context: BenchContext) -> None:
+    await graphql(client, USER, {"id": known_user_id(context)})
+
+
+async def user_rest(client: httpx.AsyncClient, context: BenchContext) -> None:
+    await rest(client, f"/v1/users/{known_user_id(context)}")
+
+
+async def users_batch_rest(client: httpx.AsyncClient, context: BenchContext) -> None:
+    if not context.user_ids:
+        raise ScenarioSkipped()
+    ids = random.sample(context.user_ids, min(20, len(context.user_ids)))
+    await rest(client, "/v1/users", {"ids": ",".join(map(str, ids))})
+
+
+SCENARIOS: dict[str, Callable[[httpx.AsyncClient, BenchContext], Awaitable[None]]] = {
+    "register": register,
+    "verify": verify,
+    "all_users": all_users,
+    "user_graphql": user_graphql,
+    "user_rest": user_rest,
+    "users_batch_rest": users_batch_rest,
+}
@@ -0,0 +1,111 @@
+"""
+Minimal in-process SMTP server that accepts and records every message.
+
+It speaks just enough SMTP (EHLO, AUTH PLAIN/LOGIN, MAIL, RCPT, DATA, QUIT)
+for `smtplib`, and keeps the verification code found in each message so the
+verification scenario can complete the flow without a real mailbox.
+"""
+
+import re
+import socketserver
+import threading
+import time
+from typing import Optional
+
+CODE_PATTERN = re.compile(r"verification code is: (\w+)")
+
+
+class SmtpSink:
+    """
+    Threaded SMTP sink listening on `host:port` (port 0 picks a free port).
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        sink = self
+        self.messages = 0
+        self._codes: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._arrived = threading.Condition(self._lock)
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                sink._session(self.rfile, self.wfile)
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self._server = Server((host, port), Handler)
+        self.host, self.port = self._server.server_address[:2]
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "SmtpSink":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="SmtpSink", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def code_for(self, email: str, timeout: float = 10.0) -> Optional[str]:
+        """Waits up to `timeout` seconds for a verification code sent to `email` and returns it."""
+        deadline = time.monotonic() + timeout
+        with self._arrived:
+            while email.lower() not in self._codes:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._arrived.wait(remaining)
+            return self._codes.pop(email.lower())
+
+    def _session(self, rfile, wfile) -> None:
+        def reply(line: str) -> None:
+            wfile.write(line.encode() + b"\r\n")
+
+        recipients: list[str] = []
+        reply("220 sink ESMTP")
+        while True:
+            raw = rfile.readline()
+            if not raw:
+                return
+            command = raw.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+
+            if verb in ("EHLO", "HELO"):
+                reply("250-sink")
+                reply("250 AUTH PLAIN LOGIN")
+            elif verb == "AUTH":
+                if command.upper().startswith("AUTH LOGIN"):
+                    # Username and password prompts; any credentials are accepted
+                    for _ in range(2 - (len(command.split()) > 2)):
+                        reply("334 VXNlcm5hbWU6")
+                        rfile.readline()
+                reply("235 Authentication successful")
+            elif verb == "MAIL":
+                recipients = []
+                reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.split(":", 1)[1].strip().strip("<>"))
+                reply("250 OK")
+            elif verb == "DATA":
+                reply("354 End data with <CR><LF>.<CR><LF>")
+                body = []
+                while (line := rfile.readline()) not in (b".\r\n", b".\n", b""):
+                    body.append(line.decode(errors="replace"))
+                self._record(recipients, "".join(body))
+                reply("250 OK")
+            elif verb == "QUIT":
+                reply("221 Bye")
+                return
+            else:
+                reply("250 OK")
+
+    def _record(self, recipients: list[str], body: str) -> None:
+        match = CODE_PATTERN.search(body)
+        with self._arrived:
+            self.messages += 1
+            if match:
+                for recipient in recipients:
+                    self._codes[recipient.lower()] = match.group(1)
+            self._arrived.notify_all()
@@ -68,9 +68,11 @@ def run_migrations_online() -> None:
     connectable.url = get_database_url()
 
     with connectable.connect() as connection:
+        # One transaction per revision, so migrations using the online_ops
+        # helpers (which commit and switch to autocommit) stay isolated
         context.configure(
             connection=connection, target_metadata=target_metadata,
-            include_schemas=True
+            include_schemas=True, transaction_per_migration=True
         )
 
         with context.begin_transaction():
@@ -0,0 +1,229 @@
+"""
+Helpers for schema changes that must not block production traffic.
+
+Plain `op.create_index`, `op.alter_column(nullable=False)` and large UPDATEs
+hold locks that block writes to the table for as long as they run. The
+helpers here split such changes into steps that either take no blocking lock
+or take one only briefly:
+
+- `create_index_concurrently` / `drop_index_concurrently` build and drop
+  indexes with ``CONCURRENTLY`` outside the migration transaction.
+- `add_check_constraint` adds a constraint ``NOT VALID`` (a brief lock) and
+  validates it separately (no write-blocking lock); `set_not_null` builds on it.
+- `backfill` updates rows in primary-key ranges, one short transaction per
+  batch, throttled to a duty cycle and reporting progress.
+- Every lock-taking statement runs with `lock_timeout` and is retried with
+  backoff, so a migration waiting behind a long transaction gives up quickly
+  instead of queueing every other query behind it.
+
+Helpers that must run outside a transaction open Alembic's `autocommit_block`
+themselves; statements issued before them in the same migration are committed
+first. They need a live connection, so they do not support offline (``--sql``)
+mode. Use them from upgrade scripts::
+
+    from migrations.online_ops import create_index_concurrently
+
+    def upgrade() -> None:
+        create_index_concurrently('ix_users_live_id', 'users', ['id'],
+                                  postgresql_where=sa.text('is_deleted = false'))
+"""
+
+import os
+import time
+from typing import Callable, Optional
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.exc import DBAPIError
+
+SCHEMA = 'chrome_users'
+
+MIGRATION_LOCK_TIMEOUT = os.environ.get('MIGRATION_LOCK_TIMEOUT', '5s')
+MIGRATION_LOCK_RETRIES = int(os.environ.get('MIGRATION_LOCK_RETRIES', '10'))
+MIGRATION_BACKFILL_BATCH_SIZE = int(os.environ.get('MIGRATION_BACKFILL_BATCH_SIZE', '5000'))
+MIGRATION_BACKFILL_DUTY_CYCLE = float(os.environ.get('MIGRATION_BACKFILL_DUTY_CYCLE', '0.5'))
+
+# SQLSTATE lock_not_available, raised when lock_timeout expires
+_LOCK_NOT_AVAILABLE = '55P03'
+
+
+def _is_lock_timeout(error: DBAPIError) -> bool:
+    orig = error.orig
+    return (getattr(orig, 'pgcode', None) or getattr(orig, 'sqlstate', None)) == _LOCK_NOT_AVAILABLE
+
+
+def with_lock_retry(action: Callable[[], None], description: str, lock_timeout: str = MIGRATION_LOCK_TIMEOUT,
+                    retries: int = MIGRATION_LOCK_RETRIES) -> None:
+    """
+    Runs `action` in autocommit mode with `lock_timeout` set, retrying with
+    exponential backoff when it cannot get its lock in time.
+
+    Must be called inside `op.get_context().autocommit_block()`: a failed
+    statement inside a transaction would abort the whole migration.
+
+    Raises:
+        DBAPIError: If the lock could not be taken after `retries` attempts.
+    """
+    bind = op.get_bind()
+    bind.exec_driver_sql(f"SET lock_timeout = '{lock_timeout}'")
+    try:
+        for attempt in range(1, retries + 1):
+            try:
+                action()
+                return
+            except DBAPIError as error:
+                if not _is_lock_timeout(error) or attempt == retries:
+                    raise
+                delay = min(30.0, 0.5 * 2 ** attempt)
+                print(f'[Migration] {description}: lock not available (attempt {attempt}/{retries}); retrying in {delay:.0f}s')
+                time.sleep(delay)
+    finally:
+        bind.exec_driver_sql('RESET lock_timeout')
+
+
+def set_lock_timeout(lock_timeout: str = MIGRATION_LOCK_TIMEOUT) -> None:
+    """
+    Sets `lock_timeout` for the rest of the current migration transaction, so
+    DDL that cannot use the helpers below fails fast instead of queueing.
+    """
+    op.execute(f"SET LOCAL lock_timeout = '{lock_timeout}'")
+
+
+def _invalid_index_exists(index_name: str, schema: str) -> bool:
+    # A failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind
+    return bool(op.get_bind().execute(
+        sa.text(
+            'SELECT NOT i.indisvalid FROM pg_index i '
+            'JOIN pg_class c ON c.oid = i.indexrelid JOIN pg_namespace n ON n.oid = c.relnamespace '
+            'WHERE c.relname = :name AND n.nspname = :schema'
+        ),
+        {'name': index_name, 'schema': schema},
+    ).scalar())
+
+
+def create_index_concurrently(index_name: str, table: str, columns: list, *, schema: str = SCHEMA,
+                              unique: bool = False, **kw) -> None:
+    """
+    Creates an index with ``CREATE INDEX CONCURRENTLY IF NOT EXISTS``.
+
+    An invalid index left by an earlier failed attempt is dropped first.
+    Accepts the same keyword arguments as `op.create_index`
+    (e.g. `postgresql_where`, `postgresql_using`, `postgresql_ops`).
+    """
+    with op.get_context().autocommit_block():
+        if _invalid_index_exists(index_name, schema):
+            with_lock_retry(
+                lambda: op.drop_index(index_name, table_name=table, schema=schema,
+                                      postgresql_concurrently=True, if_exists=True),
+                f'drop invalid index {index_name}',
+            )
+        with_lock_retry(
+            lambda: op.create_index(index_name, table, columns, unique=unique, schema=schema,
+                                    postgresql_concurrently=True, if_not_exists=True, **kw),
+            f'create index {index_name}',
+        )
+
+
+def drop_index_concurrently(index_name: str, table: str, *, schema: str = SCHEMA) -> None:
+    """Drops an index with ``DROP INDEX CONCURRENTLY IF EXISTS``."""
+    with op.get_context().autocommit_block():
+        with_lock_retry(
+            lambda: op.drop_index(index_name, table_name=table, schema=schema,
+                                  postgresql_concurrently=True, if_exists=True),
+            f'drop index {index_name}',
+        )
+
+
+def add_check_constraint(name: str, table: str, condition: str, *, schema: str = SCHEMA) -> None:
+    """
+    Adds a CHECK constraint without blocking writes while existing rows are checked.
+
+    The constraint is added ``NOT VALID`` (enforced for new rows, a brief
+    ACCESS EXCLUSIVE lock) and then validated with ``VALIDATE CONSTRAINT``,
+    which only takes a SHARE UPDATE EXCLUSIVE lock during the table scan.
+    """
+    qualified = f'{schema}.{table}'
+    bind = op.get_bind()
+    with op.get_context().autocommit_block():
+        exists = bind.execute(
+            sa.text('SELECT 1 FROM pg_constraint WHERE conname = :name AND conrelid = CAST(:table AS regclass)'),
+            {'name': name, 'table': qualified},
+        ).scalar()
+        if not exists:
+            with_lock_retry(
+                lambda: bind.exec_driver_sql(f'ALTER TABLE {qualified} ADD CONSTRAINT {name} CHECK ({condition}) NOT VALID'),
+                f'add constraint {name}',
+            )
+        with_lock_retry(
+            lambda: bind.exec_driver_sql(f'ALTER TABLE {qualified} VALIDATE CONSTRAINT {name}'),
+            f'validate constraint {name}',
+        )
+
+
+def set_not_null(table: str, column: str, *, schema: str = SCHEMA) -> None:
+    """
+    Makes `column` NOT NULL without a long write-blocking table scan.
+
+    A validated ``CHECK (column IS NOT NULL)`` constraint lets PostgreSQL
+    (12+) skip the scan in ``SET NOT NULL``; the helper constraint is then dropped.
+    """
+    qualified = f'{schema}.{table}'
+    constraint = f'{table}_{column}_not_null'
+    bind = op.get_bind()
+    add_check_constraint(constraint, table, f'{column} IS NOT NULL', schema=schema)
+    with op.get_context().autocommit_block():
+        with_lock_retry(
+            lambda: bind.exec_driver_sql(f'ALTER TABLE {qualified} ALTER COLUMN {column} SET NOT NULL'),
+            f'set {table}.{column} not null',
+        )
+        with_lock_retry(
+            lambda: bind.exec_driver_sql(f'ALTER TABLE {qualified} DROP CONSTRAINT IF EXISTS {constraint}'),
+            f'drop constraint {constraint}',
+        )
+
+
+def backfill(table: str, assignments: str, *, where: Optional[str] = None, schema: str = SCHEMA, pk: str = 'id',
+             batch_size: int = MIGRATION_BACKFILL_BATCH_SIZE, duty_cycle: float = MIGRATION_BACKFILL_DUTY_CYCLE) -> int:
+    """
+    Runs ``UPDATE table SET <assignments> [WHERE <where>]`` in primary-key ranges.
+
+    Each range of `batch_size` ids is updated in its own short transaction, so
+    row locks are held briefly and progress survives an interruption (rerun
+    the migration and finished ranges are cheap if `where` excludes them).
+    Between batches the helper sleeps so it uses at most `duty_cycle` of wall
+    time, and it prints progress as it goes.
+
+    Args:
+        table (str): Table name.
+        assignments (str): SQL for the SET clause, e.g. ``"version = 0"``.
+        where (Optional[str]): Extra predicate selecting rows that still need the backfill.
+        pk (str): Integer primary key column to range over.
+
+    Returns:
+        int: Number of rows updated.
+    """
+    qualified = f'{schema}.{table}'
+    bind = op.get_bind()
+    predicate = f' AND ({where})' if where else ''
+    updated = 0
+    with op.get_context().autocommit_block():
+        low, high = bind.exec_driver_sql(f'SELECT min({pk}), max({pk}) FROM {qualified}').one()
+        if low is None:
+            return 0
+        total = high - low + 1
+        started = time.monotonic()
+        for start in range(low, high + 1, batch_size):
+            batch_started = time.perf_counter()
+            result = bind.execute(
+                sa.text(f'UPDATE {qualified} SET {assignments} WHERE {pk} >= :start AND {pk} < :stop{predicate}'),
+                {'start': start, 'stop': start + batch_size},
+            )
+            elapsed = time.perf_counter() - batch_started
+            updated += result.rowcount
+
+            done = min(start + batch_size, high + 1) - low
+            print(f'[Migration] backfill {table}: {done / total:.0%} of id range, {updated} rows updated, '
+                  f'{time.monotonic() - started:.0f}s elapsed')
+            if duty_cycle < 1:
+                time.sleep(elapsed * (1 / duty_cycle - 1))
+    return updated
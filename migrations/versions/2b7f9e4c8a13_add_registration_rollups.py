@@ -0,0 +1,37 @@
+"""Add registration rollups
+
+Revision ID: 2b7f9e4c8a13
+Revises: 5d8e2a7c9f41
+Create Date: 2026-10-19 22:11:07.204519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2b7f9e4c8a13'
+down_revision: Union[str, None] = '5d8e2a7c9f41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Populated by `python -m app.tools.backfill_registration_rollups`
+    op.create_table('registration_rollups',
+    sa.Column('bucket', sa.TIMESTAMP(), nullable=False),
+    sa.Column('registered_via', sa.String(length=50), server_default='', nullable=False),
+    sa.Column('referrer', sa.String(length=255), server_default='', nullable=False),
+    sa.Column('registrations', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('verifications', sa.BigInteger(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('bucket', 'registered_via', 'referrer'),
+    schema='chrome_users'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('registration_rollups', schema='chrome_users')
@@ -0,0 +1,42 @@
+"""Add idempotency key store
+
+Revision ID: 3a9d7c2e6b15
+Revises: f52b8d0e7c14
+Create Date: 2026-10-19 18:02:47.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3a9d7c2e6b15'
+down_revision: Union[str, None] = 'f52b8d0e7c14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('idempotency_keys',
+    sa.Column('key', sa.String(length=300), nullable=False),
+    sa.Column('fingerprint', sa.String(length=64), nullable=False),
+    sa.Column('status_code', sa.Integer(), nullable=True),
+    sa.Column('headers', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('body', sa.LargeBinary(), nullable=True),
+    sa.Column('locked_until', sa.TIMESTAMP(), nullable=True),
+    sa.Column('created_at', sa.TIMESTAMP(), nullable=True),
+    sa.Column('expires_at', sa.TIMESTAMP(), nullable=False),
+    sa.PrimaryKeyConstraint('key'),
+    schema='chrome_users'
+    )
+    op.create_index(op.f('ix_chrome_users_idempotency_keys_expires_at'), 'idempotency_keys', ['expires_at'], unique=False, schema='chrome_users')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_chrome_users_idempotency_keys_expires_at'), table_name='idempotency_keys', schema='chrome_users')
+    op.drop_table('idempotency_keys', schema='chrome_users')
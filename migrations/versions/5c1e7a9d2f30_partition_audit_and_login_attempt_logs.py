@@ -0,0 +1,160 @@
+"""Partition audit_logs and login_attempt_logs by month
+
+Revision ID: 5c1e7a9d2f30
+Revises: 1ba225de586b
+Create Date: 2026-10-19 09:12:40.518233
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e7a9d2f30'
+down_revision: Union[str, None] = '1ba225de586b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SCHEMA = 'chrome_users'
+
+# Months of partitions to pre-create past the current one
+MONTHS_AHEAD = 3
+
+AUDIT_LOGS_COLUMNS = """
+    id integer NOT NULL DEFAULT nextval('chrome_users.audit_logs_id_seq'),
+    user_id integer REFERENCES chrome_users.users (id),
+    actor_id integer REFERENCES chrome_users.users (id),
+    event_type varchar(50) NOT NULL,
+    action varchar(100) NOT NULL,
+    target varchar(100),
+    meta_info text,
+    ip_address varchar(45),
+    user_agent text,
+    created_at timestamp NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, created_at)
+"""
+
+LOGIN_ATTEMPT_LOGS_COLUMNS = """
+    id integer NOT NULL DEFAULT nextval('chrome_users.login_attempt_logs_id_seq'),
+    ip_address varchar(45),
+    user_id integer REFERENCES chrome_users.users (id),
+    attempted_at timestamp NOT NULL DEFAULT now(),
+    was_successful boolean,
+    reason text,
+    PRIMARY KEY (id, attempted_at)
+"""
+
+
+def _create_monthly_partitions(table: str, key: str, source: str) -> None:
+    """Creates one partition per month from the oldest row in `source` to MONTHS_AHEAD, then a default partition."""
+    op.execute(f"""
+        DO $$
+        DECLARE
+            month date := date_trunc('month', coalesce((SELECT min({key}) FROM {source}), now()))::date;
+            last_month date := (date_trunc('month', now()) + interval '{MONTHS_AHEAD} months')::date;
+        BEGIN
+            WHILE month <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE {SCHEMA}.%I PARTITION OF {SCHEMA}.{table} FOR VALUES FROM (%L) TO (%L)',
+                    '{table}_p' || to_char(month, 'YYYY_MM'),
+                    month,
+                    (month + interval '1 month')::date
+                );
+                month := (month + interval '1 month')::date;
+            END LOOP;
+        END $$;
+    """)
+    # Last, so creating the monthly partitions never has to check it
+    op.execute(f"CREATE TABLE {SCHEMA}.{table}_default PARTITION OF {SCHEMA}.{table} DEFAULT")
+
+
+def _is_partitioned(table: str) -> bool:
+    """True if `table` is already a partitioned table (e.g. created by the app's create_all)."""
+    return op.get_bind().execute(
+        sa.text("""
+            SELECT EXISTS (
+                SELECT 1 FROM pg_partitioned_table pt
+                JOIN pg_class c ON c.oid = pt.partrelid
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = :schema AND c.relname = :table
+            )
+        """),
+        {'schema': SCHEMA, 'table': table},
+    ).scalar()
+
+
+def _partition_table(table: str, key: str, columns: str, column_names: str) -> None:
+    """Swaps `table` for a range-partitioned copy on `key`, carrying rows and the id sequence across."""
+    bind = op.get_bind()
+    exists = sa.inspect(bind).has_table(table, schema=SCHEMA)
+    if exists and _is_partitioned(table):
+        return
+
+    if exists:
+        op.execute(f"ALTER TABLE {SCHEMA}.{table} RENAME TO {table}_unpartitioned")
+        op.execute(f"ALTER INDEX IF EXISTS {SCHEMA}.ix_{SCHEMA}_{table}_id RENAME TO ix_{SCHEMA}_{table}_unpartitioned_id")
+        op.execute(f"ALTER INDEX IF EXISTS {SCHEMA}.ix_{SCHEMA}_{table}_ip_address RENAME TO ix_{SCHEMA}_{table}_unpartitioned_ip_address")
+        op.execute(f"ALTER SEQUENCE {SCHEMA}.{table}_id_seq OWNED BY NONE")
+    else:
+        op.execute(f"CREATE SEQUENCE {SCHEMA}.{table}_id_seq")
+
+    op.execute(f"CREATE TABLE {SCHEMA}.{table} ({columns}) PARTITION BY RANGE ({key})")
+    op.execute(f"ALTER SEQUENCE {SCHEMA}.{table}_id_seq OWNED BY {SCHEMA}.{table}.id")
+    op.create_index(op.f(f'ix_{SCHEMA}_{table}_id'), table, ['id'], unique=False, schema=SCHEMA)
+
+    source = f"{SCHEMA}.{table}_unpartitioned" if exists else f"{SCHEMA}.{table}"
+    _create_monthly_partitions(table, key, source)
+
+    if exists:
+        op.execute(f"""
+            INSERT INTO {SCHEMA}.{table} ({column_names})
+            SELECT {column_names.replace(key, f'coalesce({key}, now())')}
+            FROM {SCHEMA}.{table}_unpartitioned
+        """)
+        op.execute(f"DROP TABLE {SCHEMA}.{table}_unpartitioned")
+
+
+def _unpartition_table(table: str, key: str, columns: str, column_names: str) -> None:
+    """Reverses `_partition_table`, copying all partitions back into a plain table."""
+    op.execute(f"ALTER TABLE {SCHEMA}.{table} RENAME TO {table}_partitioned")
+    op.execute(f"ALTER INDEX {SCHEMA}.ix_{SCHEMA}_{table}_id RENAME TO ix_{SCHEMA}_{table}_partitioned_id")
+    op.execute(f"ALTER SEQUENCE {SCHEMA}.{table}_id_seq OWNED BY NONE")
+
+    plain_columns = columns.replace(f"PRIMARY KEY (id, {key})", "PRIMARY KEY (id)")
+    op.execute(f"CREATE TABLE {SCHEMA}.{table} ({plain_columns})")
+    op.execute(f"ALTER SEQUENCE {SCHEMA}.{table}_id_seq OWNED BY {SCHEMA}.{table}.id")
+    op.execute(f"""
+        INSERT INTO {SCHEMA}.{table} ({column_names})
+        SELECT {column_names} FROM {SCHEMA}.{table}_partitioned
+    """)
+    op.execute(f"DROP TABLE {SCHEMA}.{table}_partitioned CASCADE")
+    op.create_index(op.f(f'ix_{SCHEMA}_{table}_id'), table, ['id'], unique=False, schema=SCHEMA)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _partition_table(
+        'audit_logs', 'created_at', AUDIT_LOGS_COLUMNS,
+        'id, user_id, actor_id, event_type, action, target, meta_info, ip_address, user_agent, created_at',
+    )
+    _partition_table(
+        'login_attempt_logs', 'attempted_at', LOGIN_ATTEMPT_LOGS_COLUMNS,
+        'id, ip_address, user_id, attempted_at, was_successful, reason',
+    )
+    op.create_index(op.f('ix_chrome_users_login_attempt_logs_ip_address'), 'login_attempt_logs', ['ip_address'], unique=False, schema=SCHEMA, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_chrome_users_login_attempt_logs_ip_address'), table_name='login_attempt_logs', schema=SCHEMA)
+    _unpartition_table(
+        'login_attempt_logs', 'attempted_at', LOGIN_ATTEMPT_LOGS_COLUMNS,
+        'id, ip_address, user_id, attempted_at, was_successful, reason',
+    )
+    op.create_index(op.f('ix_chrome_users_login_attempt_logs_ip_address'), 'login_attempt_logs', ['ip_address'], unique=False, schema=SCHEMA)
+    _unpartition_table(
+        'audit_logs', 'created_at', AUDIT_LOGS_COLUMNS,
+        'id, user_id, actor_id, event_type, action, target, meta_info, ip_address, user_agent, created_at',
+    )
@@ -0,0 +1,60 @@
+"""Add per-table data version counters
+
+Revision ID: 5d8e2a7c9f41
+Revises: 9c4a1e7b2d36
+Create Date: 2026-10-19 21:04:18.530662
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d8e2a7c9f41'
+down_revision: Union[str, None] = '9c4a1e7b2d36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match app.core.cache.data_versions.TRACKED_TABLES
+TRACKED_TABLES = ('users', 'user_roles', 'user_profiles')
+
+# Counter rows per table; writers on different connections mostly hit different rows
+SLOTS = 16
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('data_versions',
+    sa.Column('table_name', sa.String(length=63), nullable=False),
+    sa.Column('slot', sa.SmallInteger(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('table_name', 'slot'),
+    schema='chrome_users'
+    )
+    op.execute(f"""
+        CREATE FUNCTION chrome_users.bump_data_version() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO chrome_users.data_versions (table_name, slot, version)
+            VALUES (TG_TABLE_NAME, pg_backend_pid() % {SLOTS}, 1)
+            ON CONFLICT (table_name, slot) DO UPDATE SET version = chrome_users.data_versions.version + 1;
+            RETURN NULL;
+        END
+        $$
+    """)
+    for table in TRACKED_TABLES:
+        op.execute(
+            f"CREATE TRIGGER {table}_data_version "
+            f"AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON chrome_users.{table} "
+            "FOR EACH STATEMENT EXECUTE FUNCTION chrome_users.bump_data_version()"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TRACKED_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_data_version ON chrome_users.{table}")
+    op.execute("DROP FUNCTION IF EXISTS chrome_users.bump_data_version()")
+    op.drop_table('data_versions', schema='chrome_users')
@@ -0,0 +1,33 @@
+"""Add last_seen_at to user sessions
+
+Revision ID: 6e2b9f4d1a70
+Revises: 3a9d7c2e6b15
+Create Date: 2026-10-19 19:24:11.406372
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.online_ops import set_lock_timeout
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e2b9f4d1a70'
+down_revision: Union[str, None] = '3a9d7c2e6b15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Adding a nullable column is metadata-only, but still needs a brief exclusive lock
+    set_lock_timeout()
+    op.add_column('user_sessions', sa.Column('last_seen_at', sa.TIMESTAMP(), nullable=True), schema='chrome_users')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    set_lock_timeout()
+    op.drop_column('user_sessions', 'last_seen_at', schema='chrome_users')
@@ -0,0 +1,49 @@
+"""Make soft-delete and verification flags NOT NULL
+
+Revision ID: 7a5c3e9d1f82
+Revises: 2b7f9e4c8a13
+Create Date: 2026-10-20 10:02:51.377140
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.online_ops import backfill, set_lock_timeout, set_not_null
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a5c3e9d1f82'
+down_revision: Union[str, None] = '2b7f9e4c8a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SCHEMA = 'chrome_users'
+
+# (table, column, integer key to backfill by). The hot queries and partial
+# indexes test these flags with `= false`, which skips rows where they are NULL.
+FLAGS = (
+    ('users', 'is_deleted', 'id'),
+    ('users', 'email_verified', 'id'),
+    ('user_roles', 'is_deleted', 'user_id'),
+    ('roles', 'is_deleted', 'id'),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Server defaults first, so rows inserted outside the ORM during the backfill are not NULL
+    set_lock_timeout()
+    for table, column, _ in FLAGS:
+        op.alter_column(table, column, existing_type=sa.Boolean(), server_default=sa.false(), schema=SCHEMA)
+    for table, column, key in FLAGS:
+        backfill(table, f'{column} = false', where=f'{column} IS NULL', pk=key)
+        set_not_null(table, column)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    set_lock_timeout()
+    for table, column, _ in FLAGS:
+        op.alter_column(table, column, existing_type=sa.Boolean(), nullable=True, server_default=None, schema=SCHEMA)
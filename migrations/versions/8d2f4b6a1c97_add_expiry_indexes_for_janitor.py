@@ -0,0 +1,53 @@
+"""Add expiry indexes used by the janitor
+
+Revision ID: 8d2f4b6a1c97
+Revises: 5c1e7a9d2f30
+Create Date: 2026-10-19 11:40:03.271946
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.online_ops import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2f4b6a1c97'
+down_revision: Union[str, None] = '5c1e7a9d2f30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SCHEMA = 'chrome_users'
+
+# (table, column) pairs the janitor's purge rules range-scan
+EXPIRY_INDEXES = (
+    ('password_reset_tokens', 'expires_at'),
+    ('authorization_codes', 'expires_at'),
+    ('captcha_challenges', 'created_at'),
+    ('refresh_tokens', 'expires_at'),
+    ('user_sessions', 'expires_at'),
+    ('user_sessions', 'revoked_at'),
+)
+
+
+def _existing_tables() -> set:
+    # authorization_codes and refresh_tokens have so far only been created by the app's create_all
+    return set(sa.inspect(op.get_bind()).get_table_names(schema=SCHEMA))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    tables = _existing_tables()
+    for table, column in EXPIRY_INDEXES:
+        if table in tables:
+            create_index_concurrently(op.f(f'ix_{SCHEMA}_{table}_{column}'), table, [column], schema=SCHEMA)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    tables = _existing_tables()
+    for table, column in reversed(EXPIRY_INDEXES):
+        if table in tables:
+            drop_index_concurrently(op.f(f'ix_{SCHEMA}_{table}_{column}'), table, schema=SCHEMA)
@@ -0,0 +1,38 @@
+"""Add user directory for sharded storage
+
+Revision ID: 9c4a1e7b2d36
+Revises: 6e2b9f4d1a70
+Create Date: 2026-10-19 20:15:42.873190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4a1e7b2d36'
+down_revision: Union[str, None] = '6e2b9f4d1a70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Populated by revision c6f1d3a8b2e4 and `python -m app.tools.rebalance_shards`
+    op.create_table('user_directory',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('shard', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(length=50), nullable=False),
+    sa.Column('email_lower', sa.String(length=100), nullable=False),
+    sa.PrimaryKeyConstraint('user_id'),
+    sa.UniqueConstraint('email_lower'),
+    sa.UniqueConstraint('username'),
+    schema='chrome_users'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_directory', schema='chrome_users')
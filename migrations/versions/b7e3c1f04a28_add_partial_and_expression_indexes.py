@@ -0,0 +1,46 @@
+"""Add partial and expression indexes for hot user predicates
+
+Revision ID: b7e3c1f04a28
+Revises: 8d2f4b6a1c97
+Create Date: 2026-10-19 14:05:51.630418
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.online_ops import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e3c1f04a28'
+down_revision: Union[str, None] = '8d2f4b6a1c97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Fails if existing emails collide case-insensitively; resolve those rows first
+    create_index_concurrently('uq_users_email_lower', 'users', [sa.text('lower(email)')], unique=True, schema='chrome_users')
+    create_index_concurrently('ix_users_live_id', 'users', ['id'], schema='chrome_users',
+                              postgresql_where=sa.text('is_deleted = false'))
+    create_index_concurrently('ix_users_unverified_code_expiry', 'users', ['verification_code_expires_at'], schema='chrome_users',
+                              postgresql_where=sa.text('email_verified = false AND is_deleted = false'))
+    create_index_concurrently('ix_user_sessions_live_user_id', 'user_sessions', ['user_id'], schema='chrome_users',
+                              postgresql_where=sa.text('revoked_at IS NULL'))
+    create_index_concurrently('ix_user_roles_live_user_id', 'user_roles', ['user_id'], schema='chrome_users',
+                              postgresql_where=sa.text('is_deleted = false'))
+    create_index_concurrently('ix_user_job_queue_pending', 'user_job_queue', ['scheduled_for'], schema='chrome_users',
+                              postgresql_where=sa.text("status = 'pending'"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_index_concurrently('ix_user_job_queue_pending', 'user_job_queue', schema='chrome_users')
+    drop_index_concurrently('ix_user_roles_live_user_id', 'user_roles', schema='chrome_users')
+    drop_index_concurrently('ix_user_sessions_live_user_id', 'user_sessions', schema='chrome_users')
+    drop_index_concurrently('ix_users_unverified_code_expiry', 'users', schema='chrome_users')
+    drop_index_concurrently('ix_users_live_id', 'users', schema='chrome_users')
+    drop_index_concurrently('uq_users_email_lower', 'users', schema='chrome_users')
@@ -0,0 +1,66 @@
+"""Add phone numbers to the user directory and backfill it
+
+Revision ID: c6f1d3a8b2e4
+Revises: 7a5c3e9d1f82
+Create Date: 2026-10-21 09:12:40.518362
+
+"""
+import time
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.online_ops import MIGRATION_BACKFILL_BATCH_SIZE, set_lock_timeout
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6f1d3a8b2e4'
+down_revision: Union[str, None] = '7a5c3e9d1f82'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SCHEMA = 'chrome_users'
+
+# Adds the users of one id range to the directory as living on shard 0, which
+# is where every user is until `app.tools.rebalance_shards` moves them
+POPULATE_SQL = f"""
+INSERT INTO {SCHEMA}.user_directory (user_id, shard, username, email_lower, phone_number)
+SELECT id, 0, username, lower(email), phone_number FROM {SCHEMA}.users
+WHERE id >= :start AND id < :stop
+ON CONFLICT (user_id) DO UPDATE SET phone_number = EXCLUDED.phone_number
+"""
+
+
+def populate_directory(batch_size: int = MIGRATION_BACKFILL_BATCH_SIZE) -> None:
+    """Adds every existing user to the directory, one short transaction per id range."""
+    bind = op.get_bind()
+    with op.get_context().autocommit_block():
+        low, high = bind.exec_driver_sql(f'SELECT min(id), max(id) FROM {SCHEMA}.users').one()
+        if low is None:
+            return
+        started = time.monotonic()
+        for start in range(low, high + 1, batch_size):
+            bind.execute(sa.text(POPULATE_SQL), {'start': start, 'stop': start + batch_size})
+            print(f'[Migration] user_directory: up to user {min(start + batch_size, high + 1) - 1} of {high}, '
+                  f'{time.monotonic() - started:.0f}s elapsed')
+        # Ids allocated by the directory must not collide with existing users
+        bind.exec_driver_sql(
+            f"SELECT setval(pg_get_serial_sequence('{SCHEMA}.user_directory', 'user_id'), "
+            f"(SELECT max(user_id) FROM {SCHEMA}.user_directory))"
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    set_lock_timeout()
+    op.add_column('user_directory', sa.Column('phone_number', sa.String(length=20), nullable=True), schema=SCHEMA)
+    op.create_unique_constraint('uq_user_directory_phone_number', 'user_directory', ['phone_number'], schema=SCHEMA)
+    populate_directory()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    set_lock_timeout()
+    op.drop_constraint('uq_user_directory_phone_number', 'user_directory', schema=SCHEMA, type_='unique')
+    op.drop_column('user_directory', 'phone_number', schema=SCHEMA)
@@ -0,0 +1,123 @@
+"""Delta-encode user profile history
+
+Revision ID: e41a9c6d3b58
+Revises: b7e3c1f04a28
+Create Date: 2026-10-19 15:12:37.904112
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e41a9c6d3b58'
+down_revision: Union[str, None] = 'b7e3c1f04a28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SCHEMA = 'chrome_users'
+
+PROFILE_COLUMNS = (
+    ('first_name', sa.String(50)),
+    ('last_name', sa.String(50)),
+    ('date_of_birth', sa.TIMESTAMP()),
+    ('gender', sa.String(10)),
+    ('address', sa.Text()),
+    ('country', sa.String(50)),
+    ('timezone', sa.String(50)),
+    ('bio', sa.Text()),
+    ('website', sa.String(255)),
+    ('social_links', sa.Text()),
+)
+
+
+def _existing_tables() -> set:
+    # user_profiles and user_profile_history have so far only been created by the app's create_all
+    return set(sa.inspect(op.get_bind()).get_table_names(schema=SCHEMA))
+
+
+def _snapshot(alias: str) -> str:
+    """SQL building the full-profile JSONB document from the columns of `alias`."""
+    pairs = ', '.join(f"'{name}', {alias}.{name}" for name, _ in PROFILE_COLUMNS)
+    return f'jsonb_build_object({pairs})'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    tables = _existing_tables()
+    if 'user_profiles' in tables:
+        op.add_column('user_profiles', sa.Column('version', sa.Integer(), server_default='0', nullable=False), schema=SCHEMA)
+    if 'user_profile_history' not in tables:
+        return
+
+    history = f'{SCHEMA}.user_profile_history'
+    op.add_column('user_profile_history', sa.Column('version', sa.Integer(), nullable=True), schema=SCHEMA)
+    op.add_column('user_profile_history', sa.Column('is_checkpoint', sa.Boolean(), server_default=sa.false(), nullable=False), schema=SCHEMA)
+    op.add_column('user_profile_history', sa.Column('changes', postgresql.JSONB(), nullable=True), schema=SCHEMA)
+
+    # Existing full-row snapshots become checkpoints, numbered in time order per user
+    op.execute(f"""
+        UPDATE {history} h
+        SET version = r.rn, is_checkpoint = true, changes = {_snapshot('h')},
+            updated_at = COALESCE(h.updated_at, now())
+        FROM (
+            SELECT id, row_number() OVER (PARTITION BY user_id ORDER BY updated_at, id) AS rn
+            FROM {history}
+        ) r
+        WHERE r.id = h.id
+    """)
+
+    if 'user_profiles' in tables:
+        # Start every profile's delta chain from a checkpoint of its current state
+        op.execute(f"""
+            INSERT INTO {history} (user_id, version, is_checkpoint, changes, updated_at)
+            SELECT p.user_id,
+                   COALESCE((SELECT max(h.version) FROM {history} h WHERE h.user_id = p.user_id), 0) + 1,
+                   true, {_snapshot('p')}, now()
+            FROM {SCHEMA}.user_profiles p
+            WHERE p.user_id IS NOT NULL
+        """)
+        op.execute(f"""
+            UPDATE {SCHEMA}.user_profiles p
+            SET version = (SELECT max(h.version) FROM {history} h WHERE h.user_id = p.user_id)
+            WHERE p.user_id IS NOT NULL
+        """)
+
+    op.alter_column('user_profile_history', 'version', nullable=False, schema=SCHEMA)
+    op.alter_column('user_profile_history', 'changes', nullable=False, schema=SCHEMA)
+    op.alter_column('user_profile_history', 'updated_at', nullable=False, schema=SCHEMA)
+    op.alter_column('user_profile_history', 'id', type_=sa.BigInteger(), existing_nullable=False, schema=SCHEMA)
+    for name, _ in PROFILE_COLUMNS:
+        op.drop_column('user_profile_history', name, schema=SCHEMA)
+
+    op.create_unique_constraint('uq_user_profile_history_user_version', 'user_profile_history', ['user_id', 'version'], schema=SCHEMA)
+    op.create_index('ix_user_profile_history_checkpoints', 'user_profile_history', ['user_id', 'updated_at'], unique=False, schema=SCHEMA,
+                    postgresql_where=sa.text('is_checkpoint'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    tables = _existing_tables()
+    if 'user_profile_history' in tables:
+        history = f'{SCHEMA}.user_profile_history'
+        op.drop_index('ix_user_profile_history_checkpoints', table_name='user_profile_history', schema=SCHEMA)
+        op.drop_constraint('uq_user_profile_history_user_version', 'user_profile_history', schema=SCHEMA, type_='unique')
+        for name, type_ in PROFILE_COLUMNS:
+            op.add_column('user_profile_history', sa.Column(name, type_, nullable=True), schema=SCHEMA)
+
+        # Lossy: delta rows come back as sparse snapshots holding only their changed fields
+        assignments = ', '.join(
+            f"{name} = (changes ->> '{name}')::{type_.compile(dialect=postgresql.dialect())}"
+            for name, type_ in PROFILE_COLUMNS
+        )
+        op.execute(f'UPDATE {history} SET {assignments}')
+
+        op.alter_column('user_profile_history', 'id', type_=sa.Integer(), existing_nullable=False, schema=SCHEMA)
+        op.drop_column('user_profile_history', 'changes', schema=SCHEMA)
+        op.drop_column('user_profile_history', 'is_checkpoint', schema=SCHEMA)
+        op.drop_column('user_profile_history', 'version', schema=SCHEMA)
+    if 'user_profiles' in tables:
+        op.drop_column('user_profiles', 'version', schema=SCHEMA)
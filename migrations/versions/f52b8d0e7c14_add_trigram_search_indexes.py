@@ -0,0 +1,36 @@
+"""Add trigram indexes for user search
+
+Revision ID: f52b8d0e7c14
+Revises: e41a9c6d3b58
+Create Date: 2026-10-19 16:31:08.552390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.online_ops import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f52b8d0e7c14'
+down_revision: Union[str, None] = 'e41a9c6d3b58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    create_index_concurrently('ix_users_username_trgm', 'users', [sa.text('lower(username) gin_trgm_ops')], schema='chrome_users',
+                              postgresql_using='gin')
+    create_index_concurrently('ix_users_email_trgm', 'users', [sa.text('lower(email) gin_trgm_ops')], schema='chrome_users',
+                              postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # pg_trgm is left installed; other objects may depend on it
+    drop_index_concurrently('ix_users_email_trgm', 'users', schema='chrome_users')
+    drop_index_concurrently('ix_users_username_trgm', 'users', schema='chrome_users')
@@ -0,0 +1,57 @@
+"""
+Shared fixtures for the test suite.
+
+Unit tests need nothing but the installed requirements. Tests using the
+`database` fixture run against the PostgreSQL database in ``DATABASE_URL``
+(migrated to head; tests add rows and do not clean up, so use a scratch
+database) and are skipped when the variable is not set. The application's
+built-in default URL is never used by tests. Tests using the `shards` fixture
+need at least two migrated scratch databases in ``SHARD_DATABASE_URLS``.
+"""
+
+import os
+
+import pytest
+
+os.environ.setdefault("SQL_ECHO", "0")
+os.environ.setdefault("TOKEN_SIGNING_SECRET", "test-signing-secret")
+
+
+@pytest.fixture
+def database_url() -> str:
+    """The test database URL; skips the test when ``DATABASE_URL`` is not set."""
+    url = os.environ.get("DATABASE_URL")
+    if not url:
+        pytest.skip("DATABASE_URL is not set")
+    return url
+
+
+@pytest.fixture
+async def database(database_url):
+    """
+    The application engine, for tests that use the database.
+
+    Pooled connections belong to the test's event loop, so the pool is
+    emptied after every test.
+    """
+    from app.database import engine
+
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+async def shards():
+    """
+    A router over the databases in ``SHARD_DATABASE_URLS``; skips the test
+    unless at least two are configured.
+    """
+    from app.database import engine
+    from app.infrastructure.sharding.shard_router import SHARD_DATABASE_URLS, ShardRouter
+
+    if len(SHARD_DATABASE_URLS) < 2:
+        pytest.skip("SHARD_DATABASE_URLS does not configure two or more shards")
+    router = ShardRouter(SHARD_DATABASE_URLS)
+    yield router
+    await router.dispose()
+    await engine.dispose()
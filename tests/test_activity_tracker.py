@@ -0,0 +1,142 @@
+from contextlib import asynccontextmanager
+
+import asyncpg
+import pytest
+
+from app.infrastructure import copy_writer
+from app.infrastructure.activity import activity_tracker
+from app.infrastructure.activity.activity_tracker import ActivityTracker
+
+
+class FakeConnection:
+    def __init__(self):
+        self.updates = []
+        self.copied = []
+        self.failing = set()
+
+    async def execute(self, query, *params):
+        table = "users" if ".users " in query else "user_sessions"
+        if table in self.failing:
+            raise ConnectionError("connection refused")
+        rows = list(zip(params[::2], params[1::2]))
+        if any(value == "bad" for _, value in rows):
+            raise asyncpg.DataError("invalid input syntax")
+        self.updates.append((table, rows))
+
+    async def copy_records_to_table(self, table, schema_name, columns, records):
+        if table in self.failing:
+            raise ConnectionError("connection refused")
+        self.copied.extend(records)
+
+
+@pytest.fixture
+def connection(monkeypatch):
+    conn = FakeConnection()
+
+    @asynccontextmanager
+    async def fake_asyncpg_connection(bind=None):
+        yield conn
+
+    monkeypatch.setattr(activity_tracker, "asyncpg_connection", fake_asyncpg_connection)
+    monkeypatch.setattr(copy_writer, "asyncpg_connection", fake_asyncpg_connection)
+    return conn
+
+
+async def test_updates_are_coalesced_per_user_and_session(connection):
+    tracker = ActivityTracker(flush_interval=60)
+    tracker.record_login(2, "10.0.0.1")
+    tracker.record_login(1, "10.0.0.2")
+    tracker.record_login(2, "10.0.0.3")
+    tracker.touch_session(1, 7)
+    tracker.touch_session(1, 7)
+
+    await tracker.flush()
+
+    assert connection.updates[0] == ("users", [(1, "10.0.0.2"), (2, "10.0.0.3")])
+    assert [(table, [row[0] for row in rows]) for table, rows in connection.updates[1:]] == [("user_sessions", [7])]
+    assert [row[:3] for row in connection.copied] == [
+        (2, "password", "10.0.0.1"), (1, "password", "10.0.0.2"), (2, "password", "10.0.0.3"),
+    ]
+    assert len(tracker) == 0
+
+
+async def test_a_failing_step_puts_its_rows_back_without_blocking_the_others(connection):
+    tracker = ActivityTracker(flush_interval=60)
+    tracker.record_login(1, "10.0.0.1")
+    tracker.touch_session(1, 7)
+    connection.failing.add("users")
+
+    with pytest.raises(ConnectionError):
+        await tracker.flush()
+
+    assert [table for table, _ in connection.updates] == ["user_sessions"]
+    assert len(connection.copied) == 1
+    assert tracker._last_login_ip == {1: "10.0.0.1"}
+
+    # A newer value recorded before the retry wins over the put-back one
+    tracker.record_login(1, "10.0.0.9")
+    connection.failing.clear()
+    await tracker.flush()
+
+    assert connection.updates[-1] == ("users", [(1, "10.0.0.9")])
+    assert len(tracker) == 0
+
+
+async def test_logins_stay_queued_while_copy_fails(connection):
+    tracker = ActivityTracker(flush_interval=60, max_pending_logins=2)
+    connection.failing.add("user_logins")
+    for user_id in (1, 2, 3):
+        tracker.record_login(user_id, None)
+
+    with pytest.raises(ConnectionError):
+        await tracker.flush()
+
+    assert len(tracker.logins) == 2 and tracker.dropped == 1
+    connection.failing.clear()
+    await tracker.flush()
+    assert [row[0] for row in connection.copied] == [1, 2]
+
+
+async def test_rejected_updates_are_dropped_and_the_rest_written(connection):
+    tracker = ActivityTracker(flush_interval=60, batch_size=10)
+    for user_id, ip_address in ((1, "10.0.0.1"), (2, "bad"), (3, "10.0.0.3")):
+        tracker.record_login(user_id, ip_address)
+
+    await tracker.flush()
+
+    assert sorted(row for _, rows in connection.updates for row in rows) == [(1, "10.0.0.1"), (3, "10.0.0.3")]
+    assert tracker.rejected == 1 and len(tracker) == 0
+
+
+class FakeRouter:
+    engines = ["shard0", "shard1"]
+
+    def shard_for(self, user_id):
+        return user_id % 2
+
+
+async def test_updates_go_to_the_users_shard(monkeypatch):
+    connections = {"shard0": FakeConnection(), "shard1": FakeConnection()}
+
+    @asynccontextmanager
+    async def fake_asyncpg_connection(bind=None):
+        yield connections[bind]
+
+    monkeypatch.setattr(activity_tracker, "asyncpg_connection", fake_asyncpg_connection)
+    monkeypatch.setattr(copy_writer, "asyncpg_connection", fake_asyncpg_connection)
+    monkeypatch.setattr(activity_tracker, "shard_router", FakeRouter())
+    monkeypatch.setattr(copy_writer, "shard_router", FakeRouter())
+    tracker = ActivityTracker(flush_interval=60)
+    tracker.record_login(1, "10.0.0.1")
+    tracker.record_login(2, "10.0.0.2")
+    # Session ids are only unique within a shard
+    tracker.touch_session(1, 7)
+    tracker.touch_session(2, 7)
+
+    await tracker.flush()
+
+    for bind, user_id in (("shard0", 2), ("shard1", 1)):
+        updates = connections[bind].updates
+        assert updates[0] == ("users", [(user_id, f"10.0.0.{user_id}")])
+        assert [(table, [row[0] for row in rows]) for table, rows in updates[1:]] == [("user_sessions", [7])]
+        assert [row[0] for row in connections[bind].copied] == [user_id]
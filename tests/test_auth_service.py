@@ -0,0 +1,80 @@
+import uuid
+from datetime import datetime, timedelta
+
+import bcrypt
+import pytest
+from graphql import GraphQLError
+from sqlalchemy import select, update
+
+from app.core.services.auth_service import _DUMMY_PASSWORD_HASH, AuthService
+from app.database import async_session
+from app.models import User, UserSession
+from app.schemas.auth import LoginInput
+
+PASSWORD = "correct horse battery staple"
+
+
+def test_dummy_hash_is_a_valid_bcrypt_hash():
+    assert not bcrypt.checkpw(PASSWORD.encode(), _DUMMY_PASSWORD_HASH.encode())
+    assert _DUMMY_PASSWORD_HASH.startswith("$2b$12$")
+
+
+async def create_user() -> User:
+    name = f"auth_{uuid.uuid4().hex[:12]}"
+    async with async_session() as db:
+        user = User(
+            username=name,
+            email=f"{name}@example.com",
+            password_hash=bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(4)).decode(),
+            is_active=True,
+            is_deleted=False,
+            email_verified=True,
+        )
+        db.add(user)
+        await db.commit()
+        return user
+
+
+async def session_of(user_id: int) -> UserSession:
+    async with async_session() as db:
+        result = await db.execute(select(UserSession).where(UserSession.user_id == user_id))
+        return result.scalars().one()
+
+
+async def test_refresh_extends_the_session(database):
+    user = await create_user()
+    payload = await AuthService.login(LoginInput(identifier=user.username, password=PASSWORD), "127.0.0.1", "pytest")
+    async with async_session() as db:
+        await db.execute(
+            update(UserSession)
+            .where(UserSession.user_id == user.id)
+            .values(expires_at=datetime.utcnow() + timedelta(hours=1))
+        )
+        await db.commit()
+
+    await AuthService.refresh(payload.refresh_token, "127.0.0.1", "pytest")
+
+    session = await session_of(user.id)
+    assert session.expires_at > datetime.utcnow() + timedelta(days=1)
+
+
+async def test_refresh_rejects_an_expired_session(database):
+    user = await create_user()
+    payload = await AuthService.login(LoginInput(identifier=user.username, password=PASSWORD), "127.0.0.1", "pytest")
+    async with async_session() as db:
+        await db.execute(
+            update(UserSession)
+            .where(UserSession.user_id == user.id)
+            .values(expires_at=datetime.utcnow() - timedelta(seconds=1))
+        )
+        await db.commit()
+
+    with pytest.raises(GraphQLError, match="expired"):
+        await AuthService.refresh(payload.refresh_token, "127.0.0.1", "pytest")
+
+
+async def test_unknown_user_gets_the_same_error(database):
+    with pytest.raises(GraphQLError, match="Invalid credentials"):
+        await AuthService.login(
+            LoginInput(identifier=f"missing_{uuid.uuid4().hex}", password=PASSWORD), "127.0.0.2", "pytest"
+        )
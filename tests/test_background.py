@@ -0,0 +1,66 @@
+import asyncio
+
+from app.infrastructure.background import PeriodicFlusher, PeriodicTask
+
+
+class CountingTask(PeriodicTask):
+    name = "CountingTask"
+
+    def __init__(self, interval: float):
+        super().__init__(interval)
+        self.runs = 0
+
+    async def run_once(self) -> None:
+        self.runs += 1
+
+
+class CountingFlusher(PeriodicFlusher):
+    name = "CountingFlusher"
+
+    def __init__(self, flush_interval: float):
+        super().__init__(flush_interval)
+        self.flushes = 0
+
+    async def flush(self) -> None:
+        async with self.flush_lock:
+            self.flushes += 1
+
+
+# Built at import time, like the application's singletons
+task_built_without_a_loop = CountingTask(interval=60)
+
+
+async def test_wake_before_start_runs_immediately():
+    task = task_built_without_a_loop
+    task.wake()
+    task.start()
+    try:
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert task.runs == 1
+    finally:
+        await task.stop()
+
+
+async def test_restarts_on_a_new_loop():
+    # Re-uses the singleton started by the previous test, on that test's loop
+    task = task_built_without_a_loop
+    task.start()
+    try:
+        task.wake()
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert task.runs == 2
+    finally:
+        await task.stop()
+
+
+async def test_stop_flushes_once_more():
+    flusher = CountingFlusher(flush_interval=60)
+    flusher.start()
+    flusher.wake()
+    for _ in range(10):
+        await asyncio.sleep(0)
+    await flusher.stop()
+
+    assert flusher.flushes == 2
@@ -0,0 +1,24 @@
+import asyncio
+
+from benchmarks import runner
+from benchmarks.runner import BenchConfig, run_benchmark
+
+
+async def test_stragglers_are_cancelled_and_do_not_dilute_throughput(monkeypatch):
+    calls = []
+
+    async def scenario(client, context):
+        calls.append(None)
+        # Every fourth request hangs past the drain timeout
+        await asyncio.sleep(10 if len(calls) % 4 == 0 else 0.001)
+
+    monkeypatch.setitem(runner.SCENARIOS, "fake", scenario)
+    config = BenchConfig(mix={"fake": 1}, rate=200, duration=0.2, warmup=0, transport="http", drain_timeout=0.3)
+
+    report = await run_benchmark(config)
+
+    endpoint = report["endpoints"]["fake"]
+    assert endpoint["timed_out"] == report["timed_out"] == 10
+    assert endpoint["count"] == 30
+    # 30 completions over the ~0.2 s arrival window, not the 0.5 s including the drain
+    assert report["throughput_rps"] > 100
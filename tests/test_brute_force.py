@@ -0,0 +1,81 @@
+from app.core.security.brute_force import BruteForceDetector, LoginAttemptWriter, SlidingWindowCounter
+
+
+def test_counts_events_inside_the_window():
+    counter = SlidingWindowCounter(window_seconds=60, bucket_seconds=10)
+
+    assert counter.add("ip", timestamp=1000) == 1
+    assert counter.add("ip", timestamp=1005, amount=2) == 3
+    assert counter.add("ip", timestamp=1055) == 4
+    assert counter.count("ip", timestamp=1059) == 4
+    assert counter.count("other", timestamp=1059) == 0
+
+
+def test_old_buckets_slide_out():
+    counter = SlidingWindowCounter(window_seconds=60, bucket_seconds=10)
+    counter.add("ip", timestamp=1000)
+    counter.add("ip", timestamp=1030)
+
+    # The bucket of t=1000 leaves the window once six newer buckets exist
+    assert counter.count("ip", timestamp=1060) == 1
+    assert counter.count("ip", timestamp=1090) == 0
+
+
+def test_events_older_than_the_window_are_ignored():
+    counter = SlidingWindowCounter(window_seconds=60, bucket_seconds=10)
+    counter.add("ip", timestamp=2000)
+
+    assert counter.add("ip", timestamp=1900) == 1
+
+
+def test_jump_past_the_whole_window_clears_it():
+    counter = SlidingWindowCounter(window_seconds=60, bucket_seconds=10)
+    counter.add("ip", timestamp=1000, amount=5)
+
+    assert counter.add("ip", timestamp=5000) == 1
+
+
+def test_reset_and_prune():
+    counter = SlidingWindowCounter(window_seconds=60, bucket_seconds=10)
+    counter.add("a", timestamp=1000)
+    counter.add("b", timestamp=1050)
+    counter.reset("b")
+    assert counter.count("b", timestamp=1050) == 0
+
+    counter.add("c", timestamp=1100)
+    counter.prune(timestamp=1100)
+    assert len(counter) == 1 and counter.count("c", timestamp=1100) == 1
+
+
+def test_max_keys_evicts_the_oldest_key():
+    counter = SlidingWindowCounter(window_seconds=60, bucket_seconds=10, max_keys=2)
+    for key in ("a", "b", "c"):
+        counter.add(key)
+
+    assert len(counter) == 2
+    assert counter.count("a") == 0 and counter.count("c") == 1
+
+
+async def test_detector_blocks_after_max_failures():
+    detector = BruteForceDetector(
+        window_seconds=60, bucket_seconds=10, max_ip_failures=3, max_user_failures=2,
+        block_seconds=30, writer=LoginAttemptWriter(),
+    )
+
+    assert await detector.record_attempt("10.0.0.1", 7, False) is None
+    assert await detector.record_attempt("10.0.0.1", 7, False) is not None
+    assert detector.blocked_until(user_id=7) is not None
+    assert detector.blocked_until(ip_address="10.0.0.1") is None
+
+    await detector.record_attempt("10.0.0.1", None, False)
+    assert detector.blocked_until(ip_address="10.0.0.1") is not None
+
+
+async def test_success_clears_the_user_window():
+    detector = BruteForceDetector(
+        window_seconds=60, bucket_seconds=10, max_user_failures=2, writer=LoginAttemptWriter()
+    )
+    await detector.record_attempt("10.0.0.1", 7, False)
+    await detector.record_attempt("10.0.0.1", 7, True)
+
+    assert await detector.record_attempt("10.0.0.1", 7, False) is None
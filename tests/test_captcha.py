@@ -0,0 +1,80 @@
+import time
+
+import pytest
+
+from app.core.security.captcha import CaptchaError, CaptchaService, NonceSet
+
+
+def fixed_question() -> tuple[str, str]:
+    return "What is 2 + 2?", "4"
+
+
+def test_nonce_can_be_spent_once():
+    nonces = NonceSet(max_size=10)
+    expires_at = time.time() + 60
+
+    assert nonces.spend("a", expires_at)
+    assert not nonces.spend("a", expires_at)
+    assert len(nonces) == 1
+
+
+def test_expired_nonces_are_forgotten():
+    nonces = NonceSet(max_size=10)
+    nonces.spend("a", time.time() - 1)
+
+    assert nonces.spend("b", time.time() + 60)
+    assert len(nonces) == 1
+    assert nonces.spend("a", time.time() + 60)
+
+
+def test_a_full_set_evicts_the_oldest_nonces():
+    nonces = NonceSet(max_size=2)
+    expires_at = time.time() + 60
+    for nonce in ("a", "b", "c"):
+        assert nonces.spend(nonce, expires_at)
+
+    assert len(nonces) == 2
+    assert nonces.evicted == 1
+    assert not nonces.spend("c", expires_at)
+    assert nonces.spend("a", expires_at)
+
+
+async def test_correct_answer_is_accepted_once():
+    service = CaptchaService(question=fixed_question, nonces=NonceSet(max_size=10))
+    challenge = service.issue()
+
+    await service.verify(challenge.token, " 4 ")
+    with pytest.raises(CaptchaError, match="already been used"):
+        await service.verify(challenge.token, "4")
+
+
+async def test_a_wrong_answer_invalidates_the_token():
+    nonces = NonceSet(max_size=10)
+    service = CaptchaService(question=fixed_question, nonces=nonces)
+    challenge = service.issue()
+
+    with pytest.raises(CaptchaError, match="Incorrect"):
+        await service.verify(challenge.token, "5")
+    assert len(nonces) == 1
+    with pytest.raises(CaptchaError, match="already been used"):
+        await service.verify(challenge.token, "4")
+
+
+async def test_forged_and_expired_tokens_are_rejected_without_spending():
+    nonces = NonceSet(max_size=10)
+    service = CaptchaService(question=fixed_question, nonces=nonces)
+    token = service.issue().token
+
+    with pytest.raises(CaptchaError, match="Invalid"):
+        await service.verify(token.replace("cc1.", "cc1.x", 1), "4")
+    expired = CaptchaService(ttl_seconds=-10, question=fixed_question, nonces=nonces).issue()
+    with pytest.raises(CaptchaError, match="expired"):
+        await service.verify(expired.token, "4")
+    assert len(nonces) == 0
+
+
+async def test_a_full_nonce_set_does_not_reject_valid_answers():
+    service = CaptchaService(question=fixed_question, nonces=NonceSet(max_size=1))
+
+    await service.verify(service.issue().token, "4")
+    await service.verify(service.issue().token, "4")
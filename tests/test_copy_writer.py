@@ -0,0 +1,128 @@
+from contextlib import asynccontextmanager
+
+import asyncpg
+import pytest
+
+from app.infrastructure import copy_writer
+
+
+class Writer(copy_writer.BufferedCopyWriter):
+    name = "TestWriter"
+    table = "rows"
+    columns = ("value",)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.copied = []
+        self.down = False
+
+    async def copy_records_to_table(self, table, schema_name, columns, records):
+        if self.down:
+            raise ConnectionError("connection refused")
+        if any(record[0] == "bad" for record in records):
+            raise asyncpg.DataError("invalid input syntax")
+        self.copied.extend(records)
+
+
+@pytest.fixture
+def connection(monkeypatch):
+    conn = FakeConnection()
+
+    @asynccontextmanager
+    async def fake_asyncpg_connection(bind=None):
+        yield conn
+
+    monkeypatch.setattr(copy_writer, "asyncpg_connection", fake_asyncpg_connection)
+    return conn
+
+
+async def fill(writer, values):
+    for value in values:
+        assert await writer.enqueue((value,))
+
+
+async def test_flush_writes_rows_in_batches(connection):
+    writer = Writer(capacity=100, batch_size=2, flush_interval=60, block_timeout=0)
+    await fill(writer, ["a", "b", "c"])
+
+    await writer.flush()
+
+    assert connection.copied == [("a",), ("b",), ("c",)]
+    assert len(writer) == 0 and writer.written == 3
+
+
+async def test_rejected_rows_are_isolated_after_max_attempts(connection):
+    writer = Writer(capacity=100, batch_size=10, flush_interval=60, block_timeout=0, max_attempts=2)
+    await fill(writer, ["a", "bad", "b", "c", "bad", "d"])
+
+    for _ in range(2):
+        with pytest.raises(asyncpg.DataError):
+            await writer.flush()
+        assert len(writer) == 6
+
+    await writer.flush()
+
+    assert connection.copied == [("a",), ("b",), ("c",), ("d",)]
+    assert writer.rejected == 2 and len(writer) == 0
+
+
+async def test_connection_errors_keep_the_batch(connection):
+    writer = Writer(capacity=100, batch_size=10, flush_interval=60, block_timeout=0, max_attempts=1)
+    await fill(writer, ["a", "b"])
+    connection.down = True
+
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            await writer.flush()
+
+    assert len(writer) == 2 and writer.rejected == 0
+    connection.down = False
+    await writer.flush()
+    assert connection.copied == [("a",), ("b",)]
+
+
+async def test_full_buffer_drops_after_block_timeout(connection):
+    writer = Writer(capacity=1, batch_size=10, flush_interval=60, block_timeout=0.01)
+    assert await writer.enqueue(("a",))
+
+    assert not await writer.enqueue(("b",))
+    assert writer.dropped == 1
+
+
+class UserWriter(Writer):
+    columns = ("user_id", "value")
+    user_column = 0
+
+
+class FakeRouter:
+    engines = ["shard0", "shard1"]
+
+    def shard_for(self, user_id):
+        return user_id % 2
+
+
+async def test_rows_are_written_to_their_users_shard(monkeypatch):
+    connections = {"shard0": FakeConnection(), "shard1": FakeConnection()}
+
+    @asynccontextmanager
+    async def fake_asyncpg_connection(bind=None):
+        yield connections[bind]
+
+    monkeypatch.setattr(copy_writer, "asyncpg_connection", fake_asyncpg_connection)
+    monkeypatch.setattr(copy_writer, "shard_router", FakeRouter())
+    writer = UserWriter(capacity=100, batch_size=10, flush_interval=60, block_timeout=0)
+    for record in ((1, "a"), (2, "b"), (None, "c"), (3, "d")):
+        assert await writer.enqueue(record)
+    connections["shard1"].down = True
+
+    # A shard that is down keeps its rows without holding up the others
+    with pytest.raises(ConnectionError):
+        await writer.flush()
+    assert connections["shard0"].copied == [(2, "b"), (None, "c")]
+    assert len(writer) == 2
+
+    connections["shard1"].down = False
+    await writer.flush()
+    assert connections["shard1"].copied == [(1, "a"), (3, "d")]
+    assert len(writer) == 0
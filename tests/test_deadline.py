@@ -0,0 +1,145 @@
+import asyncio
+import json
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.core import deadline as deadline_module
+from app.core.deadline import DeadlineExceeded, check, deadline_after, no_deadline, remaining, statement_timeout_ms
+from app.database import async_session
+from app.middleware.deadline import DeadlineMiddleware
+
+
+def test_no_deadline_by_default():
+    assert remaining() is None
+    assert statement_timeout_ms() is None
+    check()
+
+
+def test_deadline_after_sets_and_restores_the_deadline():
+    with deadline_after(5):
+        assert 4.9 < remaining() <= 5
+        assert 4900 < statement_timeout_ms() <= 5000
+    assert remaining() is None
+
+
+def test_nested_deadlines_keep_the_earlier_one():
+    with deadline_after(1) as outer:
+        with deadline_after(10) as inner:
+            assert inner == outer
+        with deadline_after(0.5) as inner:
+            assert inner < outer
+
+
+def test_passed_deadline_raises():
+    with deadline_after(-1):
+        assert remaining() < 0
+        with pytest.raises(DeadlineExceeded):
+            check()
+        with pytest.raises(DeadlineExceeded):
+            statement_timeout_ms()
+
+
+def test_statement_timeout_is_never_zero(monkeypatch):
+    with deadline_after(1) as deadline:
+        monkeypatch.setattr(deadline_module.time, "monotonic", lambda: deadline - 0.0004)
+        assert statement_timeout_ms() == 1
+
+
+def test_no_deadline_suspends_the_current_one():
+    with deadline_after(1):
+        with no_deadline():
+            assert remaining() is None
+        assert remaining() is not None
+
+
+async def test_tasks_inherit_the_deadline():
+    async def left():
+        return remaining()
+
+    with deadline_after(2):
+        task = asyncio.create_task(left())
+    assert remaining() is None
+    assert 1.9 < await task <= 2
+
+
+def request(headers=()):
+    return {"type": "http", "method": "POST", "path": "/graphql", "headers": list(headers), "query_string": b""}
+
+
+def receiving(body: bytes = b"{}"):
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.Event().wait()
+
+    return receive
+
+
+async def run_middleware(app, scope, **kwargs):
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    await DeadlineMiddleware(app, **kwargs)(scope, receiving(), send)
+    return sent
+
+
+def test_budget_comes_from_header_then_operation_then_default():
+    middleware = DeadlineMiddleware(None, default_ms=1000, max_ms=5000, operation_ms={"allUsers": 3000})
+    body = json.dumps({"query": "query allUsers { allUsers { id } }", "operationName": "allUsers"}).encode()
+
+    assert middleware.budget(request([(b"x-request-timeout-ms", b"200")]), body) == 0.2
+    assert middleware.budget(request([(b"x-request-timeout-ms", b"99999")]), body) == 5
+    assert middleware.budget(request(), body) == 3
+    assert middleware.budget(request(), b"{}") == 1
+
+
+async def test_requests_run_under_their_deadline():
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(remaining())
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    sent = await run_middleware(app, request(), default_ms=1000)
+
+    assert 0.9 < seen[0] <= 1
+    assert sent[0]["status"] == 200
+
+
+async def test_requests_past_their_deadline_are_cancelled_with_504():
+    cancelled = []
+
+    async def app(scope, receive, send):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    sent = await run_middleware(app, request(), default_ms=20)
+
+    assert cancelled == [True]
+    assert sent[0]["status"] == 504
+    assert json.loads(sent[1]["body"])["errors"][0]["extensions"]["code"] == "DEADLINE_EXCEEDED"
+
+
+async def test_transactions_under_a_deadline_get_a_statement_timeout(database):
+    with deadline_after(0.2):
+        async with async_session() as db:
+            timeout = (await db.execute(text("SHOW statement_timeout"))).scalar()
+            assert timeout.endswith("ms") and 0 < int(timeout[:-2]) <= 200
+        async with async_session() as db:
+            with pytest.raises(DBAPIError, match="statement timeout"):
+                await db.execute(text("SELECT pg_sleep(1)"))
+
+    with deadline_after(-1):
+        async with async_session() as db:
+            with pytest.raises(DeadlineExceeded):
+                await db.execute(text("SELECT 1"))
@@ -0,0 +1,69 @@
+"""
+EXPLAIN regression test for the hot-path user queries.
+
+Renders each query builder from `app.crud` to SQL, runs ``EXPLAIN (FORMAT JSON)``
+against the test database and asserts that the plan uses the partial or
+expression index the query was written for, e.g. that a predicate was not
+rewritten in a way that no longer implies the index predicate. Sequential
+scans are disabled so the result does not depend on how many rows the tables hold.
+"""
+
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import asyncpg
+
+from app import crud
+from app.database import asyncpg_connection
+from app.models import User
+
+NOW = datetime(2026, 1, 1)
+
+HOT_QUERIES = {
+    "user_record_by_email": (
+        select(*crud.USER_RECORD_COLUMNS).where(crud.email_matches("Someone@Example.com"), crud.live_users()),
+        "uq_users_email_lower",
+    ),
+    "user_search": (crud.select_user_search("jdoe", 20), "ix_users_username_trgm"),
+    "live_users": (crud.select_live_users(User.id).limit(100), "ix_users_live_id"),
+    "expired_unverified_users": (
+        crud.select_expired_unverified_users(NOW).limit(1000),
+        "ix_users_unverified_code_expiry",
+    ),
+    "active_sessions": (crud.select_active_sessions(1), "ix_user_sessions_live_user_id"),
+    "live_user_roles": (crud.select_live_user_roles(1), "ix_user_roles_live_user_id"),
+    "pending_jobs": (crud.select_pending_jobs(NOW, 100), "ix_user_job_queue_pending"),
+}
+
+
+def render(statement) -> str:
+    """Compiles a SQLAlchemy statement to PostgreSQL SQL with inlined parameters."""
+    # The asyncpg dialect does not double `%`, which the trigram `%` operator relies on
+    return str(statement.compile(dialect=asyncpg.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def plan_indexes(plan: dict) -> set:
+    """Collects every index name referenced anywhere in an EXPLAIN JSON plan node."""
+    names = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", ()):
+        names |= plan_indexes(child)
+    return names
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+async def test_hot_query_uses_its_index(database, name):
+    statement, index = HOT_QUERIES[name]
+    async with asyncpg_connection() as conn:
+        async with conn.transaction():
+            await conn.execute("SET LOCAL enable_seqscan = off")
+            raw = await conn.fetchval(f"EXPLAIN (FORMAT JSON) {render(statement)}")
+
+    plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+    assert index in plan_indexes(plan)
+
+
+def test_live_users_predicate_matches_the_index():
+    # The partial index is defined with `is_deleted = false`; the predicate must render the same way
+    assert "is_deleted = false" in render(select(User.id).where(crud.live_users()))
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from app.middleware.idempotency import (
+    IdempotencyKeyInProgress,
+    IdempotencyKeyMismatch,
+    IdempotencyStore,
+    StoredResponse,
+)
+
+RESPONSE = StoredResponse(status=200, headers=[("content-type", "application/json")], body=b'{"data": {}}')
+
+
+async def test_first_claim_owns_the_key_and_completion_is_replayed():
+    store = IdempotencyStore()
+
+    assert await store.claim("key", "request") is None
+    await store.complete("key", RESPONSE)
+
+    assert await store.claim("key", "request") == RESPONSE
+
+
+async def test_reusing_a_key_for_another_request_is_rejected():
+    store = IdempotencyStore()
+    await store.claim("key", "request")
+
+    with pytest.raises(IdempotencyKeyMismatch):
+        await store.claim("key", "other request")
+
+
+async def test_release_lets_the_next_request_execute():
+    store = IdempotencyStore()
+    await store.claim("key", "request")
+    await store.release("key")
+
+    assert await store.claim("key", "request") is None
+
+
+async def test_duplicates_wait_for_the_owner():
+    store = IdempotencyStore()
+    await store.claim("key", "request")
+
+    duplicate = asyncio.ensure_future(store.claim("key", "request"))
+    await asyncio.sleep(0)
+    assert not duplicate.done()
+
+    await store.complete("key", RESPONSE)
+    assert await duplicate == RESPONSE
+
+
+async def test_a_waiting_duplicate_takes_over_a_released_key():
+    store = IdempotencyStore()
+    await store.claim("key", "request")
+
+    duplicate = asyncio.ensure_future(store.claim("key", "request"))
+    await asyncio.sleep(0)
+    await store.release("key")
+
+    assert await duplicate is None
+    with pytest.raises(IdempotencyKeyInProgress):
+        await store.claim("key", "request", timeout=0.01)
+
+
+async def test_duplicates_give_up_after_the_timeout():
+    store = IdempotencyStore()
+    await store.claim("key", "request")
+
+    with pytest.raises(IdempotencyKeyInProgress):
+        await store.claim("key", "request", timeout=0.01)
+
+
+async def test_an_abandoned_claim_expires_after_the_lock_period():
+    store = IdempotencyStore(lock_seconds=0)
+    await store.claim("key", "request")
+
+    assert await store.claim("key", "request") is None
+
+
+async def test_oldest_entries_are_evicted_beyond_max_entries():
+    store = IdempotencyStore(max_entries=2)
+    for key in ("a", "b", "c"):
+        await store.claim(key, "request")
+        await store.complete(key, RESPONSE)
+
+    assert await store.claim("a", "request") is None
+    assert await store.claim("c", "request") == RESPONSE
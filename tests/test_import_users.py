@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from app.tools.import_users import ImportRecord, Rejection, read_records, validate
+
+HASH = "$2b$12$qqnM/7luED4SBsf211EzGel.nJ2mgTBF82otB0HcmwSYpMrcJdLm."
+
+
+def test_valid_record_is_cleaned():
+    record = validate(1, {
+        "username": " ann ",
+        "email": "ann@example.com",
+        "password_hash": HASH,
+        "email_verified": "yes",
+        "created_at": "2024-05-01T12:00:00+02:00",
+    })
+
+    assert isinstance(record, ImportRecord)
+    assert (record.username, record.password, record.password_hash) == ("ann", None, HASH)
+    assert record.email_verified
+    assert record.created_at == datetime(2024, 5, 1, 10, 0)
+
+
+def test_validation_failures_are_rejected_with_a_reason():
+    assert validate(1, {"username": "ann", "email": "nope", "password": "x"}).reason == "invalid_email"
+    assert validate(2, {"username": "ann", "email": "ann@example.com"}).reason == "missing_password"
+    assert validate(3, {"username": "ann", "email": "ann@example.com", "password_hash": "md5"}).reason == "unsupported_password_hash"
+
+
+def test_records_of_the_wrong_shape_are_invalid():
+    assert validate(1, None) == Rejection(1, "", "", "invalid_record")
+    assert validate(2, ["ann"]) == Rejection(2, "", "", "invalid_record")
+    rejection = validate(3, {"username": "ann", "email": "ann@example.com", "phone_number": 5551234, "password": "x"})
+    assert rejection == Rejection(3, "ann", "ann@example.com", "invalid_record")
+
+
+def test_malformed_ndjson_lines_do_not_stop_reading(tmp_path):
+    path = tmp_path / "users.ndjson"
+    path.write_text('{"username": "ann"}\n{not json\n\n[1, 2]\n{"username": "bea"}\n', encoding="utf-8")
+
+    assert list(read_records(str(path), "ndjson")) == [{"username": "ann"}, None, [1, 2], {"username": "bea"}]
@@ -0,0 +1,41 @@
+import asyncio
+import time
+
+import pytest
+
+from app.infrastructure.profiling.loop_watchdog import LoopWatchdog, SlowCallbackError, fail_on_slow_callbacks
+
+
+async def test_fail_on_slow_callbacks_raises_for_a_blocking_call():
+    with pytest.raises(SlowCallbackError, match="took longer than 20 ms"):
+        async with fail_on_slow_callbacks(20):
+            time.sleep(0.1)
+
+
+async def test_fail_on_slow_callbacks_passes_and_restores_the_loop():
+    loop = asyncio.get_running_loop()
+    debug, duration = loop.get_debug(), loop.slow_callback_duration
+
+    async with fail_on_slow_callbacks(200) as handler:
+        await asyncio.sleep(0.01)
+
+    assert handler.slow == []
+    assert (loop.get_debug(), loop.slow_callback_duration) == (debug, duration)
+
+
+async def test_watchdog_reports_the_blocking_stack_and_operation(capsys):
+    watchdog = LoopWatchdog(interval=0.01, block_threshold=0.05)
+    watchdog.start()
+    try:
+        await asyncio.sleep(0.05)
+        watchdog.operation_started("allUsers")
+        time.sleep(0.3)
+        watchdog.operation_finished()
+        await asyncio.sleep(0.05)
+    finally:
+        await watchdog.stop()
+
+    output = capsys.readouterr().out
+    assert "[LoopWatchdog] Event loop blocked" in output
+    assert "operation allUsers" in output
+    assert "test_watchdog_reports_the_blocking_stack_and_operation" in output
@@ -0,0 +1,57 @@
+import gzip
+import os
+from contextlib import asynccontextmanager
+from datetime import date
+
+from app.infrastructure.partitions.partition_manager import PartitionManager, add_months, partition_name
+
+
+class FakeConnection:
+    def __init__(self, stray_rows: int):
+        self.stray_rows = stray_rows
+        self.statements = []
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def fetchval(self, query, *args):
+        return True if "to_regclass" in query else self.stray_rows > 0
+
+    async def execute(self, query, *args):
+        self.statements.append(query)
+        if query.startswith("DELETE"):
+            return f"DELETE {self.stray_rows}"
+        return "OK"
+
+    async def copy_from_query(self, query, *args, output, format, header):
+        self.statements.append(f"COPY {query}")
+        await output(b"id,created_at\n1,2020-01-01\n")
+
+
+def test_month_helpers():
+    assert add_months(date(2026, 11, 15), 2) == date(2027, 1, 1)
+    assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+    assert partition_name("audit_logs", date(2026, 3, 1)) == "audit_logs_p2026_03"
+
+
+async def test_default_partition_rows_past_retention_are_archived_and_deleted(tmp_path):
+    conn = FakeConnection(stray_rows=3)
+    manager = PartitionManager({"audit_logs": "created_at"})
+
+    deleted = await manager.purge_default_before("audit_logs", date(2026, 1, 1), str(tmp_path), conn)
+
+    assert deleted == 3
+    assert conn.statements[0].startswith("LOCK TABLE chrome_users.audit_logs_default")
+    assert conn.statements[1] == "COPY SELECT * FROM chrome_users.audit_logs_default WHERE created_at < $1"
+    assert conn.statements[2] == "DELETE FROM chrome_users.audit_logs_default WHERE created_at < $1"
+    archive = tmp_path / "chrome_users.audit_logs_default_before_2026_01.csv.gz"
+    assert gzip.decompress(archive.read_bytes()).startswith(b"id,created_at")
+    assert not os.path.exists(f"{archive}.partial")
+
+
+async def test_empty_default_partition_is_left_alone():
+    conn = FakeConnection(stray_rows=0)
+
+    assert await PartitionManager({"audit_logs": "created_at"}).purge_default_before("audit_logs", date(2026, 1, 1), None, conn) == 0
+    assert conn.statements == []
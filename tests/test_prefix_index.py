@@ -0,0 +1,89 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from app.core.cache import prefix_index
+from app.core.cache.prefix_index import PrefixIndex
+
+
+def test_search_returns_distinct_ids_in_key_order():
+    index = PrefixIndex()
+    index.add(2, "bob", "bob@example.com")
+    index.add(1, "Alice", "alice@example.com")
+    index.add(3, "alicia", "ALI@example.com")
+
+    assert index.search("ali", 10) == [3, 1]
+    assert index.search("AL", 1) == [3]
+    assert index.search("bob", 10) == [2]
+    assert index.search("carol", 10) == []
+
+
+def test_add_skips_exact_duplicates():
+    index = PrefixIndex()
+    index.add(1, "alice", "alice@example.com")
+    index.add(1, "ALICE", "alice@example.com")
+    index.add(2, "alice")
+
+    assert len(index) == 3
+    assert sorted(index.search("alice", 10)) == [1, 2]
+
+
+async def test_merge_combines_existing_and_new_entries():
+    index = PrefixIndex()
+    index.add(1, "alice", "alice@example.com")
+
+    await index.merge([(2, "Bob", "bob@example.com"), (1, "alice", "alice@example.com")])
+
+    assert len(index) == 4
+    assert index.search("a", 10) == [1]
+    assert index.search("b", 10) == [2]
+
+
+async def test_merge_sorts_a_copy_and_replays_concurrent_adds(monkeypatch):
+    index = PrefixIndex()
+    index.add(1, "alice")
+    to_thread = asyncio.to_thread
+
+    async def add_while_sorting(func, arrays, rows):
+        # Simulates a registration event handled while the helper thread sorts
+        index.add(9, "zed", "aaron@example.com")
+        assert arrays == (["alice"], prefix_index.array("q", [1]))
+        return await to_thread(func, arrays, rows)
+
+    monkeypatch.setattr(prefix_index.asyncio, "to_thread", add_while_sorting)
+    await index.merge([(2, "bob", "bob@example.com")])
+
+    assert index.search("a", 10) == [9, 1]
+    assert index.search("zed", 10) == [9]
+    assert index.search("bob", 10) == [2]
+    assert len(index) == 5
+
+
+class FakeUsersConnection:
+    def __init__(self):
+        self.visible = []
+
+    async def fetch(self, statement, after, limit):
+        rows = sorted(row for row in self.visible if row[0] > after)[:limit]
+        return [{"id": user_id, "username": username, "email": email} for user_id, username, email in rows]
+
+
+async def test_loader_picks_up_ids_that_commit_out_of_order(monkeypatch):
+    conn = FakeUsersConnection()
+
+    @asynccontextmanager
+    async def fake_asyncpg_connection(bind=None):
+        yield conn
+
+    monkeypatch.setattr(prefix_index, "asyncpg_connection", fake_asyncpg_connection)
+    index = PrefixIndex()
+    loader = prefix_index.PrefixIndexLoader(index, batch_size=2, rescan_ids=10)
+
+    # User 2's registration is still uncommitted when 1 and 3 are read
+    conn.visible = [(1, "ann", "ann@example.com"), (3, "cid", "cid@example.com")]
+    await loader.run_once()
+    conn.visible += [(2, "bea", "bea@example.com"), (4, "dan", "dan@example.com")]
+    await loader.run_once()
+
+    assert index.last_user_id == 4
+    assert index.search("bea", 10) == [2]
+    assert len(index) == 8
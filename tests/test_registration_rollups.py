@@ -0,0 +1,111 @@
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.core.services import stats_service
+from app.core.services.stats_service import RegistrationStatsService
+from app.database import async_session
+from app.infrastructure.rollups import registration_rollups
+from app.infrastructure.rollups.registration_rollups import RegistrationRollups, rollup_key
+from app.models import RegistrationRollup
+
+
+def test_rollup_key_buckets_by_hour_and_normalises_dimensions():
+    created_at = datetime(2026, 3, 1, 12, 34, 56, 789, tzinfo=timezone.utc)
+
+    assert rollup_key(created_at, "web", "https://example.com") == (datetime(2026, 3, 1, 12), "web", "https://example.com")
+    assert rollup_key(created_at, None, None) == (datetime(2026, 3, 1, 12), "", "")
+    assert rollup_key(created_at, "x" * 60, "y" * 300)[1:] == ("x" * 50, "y" * 255)
+
+
+class FakeConnection:
+    def __init__(self, fail_after: int):
+        self.fail_after = fail_after
+        self.batches = []
+
+    async def execute(self, query, buckets, vias, referrers, registrations, verifications):
+        if len(self.batches) == self.fail_after:
+            raise ConnectionError("connection refused")
+        self.batches.append(list(zip(buckets, registrations, verifications)))
+
+
+async def test_failed_flush_puts_unwritten_deltas_back(monkeypatch):
+    conn = FakeConnection(fail_after=1)
+
+    @asynccontextmanager
+    async def fake_asyncpg_connection():
+        yield conn
+
+    monkeypatch.setattr(registration_rollups, "asyncpg_connection", fake_asyncpg_connection)
+    rollups = RegistrationRollups(flush_interval=60, batch_size=1)
+    first, second = (rollup_key(datetime(2026, 3, 1, hour), "web", None) for hour in (1, 2))
+    rollups.record_registration(first)
+    rollups.record_registration(second)
+    rollups.record_verification(second)
+
+    with pytest.raises(ConnectionError):
+        await rollups.flush()
+
+    assert conn.batches == [[(first[0], 1, 0)]]
+    # Deltas recorded after the failed flush are added to the ones put back
+    rollups.record_registration(second)
+    assert rollups._pending == {second: [2, 1]}
+
+    conn.fail_after = None
+    await rollups.flush()
+    assert conn.batches[-1] == [(second[0], 2, 1)]
+    assert len(rollups) == 0
+
+
+async def test_registration_stats_groups_only_by_the_requested_dimensions(monkeypatch):
+    statements = []
+
+    class FakeSession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc_info):
+            return False
+
+        async def execute(self, stmt):
+            statements.append(str(stmt.compile(dialect=postgresql.dialect())))
+            return self
+
+        def all(self):
+            return []
+
+    monkeypatch.setattr(stats_service, "async_session", FakeSession)
+    start, end = datetime(2026, 3, 1), datetime(2026, 3, 8)
+
+    await RegistrationStatsService.registration_stats(start, end, period="week", by_referrer=True)
+    await RegistrationStatsService.registration_stats(start, end, period=None)
+
+    assert "GROUP BY date_trunc('week', chrome_users.registration_rollups.bucket), chrome_users.registration_rollups.referrer" in statements[0]
+    assert "GROUP BY" not in statements[1]
+    with pytest.raises(ValueError):
+        await RegistrationStatsService.registration_stats(start, end, period="fortnight")
+    with pytest.raises(ValueError):
+        await RegistrationStatsService.registration_stats(end, start)
+
+
+async def test_registration_stats_sums_buckets_per_group(database):
+    # A range of its own, far from rows other tests or earlier runs may have added
+    start = datetime(1990, 1, 1) + timedelta(days=datetime.utcnow().microsecond)
+    async with async_session() as db:
+        db.add_all([
+            RegistrationRollup(bucket=start, registered_via="web", referrer="", registrations=3, verifications=1),
+            RegistrationRollup(bucket=start + timedelta(hours=5), registered_via="app", referrer="", registrations=2, verifications=2),
+            RegistrationRollup(bucket=start + timedelta(days=1), registered_via="web", referrer="", registrations=4, verifications=0),
+        ])
+        await db.commit()
+
+    end = start + timedelta(days=2)
+    by_day = await RegistrationStatsService.registration_stats(start, end, period="day")
+    by_via = await RegistrationStatsService.registration_stats(start, end, period=None, by_registered_via=True)
+
+    assert [(row.period, row.registrations, row.verifications) for row in by_day] == [
+        (start, 5, 3), (start + timedelta(days=1), 4, 0),
+    ]
+    assert [(row.registered_via, row.registrations) for row in by_via] == [("app", 2), ("web", 7)]
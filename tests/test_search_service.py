@@ -0,0 +1,37 @@
+from collections import namedtuple
+
+from sqlalchemy.dialects import postgresql
+
+from app.core.cache.user_cache import UserRecord
+from app.core.services import search_service
+from app.core.services.search_service import UserSearchService
+
+Row = namedtuple("Row", UserRecord._fields + ("score",))
+
+
+class FakeRouter:
+    sharded = True
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+
+    async def scatter_gather(self, statement, *, key, limit=None):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        return sorted(self.rows, key=key)[:limit]
+
+
+async def test_sharded_search_merges_shards_by_score(monkeypatch):
+    fields = {name: None for name in UserRecord._fields}
+    rows = [
+        Row(**{**fields, "id": 3, "username": "annie", "score": 0.5}),
+        Row(**{**fields, "id": 2, "username": "ann", "score": 1.0}),
+        Row(**{**fields, "id": 1, "username": "anne", "score": 0.5}),
+    ]
+    router = FakeRouter(rows)
+    monkeypatch.setattr(search_service, "shard_router", router)
+
+    records = await UserSearchService.search_users("ann", first=2)
+
+    assert [(type(record), record.id) for record in records] == [(UserRecord, 2), (UserRecord, 1)]
+    assert "AS score" in router.statements[0] and "LIMIT" in router.statements[0]
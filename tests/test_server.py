@@ -0,0 +1,28 @@
+import time
+
+from app.server import STARTUP_FAILURE_STATUS, Master
+
+
+def test_startup_failures_back_off_exponentially_then_stop():
+    master = Master(workers=1, max_startup_failures=4, max_respawn_delay=3)
+    delays = []
+    for pid in range(3):
+        master._replace(pid, STARTUP_FAILURE_STATUS)
+        delays.append(round(master._respawn_at - time.monotonic()))
+
+    assert delays == [1, 2, 3]
+    assert master._pending_spawns == 3
+    assert not master.stopping
+
+    master._replace(3, STARTUP_FAILURE_STATUS)
+    assert master.stopping
+    assert master.startup_failures == 4
+
+
+def test_a_worker_that_started_resets_the_failure_count():
+    master = Master(workers=1)
+    master._replace(1, STARTUP_FAILURE_STATUS)
+    master._replace(2, 0)
+
+    assert master.startup_failures == 0
+    assert master._pending_spawns == 2
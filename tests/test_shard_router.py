@@ -0,0 +1,135 @@
+import uuid
+from collections import Counter
+
+import asyncpg
+import pytest
+from sqlalchemy import func, select, text
+
+from app.infrastructure.sharding.shard_router import (
+    CO_LOCATED_TABLES,
+    SHARD_DATABASE_URLS,
+    DirectoryConflict,
+    ShardRouter,
+    jump_hash,
+    shard_of,
+)
+from app.models import User, UserDirectory
+from app.tools.rebalance_shards import SCHEMA, _columns, driver_url, move_user, rebuild_directory
+
+
+def test_jump_hash_stays_in_range_and_is_deterministic():
+    for key in (0, 1, 2**32, 2**64 - 1):
+        for buckets in (1, 2, 7, 64):
+            bucket = jump_hash(key, buckets)
+            assert 0 <= bucket < buckets
+            assert jump_hash(key, buckets) == bucket
+
+
+def test_jump_hash_only_moves_keys_to_the_new_bucket():
+    for key in range(0, 2**40, 2**40 // 997):
+        for buckets in range(1, 12):
+            before, after = jump_hash(key, buckets), jump_hash(key, buckets + 1)
+            assert after in (before, buckets)
+
+
+def test_shard_of_spreads_users_evenly():
+    counts = Counter(shard_of(user_id, 4) for user_id in range(1, 40001))
+
+    assert sorted(counts) == [0, 1, 2, 3]
+    assert all(8000 < count < 12000 for count in counts.values())
+    assert shard_of(12345, 1) == 0
+
+
+def test_growing_by_one_shard_moves_about_its_share_of_users():
+    moved = sum(shard_of(user_id, 4) != shard_of(user_id, 5) for user_id in range(1, 20001))
+
+    assert 3000 < moved < 5000
+
+
+async def reserve_user(router: ShardRouter) -> tuple[int, str]:
+    name = f"shard_{uuid.uuid4().hex[:12]}"
+    return await router.reserve(name, f"{name}@example.com"), name
+
+
+async def test_users_are_placed_on_their_hashed_shard(shards):
+    user_id, name = await reserve_user(shards)
+    shard = shards.shard_for(user_id)
+    async with shards.session_for(user_id) as session:
+        session.add(User(id=user_id, username=name, email=f"{name}@example.com"))
+        await session.commit()
+
+    async with shards.directory_session() as session:
+        recorded = (await session.execute(select(UserDirectory.shard).where(UserDirectory.user_id == user_id))).scalar()
+    assert recorded == shard
+    assert await shards.locate(email=f"{name.upper()}@example.com") == user_id
+
+    async def count(session):
+        return (await session.execute(select(func.count()).where(User.id == user_id))).scalar()
+
+    found = await shards.scatter(count)
+    assert found == [1 if index == shard else 0 for index in range(shards.count)]
+
+
+async def test_phone_numbers_are_unique_across_shards(shards):
+    phone_number = f"+1{uuid.uuid4().int % 10**10:010d}"
+    name = f"shard_{uuid.uuid4().hex[:12]}"
+    user_id = await shards.reserve(name, f"{name}@example.com", phone_number)
+
+    with pytest.raises(DirectoryConflict) as conflict:
+        await shards.reserve(f"{name}_2", f"{name}_2@example.com", phone_number)
+
+    assert set(conflict.value.fields) == {"phone_number"}
+    assert await shards.locate(email="nobody@example.com", phone_number=phone_number) == user_id
+
+
+async def test_rebuild_adds_users_missing_from_the_directory(shards):
+    name = f"shard_{uuid.uuid4().hex[:12]}"
+    phone_number = f"+1{uuid.uuid4().int % 10**10:010d}"
+    connections = [await asyncpg.connect(driver_url(url)) for url in SHARD_DATABASE_URLS]
+    try:
+        user_id = await connections[0].fetchval(f"SELECT nextval(pg_get_serial_sequence('{SCHEMA}.user_directory', 'user_id'))")
+        await connections[1].execute(
+            f"INSERT INTO {SCHEMA}.users (id, username, email, phone_number) VALUES ($1, $2, $3, $4)",
+            user_id, name, f"{name}@Example.com", phone_number,
+        )
+
+        await rebuild_directory(connections, batch_size=1000)
+
+        entry = await connections[0].fetchrow(f"SELECT * FROM {SCHEMA}.user_directory WHERE user_id = $1", user_id)
+        assert (entry["shard"], entry["email_lower"], entry["phone_number"]) == (1, f"{name}@example.com", phone_number)
+    finally:
+        for conn in connections:
+            await conn.close()
+
+
+async def test_scatter_gather_merges_rows_in_order(shards):
+    statement = text("SELECT g FROM generate_series(1, 5) AS g ORDER BY g DESC LIMIT 4")
+
+    rows = await shards.scatter_gather(statement, key=lambda row: -row[0], limit=6)
+
+    expected = sorted([5, 4, 3, 2] * shards.count, reverse=True)[:6]
+    assert [row[0] for row in rows] == expected
+
+
+async def test_rebalance_moves_a_user_to_its_hashed_shard(shards):
+    user_id, name = await reserve_user(shards)
+    target = shards.shard_for(user_id)
+    source = (target + 1) % shards.count
+    connections = [await asyncpg.connect(driver_url(url)) for url in SHARD_DATABASE_URLS]
+    try:
+        directory = connections[0]
+        await connections[source].execute(
+            f"INSERT INTO {SCHEMA}.users (id, username, email) VALUES ($1, $2, $3)", user_id, name, f"{name}@example.com"
+        )
+        await directory.execute(f"UPDATE {SCHEMA}.user_directory SET shard = $2 WHERE user_id = $1", user_id, source)
+        columns = {table: await _columns(directory, table, surrogate) for table, _, surrogate in CO_LOCATED_TABLES}
+
+        copied = await move_user(user_id, connections[source], connections[target], directory, target, columns)
+
+        assert copied == 1
+        assert await connections[target].fetchval(f"SELECT username FROM {SCHEMA}.users WHERE id = $1", user_id) == name
+        assert await connections[source].fetchval(f"SELECT count(*) FROM {SCHEMA}.users WHERE id = $1", user_id) == 0
+        assert await directory.fetchval(f"SELECT shard FROM {SCHEMA}.user_directory WHERE user_id = $1", user_id) == target
+    finally:
+        for conn in connections:
+            await conn.close()
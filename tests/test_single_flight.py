@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+from graphql import ExecutionResult
+
+from app.graphql.single_flight import SingleFlight, _Flight
+
+
+async def test_waiter_receives_the_shared_result():
+    extension = SingleFlight(timeout=1)
+    flight = _Flight()
+    result = ExecutionResult(data={"allUsers": []})
+
+    waiter = asyncio.ensure_future(extension._wait(flight, "query"))
+    await asyncio.sleep(0)
+    assert flight.waiters == 1
+    flight.future.set_result(result)
+
+    assert await waiter is result
+    assert flight.waiters == 0
+
+
+async def test_waiter_reruns_when_the_shared_execution_is_cancelled():
+    extension = SingleFlight(timeout=1)
+    flight = _Flight()
+
+    waiter = asyncio.ensure_future(extension._wait(flight, "query"))
+    await asyncio.sleep(0)
+    flight.future.cancel()
+
+    assert await waiter is None
+
+
+async def test_cancelling_a_waiter_propagates_and_leaves_the_flight_alone():
+    extension = SingleFlight(timeout=1)
+    flight = _Flight()
+
+    waiter = asyncio.ensure_future(extension._wait(flight, "query"))
+    await asyncio.sleep(0)
+    waiter.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert not flight.future.done()
+    assert flight.waiters == 0
+
+
+async def test_waiter_times_out_without_cancelling_the_flight():
+    extension = SingleFlight(timeout=0.01)
+    flight = _Flight()
+
+    result = await extension._wait(flight, "query")
+
+    assert result.data is None
+    assert "Timed out" in result.errors[0].message
+    assert not flight.future.done()
+    assert flight.waiters == 0
@@ -0,0 +1,29 @@
+import pytest
+
+from app.core.security.tokens import (
+    AccessClaims,
+    RevocationSet,
+    TokenError,
+    new_refresh_token,
+    refresh_token_session,
+)
+
+
+def test_refresh_tokens_carry_their_user_and_session():
+    assert refresh_token_session(new_refresh_token(42, 7)) == (42, 7)
+    # Tokens issued before the user id was added are still accepted
+    assert refresh_token_session("rt1.7.c2VjcmV0") == (None, 7)
+    for token in ("rt2.x.7.c2VjcmV0", "rt2.7.c2VjcmV0", "at1.42.7.c2VjcmV0", ""):
+        with pytest.raises(TokenError):
+            refresh_token_session(token)
+
+
+def test_revocations_are_scoped_to_the_user():
+    revocations = RevocationSet()
+    revocations.revoke_session(1, 5)
+    revocations.revoke_refresh_token(2, 9)
+
+    assert revocations.is_revoked(AccessClaims(1, 5, 3, 0))
+    assert revocations.is_revoked(AccessClaims(2, 4, 9, 0))
+    # The same ids on another shard belong to other users' sessions
+    assert not revocations.is_revoked(AccessClaims(3, 5, 9, 0))
@@ -0,0 +1,98 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+from app.core.deadline import check, deadline_after
+from app.core.services.user_service import UserService
+from app.database import async_session
+from app.events.user_events import event_bus
+from app.models import User
+from app.schemas.user import UserVerifyInput
+
+
+async def create_unverified_user() -> User:
+    name = f"verify_{uuid.uuid4().hex[:12]}"
+    async with async_session() as db:
+        user = User(
+            username=name,
+            email=f"{name}@example.com",
+            password_hash="x",
+            is_active=False,
+            email_verified=False,
+            verification_code="abc123",
+            verification_code_expires_at=datetime.utcnow() + timedelta(minutes=10),
+        )
+        db.add(user)
+        await db.commit()
+        return user
+
+
+async def test_repeated_verification_is_announced_once(database, monkeypatch):
+    emitted = []
+
+    async def emit_async(event, *args, **kwargs):
+        emitted.append(event)
+        return True
+
+    monkeypatch.setattr(event_bus, "emit_async", emit_async)
+    user = await create_unverified_user()
+    input = UserVerifyInput(email=user.email, verification_code="abc123")
+
+    for _ in range(2):
+        async with async_session() as db:
+            verified = await UserService.verify_user_code(input, db, "127.0.0.1")
+        assert verified.email_verified and verified.is_active
+
+    assert emitted == ["user_verified"]
+
+
+class SlowRefreshSession:
+    """Stands in for the session of a request that is cancelled while the user is refreshed."""
+
+    def __init__(self, user):
+        self.user = user
+
+    async def execute(self, query):
+        return self
+
+    def scalars(self):
+        return self
+
+    def first(self):
+        return self.user
+
+    async def commit(self):
+        pass
+
+    async def refresh(self, user):
+        await asyncio.sleep(0.05)
+        # A transaction started after the request's deadline would be refused
+        check()
+
+
+async def test_verification_is_announced_even_if_the_request_is_cancelled_after_commit(monkeypatch):
+    emitted = []
+
+    async def emit_async(event, *args, **kwargs):
+        emitted.append(event)
+        return True
+
+    monkeypatch.setattr(event_bus, "emit_async", emit_async)
+    user = User(
+        id=1,
+        username="ann",
+        email="ann@example.com",
+        email_verified=False,
+        verification_code="abc123",
+        verification_code_expires_at=datetime.utcnow() + timedelta(minutes=10),
+    )
+    input = UserVerifyInput(email=user.email, verification_code="abc123")
+    with deadline_after(0.02):
+        task = asyncio.create_task(UserService.verify_user_code(input, SlowRefreshSession(user), "127.0.0.1"))
+    await asyncio.sleep(0.01)
+    task.cancel()
+
+    await asyncio.sleep(0.1)
+
+    assert task.cancelled()
+    assert emitted == ["user_verified"]